@@ -0,0 +1,41 @@
+"""
+This module contains the password hashers of the password hashing profiles, see `PASSWORD_HASHER_PROFILE` in the
+settings.
+
+The hashers keep the algorithm names of the Django hashers they extend, so hashes made with other parameters are
+still verified, and `must_update` reports them to be rehashed with the parameters below at the next login.
+
+`Classes`:
+
+    ScryptPasswordHasher:
+        Scrypt with a larger work factor than the Django default.
+
+    Argon2PasswordHasher:
+        Argon2id with less memory and parallelism than the Django default.
+"""
+
+from django.contrib.auth import hashers
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """
+    Scrypt with N=2^16, r=8, p=1, which uses 64 MiB and takes about as long as the default PBKDF2 iterations.
+    """
+
+    work_factor = 2**16
+    block_size = 8
+    parallelism = 1
+
+    # hashlib caps scrypt at 32 MiB unless told otherwise
+    maxmem = 2 * 128 * work_factor * block_size
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id with t=2 and m=19 MiB, the minimum OWASP recommends. The Django default asks for 100 MiB and 8 lanes,
+    which a small web dyno cannot give to several logins at once. Needs the argon2-cffi package.
+    """
+
+    time_cost = 2
+    memory_cost = 19 * 1024
+    parallelism = 1
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-19 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learner',
+            name='social_profile_name',
+            field=models.CharField(default=None, editable=False, max_length=200, null=True),
+        ),
+    ]
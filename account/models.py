@@ -119,6 +119,8 @@ class Learner(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="learners")  # Act as a foreign key
     field_of_interest = models.CharField(null=True, max_length=50, choices=FIELD_OF_INTEREST_CHOICES, default=None)
     social_link = models.URLField(null=True, max_length=200, default=None)
+    # Looked up from `social_link` by the task queue, None until then and empty when the lookup found none
+    social_profile_name = models.CharField(null=True, max_length=200, default=None, editable=False)
     profession = models.CharField(null=True, max_length=50, default=None)
 
     def __str__(self):
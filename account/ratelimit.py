@@ -0,0 +1,197 @@
+"""
+This module contains the rate limiter of the account endpoints.
+
+Every rule counts the requests of one identity, such as a client IP or the email of a login form, in the shared
+cache. A fixed window counts the requests since the start of the current window. A sliding window also weighs in the
+previous window's count by the share of it that still falls into the last `window` seconds, which smooths the burst
+a fixed window allows at its boundary. Either way a check costs one atomic cache increment and at most one read, and
+the memory per identity is two counters whatever the traffic.
+
+`Classes`:
+
+    Rule:
+        A limit on the number of requests of an identity per window.
+
+`Functions`:
+
+    hit(scope: str, identity: str, limit: int, window: int, algorithm: str) -> Tuple[bool, int]:
+        Counts a request and tells whether it is allowed.
+
+    ratelimit(scope: str, rules: List[Rule], methods: Iterable[str]) -> Callable:
+        Decorates a view so that requests over a limit get a 429 response.
+
+    client_ip(request: HttpRequest) -> str:
+        Returns the IP address of the client.
+
+    json_field(name: str) -> Callable:
+        Returns a key function reading a field of a JSON body.
+"""
+
+import functools
+import hashlib
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, JsonResponse
+
+FIXED = "fixed"
+SLIDING = "sliding"
+
+
+def _increment(key: str, timeout: int) -> int:
+    # `add` only sets a missing key, so concurrent first hits cannot reset each other's count
+    if cache.add(key, 1, timeout=timeout):
+        return 1
+
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key expired between `add` and `incr`
+        cache.add(key, 1, timeout=timeout)
+        return 1
+
+
+def hit(scope: str, identity: str, limit: int, window: int, algorithm: str = SLIDING) -> Tuple[bool, int]:
+    """
+    Count a request of an identity and tell whether it is within the limit.
+
+    Args:
+        scope (str): The name of the limited endpoint, so identities are counted per endpoint.
+        identity (str): The identity the request is counted for.
+        limit (int): The number of requests allowed per window.
+        window (int): The length of the window, in seconds.
+        algorithm (str): "sliding" or "fixed".
+
+    Returns:
+        Tuple[bool, int]: Whether the request is allowed, and otherwise the number of seconds after which a request
+        would be allowed again.
+    """
+
+    now = time.time()
+    index, elapsed = divmod(now, window)
+    index = int(index)
+
+    digest = hashlib.sha1(identity.encode()).hexdigest()
+    key = f"ratelimit:{scope}:{digest}"
+
+    # Counters live for two windows, the sliding estimate reads the previous one
+    count = _increment(f"{key}:{index}", timeout=window * 2)
+
+    if algorithm == FIXED:
+        if count <= limit:
+            return True, 0
+        return False, max(1, math.ceil(window - elapsed))
+
+    previous_count = cache.get(f"{key}:{index - 1}", 0)
+    weight = 1 - elapsed / window
+    estimate = previous_count * weight + count
+
+    if estimate <= limit:
+        return True, 0
+
+    # While the current window alone is under the limit, the next request fits once enough of the previous window
+    # has slid out
+    if count < limit:
+        retry_after = math.ceil((estimate + 1 - limit) / previous_count * window)
+    else:
+        retry_after = math.ceil(window - elapsed)
+
+    return False, max(1, retry_after)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    A limit on the number of requests of an identity per window.
+
+    Attributes:
+        key (Callable): Returns the identity of a request, or None to skip the rule for that request.
+        limit (int): The number of requests allowed per window.
+        window (int): The length of the window, in seconds.
+        algorithm (str): "sliding" or "fixed".
+    """
+
+    key: Callable[[HttpRequest], Optional[str]]
+    limit: int
+    window: int
+    algorithm: str = SLIDING
+
+
+def client_ip(request: HttpRequest) -> str:
+    """
+    Return the IP address of the client. Behind a proxy, enable `RATELIMIT["TRUST_X_FORWARDED_FOR"]` so the address
+    the proxy appended is used instead of the proxy's own.
+    """
+
+    forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if forwarded_for and getattr(settings, "RATELIMIT", {}).get("TRUST_X_FORWARDED_FOR"):
+        return forwarded_for.split(",")[-1].strip()
+
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def json_field(name: str) -> Callable[[HttpRequest], Optional[str]]:
+    """
+    Return a key function reading a field of a JSON body, such as the email of a login form, normalized to lowercase.
+    """
+
+    def key(request):
+        try:
+            value = json.loads(request.body).get(name)
+        except (ValueError, AttributeError):
+            return None
+        return str(value).strip().lower() if value else None
+
+    key.__name__ = f"json_field_{name}"
+    return key
+
+
+def ratelimit(scope: str, rules: List[Rule], methods: Iterable[str] = ("POST",)):
+    """
+    Decorate a view so that requests over any of the rules get a 429 response with a `Retry-After` header.
+
+    Every rule is counted, even when an earlier one already rejects the request, so a client cannot dodge a per-IP
+    limit by spreading attempts over identities. Limiting is skipped when `RATELIMIT["ENABLED"]` is False.
+
+    Args:
+        scope (str): The name of the limited endpoint.
+        rules (List[Rule]): The limits applied to every request.
+        methods (Iterable[str]): The HTTP methods that are limited.
+    """
+
+    methods = set(methods)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods or not getattr(settings, "RATELIMIT", {}).get("ENABLED", True):
+                return view(request, *args, **kwargs)
+
+            retry_after = 0
+            for rule in rules:
+                identity = rule.key(request)
+                if identity is None:
+                    continue
+
+                allowed, wait = hit(f"{scope}:{rule.key.__name__}", identity, rule.limit, rule.window, rule.algorithm)
+                if not allowed:
+                    retry_after = max(retry_after, wait)
+
+            if retry_after:
+                response = JsonResponse(
+                    {"success": False, "message": f"Too many attempts. Please try again in {retry_after} seconds."},
+                    status=429,
+                )
+                response["Retry-After"] = str(retry_after)
+                return response
+
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,135 @@
+"""
+This module contains the lookup of the profile name behind a learner's social link.
+
+It scrapes the social platforms with aiohttp and BeautifulSoup, or calls third-party APIs with requests. Those
+libraries take a large share of a worker's startup time and memory, so the module is only imported by the background
+task that performs the lookup, never by the views.
+
+`Functions`:
+
+    get_social_profile_name(social_link: str) -> str:
+        Looks up the profile name behind an Instagram, Facebook, GitHub, LinkedIn or X link.
+"""
+
+import os
+
+import aiohttp
+import requests
+from bs4 import BeautifulSoup
+from django.core.cache import cache
+
+
+async def get_social_profile_name(social_link: str):
+    API_KEY = os.getenv("API_KEY")
+
+    if "https://" in social_link and "www" not in social_link:
+        splitted_link = social_link.split("//")
+        social_link = f"https://www.{splitted_link[-1]}"
+    elif "https://www" not in social_link:
+        social_link = f"https://{social_link}"
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(social_link) as response:
+            html_content = await response.text()
+
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    if "instagram.com" in social_link:
+        content = soup.find("meta", property="og:title")
+
+        # Get content from the meta tag
+        splitted_content = content.get("content", None).split(" ")[:2]
+        profile_name = " ".join(splitted_content)
+        
+        if "@" in splitted_content[-1]:
+            profile_name = splitted_content[0]
+        
+        cache_key = f"instagram_profile_name:{social_link}"
+        cached_name = cache.get(cache_key)
+        
+        if cached_name:
+            return cached_name
+        
+        cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)
+        
+        return profile_name
+
+    if "facebook.com" in social_link:
+        content = soup.find("meta", property="og:title")
+
+        # Get content from the meta tag
+        splitted_content = content.get("content", None).split(" ")[:3]
+        profile_name = " ".join(splitted_content)
+        
+        cache_key = f"facebook_profile_name:{social_link}"
+        cached_name = cache.get(cache_key)
+        
+        if cached_name:
+            return cached_name
+        
+        cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)
+
+        return profile_name
+    
+    if "github.com" in social_link:
+        name_tag = soup.find("span", class_="p-name vcard-fullname d-block overflow-hidden")
+        profile_name = name_tag.get_text(strip=True)
+        
+        cache_key = f"github_profile_name:{social_link}"
+        cached_name = cache.get(cache_key)
+        
+        if cached_name:
+            return cached_name
+        
+        cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)
+        
+        return profile_name
+
+    if "linkedin.com" in social_link:
+        url = "https://li-data-scraper.p.rapidapi.com/get-profile-data-by-url"
+        querystring = {"url": social_link}
+        headers = {
+            "x-rapidapi-key": API_KEY,
+            "x-rapidapi-host": "li-data-scraper.p.rapidapi.com",
+        }
+
+        cache_key = f"linkedin_profile_name:{social_link}"
+        cached_name = cache.get(cache_key)
+
+        if cached_name:
+            return cached_name
+
+        response = requests.get(url, headers=headers, params=querystring)
+
+        if response.status_code == 200:
+            response_data = response.json()
+            profile_name = f"{response_data['firstName']} {response_data['lastName']}"
+            cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)  # 30 days
+            return profile_name
+
+    if "x.com" in social_link:
+        url = "https://twitter-api47.p.rapidapi.com/v2/user/by-username"
+        username = social_link.split("/")[-1]
+
+        querystring = {"username": username}
+
+        headers = {
+            "x-rapidapi-key": API_KEY,
+            "x-rapidapi-host": "twitter-api47.p.rapidapi.com",
+        }
+
+        cache_key = f"twitter_profile_name:{username}"
+        cached_name = cache.get(cache_key)
+
+        if cached_name:
+            return cached_name
+
+        response = requests.get(url, headers=headers, params=querystring)
+
+        if response.status_code == 200:
+            response_data = response.json()
+            profile_name = response_data["legacy"]["name"]
+            cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)
+            return profile_name
+
+    return "Unknown User"
@@ -0,0 +1,22 @@
+import asyncio
+import hashlib
+
+from .models import Learner
+
+
+def social_profile_task_key(social_link: str) -> str:
+    return f"social_profile_name:{hashlib.sha1(social_link.encode()).hexdigest()}"
+
+
+def fetch_social_profile_name(social_link: str):
+    """
+    Look up the profile name behind a social link and store it on the learners with that link, for the profile page.
+    It runs in the task queue, as the lookup scrapes the social platform or calls a third-party API. The name is kept
+    in the database, the worker may not share a cache with the web processes.
+    """
+
+    # Imported here, the scraping libraries are only loaded by the workers that run the lookup
+    from .social import get_social_profile_name
+
+    profile_name = asyncio.run(get_social_profile_name(social_link))
+    Learner.objects.filter(social_link=social_link).update(social_profile_name=(profile_name or "")[:200])
@@ -1,3 +1,188 @@
-from django.test import TestCase
+import json
+import os
+import runpy
+import sys
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import MD5PasswordHasher, ScryptPasswordHasher, make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from myproject.settings import base as base_settings
+from onlinecourse.models import Task
+
+from . import ratelimit
+from .models import Learner, User
+from .tasks import fetch_social_profile_name
+
+
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="learner@example.com", username="learner_01", password="Secret-123")
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, email="learner@example.com", password="wrong", **extra):
+        payload = json.dumps({"loginEmail": email, "loginPassword": password})
+        return self.client.post(reverse("account:login"), payload, content_type="application/json", **extra)
+
+    def test_fixed_window_resets_on_the_next_window(self):
+        with mock.patch.object(ratelimit.time, "time", return_value=1000.0):
+            results = [ratelimit.hit("test", "a", limit=3, window=60, algorithm=ratelimit.FIXED) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        self.assertEqual(results[-1][1], 20)  # The window started at 960
+
+        with mock.patch.object(ratelimit.time, "time", return_value=1021.0):
+            self.assertTrue(ratelimit.hit("test", "a", limit=3, window=60, algorithm=ratelimit.FIXED)[0])
+
+    def test_sliding_window_weighs_the_previous_window(self):
+        with mock.patch.object(ratelimit.time, "time", return_value=1000.0):
+            for _ in range(4):
+                ratelimit.hit("test", "a", limit=4, window=60)
+
+        # A quarter into the next window, three quarters of the previous count still apply
+        with mock.patch.object(ratelimit.time, "time", return_value=1035.0):
+            self.assertTrue(ratelimit.hit("test", "a", limit=4, window=60)[0])
+            allowed, retry_after = ratelimit.hit("test", "a", limit=4, window=60)
+        self.assertFalse(allowed)
+        self.assertEqual(retry_after, 30)
+
+        with mock.patch.object(ratelimit.time, "time", return_value=1065.0):
+            self.assertTrue(ratelimit.hit("test", "a", limit=4, window=60)[0])
+
+    def test_login_is_limited_per_email(self):
+        for _ in range(5):
+            self.assertEqual(self.login().status_code, 200)
+
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertFalse(response.json()["success"])
+
+        # The limit of an email does not lock out other accounts from the same address
+        self.assertEqual(self.login(email="other@example.com").status_code, 200)
+
+    def test_login_is_limited_per_ip(self):
+        for number in range(20):
+            self.assertEqual(self.login(email=f"user{number}@example.com").status_code, 200)
+
+        self.assertEqual(self.login(email="user20@example.com").status_code, 429)
+        self.assertEqual(self.login(email="user20@example.com", REMOTE_ADDR="10.0.0.2").status_code, 200)
+
+    def test_rejected_login_skips_authentication(self):
+        for _ in range(5):
+            self.login()
+
+        with mock.patch("account.views.authenticate") as authenticate:
+            self.assertEqual(self.login(password="Secret-123").status_code, 429)
+        authenticate.assert_not_called()
+
+    def test_registration_is_limited_per_ip(self):
+        url = reverse("account:registration")
+        fields = ["signUpEmail", "signUpUsername", "signUpPassword", "confirmationPassword"]
+        payload = json.dumps(dict.fromkeys(fields, ""))
+
+        for _ in range(10):
+            self.assertEqual(self.client.post(url, payload, content_type="application/json").status_code, 200)
+        self.assertEqual(self.client.post(url, payload, content_type="application/json").status_code, 429)
+
+        # Rendering the page is not limited
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(RATELIMIT={"ENABLED": False})
+    def test_disabled(self):
+        for _ in range(10):
+            self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(RATELIMIT={"TRUST_X_FORWARDED_FOR": True})
+    def test_trusted_forwarded_for(self):
+        for _ in range(20):
+            self.login(email="a@example.com", HTTP_X_FORWARDED_FOR="spoofed, 10.0.0.3")
+
+        self.assertEqual(self.login(email="b@example.com", HTTP_X_FORWARDED_FOR="10.0.0.3").status_code, 429)
+        self.assertEqual(self.login(email="b@example.com", HTTP_X_FORWARDED_FOR="10.0.0.4").status_code, 200)
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+    def test_registration_hashes_once_in_one_insert(self):
+        payload = {
+            "signUpEmail": "new.learner@example.com",
+            "signUpUsername": "newlearner",
+            "signUpPassword": "Secret-123",
+            "confirmationPassword": "Secret-123",
+        }
+
+        patch = mock.patch.object(MD5PasswordHasher, "encode", autospec=True, side_effect=MD5PasswordHasher.encode)
+        with patch as encode:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    reverse("account:registration"), json.dumps(payload), content_type="application/json"
+                )
+
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(encode.call_count, 1)
+
+        user_writes = [query["sql"] for query in queries if '"account_user"' in query["sql"]]
+        self.assertEqual(sum(sql.startswith("INSERT") for sql in user_writes), 1)
+        self.assertFalse([sql for sql in user_writes if sql.startswith("UPDATE") and '"password"' in sql])
+        self.assertTrue(User.objects.get(email=payload["signUpEmail"]).check_password("Secret-123"))
+
+    @override_settings(PASSWORD_HASHERS=["account.hashers.ScryptPasswordHasher"])
+    def test_login_rehashes_outdated_hashes(self):
+        # A hash made with the smaller Django default work factor is upgraded on the first successful login
+        outdated = make_password("Secret-123", hasher=ScryptPasswordHasher())
+        user = User.objects.create(email="learner@example.com", username="learner_01", password=outdated)
+
+        response = self.client.post(
+            reverse("account:login"),
+            json.dumps({"loginEmail": user.email, "loginPassword": "Secret-123"}),
+            content_type="application/json",
+        )
+        self.assertTrue(response.json()["success"])
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("scrypt$65536$"))
+        self.assertTrue(user.check_password("Secret-123"))
+
+
+    def test_fast_profile_is_only_accepted_by_the_tests(self):
+        with mock.patch.dict(os.environ, {"PASSWORD_HASHER_PROFILE": "fast"}):
+            with mock.patch.object(sys, "argv", ["manage.py", "test"]):
+                settings = runpy.run_path(base_settings.__file__)
+            self.assertEqual(settings["PASSWORD_HASHERS"][0], "django.contrib.auth.hashers.MD5PasswordHasher")
+
+            with mock.patch.object(sys, "argv", ["manage.py", "runserver"]):
+                with self.assertRaises(ImproperlyConfigured):
+                    runpy.run_path(base_settings.__file__)
+
+
+class SocialProfileNameTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="learner@example.com", username="learner_01", password="Secret-123", profile_image="learner.png"
+        )
+        self.learner = Learner.objects.create(user=self.user, social_link="https://github.com/learner")
+        self.client.force_login(self.user)
+
+    def test_name_is_looked_up_once_and_kept_on_the_learner(self):
+        self.assertIsNone(self.client.get(reverse("account:profile")).context["learner_data"]["social_profile_name"])
+        self.assertEqual(Task.objects.count(), 1)
+
+        # The worker stores the name in the database, which every web process reads
+        with mock.patch("account.social.get_social_profile_name", mock.AsyncMock(return_value="Learner")):
+            fetch_social_profile_name(self.learner.social_link)
+        Task.objects.all().delete()
+
+        response = self.client.get(reverse("account:profile"))
+        self.assertEqual(response.context["learner_data"]["social_profile_name"], "Learner")
+        self.assertFalse(Task.objects.exists())
@@ -1,26 +1,34 @@
-import asyncio
 import json
 import logging
 import os
 import re
 
-import aiohttp
-import requests
-from bs4 import BeautifulSoup
 from django.contrib.auth import authenticate, login, logout
-from django.core.cache import cache
 from django.http import HttpRequest, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils.timezone import now, timedelta
 from django.views.decorators.csrf import csrf_exempt
-from dotenv import load_dotenv
+
+from myproject.db_routers import read_from_replica
+from onlinecourse.tasks import enqueue
 
 from .models import Learner, User
+from .ratelimit import Rule, client_ip, json_field, ratelimit
+from .tasks import fetch_social_profile_name, social_profile_task_key
 
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+# Every login attempt runs the password hasher, so a client guessing passwords or stuffing credentials is limited per
+# IP address and per targeted email
+LOGIN_RATE_LIMITS = [
+    Rule(key=client_ip, limit=20, window=60),
+    Rule(key=json_field("loginEmail"), limit=5, window=5 * 60),
+]
+
+REGISTRATION_RATE_LIMITS = [
+    Rule(key=client_ip, limit=10, window=60 * 60),
+]
 
 
 def validate_email(email):
@@ -51,6 +59,7 @@ def validate_user_data(email, username, password):
 
 
 # Create your views here.
+@ratelimit("registration", REGISTRATION_RATE_LIMITS)
 def registration_request(request: HttpRequest) -> HttpResponse:
     # Context is a dictionary that is passed to the template
     context = {}
@@ -109,9 +118,8 @@ def registration_request(request: HttpRequest) -> HttpResponse:
             all_data_valid = validate_user_data(email=email, username=username, password=password)
 
             if all_data_valid:
-                user = User.objects.create_user(email=email, username=username)
-                user.set_password(password)
-                user.save()
+                # Hashed once and saved with the user in a single INSERT
+                user = User.objects.create_user(email=email, username=username, password=password)
 
                 login(request, user)
 
@@ -120,6 +128,7 @@ def registration_request(request: HttpRequest) -> HttpResponse:
                 return JsonResponse({"success": True, "redirect_url": profile_completion_url})
 
 
+@ratelimit("login", LOGIN_RATE_LIMITS)
 def login_request(request: HttpRequest) -> HttpResponseRedirect | HttpResponse:
     """
     Handle user login requests.
@@ -269,122 +278,7 @@ def logout_request(request: HttpRequest) -> HttpResponseRedirect:
     return redirect(to="onlinecourse:index")
 
 
-async def get_social_profile_name(social_link: str):
-    API_KEY = os.getenv("API_KEY")
-
-    if "https://" in social_link and "www" not in social_link:
-        splitted_link = social_link.split("//")
-        social_link = f"https://www.{splitted_link[-1]}"
-    elif "https://www" not in social_link:
-        social_link = f"https://{social_link}"
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(social_link) as response:
-            html_content = await response.text()
-
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    if "instagram.com" in social_link:
-        content = soup.find("meta", property="og:title")
-
-        # Get content from the meta tag
-        splitted_content = content.get("content", None).split(" ")[:2]
-        profile_name = " ".join(splitted_content)
-        
-        if "@" in splitted_content[-1]:
-            profile_name = splitted_content[0]
-        
-        cache_key = f"instagram_profile_name:{social_link}"
-        cached_name = cache.get(cache_key)
-        
-        if cached_name:
-            return cached_name
-        
-        cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)
-        
-        return profile_name
-
-    if "facebook.com" in social_link:
-        content = soup.find("meta", property="og:title")
-
-        # Get content from the meta tag
-        splitted_content = content.get("content", None).split(" ")[:3]
-        profile_name = " ".join(splitted_content)
-        
-        cache_key = f"facebook_profile_name:{social_link}"
-        cached_name = cache.get(cache_key)
-        
-        if cached_name:
-            return cached_name
-        
-        cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)
-
-        return profile_name
-    
-    if "github.com" in social_link:
-        name_tag = soup.find("span", class_="p-name vcard-fullname d-block overflow-hidden")
-        profile_name = name_tag.get_text(strip=True)
-        
-        cache_key = f"github_profile_name:{social_link}"
-        cached_name = cache.get(cache_key)
-        
-        if cached_name:
-            return cached_name
-        
-        cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)
-        
-        return profile_name
-
-    if "linkedin.com" in social_link:
-        url = "https://li-data-scraper.p.rapidapi.com/get-profile-data-by-url"
-        querystring = {"url": social_link}
-        headers = {
-            "x-rapidapi-key": API_KEY,
-            "x-rapidapi-host": "li-data-scraper.p.rapidapi.com",
-        }
-
-        cache_key = f"linkedin_profile_name:{social_link}"
-        cached_name = cache.get(cache_key)
-
-        if cached_name:
-            return cached_name
-
-        response = requests.get(url, headers=headers, params=querystring)
-
-        if response.status_code == 200:
-            response_data = response.json()
-            profile_name = f"{response_data['firstName']} {response_data['lastName']}"
-            cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)  # 30 days
-            return profile_name
-
-    if "x.com" in social_link:
-        url = "https://twitter-api47.p.rapidapi.com/v2/user/by-username"
-        username = social_link.split("/")[-1]
-
-        querystring = {"username": username}
-
-        headers = {
-            "x-rapidapi-key": API_KEY,
-            "x-rapidapi-host": "twitter-api47.p.rapidapi.com",
-        }
-
-        cache_key = f"twitter_profile_name:{username}"
-        cached_name = cache.get(cache_key)
-
-        if cached_name:
-            return cached_name
-
-        response = requests.get(url, headers=headers, params=querystring)
-
-        if response.status_code == 200:
-            response_data = response.json()
-            profile_name = response_data["legacy"]["name"]
-            cache.set(cache_key, profile_name, timeout=30 * 24 * 60 * 60)
-            return profile_name
-
-    return "Unknown User"
-
-
+@read_from_replica
 def view_profile(request: HttpRequest) -> HttpResponse:
     user = request.user
 
@@ -397,7 +291,11 @@ def view_profile(request: HttpRequest) -> HttpResponse:
             social_link = learner.social_link
 
             completion_percentage = user.completion_percentage()
-            social_profile_name = asyncio.run(get_social_profile_name(social_link)) if social_link else None
+
+            # The lookup is slow, a name not looked up yet is fetched in the background and the link is shown meanwhile
+            social_profile_name = learner.social_profile_name
+            if social_link and social_profile_name is None:
+                enqueue(fetch_social_profile_name, social_link, key=social_profile_task_key(social_link))
 
             learner_data = {
                 "field_of_interest": field_of_interest,
@@ -468,8 +366,11 @@ def update_profile(request):
 
         if social_link:
             learner = Learner.objects.get(user=user)
-            learner.social_link = social_link
-            learner.save()
+            if learner.social_link != social_link:
+                learner.social_link = social_link
+                learner.social_profile_name = None
+                learner.save()
+                enqueue(fetch_social_profile_name, social_link, key=social_profile_task_key(social_link))
 
         user.save()
         return JsonResponse({"success": True, "message": "Profile updated successfully."})
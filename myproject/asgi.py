@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 
 application = get_asgi_application()
+
+# Compile the templates before the first request rather than during it
+if settings.TEMPLATE_WARMUP:
+    from onlinecourse.template_cache import warm_template_cache
+
+    warm_template_cache()
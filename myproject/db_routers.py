@@ -0,0 +1,182 @@
+"""
+This module contains the routing of reads to a replica database.
+
+Read-mostly pages, such as the course list or a quiz result, and the analytics and export code read from the database
+alias named by `REPLICA["ALIAS"]`, so they do not compete with quiz submissions on the primary. Reads are only routed
+inside `replica_reads()`, which the `read_from_replica` view decorator enters, everything else, and every write, keeps
+using the primary.
+
+A replica lags behind the primary. So that learners see their own writes, a successful request by a signed-in
+learner that wrote to the primary, such as a quiz submission, makes their session stick to the primary for
+`REPLICA["STICKY_SECONDS"]`. When the replica
+cannot be connected to, reads fall back to the primary and the replica is retried after
+`REPLICA["RETRY_AFTER_SECONDS"]`.
+
+`Classes`:
+
+    ReplicaRouter:
+        Routes the reads made inside `replica_reads()` to the replica, and every write to the primary.
+
+    StickyPrimaryMiddleware:
+        Sticks the session of a learner to the primary after a request that wrote to it.
+
+`Functions`:
+
+    replica_reads() -> ContextManager:
+        Routes the reads of the block to the replica.
+
+    read_from_replica(view: Callable) -> Callable:
+        Decorates a view so that its reads go to the replica, unless the session sticks to the primary.
+
+    stick_to_primary(request: HttpRequest) -> None:
+        Sticks the session of a request to the primary.
+"""
+
+import contextlib
+import functools
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# The session key holding the time until which the session reads from the primary
+STICKY_SESSION_KEY = "_primary_until"
+
+# The statements that make a request stick to the primary
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+# The time until which the replica is considered down, per alias
+_replica_down_until = {}
+
+
+def replica_settings() -> dict:
+    return {"ALIAS": None, "STICKY_SECONDS": 15, "RETRY_AFTER_SECONDS": 30, **getattr(settings, "REPLICA", {})}
+
+
+def available_replica():
+    """
+    Return the alias of the replica, or None when none is configured or it cannot be connected to.
+    """
+
+    options = replica_settings()
+    alias = options["ALIAS"]
+    if alias is None:
+        return None
+
+    if _replica_down_until.get(alias, 0) > time.monotonic():
+        return None
+
+    try:
+        # A no-op once connected, the connection is reused for the rest of the request
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        logger.warning("Replica %s is unavailable, reading from the primary", alias, exc_info=True)
+        _replica_down_until[alias] = time.monotonic() + options["RETRY_AFTER_SECONDS"]
+        return None
+
+    return alias
+
+
+@contextlib.contextmanager
+def replica_reads():
+    """
+    Route the reads made inside the block to the replica.
+    """
+
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def stick_to_primary(request):
+    """
+    Make the session of a request read from the primary for `REPLICA["STICKY_SECONDS"]`.
+    """
+
+    request.session[STICKY_SESSION_KEY] = time.time() + replica_settings()["STICKY_SECONDS"]
+
+
+def sticks_to_primary(request) -> bool:
+    session = getattr(request, "session", None)
+    return session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+def read_from_replica(view):
+    """
+    Decorate a view so that its reads go to the replica, unless the session sticks to the primary.
+
+    The signed-in user is loaded from the primary before the view runs, a learner who just signed up is not signed out
+    by a lagging replica.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user = getattr(request, "user", None)
+        if user is not None:
+            user.is_authenticated  # Evaluates the lazy user
+
+        if sticks_to_primary(request):
+            return view(request, *args, **kwargs)
+
+        with replica_reads():
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Routes the reads made inside `replica_reads()` to the replica, and every write to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return available_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Without an explicit answer, Django writes an instance to the database it was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+
+class StickyPrimaryMiddleware:
+    """
+    Sticks the session of a signed-in learner to the primary after a successful request that wrote to it, so the pages
+    that follow show the learner's own writes. Requests that only read, such as most autosaves of a quiz in progress,
+    leave the session alone. Removed from the middleware chain when no replica is configured.
+    """
+
+    def __init__(self, get_response):
+        if replica_settings()["ALIAS"] is None:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrote = False
+
+        def watch_writes(execute, sql, params, many, context):
+            nonlocal wrote
+            wrote = wrote or sql.lstrip().upper().startswith(WRITE_STATEMENTS)
+            return execute(sql, params, many, context)
+
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(watch_writes):
+            response = self.get_response(request)
+
+        user = getattr(request, "user", None)
+        if wrote and response.status_code < 400 and user is not None and user.is_authenticated:
+            stick_to_primary(request)
+
+        return response
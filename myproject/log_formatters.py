@@ -0,0 +1,39 @@
+"""
+This module contains the log formatter of the production settings.
+
+`Classes`:
+
+    JsonFormatter(logging.Formatter):
+        Formats every record as one JSON object per line.
+"""
+
+import json
+import logging
+
+# Attributes every record has, anything else was passed with `extra` and is logged as a field
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats every record as one JSON object per line, holding the time, level, logger and message of the record, the
+    fields passed with `extra` and the formatted exception if any.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        # Values json cannot encode, such as model instances, are logged as their string
+        return json.dumps(entry, default=str)
@@ -0,0 +1,23 @@
+"""
+Django settings for myproject project.
+
+The profile is selected by the DJANGO_ENV environment variable: "dev", the default, or "prod". A profile can also be
+selected directly with DJANGO_SETTINGS_MODULE=myproject.settings.dev or myproject.settings.prod.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
+
+# Loaded here as well as in base, so DJANGO_ENV can be set in the .env file
+load_dotenv()
+
+DJANGO_ENV = os.getenv("DJANGO_ENV", "dev")
+
+if DJANGO_ENV == "prod":
+    from .prod import *  # noqa: F401,F403
+elif DJANGO_ENV == "dev":
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f'DJANGO_ENV must be "dev" or "prod", not "{DJANGO_ENV}".')
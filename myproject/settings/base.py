@@ -0,0 +1,287 @@
+"""
+Django settings for myproject project, shared by the development and production profiles.
+
+Generated by 'django-admin startproject' using Django 3.0.4.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.0/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/3.0/ref/settings/
+"""
+
+import os
+import sys
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
+load_dotenv()
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/3.0/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.getenv("SECRET_KEY")
+
+# SECURITY WARNING: don't run with debug turned on in production!
+# Debug also keeps every SQL statement in memory and renders the slow technical error pages, the dev profile enables it
+DEBUG = False
+
+ALLOWED_HOSTS = ["127.0.0.1", ".vercel.app"]
+
+CSRF_TRUSTED_ORIGINS = ["https://*.vercel.app"]
+
+# True while "python manage.py test" runs
+TESTING = sys.argv[1:2] == ["test"]
+
+# Application definition
+INSTALLED_APPS = [
+    "onlinecourse.apps.OnlinecourseConfig",
+    "account.apps.AccountConfig",
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Removes itself from the chain unless REPLICA["ALIAS"] is set
+    "myproject.db_routers.StickyPrimaryMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Removes itself from the chain unless PROFILING["ENABLED"] is true
+    "onlinecourse.profiling.ProfilingMiddleware",
+]
+
+ROOT_URLCONF = "myproject.urls"
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.debug",
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.template.context_processors.media",
+                "django.contrib.messages.context_processors.messages",
+            ],
+        },
+    },
+]
+
+# Compile the app templates when a worker boots, see onlinecourse/template_cache.py
+TEMPLATE_WARMUP = os.getenv("TEMPLATE_WARMUP", "False") == "True"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "unique-snowflake",
+    }
+}
+
+# The local memory cache is private to each process, counters such as the rate limits need a cache shared by all of
+# them in production. Set REDIS_URL to use Redis, which needs the redis package
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+
+WSGI_APPLICATION = "myproject.wsgi.app"
+
+
+# Database
+# https://docs.djangoproject.com/en/3.0/ref/settings/#databases
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "TIME_ZONE": "Asia/Jakarta",
+    }
+}
+
+# Read replica
+# Set REPLICA_DATABASE_NAME to a replica of the default database to route the reads of the read-mostly pages, the
+# analytics and the exports to it, see myproject/db_routers.py
+
+REPLICA = {
+    "ALIAS": "replica" if os.getenv("REPLICA_DATABASE_NAME") else None,
+    # How long a learner reads from the primary after a write, longer than the replication lag
+    "STICKY_SECONDS": int(os.getenv("REPLICA_STICKY_SECONDS", "15")),
+    # How long an unavailable replica is skipped before it is tried again
+    "RETRY_AFTER_SECONDS": int(os.getenv("REPLICA_RETRY_AFTER_SECONDS", "30")),
+}
+
+if REPLICA["ALIAS"]:
+    DATABASES[REPLICA["ALIAS"]] = {**DATABASES["default"], "NAME": os.getenv("REPLICA_DATABASE_NAME")}
+elif TESTING:
+    # A second SQLite file stands in for the replica in the tests that enable it
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.path.join(BASE_DIR, "db-replica.sqlite3"),
+        "TEST": {"NAME": os.path.join(tempfile.gettempdir(), "quizzku-test-replica.sqlite3")},
+    }
+
+DATABASE_ROUTERS = ["myproject.db_routers.ReplicaRouter"]
+
+AUTH_USER_MODEL = "account.User"
+
+# Password hashing
+# The first hasher of the profile hashes new passwords, the others only verify existing hashes, which are rehashed with
+# the first one at the next login. "argon2" needs the argon2-cffi package. "fast" skips key stretching, it is only
+# accepted while the test suite runs, which uses it unless told otherwise
+
+PASSWORD_HASHER_PROFILES = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "scrypt": "account.hashers.ScryptPasswordHasher",
+    "argon2": "account.hashers.Argon2PasswordHasher",
+    "fast": "django.contrib.auth.hashers.MD5PasswordHasher",
+}
+
+PASSWORD_HASHER_PROFILE = os.getenv("PASSWORD_HASHER_PROFILE", "fast" if TESTING else "pbkdf2")
+
+if PASSWORD_HASHER_PROFILE == "fast" and not TESTING:
+    raise ImproperlyConfigured('PASSWORD_HASHER_PROFILE "fast" hashes passwords with MD5, it is only for the tests.')
+
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE],
+    *(
+        hasher
+        for profile, hasher in PASSWORD_HASHER_PROFILES.items()
+        if profile not in (PASSWORD_HASHER_PROFILE, "fast")
+    ),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+
+# Password validation
+# https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/3.0/topics/i18n/
+
+LANGUAGE_CODE = "en-us"
+
+TIME_ZONE = "Asia/Jakarta"
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+SESSION_COOKIE_AGE = 15 * 60 # 15 minutes
+SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/3.0/howto/static-files/
+
+STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
+MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+STATIC_URL = "/static/"
+MEDIA_URL = "/media/"
+
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, "static"),
+]
+
+# Request profiling
+# Profiles are listed for staff members at /admin/profiles/
+
+PROFILING = {
+    "ENABLED": os.getenv("PROFILING_ENABLED", "False") == "True",
+    "MODE": os.getenv("PROFILING_MODE", "cprofile"),  # "cprofile" or "sampling"
+    "VIEWS": [view for view in os.getenv("PROFILING_VIEWS", "").split(",") if view],  # e.g. "onlinecourse:submit"
+    "SAMPLE_RATE": float(os.getenv("PROFILING_SAMPLE_RATE", "1.0")),
+    "SLOW_THRESHOLD_MS": int(os.getenv("PROFILING_SLOW_THRESHOLD_MS", "1000")),
+    "DIRECTORY": os.path.join(BASE_DIR, "profiles"),
+    "MAX_PROFILES": 100,
+    "SAMPLING_INTERVAL_MS": 5,
+}
+
+# Background task queue
+# Tasks are run by "python manage.py run_worker", or inline after the request's transaction commits when eager
+
+TASK_QUEUE = {
+    "EAGER": os.getenv("TASK_QUEUE_EAGER", "False") == "True",
+    "POOL": os.getenv("TASK_QUEUE_POOL", "thread"),  # "thread" or "process"
+    "CONCURRENCY": int(os.getenv("TASK_QUEUE_CONCURRENCY", "4")),
+    "MAX_ATTEMPTS": 3,
+    "RETRY_BACKOFF_SECONDS": 10,
+}
+
+# Storage of the choices selected in a submission, see onlinecourse/selection.py
+# "m2m" keeps one row per choice in the selection table, "packed", opt-in, their IDs in the submission row. Submissions
+# stored either way are read back the same way, "python manage.py pack_selections" converts the existing ones
+
+SUBMISSION_STORAGE = os.getenv("SUBMISSION_STORAGE", "m2m")
+
+# Archival of old attempts, see onlinecourse/archive.py
+# "python manage.py archive_attempts" writes its files here unless given --output
+
+ARCHIVE_DIRECTORY = os.getenv("ARCHIVE_DIRECTORY", os.path.join(BASE_DIR, "archives"))
+
+# Rate limiting of the login and registration endpoints, see account/ratelimit.py
+# Enable TRUST_X_FORWARDED_FOR only behind a proxy that sets the header, clients could spoof it otherwise
+
+RATELIMIT = {
+    "ENABLED": os.getenv("RATELIMIT_ENABLED", "True") == "True",
+    "TRUST_X_FORWARDED_FOR": os.getenv("RATELIMIT_TRUST_X_FORWARDED_FOR", "False") == "True",
+}
+
+# Logging
+# Application code logs instead of printing. The dev profile writes readable lines, the prod profile one JSON object per
+# line, which log collectors parse without extra configuration
+
+LOG_FORMAT = "text"
+
+# The test suite provokes plenty of warnings, such as 4xx responses, it only shows errors
+LOG_LEVEL = os.getenv("LOG_LEVEL", "ERROR" if TESTING else "INFO")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "text": {"format": "{asctime} {levelname} {name} {message}", "style": "{"},
+        "json": {"()": "myproject.log_formatters.JsonFormatter"},
+    },
+    "handlers": {
+        # The handler filters too, records of the "django" loggers reach it whatever the root level
+        "console": {"class": "logging.StreamHandler", "formatter": LOG_FORMAT, "level": LOG_LEVEL},
+    },
+    "root": {"handlers": ["console"], "level": LOG_LEVEL},
+}
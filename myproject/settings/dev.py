@@ -0,0 +1,9 @@
+"""
+Development settings: debug pages, SQL statements kept in `connection.queries` and readable log lines.
+"""
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
+
+ALLOWED_HOSTS = ALLOWED_HOSTS + ["localhost"]
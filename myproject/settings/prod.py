@@ -0,0 +1,28 @@
+"""
+Production settings: no debug overhead, templates compiled once per process and logs written as JSON lines.
+"""
+
+import os
+
+from .base import *  # noqa: F401,F403
+
+# Without debug, Django no longer serves the static files, the web server in front of it does (see manifest.yml)
+DEBUG = False
+
+# Templates are compiled once per process. Django caches them by default too, but the explicit loaders keep it that way
+# whatever the debug setting and the Django version
+TEMPLATES[0]["APP_DIRS"] = False
+TEMPLATES[0]["OPTIONS"]["loaders"] = [
+    (
+        "django.template.loaders.cached.Loader",
+        [
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ],
+    ),
+]
+
+TEMPLATE_WARMUP = os.getenv("TEMPLATE_WARMUP", "True") == "True"
+
+LOG_FORMAT = "json"
+LOGGING["handlers"]["console"]["formatter"] = LOG_FORMAT
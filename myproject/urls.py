@@ -19,8 +19,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from onlinecourse import views as onlinecourse_views
+
 urlpatterns = (
     [
+        path("admin/profiles/", onlinecourse_views.profile_list, name="profile_list"),
+        path("admin/profiles/<str:name>/", onlinecourse_views.profile_download, name="profile_download"),
         path("admin/", admin.site.urls),
         path("home/", include("onlinecourse.urls")),
         path("home/account/", include("account.urls")),
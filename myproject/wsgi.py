@@ -9,10 +9,17 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 
 application = get_wsgi_application()
 
+# Compile the templates before the first request rather than during it
+if settings.TEMPLATE_WARMUP:
+    from onlinecourse.template_cache import warm_template_cache
+
+    warm_template_cache()
+
 app = application
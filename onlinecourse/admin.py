@@ -8,19 +8,45 @@ Classes:
     Question admin interface.
     LessonInline (admin.StackedInline): Inline admin class for managing Lesson model instances within the
     Course admin interface.
+    FullTextSearchAdmin (admin.ModelAdmin): Base admin class searching courses and lessons through the full-text index.
     CourseAdmin (admin.ModelAdmin): Custom admin class for the Course model, including inline management of
     Lesson instances and additional configurations for list display, filtering, and search fields.
-    LessonAdmin (admin.ModelAdmin): Custom admin class for the Lesson model with configurations for list display.
+    LessonAdmin (admin.ModelAdmin): Custom admin class for the Lesson model with configurations for list display, the
+    item analysis of the lesson, an action queuing the regrade of the selected lessons and a page adding the questions
+    of a CSV or JSON authoring file.
+    QuestionImportForm (forms.Form): The upload form of an authoring file.
     QuestionAdmin (admin.ModelAdmin): Custom admin class for the Question model, including inline management of
-    Choice instances and configurations for list display.
+    Choice instances, configurations for list display and the item statistics of the question.
+    SubmissionAdmin (admin.ModelAdmin): Custom admin class for the Submission model with lean list queries, raw ID
+    widgets and actions exporting the selected submissions as streamed CSV or JSONL files.
+    AttemptAdmin (admin.ModelAdmin): Custom admin class for the Attempt model with lean list queries and raw ID
+    widgets.
+    EnrollmentAdmin (admin.ModelAdmin): Custom admin class for the Enrollment model with lean list queries and raw ID
+    widgets.
+    RegradeJobAdmin (admin.ModelAdmin): Read-only admin class showing the progress of the regrade jobs.
+    TaskAdmin (admin.ModelAdmin): Read-only admin class showing the background tasks, their retries and durations.
+    AttemptSummaryAdmin (admin.ModelAdmin): Read-only admin class showing the attempt totals kept for archived
+    attempts.
 Functions:
     admin.site.register: Registers the models and their corresponding admin classes with the Django admin site.
 """
 
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models.expressions import RawSQL
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from . import search
+from .authoring import FORMATS, import_questions_file
+from .exports import CSV, JSONL, streaming_export_response
+from .pagination import EstimatedCountPaginator
+from .regrade import queue_regrade
 
 # Import models
-from .models import Choice, Course, Enrollment, Lesson, Question, Submission, Attempt
+from .models import Choice, Course, Enrollment, Lesson, Question, RegradeJob, Submission, Attempt, Task, AttemptSummary
 
 # Admin inline classes
 class QuestionInline(admin.StackedInline):
@@ -75,7 +101,21 @@ class LessonInline(admin.StackedInline):
 
 
 # Custom admin classes
-class CourseAdmin(admin.ModelAdmin):
+class FullTextSearchAdmin(admin.ModelAdmin):
+    """
+    FullTextSearchAdmin is a base admin class for courses and lessons, whose changelist and autocomplete searches go
+    through the full-text index, see `search.py`, instead of `icontains` scans of `search_fields`, where the database
+    has one.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        matching = search.matching_pks(self.model, search_term)
+        if matching is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=RawSQL(*matching)), False
+
+
+class CourseAdmin(FullTextSearchAdmin):
     """
     CourseAdmin is a custom admin class for the Course model in the Django admin interface.
 
@@ -83,7 +123,8 @@ class CourseAdmin(admin.ModelAdmin):
         inlines (list): A list of inline models to be displayed within the Course admin interface.
         list_display (list): A list of fields to be displayed in the list view of the Course admin interface.
         list_filter (list): A list of fields to filter the Course list view.
-        search_fields (list): A list of fields to be searched in the Course admin interface.
+        search_fields (list): A list of fields to be searched in the Course admin interface, where the database has no
+        full-text index.
     """
 
     inlines = [LessonInline]
@@ -92,14 +133,134 @@ class CourseAdmin(admin.ModelAdmin):
     search_fields = ["name", "description"]
 
 
-class LessonAdmin(admin.ModelAdmin):
+def format_rate(value):
+    return "-" if value is None else f"{value:.0%}"
+
+
+class QuestionImportForm(forms.Form):
+    """
+    QuestionImportForm is the upload form of an authoring file, see `authoring.py`.
+    """
+
+    file = forms.FileField(help_text="A CSV file with one row per choice, or a JSON list of questions.")
+    file_format = forms.ChoiceField(
+        choices=[("", "Told by the file extension")] + [(file_format, file_format.upper()) for file_format in FORMATS],
+        required=False,
+        label="Format",
+    )
+
+
+class LessonAdmin(FullTextSearchAdmin):
     """
     LessonAdmin is a custom admin class for the Lesson model in the Django admin interface.
     Attributes:
         list_display (list): Specifies the fields to be displayed in the list view of the admin interface.
+        readonly_fields (list): Read-only fields shown on the change form, including the item analysis and the link to
+        the question import.
+        search_fields (list): Fields searched by the admin, also used by lesson autocomplete widgets.
+        actions (list): Queues a regrade of the submissions of the selected lessons.
     """
 
     list_display = ["title"]
+    readonly_fields = ["version", "import_questions_link", "item_analysis"]
+    search_fields = ["title"]
+    actions = ["regrade_lessons"]
+
+    def get_urls(self):
+        import_view = self.admin_site.admin_view(self.import_questions_view)
+        return [
+            path("<int:lesson_id>/import-questions/", import_view, name="onlinecourse_lesson_import_questions"),
+        ] + super().get_urls()
+
+    def import_questions_view(self, request, lesson_id):
+        """
+        Add the questions of an uploaded authoring file to a lesson, all of them or, when the file is not valid, none.
+        """
+
+        lesson = get_object_or_404(Lesson, pk=lesson_id)
+        if not self.has_change_permission(request, lesson):
+            raise PermissionDenied
+
+        form = QuestionImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            try:
+                questions, choices = import_questions_file(
+                    lesson, form.cleaned_data["file"], form.cleaned_data["file_format"] or None
+                )
+            except ValidationError as error:
+                form.add_error("file", error)
+            else:
+                self.message_user(request, f"Added {questions} question(s) and {choices} choice(s).", messages.SUCCESS)
+                return redirect("admin:onlinecourse_lesson_change", lesson.pk)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": f"Import questions into {lesson}",
+            "opts": self.model._meta,
+            "lesson": lesson,
+            "form": form,
+        }
+        return render(request, "onlinecourse/import_questions.html", context)
+
+    @admin.display(description="Bulk authoring")
+    def import_questions_link(self, obj):
+        if obj is None or obj.pk is None:
+            return "-"
+
+        url = reverse("admin:onlinecourse_lesson_import_questions", args=(obj.pk,))
+        return format_html('<a href="{}">Import questions from a CSV or JSON file</a>', url)
+
+    @admin.action(description="Regrade selected lessons")
+    def regrade_lessons(self, request, queryset):
+        jobs = [job for job in map(queue_regrade, queryset.values_list("id", flat=True)) if job is not None]
+
+        if jobs:
+            self.message_user(request, f"{len(jobs)} regrade job(s) queued.", messages.SUCCESS)
+        else:
+            self.message_user(request, "No regrade needed, the lessons have no submissions or are already queued.")
+
+    @admin.display(description="Item analysis")
+    def item_analysis(self, obj):
+        if obj is None or obj.pk is None:
+            return "-"
+
+        # Imported here, numpy is only loaded by the workers serving the analysis, not at every worker's startup
+        from .analytics import get_lesson_analysis
+
+        analysis = get_lesson_analysis(obj)
+        if not analysis["submissions"]:
+            return "No submissions yet."
+
+        questions = Question.objects.filter(lesson=obj).in_bulk(list(analysis["questions"]))
+        rows = format_html_join(
+            "",
+            "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>",
+            (
+                (
+                    questions[question_id].question_text,
+                    format_rate(stats["difficulty"]),
+                    format_rate(stats["mean_score"]),
+                    "-" if stats["discrimination"] is None else f"{stats['discrimination']:+.2f}",
+                    format_rate(stats["omitted"]),
+                )
+                for question_id, stats in analysis["questions"].items()
+            ),
+        )
+        scores = analysis["scores"]
+
+        return format_html(
+            "<p>{} submissions &bull; mean grade {} &bull; median {} &bull; std {} &bull; pass rate {}</p>"
+            "<p>Grade distribution (0-100, 10 bins): {}</p>"
+            "<table><thead><tr><th>Question</th><th>Difficulty</th><th>Mean score</th><th>Discrimination</th>"
+            "<th>Omitted</th></tr></thead><tbody>{}</tbody></table>",
+            analysis["submissions"],
+            scores["mean"],
+            scores["median"],
+            scores["std"],
+            format_rate(scores["pass_rate"]),
+            " | ".join(str(count) for count in scores["histogram"]),
+            rows,
+        )
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -108,19 +269,235 @@ class QuestionAdmin(admin.ModelAdmin):
     Attributes:
         inlines (list): A list of inline models to be displayed within the Question admin interface.
         list_display (list): A list of fields to be displayed in the list view of the Question admin interface.
+        list_filter (list): Filters the questions by difficulty.
+        readonly_fields (list): Read-only fields shown on the change form, including the item statistics.
     """
 
     inlines = [ChoiceInline]
-    list_display = ["question_text"]
+    list_display = ["question_text", "tag", "difficulty"]
+    list_filter = ["difficulty"]
+    readonly_fields = ["item_statistics"]
+
+    @admin.display(description="Item statistics")
+    def item_statistics(self, obj):
+        if obj is None or obj.pk is None:
+            return "-"
+
+        from .analytics import get_lesson_analysis
+
+        stats = get_lesson_analysis(obj.lesson)["questions"].get(obj.id)
+        if stats is None:
+            return "No submissions yet."
+
+        choices = obj.choices.in_bulk(list(stats["selection_rates"]))
+        rows = format_html_join(
+            "",
+            "<tr><td>{}</td><td>{}</td><td>{}</td></tr>",
+            (
+                (
+                    choices[choice_id].choice_text,
+                    "correct" if choices[choice_id].is_correct else "distractor",
+                    format_rate(rate),
+                )
+                for choice_id, rate in stats["selection_rates"].items()
+            ),
+        )
+
+        return format_html(
+            "<p>Difficulty {} &bull; mean score {} &bull; discrimination {} &bull; omitted {}</p>"
+            "<table><thead><tr><th>Choice</th><th>Role</th><th>Selected by</th></tr></thead><tbody>{}</tbody></table>",
+            format_rate(stats["difficulty"]),
+            format_rate(stats["mean_score"]),
+            "-" if stats["discrimination"] is None else f"{stats['discrimination']:+.2f}",
+            format_rate(stats["omitted"]),
+            rows,
+        )
+
+
+def make_export_action(export_format, compress=False):
+    def export(modeladmin, request, queryset):
+        return streaming_export_response(queryset, export_format=export_format, compress=compress)
+
+    export.__name__ = f"export_{export_format}{'_gzip' if compress else ''}"
+    description = f"Export selected submissions as {export_format.upper()}{' (gzip)' if compress else ''}"
+    return admin.action(description=description)(export)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    LargeTableAdmin is a base admin class for tables that grow to millions of rows.
+    Attributes:
+        paginator (Paginator): Counts unfiltered changelists from a row estimate instead of `COUNT(*)`.
+        show_full_result_count (bool): Disabled, it would run a second `COUNT(*)` of the whole table on filtered pages.
+        sortable_by (list): Only indexed columns can be sorted.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    sortable_by = ["id"]
+
+
+class SubmissionAdmin(LargeTableAdmin):
+    """
+    SubmissionAdmin is a custom admin class for the Submission model in the Django admin interface.
+    Attributes:
+        list_display (list): Fields displayed in the changelist, read through `list_select_related` joins.
+        list_select_related (list): Relations joined into the changelist query.
+        list_filter (list): Filters on indexed foreign keys.
+        search_fields (list): Exact learner email lookup, served by the unique email index.
+        raw_id_fields (list): The attempt is entered by ID, instead of a select listing every row.
+        exclude (list): The selection table is left out of the form, packed choices do not live there.
+        readonly_fields (list): The selected choice IDs, however they are stored.
+        autocomplete_fields (list): Lessons are picked with a search widget.
+        actions (list): Export actions streaming the selected submissions, with their per-question grades and
+        selected choices, as CSV or JSONL, optionally gzip-compressed.
+    """
+
+    list_display = ["id", "learner", "lesson", "attempt_no", "grade", "submission_date"]
+    list_select_related = ["attempt__learner", "lesson"]
+    list_filter = ["lesson"]
+    search_fields = ["=attempt__learner__email"]
+    raw_id_fields = ["attempt"]
+    exclude = ["choices"]
+    readonly_fields = ["selected_choices"]
+    autocomplete_fields = ["lesson"]
+    actions = [
+        make_export_action(CSV),
+        make_export_action(JSONL),
+        make_export_action(CSV, compress=True),
+        make_export_action(JSONL, compress=True),
+    ]
+
+    @admin.display(description="Learner")
+    def learner(self, obj):
+        return obj.attempt.learner.email
+
+    @admin.display(description="Attempt")
+    def attempt_no(self, obj):
+        return obj.attempt.attempt_no
+
+    @admin.display(description="Selected choices")
+    def selected_choices(self, obj):
+        return ", ".join(map(str, obj.selected_choice_ids()))
+
+
+class AttemptAdmin(LargeTableAdmin):
+    """
+    AttemptAdmin is a custom admin class for the Attempt model in the Django admin interface.
+    Attributes:
+        list_display (list): Fields displayed in the changelist, read through `list_select_related` joins instead of
+        the per-row queries of `Attempt.__str__`.
+        list_select_related (list): Relations joined into the changelist query.
+        list_filter (list): Filters on indexed foreign keys.
+        search_fields (list): Exact learner email lookup, served by the unique email index.
+        raw_id_fields (list): The learner is entered by ID.
+        autocomplete_fields (list): Lessons are picked with a search widget.
+    """
+
+    list_display = ["id", "learner", "lesson", "attempt_no", "remaining_attempts"]
+    list_select_related = ["learner", "lesson"]
+    list_filter = ["lesson"]
+    search_fields = ["=learner__email"]
+    raw_id_fields = ["learner"]
+    autocomplete_fields = ["lesson"]
+
+
+class EnrollmentAdmin(LargeTableAdmin):
+    """
+    EnrollmentAdmin is a custom admin class for the Enrollment model in the Django admin interface.
+    Attributes:
+        list_display (list): Fields displayed in the changelist, read through `list_select_related` joins.
+        list_select_related (list): Relations joined into the changelist query.
+        list_filter (list): Filters on indexed foreign keys.
+        search_fields (list): Exact learner email lookup, served by the unique email index.
+        raw_id_fields (list): The learner is entered by ID.
+        autocomplete_fields (list): Courses are picked with a search widget.
+    """
+
+    list_display = ["id", "learner", "course", "mode", "date_enrolled"]
+    list_select_related = ["learner", "course"]
+    list_filter = ["course"]
+    search_fields = ["=learner__email"]
+    raw_id_fields = ["learner"]
+    autocomplete_fields = ["course"]
+
+
+class RegradeJobAdmin(admin.ModelAdmin):
+    """
+    RegradeJobAdmin is a read-only admin class showing the progress of the regrade jobs.
+    Attributes:
+        list_display (list): Fields displayed in the changelist, including the progress of every job.
+        list_select_related (list): Relations joined into the changelist query.
+        list_filter (list): Filters on the job status.
+    """
+
+    list_display = ["id", "lesson", "status", "progress", "changed", "created_at", "finished_at"]
+    list_select_related = ["lesson"]
+    list_filter = ["status"]
+
+    @admin.display(description="Progress")
+    def progress(self, obj):
+        return f"{obj.processed} / {obj.total}"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class TaskAdmin(admin.ModelAdmin):
+    """
+    TaskAdmin is a read-only admin class showing the background tasks.
+    Attributes:
+        list_display (list): Fields displayed in the changelist, including the attempts and the last run duration.
+        list_filter (list): Filters on the task status and name.
+        search_fields (list): Exact idempotency key lookup.
+    """
+
+    list_display = ["id", "name", "status", "attempts", "duration_ms", "run_at", "finished_at"]
+    list_filter = ["status", "name"]
+    search_fields = ["=key"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class AttemptSummaryAdmin(LargeTableAdmin):
+    """
+    AttemptSummaryAdmin is a read-only admin class showing the attempt totals kept for archived attempts.
+    Attributes:
+        list_display (list): Fields displayed in the changelist, read through `list_select_related` joins.
+        list_select_related (list): Relations joined into the changelist query.
+        list_filter (list): Filters on indexed foreign keys.
+        search_fields (list): Exact learner email lookup, served by the unique email index.
+    """
+
+    list_display = ["id", "learner", "lesson", "attempt_count", "archived_count", "best_grade", "last_submission_date"]
+    list_select_related = ["learner", "lesson"]
+    list_filter = ["lesson"]
+    search_fields = ["=learner__email"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 # Register models with custom admin classes
 admin.site.register(Course, CourseAdmin)
 admin.site.register(Lesson, LessonAdmin)
 admin.site.register(Question, QuestionAdmin)
+admin.site.register(Submission, SubmissionAdmin)
+admin.site.register(Attempt, AttemptAdmin)
+admin.site.register(Enrollment, EnrollmentAdmin)
+admin.site.register(RegradeJob, RegradeJobAdmin)
+admin.site.register(Task, TaskAdmin)
+admin.site.register(AttemptSummary, AttemptSummaryAdmin)
 
 # Register other models
 admin.site.register(Choice)
-admin.site.register(Submission)
-admin.site.register(Enrollment)
-admin.site.register(Attempt)
@@ -0,0 +1,270 @@
+"""
+This module contains the item-analysis engine of the online course application.
+
+All submissions of a lesson are loaded into NumPy arrays: a boolean submission x choice selection matrix and an answer
+key vector over the same choices. Per-question scores are then derived for every submission at once with the
+partial-credit rules of `calculate_grade`, and the item statistics are computed from those arrays without looping
+over submissions in Python.
+
+Attempts of lessons with a question pool are only asked some questions, see `pool.py`. A boolean submission x question
+matrix marks the questions every submission was asked, the statistics of a question only count the submissions that
+were asked it and the quiz grade of a submission is averaged over its asked questions, as the grading does.
+
+`Functions`:
+
+    load_lesson_arrays(lesson_id: int) -> dict:
+        Loads the answer key and the selection matrix of a lesson.
+
+    score_matrix(arrays: dict) -> np.ndarray:
+        Computes the submission x question score matrix.
+
+    analyze_lesson(lesson_id: int) -> dict:
+        Computes the item analysis of a lesson.
+
+    get_lesson_analysis(lesson: Lesson) -> dict:
+        Returns the item analysis of a lesson, cached per lesson version and submission set.
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from myproject.db_routers import replica_reads
+
+from .grading import SCORE_IF_EMPTY, selected_choice_pairs
+from .models import Choice, Lesson, Question, Submission
+from .selection import unpack_choice_ids
+
+# Share of the submissions forming the upper and lower groups of the discrimination index
+DISCRIMINATION_GROUP = 0.27
+
+# Grade above which a quiz is passed, as shown on the result page
+PASSING_GRADE = 60
+
+ANALYSIS_CACHE_TIMEOUT = 24 * 60 * 60  # 1 day
+
+
+def load_lesson_arrays(lesson_id: int) -> dict:
+    """
+    Load the answer key and the selections of every submission of a lesson into NumPy arrays.
+
+    Args:
+        lesson_id (int): The ID of the lesson.
+
+    Returns:
+        dict: The arrays, with questions and choices in ID order:
+            `question_ids` (Q,), `question_grades` (Q,), `multiple` (Q,) bool,
+            `choice_ids` (C,), `choice_question` (C,) index of the question of every choice, `is_correct` (C,) bool,
+            `submission_ids` (N,), `selected` (N, C) bool selection matrix, `asked` (N, Q) bool matrix of the
+            questions sampled for the attempt of every submission.
+    """
+
+    questions = Question.objects.filter(lesson_id=lesson_id).order_by("id")
+    question_rows = list(questions.values_list("id", "grade", "expect_multiple_answer"))
+    question_ids = np.array([row[0] for row in question_rows], dtype=np.int64)
+
+    choices = Choice.objects.filter(question__lesson_id=lesson_id).order_by("id")
+    choice_rows = list(choices.values_list("id", "question_id", "is_correct"))
+    choice_ids = np.array([row[0] for row in choice_rows], dtype=np.int64)
+
+    submissions = Submission.objects.filter(lesson_id=lesson_id).order_by("id")
+    submission_rows = list(submissions.values_list("id", "attempt__question_ids"))
+    submission_ids = np.array([row[0] for row in submission_rows], dtype=np.int64)
+
+    # Attempts without sampled questions were asked every question
+    asked = np.ones((len(submission_ids), len(question_ids)), dtype=bool)
+    for row, (_, packed_ids) in enumerate(submission_rows):
+        if packed_ids is not None:
+            asked[row] = np.isin(question_ids, unpack_choice_ids(packed_ids))
+
+    pairs = np.array(list(selected_choice_pairs(submissions)), dtype=np.int64).reshape(-1, 2)
+    # Choices of other lessons cannot be scored, drop them like `calculate_grade` ignores them
+    pairs = pairs[np.isin(pairs[:, 1], choice_ids)]
+
+    selected = np.zeros((len(submission_ids), len(choice_ids)), dtype=bool)
+    selected[np.searchsorted(submission_ids, pairs[:, 0]), np.searchsorted(choice_ids, pairs[:, 1])] = True
+
+    return {
+        "question_ids": question_ids,
+        "question_grades": np.array([row[1] for row in question_rows], dtype=np.float64),
+        "multiple": np.array([row[2] for row in question_rows], dtype=bool),
+        "choice_ids": choice_ids,
+        "choice_question": np.searchsorted(question_ids, [row[1] for row in choice_rows]).astype(np.int64),
+        "is_correct": np.array([row[2] for row in choice_rows], dtype=bool),
+        "submission_ids": submission_ids,
+        "selected": selected,
+        "asked": asked,
+    }
+
+
+def _per_question_counts(arrays):
+    """
+    Return the number of selected, correctly selected, and available choices per submission and question.
+    """
+
+    # One-hot (C, Q) matrix mapping every choice to its question
+    membership = np.zeros((len(arrays["choice_ids"]), len(arrays["question_ids"])), dtype=np.int64)
+    membership[np.arange(len(arrays["choice_ids"])), arrays["choice_question"]] = 1
+
+    selected = arrays["selected"].astype(np.int64)
+    selected_count = selected @ membership
+    selected_correct = selected @ (membership * arrays["is_correct"][:, None])
+    choice_count = membership.sum(axis=0)
+    correct_count = arrays["is_correct"].astype(np.int64) @ membership
+
+    return selected_count, selected_correct, choice_count, correct_count
+
+
+def score_matrix(arrays: dict) -> np.ndarray:
+    """
+    Compute the score of every submission on every question with the rules of `calculate_grade`.
+
+    Args:
+        arrays (dict): The arrays returned by `load_lesson_arrays`.
+
+    Returns:
+        np.ndarray: The (N, Q) matrix of question scores, out of the question grade.
+    """
+
+    selected_count, selected_correct, choice_count, correct_count = _per_question_counts(arrays)
+    grades = arrays["question_grades"]
+    multiple = arrays["multiple"]
+
+    incorrect = selected_count - selected_correct
+    point_per_choice = grades / np.maximum(choice_count, 1)
+    exact = (selected_correct == correct_count) & (incorrect == 0)
+
+    multiple_scores = np.select(
+        [
+            selected_count == 0,
+            (selected_count == correct_count) & exact,
+            selected_count == correct_count,
+            selected_count < correct_count,
+        ],
+        [
+            SCORE_IF_EMPTY,
+            grades,
+            grades - incorrect * point_per_choice,
+            SCORE_IF_EMPTY + selected_correct * point_per_choice,
+        ],
+        default=SCORE_IF_EMPTY + selected_correct * point_per_choice - incorrect * point_per_choice,
+    )
+    single_scores = np.where(exact, grades, 0)
+    scores = np.where(multiple, multiple_scores, single_scores).astype(np.float64)
+
+    # Submissions without any answer get the flat empty score on every question
+    all_empty = selected_count.sum(axis=1) == 0
+    scores[all_empty] = np.where(multiple, SCORE_IF_EMPTY, 0)
+
+    return scores
+
+
+def _asked_mean(values, asked, axis=0):
+    """
+    Return the mean of `values` over the cells of `asked`, NaN where nothing was asked.
+    """
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(asked, values, 0).sum(axis=axis) / asked.sum(axis=axis)
+
+
+def _rounded(values):
+    return [None if np.isnan(value) else round(float(value), 4) for value in values]
+
+
+def analyze_lesson(lesson_id: int) -> dict:
+    """
+    Compute the item analysis of a lesson from all of its submissions.
+
+    Args:
+        lesson_id (int): The ID of the lesson.
+
+    Returns:
+        dict: JSON-serializable statistics:
+            `submissions`: the number of analysed submissions.
+            `questions`: per question ID, its `difficulty` (share of fully correct answers), `mean_score` (mean
+            share of the question grade earned), `discrimination` (difficulty in the top 27% minus difficulty in the
+            bottom 27% of submissions by quiz grade), `omitted` (share of submissions leaving it unanswered) and the
+            `selection_rates` of its choices by choice ID. Incorrect choices' rates are the distractor rates. Only the
+            submissions that were asked the question count, its statistics are None when none was.
+            `scores`: the `mean`, `median`, `std`, `pass_rate` and the `histogram` of quiz grades in ten bins.
+    """
+
+    arrays = load_lesson_arrays(lesson_id)
+    question_ids = arrays["question_ids"]
+    submission_count = len(arrays["submission_ids"])
+
+    analysis = {"submissions": submission_count, "questions": {}, "scores": {}}
+    if submission_count == 0 or len(question_ids) == 0:
+        return analysis
+
+    asked = arrays["asked"]
+    scores = score_matrix(arrays)
+    # A submission asked none of the questions left in the lesson has no grade to analyse
+    quiz_grades = np.nan_to_num(_asked_mean(scores, asked, axis=1))
+
+    selected_count, selected_correct, _, correct_count = _per_question_counts(arrays)
+    fully_correct = (selected_correct == correct_count) & (selected_count == selected_correct)
+
+    difficulty = _asked_mean(fully_correct, asked)
+    mean_score = _asked_mean(scores / np.maximum(arrays["question_grades"], 1), asked)
+    omitted = _asked_mean(selected_count == 0, asked)
+    selection_rates = _asked_mean(arrays["selected"], asked[:, arrays["choice_question"]])
+
+    group_size = int(round(submission_count * DISCRIMINATION_GROUP))
+    if group_size > 0 and submission_count >= 2:
+        order = np.argsort(quiz_grades, kind="stable")
+        upper, lower = order[-group_size:], order[:group_size]
+        discrimination = _asked_mean(fully_correct[upper], asked[upper]) - _asked_mean(
+            fully_correct[lower], asked[lower]
+        )
+    else:
+        discrimination = np.full(len(question_ids), np.nan)
+
+    difficulty, mean_score, omitted, discrimination = map(_rounded, (difficulty, mean_score, omitted, discrimination))
+    rates = _rounded(selection_rates)
+
+    for index, question_id in enumerate(question_ids.tolist()):
+        choice_indexes = np.flatnonzero(arrays["choice_question"] == index)
+        analysis["questions"][question_id] = {
+            "difficulty": difficulty[index],
+            "mean_score": mean_score[index],
+            "discrimination": discrimination[index],
+            "omitted": omitted[index],
+            "selection_rates": {int(arrays["choice_ids"][i]): rates[i] for i in choice_indexes},
+        }
+
+    histogram, _ = np.histogram(quiz_grades, bins=10, range=(0, 100))
+    analysis["scores"] = {
+        "mean": round(float(quiz_grades.mean()), 2),
+        "median": round(float(np.median(quiz_grades)), 2),
+        "std": round(float(quiz_grades.std()), 2),
+        "pass_rate": round(float((quiz_grades > PASSING_GRADE).mean()), 4),
+        "histogram": histogram.tolist(),
+    }
+
+    return analysis
+
+
+def get_lesson_analysis(lesson: Lesson) -> dict:
+    """
+    Return the item analysis of a lesson, computed at most once per lesson version and submission set.
+
+    Args:
+        lesson (Lesson): The lesson to analyse.
+
+    Returns:
+        dict: The statistics returned by `analyze_lesson`.
+    """
+
+    # The analysis reads every submission of the lesson, which the replica serves when there is one
+    with replica_reads():
+        state = Submission.objects.filter(lesson=lesson).aggregate(count=Count("id"), last_id=Max("id"))
+        cache_key = f"lesson_analysis:{lesson.id}:{lesson.version}:{state['count']}:{state['last_id']}"
+
+        analysis = cache.get(cache_key)
+        if analysis is None:
+            analysis = analyze_lesson(lesson.id)
+            cache.set(cache_key, analysis, timeout=ANALYSIS_CACHE_TIMEOUT)
+
+    return analysis
@@ -0,0 +1,360 @@
+"""
+This module contains the JSON quiz API of the online course application.
+
+The quiz and result pages are thin shells rendered in the browser from a compact payload holding the content of a
+lesson as parallel arrays, with questions and choices in ID order:
+
+    {
+        "v": 1,
+        "lesson": <lesson ID>,
+        "version": <lesson version>,
+        "questions": {"ids": [...], "texts": [...], "multiple": [0 | 1, ...], "offsets": [...]},
+        "choices": {"ids": [...], "texts": [...]}
+    }
+
+The choices of the question at index `i` are those from `offsets[i]` to `offsets[i + 1]`, so the index arrays of a
+`QuizOrder` address the payload directly. The payload holds no correctness flag. It only changes when the lesson
+version does, so it is cached per version and served with an ETag the browser revalidates.
+
+For a lesson with a question pool, the pages ask for the payload of an attempt with the `attempt` query parameter. It
+only holds the questions sampled for that attempt, and is cached per lesson version and question set.
+
+`Functions`:
+
+    build_quiz_payload(lesson: Lesson, question_ids: List[int] | None) -> dict:
+        Builds the compact payload of a lesson, or of some of its questions.
+
+    get_quiz_payload(lesson: Lesson, question_ids: List[int] | None) -> dict:
+        Returns the payload of a lesson, cached per lesson version and question set.
+
+    result_payload(submission: Submission, grade_per_question: dict) -> dict:
+        Returns the per-submission data the result page adds to the lesson payload.
+
+    quiz_api(request: HttpRequest, lesson_id: int) -> JsonResponse:
+        Serves the payload of a lesson, or of the questions of an attempt.
+
+    search_api(request: HttpRequest) -> JsonResponse:
+        Serves a page of the courses and lessons matching a query, see `search.py`.
+
+    catalogue_page_url(params: QueryDict, cursor: str | None) -> str | None:
+        Returns the URL of the catalogue page after a cursor, keeping the filters of the current page.
+
+    catalogue_api(request: HttpRequest) -> JsonResponse:
+        Serves a page of the course catalogue, see `catalogue.py`.
+
+    leaderboard_payload(lesson_id: int, user: User, k: int) -> dict:
+        Returns the top of the leaderboard of a lesson and the rank of a learner.
+
+    leaderboard_api(request: HttpRequest, lesson_id: int) -> JsonResponse:
+        Serves the leaderboard of a lesson, see `leaderboard.py`.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import HttpRequest, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from account.models import User
+from myproject.db_routers import read_from_replica
+
+from .catalogue import catalogue_filters, catalogue_page
+from .drafts import load_draw
+from .leaderboard import DEFAULT_TOP, get_standings
+from .models import Attempt, Choice, Lesson, Question
+from .search import search
+from .selection import pack_choice_ids
+
+API_VERSION = 1
+
+QUIZ_PAYLOAD_CACHE_TIMEOUT = 24 * 60 * 60  # 1 day
+
+# Deep pages cost a scan of every result before them, nobody reads that far
+MAX_SEARCH_PAGE = 50
+
+MAX_LEADERBOARD_TOP = 100
+
+# The query parameters of the catalogue and the `catalogue_page` arguments they are read into
+CATALOGUE_FILTERS = {"instructor": "instructor_id", "published_from": "published_from", "published_to": "published_to"}
+
+
+def build_quiz_payload(lesson: Lesson, question_ids: Optional[List[int]] = None) -> dict:
+    """
+    Build the compact payload of a lesson from two queries.
+
+    Args:
+        lesson (Lesson): The lesson.
+        question_ids (List[int] | None): The IDs of the questions to include, every question of the lesson if None.
+
+    Returns:
+        dict: The payload described in the module docstring.
+    """
+
+    questions = Question.objects.filter(lesson=lesson).order_by("id")
+    choices = Choice.objects.filter(question__lesson=lesson).order_by("question_id", "id")
+    if question_ids is not None:
+        questions = questions.filter(id__in=question_ids)
+        choices = choices.filter(question_id__in=question_ids)
+
+    question_rows = list(questions.values_list("id", "question_text", "expect_multiple_answer"))
+    choice_rows = list(choices.values_list("id", "question_id", "choice_text"))
+
+    offsets = [0]
+    position = 0
+    for question_id, _, _ in question_rows:
+        while position < len(choice_rows) and choice_rows[position][1] == question_id:
+            position += 1
+        offsets.append(position)
+
+    return {
+        "v": API_VERSION,
+        "lesson": lesson.id,
+        "version": lesson.version,
+        "questions": {
+            "ids": [row[0] for row in question_rows],
+            "texts": [row[1] for row in question_rows],
+            "multiple": [int(row[2]) for row in question_rows],
+            "offsets": offsets,
+        },
+        "choices": {"ids": [row[0] for row in choice_rows], "texts": [row[2] for row in choice_rows]},
+    }
+
+
+def quiz_payload_etag(lesson_id: int, version: int, question_ids: Optional[List[int]] = None) -> str:
+    etag = f"quiz-v{API_VERSION}-{lesson_id}-{version}"
+    if question_ids is None:
+        return etag
+
+    # Attempts sampling the same questions share their payload
+    return f"{etag}-{hashlib.blake2b(pack_choice_ids(question_ids), digest_size=8).hexdigest()}"
+
+
+def get_quiz_payload(lesson: Lesson, question_ids: Optional[List[int]] = None) -> dict:
+    """
+    Return the payload of a lesson, or of the given questions of it, built at most once per lesson version and
+    question set.
+    """
+
+    cache_key = f"quiz_payload:{quiz_payload_etag(lesson.id, lesson.version, question_ids)}"
+
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = build_quiz_payload(lesson, question_ids)
+        cache.set(cache_key, payload, timeout=QUIZ_PAYLOAD_CACHE_TIMEOUT)
+
+    return payload
+
+
+def result_payload(submission, grade_per_question: dict) -> dict:
+    """
+    Return the data the result page adds to the lesson payload.
+
+    Args:
+        submission (Submission): The graded submission.
+        grade_per_question (dict): The points per question ID, as returned by `calculate_grade`.
+
+    Returns:
+        dict: The `selected` choice IDs, the `correct` choice IDs of the lesson and the `points` per question ID.
+    """
+
+    correct = Choice.objects.filter(question__lesson_id=submission.lesson_id, is_correct=True)
+
+    return {
+        "selected": submission.selected_choice_ids(),
+        "correct": list(correct.values_list("id", flat=True)),
+        "points": {str(question_id): point for question_id, point in grade_per_question.items()},
+    }
+
+
+def _requested_quiz(request, lesson_id):
+    """
+    Return the lesson of a quiz API request and the IDs of the questions of its `attempt`, None for every question.
+    """
+
+    if not hasattr(request, "_requested_quiz"):
+        lesson = get_object_or_404(Lesson, pk=lesson_id)
+        attempt_no = request.GET.get("attempt", "")
+        question_ids = None
+
+        if lesson.questions_per_attempt and attempt_no.isdigit():
+            # A submitted attempt keeps its questions, the draw of an attempt in progress is kept with its draft
+            attempt = Attempt.objects.filter(learner=request.user, lesson=lesson, attempt_no=attempt_no).first()
+            if attempt is not None:
+                question_ids = attempt.sampled_question_ids()
+            else:
+                question_ids = load_draw(request.user.id, lesson, int(attempt_no))[1]
+
+        request._requested_quiz = lesson, question_ids
+
+    return request._requested_quiz
+
+
+def _lesson_etag(request, lesson_id):
+    lesson, question_ids = _requested_quiz(request, lesson_id)
+    return quiz_payload_etag(lesson_id, lesson.version, question_ids)
+
+
+@require_GET
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_lesson_etag)
+def quiz_api(request: HttpRequest, lesson_id: int) -> JsonResponse:
+    """
+    Serve the payload of a lesson, or with the `attempt` query parameter, of the questions sampled for that attempt
+    of the learner. A browser holding the current version gets an empty 304 response.
+    """
+
+    return JsonResponse(get_quiz_payload(*_requested_quiz(request, lesson_id)))
+
+
+@require_GET
+@read_from_replica
+def search_api(request: HttpRequest) -> JsonResponse:
+    """
+    Serve a page of the courses and lessons matching the `q` query parameter, best first, as:
+
+        {"v": 1, "query": "...", "page": 1, "has_next": false, "results": [{"kind": "course" | "lesson", "title": ...,
+         "snippet": ..., "course": ..., "url": ...}, ...]}
+    """
+
+    query = request.GET.get("q", "").strip()
+    try:
+        page = min(max(int(request.GET.get("page", 1)), 1), MAX_SEARCH_PAGE)
+    except ValueError:
+        page = 1
+
+    results = search(query, page=page)
+
+    return JsonResponse(
+        {
+            "v": API_VERSION,
+            "query": query,
+            "page": results.number,
+            "has_next": results.has_next and results.number < MAX_SEARCH_PAGE,
+            "results": [
+                {
+                    "kind": result.kind,
+                    "title": result.lesson.title if result.lesson else result.course.name,
+                    "snippet": result.snippet,
+                    "course": result.course.name,
+                    "url": reverse("onlinecourse:course_details", args=(result.course.slug_name,)),
+                }
+                for result in results.results
+            ],
+        }
+    )
+
+
+def catalogue_page_url(params, cursor):
+    """
+    Return the URL of the catalogue page after a cursor, with the valid filters of the current page, None without a
+    cursor.
+    """
+
+    if cursor is None:
+        return None
+
+    filters = catalogue_filters(params)
+    query = {name: params[name] for name, argument in CATALOGUE_FILTERS.items() if argument in filters}
+    return reverse("onlinecourse:catalogue_api") + "?" + urlencode({**query, "after": cursor})
+
+
+@require_GET
+@read_from_replica
+def catalogue_api(request: HttpRequest) -> JsonResponse:
+    """
+    Serve a page of the course catalogue after the `after` cursor, filtered by the `instructor`, `published_from` and
+    `published_to` query parameters, for the infinite scroll of the course list, as:
+
+        {"v": 1, "courses": [{"id": ..., "name": ..., "url": ..., ...}, ...], "next": <URL of the next page> | null}
+    """
+
+    page = catalogue_page(request.user, cursor=request.GET.get("after"), **catalogue_filters(request.GET))
+
+    return JsonResponse(
+        {
+            "v": API_VERSION,
+            "courses": [
+                {
+                    "id": course.id,
+                    "name": course.name,
+                    "description": course.description,
+                    "image": course.image.url if course.image else None,
+                    "pub_date": course.pub_date.isoformat() if course.pub_date else None,
+                    "total_enrollment": course.total_enrollment,
+                    "instructors": [instructor.user.nickname for instructor in course.instructors.all()],
+                    "is_enrolled": course.is_enrolled,
+                    "url": reverse("onlinecourse:enroll", args=(course.slug_name,)),
+                }
+                for course in page.courses
+            ],
+            "next": catalogue_page_url(request.GET, page.next_cursor),
+        }
+    )
+
+
+def leaderboard_payload(lesson_id: int, user=None, k: int = DEFAULT_TOP) -> dict:
+    """
+    Return the top of the leaderboard of a lesson, and the entry of a signed-in learner, as:
+
+        {"v": 1, "lesson": <lesson ID>, "size": <number of learners>, "top": [{"rank": 1, "learner": <nickname>,
+         "grade": ..., "submitted_at": ...}, ...], "me": {"rank": ..., "grade": ..., "submitted_at": ...} | null}
+
+    Args:
+        lesson_id (int): The lesson.
+        user (User, optional): The learner whose entry is returned.
+        k (int): The number of top entries.
+
+    Returns:
+        dict: The payload.
+    """
+
+    learner_id = user.id if user is not None and user.is_authenticated else None
+    standings = get_standings(lesson_id, learner_id, k=k)
+
+    learners = User.objects.filter(id__in=[entry.learner_id for entry in standings.top])
+    names = {pk: nickname or username for pk, nickname, username in learners.values_list("id", "nickname", "username")}
+
+    def submitted_at(entry):
+        return datetime.fromtimestamp(entry.submitted_at, tz=timezone.utc).isoformat()
+
+    return {
+        "v": API_VERSION,
+        "lesson": lesson_id,
+        "size": standings.size,
+        "top": [
+            {
+                "rank": rank,
+                "learner": names.get(entry.learner_id),
+                "grade": entry.grade,
+                "submitted_at": submitted_at(entry),
+            }
+            for rank, entry in enumerate(standings.top, start=1)
+        ],
+        "me": None
+        if standings.entry is None
+        else {"rank": standings.rank, "grade": standings.entry.grade, "submitted_at": submitted_at(standings.entry)},
+    }
+
+
+@require_GET
+@login_required
+def leaderboard_api(request: HttpRequest, lesson_id: int) -> JsonResponse:
+    """
+    Serve the top `k` entries of the leaderboard of a lesson, 10 by default, and the entry of the learner.
+    """
+
+    lesson = get_object_or_404(Lesson, pk=lesson_id)
+    try:
+        k = min(max(int(request.GET.get("k", DEFAULT_TOP)), 1), MAX_LEADERBOARD_TOP)
+    except ValueError:
+        k = DEFAULT_TOP
+
+    return JsonResponse(leaderboard_payload(lesson.id, request.user, k=k))
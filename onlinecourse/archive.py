@@ -0,0 +1,364 @@
+"""
+This module contains the archival of old attempts and their submissions.
+
+Every quiz attempt adds an attempt, a submission and its selected choices for good, and every lookup of a learner's
+attempts on a lesson and every backup pays for them. Archival moves the attempts nobody needs any more into a
+gzip-compressed JSONL file, one attempt per line with its submissions and their selected choice IDs, and deletes them
+from the database. Per learner and lesson, the last `keep_last` attempts and the best graded one always stay, so the
+attempt numbering, the remaining attempts and the best grade shown to the learner do not change.
+
+The totals of the archived attempts, the attempt count and the best grade, are kept in `AttemptSummary`. Attempts are
+archived in chunks, each chunk written and flushed to the file before its rows are deleted in one transaction, so an
+interrupted run loses nothing: restoring a file skips the attempts still in the database.
+
+`Functions`:
+
+    plan_archive(older_than: datetime | None, keep_last: int) -> ArchivePlan:
+        Selects the attempts to archive.
+
+    archive_attempts(path: str, older_than: datetime | None, keep_last: int, chunk_size: int) -> dict:
+        Moves the selected attempts into an archive file.
+
+    read_archive(path: str) -> Iterator[dict]:
+        Yields the records of an archive file.
+
+    restore_archive(path: str, chunk_size: int) -> dict:
+        Moves the attempts of an archive file back into the database.
+"""
+
+import base64
+import gzip
+import itertools
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from account.models import User
+
+from .leaderboard import invalidate_leaderboard
+from .models import Attempt, AttemptSummary, Choice, Lesson, Submission
+from .selection import PACKED, pack_choice_ids, storage_mode
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+@dataclass
+class ArchivePlan:
+    """
+    The attempts selected for archival.
+
+    Attributes:
+        attempt_ids (List[int]): The IDs of the attempts to archive, grouped by learner and lesson.
+        totals (Dict[Tuple[int, int], dict]): Per (learner ID, lesson ID) pair with attempts to archive, the best grade
+        and the last submission date of all its attempts.
+    """
+
+    attempt_ids: List[int] = field(default_factory=list)
+    totals: Dict[Tuple[int, int], dict] = field(default_factory=dict)
+
+
+def default_archive_path() -> str:
+    return os.path.join(settings.ARCHIVE_DIRECTORY, f"attempts-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz")
+
+
+def plan_archive(older_than: Optional[datetime] = None, keep_last: int = 1) -> ArchivePlan:
+    """
+    Select the attempts to archive.
+
+    Attempts are dated by their last submission. With `older_than`, only attempts submitted before it are archived,
+    and attempts never submitted, which have no date, are kept.
+
+    Args:
+        older_than (datetime, optional): Only archive attempts submitted before this time.
+        keep_last (int): The number of most recent attempts kept per learner and lesson, at least 1.
+
+    Returns:
+        ArchivePlan: The attempts to archive and the totals of their learner and lesson pairs.
+    """
+
+    keep_last = max(keep_last, 1)
+    attempts = (
+        Attempt.objects.annotate(grade=Max("submissions__grade"), submitted_at=Max("submissions__submission_date"))
+        .order_by("learner_id", "lesson_id", "-attempt_no")
+        .values_list("id", "learner_id", "lesson_id", "grade", "submitted_at")
+    )
+
+    plan = ArchivePlan()
+    for pair, group in itertools.groupby(attempts.iterator(chunk_size=5000), key=lambda row: (row[1], row[2])):
+        group = list(group)
+        graded = [row for row in group if row[3] is not None]
+        # The best grade stays, the most recent attempt reaching it if several do
+        best_id = max(graded, key=lambda row: row[3])[0] if graded else None
+
+        archived = [
+            attempt_id
+            for attempt_id, _, _, _, submitted_at in group[keep_last:]
+            if attempt_id != best_id
+            and (older_than is None or (submitted_at is not None and submitted_at < older_than))
+        ]
+        if not archived:
+            continue
+
+        plan.attempt_ids.extend(archived)
+        dates = [row[4] for row in group if row[4] is not None]
+        plan.totals[pair] = {
+            "best_grade": max(row[3] for row in graded) if graded else None,
+            "last_submission_date": max(dates) if dates else None,
+        }
+
+    return plan
+
+
+def attempt_records(attempt_ids: List[int]) -> List[dict]:
+    """
+    Return the archive records of attempts, with their submissions and selected choice IDs.
+    """
+
+    submissions = defaultdict(list)
+    for submission in Submission.objects.filter(attempt_id__in=attempt_ids).prefetch_related("choices").order_by("id"):
+        submissions[submission.attempt_id].append(
+            {
+                "id": submission.id,
+                "lesson_id": submission.lesson_id,
+                "grade": submission.grade,
+                "submission_date": submission.submission_date.isoformat(),
+                "choice_ids": submission.selected_choice_ids(),
+            }
+        )
+
+    records = []
+    for attempt in Attempt.objects.filter(id__in=attempt_ids).order_by("id"):
+        shuffle_order = attempt.shuffle_order
+        records.append(
+            {
+                "id": attempt.id,
+                "learner_id": attempt.learner_id,
+                "lesson_id": attempt.lesson_id,
+                "attempt_no": attempt.attempt_no,
+                "remaining_attempts": attempt.remaining_attempts,
+                "shuffle_order": base64.b64encode(bytes(shuffle_order)).decode() if shuffle_order is not None else None,
+                "question_ids": attempt.sampled_question_ids(),
+                "submissions": submissions[attempt.id],
+            }
+        )
+
+    return records
+
+
+def update_summaries(changes: Dict[Tuple[int, int], dict]):
+    """
+    Update the summaries of learner and lesson pairs after some of their attempts were archived or restored, creating
+    the missing ones. The attempt count is the attempts in the database plus the archived ones.
+
+    Args:
+        changes (Dict[Tuple[int, int], dict]): Per (learner ID, lesson ID) pair, the `archived` count to add, negative
+        for restored attempts, and optionally the `best_grade` and `last_submission_date` of the archived attempts.
+    """
+
+    learner_ids = {learner_id for learner_id, _ in changes}
+    lesson_ids = {lesson_id for _, lesson_id in changes}
+    existing = {
+        (summary.learner_id, summary.lesson_id): summary
+        for summary in AttemptSummary.objects.filter(learner_id__in=learner_ids, lesson_id__in=lesson_ids)
+    }
+    attempt_counts = {
+        (learner_id, lesson_id): count
+        for learner_id, lesson_id, count in Attempt.objects.filter(learner_id__in=learner_ids, lesson_id__in=lesson_ids)
+        .values("learner_id", "lesson_id")
+        .annotate(count=Count("id"))
+        .values_list("learner_id", "lesson_id", "count")
+    }
+
+    summaries = []
+    for (learner_id, lesson_id), change in changes.items():
+        summary = existing.get((learner_id, lesson_id)) or AttemptSummary(learner_id=learner_id, lesson_id=lesson_id)
+        summary.archived_count = max(summary.archived_count + change["archived"], 0)
+        summary.attempt_count = attempt_counts.get((learner_id, lesson_id), 0) + summary.archived_count
+
+        grades = [grade for grade in (summary.best_grade, change.get("best_grade")) if grade is not None]
+        summary.best_grade = max(grades) if grades else None
+        dates = [date for date in (summary.last_submission_date, change.get("last_submission_date")) if date]
+        summary.last_submission_date = max(dates) if dates else None
+        summaries.append(summary)
+
+    AttemptSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=["learner", "lesson"],
+        update_fields=["attempt_count", "archived_count", "best_grade", "last_submission_date", "updated_at"],
+    )
+
+
+def archive_attempts(
+    path: str, older_than: Optional[datetime] = None, keep_last: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> dict:
+    """
+    Move the attempts selected by `plan_archive` and their submissions into a gzip-compressed JSONL file.
+
+    Args:
+        path (str): The archive file, created with its directory.
+        older_than (datetime, optional): Only archive attempts submitted before this time.
+        keep_last (int): The number of most recent attempts kept per learner and lesson, at least 1.
+        chunk_size (int): The number of attempts moved per transaction.
+
+    Returns:
+        dict: The number of archived `attempts` and `submissions`, and the `path` of the file.
+    """
+
+    plan = plan_archive(older_than=older_than, keep_last=keep_last)
+    stats = {"attempts": 0, "submissions": 0, "path": path}
+    if not plan.attempt_ids:
+        return stats
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        for start in range(0, len(plan.attempt_ids), chunk_size):
+            chunk = plan.attempt_ids[start : start + chunk_size]
+
+            with transaction.atomic():
+                records = attempt_records(chunk)
+                for record in records:
+                    file.write(json.dumps(record, separators=(",", ":")) + "\n")
+                # The chunk is on disk before its rows go, a run interrupted in between leaves them in both places
+                file.flush()
+
+                Attempt.objects.filter(id__in=[record["id"] for record in records]).delete()
+
+                archived = defaultdict(int)
+                for record in records:
+                    archived[(record["learner_id"], record["lesson_id"])] += 1
+                update_summaries({pair: {**plan.totals[pair], "archived": count} for pair, count in archived.items()})
+
+            # The best grades stay, but the earliest submission reaching one may not
+            invalidate_leaderboard(*{lesson_id for _, lesson_id in archived})
+
+            stats["attempts"] += len(records)
+            stats["submissions"] += sum(len(record["submissions"]) for record in records)
+
+    return stats
+
+
+def read_archive(path: str) -> Iterator[dict]:
+    """
+    Yield the attempt records of an archive file.
+    """
+
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def restore_chunk(records: List[dict]) -> Tuple[int, int]:
+    """
+    Restore the attempts of a chunk of records, skipping those still in the database or whose learner or lesson was
+    deleted since.
+    """
+
+    def existing_ids(model, key):
+        ids = {record[key] for record in records}
+        return set(model.objects.filter(id__in=ids).values_list("id", flat=True))
+
+    existing = existing_ids(Attempt, "id")
+    learner_ids = existing_ids(User, "learner_id")
+    lesson_ids = existing_ids(Lesson, "lesson_id")
+
+    records = [
+        record
+        for record in records
+        if record["id"] not in existing and record["learner_id"] in learner_ids and record["lesson_id"] in lesson_ids
+    ]
+    if not records:
+        return 0, 0
+
+    Attempt.objects.bulk_create(
+        [
+            Attempt(
+                id=record["id"],
+                learner_id=record["learner_id"],
+                lesson_id=record["lesson_id"],
+                attempt_no=record["attempt_no"],
+                remaining_attempts=record["remaining_attempts"],
+                shuffle_order=base64.b64decode(record["shuffle_order"]) if record["shuffle_order"] else None,
+                # Archives written before question pools hold no sampled questions
+                question_ids=pack_choice_ids(record["question_ids"]) if record.get("question_ids") else None,
+            )
+            for record in records
+        ]
+    )
+
+    packed = storage_mode() == PACKED
+    submission_records = [(record, submission) for record in records for submission in record["submissions"]]
+    submissions = [
+        Submission(
+            id=submission["id"],
+            attempt_id=record["id"],
+            lesson_id=submission["lesson_id"],
+            grade=submission["grade"],
+            packed_choices=pack_choice_ids(submission["choice_ids"]) if packed else None,
+        )
+        for record, submission in submission_records
+    ]
+    Submission.objects.bulk_create(submissions)
+
+    # `auto_now_add` overwrote the submission dates on insert, `bulk_update` writes them as they were
+    for submission, (_, submission_record) in zip(submissions, submission_records):
+        submission.submission_date = parse_datetime(submission_record["submission_date"])
+    Submission.objects.bulk_update(submissions, ["submission_date"])
+
+    if not packed:
+        choice_ids = {choice_id for _, submission in submission_records for choice_id in submission["choice_ids"]}
+        # Choices deleted since the archival are left out of the selection table
+        choice_ids = set(Choice.objects.filter(id__in=choice_ids).values_list("id", flat=True))
+        through = Submission.choices.through
+        through.objects.bulk_create(
+            [
+                through(submission_id=submission["id"], choice_id=choice_id)
+                for _, submission in submission_records
+                for choice_id in submission["choice_ids"]
+                if choice_id in choice_ids
+            ]
+        )
+
+    restored = defaultdict(int)
+    for record in records:
+        restored[(record["learner_id"], record["lesson_id"])] -= 1
+    update_summaries({pair: {"archived": count} for pair, count in restored.items()})
+    transaction.on_commit(lambda: invalidate_leaderboard(*{lesson_id for _, lesson_id in restored}))
+
+    return len(records), len(submissions)
+
+
+def restore_archive(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Move the attempts of an archive file back into the database, with their original IDs, grades and dates. Selected
+    choices are stored as `SUBMISSION_STORAGE` sets.
+
+    Args:
+        path (str): The archive file.
+        chunk_size (int): The number of attempts restored per transaction.
+
+    Returns:
+        dict: The number of restored `attempts` and `submissions`.
+    """
+
+    stats = {"attempts": 0, "submissions": 0}
+    records = read_archive(path)
+
+    while chunk := list(itertools.islice(records, chunk_size)):
+        with transaction.atomic():
+            attempts, submissions = restore_chunk(chunk)
+        stats["attempts"] += attempts
+        stats["submissions"] += submissions
+
+    return stats
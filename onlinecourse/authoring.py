@@ -0,0 +1,309 @@
+"""
+This module contains the bulk authoring of quiz questions from CSV or JSON files.
+
+Authoring a lesson through `QuestionAdmin` saves one question per page load, with one INSERT per choice, and every
+saved row bumps the lesson version and queues a regrade through the signals. An authoring file holds the questions
+of a lesson with their choices, is validated as a whole, and is written with one `bulk_create` for the questions and
+one for the choices, in one transaction. The lesson version is bumped once, and one regrade is queued once committed.
+
+A CSV file has one row per choice, with a header:
+
+    question,choice,correct,multiple,tag,difficulty
+    "Is Django a Python framework?",Yes,true,,frameworks,easy
+    ,No,false,,,
+
+A row with an empty question continues the question above. The `multiple`, `tag` and `difficulty` columns are
+optional, the difficulty being easy, medium or hard, which question pools can be sampled by. A JSON file holds a list
+of questions, or an object with a "questions" list:
+
+    [{"question": "...", "multiple": false, "tag": "...", "difficulty": "easy",
+      "choices": [{"choice": "...", "correct": true}, ...]}]
+
+A question is valid with at least two choices and at least one correct one. Whether it expects multiple answers is
+derived from its number of correct choices when left out, and must agree with it when given.
+
+`Functions`:
+
+    parse_questions(content: str, file_format: str) -> List[dict]:
+        Parses and validates the questions of an authoring file.
+
+    import_questions(lesson: Lesson, questions: List[dict]) -> Tuple[int, int]:
+        Writes validated questions and their choices to a lesson.
+
+    import_questions_file(lesson: Lesson, file: File, file_format: str | None) -> Tuple[int, int]:
+        Parses, validates and writes the questions of an uploaded or opened authoring file.
+"""
+
+import csv
+import io
+import json
+import os
+from typing import List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from .models import Choice, Lesson, Question
+from .regrade import queue_regrade
+
+CSV = "csv"
+JSON = "json"
+FORMATS = (CSV, JSON)
+
+TRUE_VALUES = {"1", "true", "yes", "y", "x"}
+FALSE_VALUES = {"0", "false", "no", "n", ""}
+
+QUESTION_TEXT_LENGTH = Question._meta.get_field("question_text").max_length
+TAG_LENGTH = Question._meta.get_field("tag").max_length
+CHOICE_TEXT_LENGTH = Choice._meta.get_field("choice_text").max_length
+
+
+def parse_bool(value, location: str, name: str, errors: List[str]) -> Optional[bool]:
+    if isinstance(value, bool) or value is None:
+        return value
+
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+
+    errors.append(f"{location}: {name} must be true or false, not {value!r}.")
+    return None
+
+
+def parse_difficulty(value, location: str, errors: List[str]) -> Optional[int]:
+    text = str(value or "").strip().lower()
+    if not text:
+        return None
+
+    for difficulty, label in Question.DIFFICULTIES:
+        if text in (str(difficulty), label.lower()):
+            return difficulty
+
+    errors.append(f"{location}: difficulty must be easy, medium or hard, not {value!r}.")
+    return None
+
+
+def read_csv(content: str, errors: List[str]) -> List[dict]:
+    """
+    Read the questions of a CSV authoring file, one row per choice.
+    """
+
+    reader = csv.DictReader(io.StringIO(content))
+    missing = {"question", "choice", "correct"} - set(reader.fieldnames or [])
+    if missing:
+        raise ValidationError(f"The CSV header lacks the column(s) {', '.join(sorted(missing))}.")
+
+    questions = []
+    for line, row in enumerate(reader, start=2):
+        location = f"Line {line}"
+        question_text = (row["question"] or "").strip()
+
+        if question_text:
+            questions.append(
+                {
+                    "question": question_text,
+                    "multiple": parse_bool(row.get("multiple") or None, location, "multiple", errors),
+                    "tag": (row.get("tag") or "").strip(),
+                    "difficulty": parse_difficulty(row.get("difficulty"), location, errors),
+                    "choices": [],
+                    "location": location,
+                }
+            )
+        elif not questions:
+            errors.append(f"{location}: the first row must name its question.")
+            continue
+
+        questions[-1]["choices"].append(
+            {"choice": row["choice"] or "", "correct": parse_bool(row["correct"], location, "correct", errors)}
+        )
+
+    return questions
+
+
+def read_json(content: str, errors: List[str]) -> List[dict]:
+    """
+    Read the questions of a JSON authoring file.
+    """
+
+    try:
+        data = json.loads(content)
+    except ValueError as error:
+        raise ValidationError(f"The file is not valid JSON: {error}.")
+
+    if isinstance(data, dict):
+        data = data.get("questions")
+    if not isinstance(data, list):
+        raise ValidationError('The JSON file must hold a list of questions, or an object with a "questions" list.')
+
+    questions = []
+    for number, item in enumerate(data, start=1):
+        location = f"Question {number}"
+        if not isinstance(item, dict) or not isinstance(item.get("choices"), list):
+            errors.append(f'{location}: a question must be an object with a "choices" list.')
+            continue
+
+        choices = []
+        for choice in item["choices"]:
+            if not isinstance(choice, dict):
+                errors.append(f"{location}: a choice must be an object.")
+                continue
+            correct = parse_bool(choice.get("correct", False), location, "correct", errors)
+            choices.append({"choice": str(choice.get("choice") or ""), "correct": correct})
+
+        questions.append(
+            {
+                "question": str(item.get("question") or "").strip(),
+                "multiple": parse_bool(item.get("multiple"), location, "multiple", errors),
+                "tag": str(item.get("tag") or "").strip(),
+                "difficulty": parse_difficulty(item.get("difficulty"), location, errors),
+                "choices": choices,
+                "location": location,
+            }
+        )
+
+    return questions
+
+
+def validate_question(question: dict, errors: List[str]):
+    """
+    Validate a question read from an authoring file, and fill in whether it expects multiple answers.
+    """
+
+    location = question["location"]
+    if not question["question"]:
+        errors.append(f"{location}: the question text is empty.")
+    elif len(question["question"]) > QUESTION_TEXT_LENGTH:
+        errors.append(f"{location}: the question text is longer than {QUESTION_TEXT_LENGTH} characters.")
+    if len(question["tag"]) > TAG_LENGTH:
+        errors.append(f"{location}: the tag is longer than {TAG_LENGTH} characters.")
+
+    choices = question["choices"]
+    for choice in choices:
+        choice["choice"] = choice["choice"].strip()
+        if not choice["choice"]:
+            errors.append(f"{location}: a choice text is empty.")
+        elif len(choice["choice"]) > CHOICE_TEXT_LENGTH:
+            errors.append(f"{location}: a choice text is longer than {CHOICE_TEXT_LENGTH} characters.")
+
+    if len(choices) < 2:
+        errors.append(f"{location}: a question needs at least two choices.")
+
+    texts = [choice["choice"].casefold() for choice in choices]
+    if len(set(texts)) < len(texts):
+        errors.append(f"{location}: two choices have the same text.")
+
+    correct_count = sum(1 for choice in choices if choice["correct"])
+    if correct_count == 0:
+        errors.append(f"{location}: a question needs at least one correct choice.")
+    elif question["multiple"] is None:
+        question["multiple"] = correct_count > 1
+    elif question["multiple"] and correct_count == 1:
+        errors.append(f"{location}: a multiple-answer question needs more than one correct choice.")
+    elif not question["multiple"] and correct_count > 1:
+        errors.append(f"{location}: a single-answer question has {correct_count} correct choices.")
+
+
+def parse_questions(content: str, file_format: str) -> List[dict]:
+    """
+    Parse and validate the questions of an authoring file.
+
+    Args:
+        content (str): The content of the file.
+        file_format (str): "csv" or "json".
+
+    Returns:
+        List[dict]: The questions, each with its text, whether it expects multiple answers, its tag, difficulty and
+        choices.
+
+    Raises:
+        ValidationError: With one message per problem found in the file.
+    """
+
+    errors = []
+    questions = read_csv(content, errors) if file_format == CSV else read_json(content, errors)
+
+    for question in questions:
+        validate_question(question, errors)
+    if not questions and not errors:
+        errors.append("The file holds no questions.")
+
+    if errors:
+        raise ValidationError(errors)
+    return questions
+
+
+def import_questions(lesson: Lesson, questions: List[dict]) -> Tuple[int, int]:
+    """
+    Add validated questions and their choices to a lesson, with one `bulk_create` each, in one transaction.
+
+    `bulk_create` sends no signals, so the lesson version is bumped and a regrade of its submissions queued here, once.
+
+    Args:
+        lesson (Lesson): The lesson.
+        questions (List[dict]): The questions returned by `parse_questions`.
+
+    Returns:
+        Tuple[int, int]: The number of questions and of choices added.
+    """
+
+    with transaction.atomic():
+        created = Question.objects.bulk_create(
+            [
+                Question(
+                    lesson=lesson,
+                    question_text=question["question"],
+                    expect_multiple_answer=question["multiple"],
+                    tag=question["tag"],
+                    difficulty=question["difficulty"],
+                )
+                for question in questions
+            ]
+        )
+        choices = Choice.objects.bulk_create(
+            [
+                Choice(question=question, choice_text=choice["choice"], is_correct=choice["correct"])
+                for question, spec in zip(created, questions)
+                for choice in spec["choices"]
+            ]
+        )
+
+        Lesson.objects.filter(pk=lesson.pk).update(version=F("version") + 1)
+        # New questions lower the grades of the lesson's submissions, like one saved in the admin does
+        transaction.on_commit(lambda: queue_regrade(lesson.pk))
+
+    return len(created), len(choices)
+
+
+def import_questions_file(lesson: Lesson, file, file_format: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Parse, validate and add the questions of an authoring file to a lesson.
+
+    Args:
+        lesson (Lesson): The lesson.
+        file (File): The uploaded or opened file, read as UTF-8.
+        file_format (str, optional): "csv" or "json", told by the file name extension by default.
+
+    Returns:
+        Tuple[int, int]: The number of questions and of choices added.
+
+    Raises:
+        ValidationError: When the format is unknown or the file is not valid.
+    """
+
+    if file_format is None:
+        file_format = os.path.splitext(file.name)[1].lstrip(".").lower()
+    if file_format not in FORMATS:
+        raise ValidationError(f"Unknown format {file_format!r}, expected one of {', '.join(FORMATS)}.")
+
+    content = file.read()
+    if isinstance(content, bytes):
+        try:
+            # The signature Excel writes at the start of a UTF-8 CSV file is dropped
+            content = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValidationError("The file is not UTF-8 encoded.")
+
+    return import_questions(lesson, parse_questions(content, file_format))
@@ -0,0 +1,941 @@
+"""
+This module contains the benchmark scenarios of the online course application and the runner that measures them.
+
+Every scenario is registered with the `scenario` decorator. A scenario receives a `BenchmarkEnv` holding a logged-in
+test client and the seeded objects, performs its own setup and returns the zero-argument callable to be measured. The
+runner calls it repeatedly and records the wall-clock latency, the CPU time and the number of SQL queries of every call.
+
+The startup benchmark starts fresh interpreters instead, to measure what every new worker pays before its first request.
+
+`Functions`:
+
+    scenario(name: str, iterations: int | None = None) -> Callable:
+        Registers a benchmark scenario.
+
+    percentile(samples: List[float], pct: float) -> float:
+        Computes a linearly interpolated percentile.
+
+    run_benchmarks(scales: Dict[str, dict], names: List[str], iterations: int, warmup: int) -> dict:
+        Seeds every data scale and measures the selected scenarios on it.
+
+    measure_startup(runs: int, top: int) -> dict:
+        Measures the cold start time, import time and memory of a worker.
+
+    measure_template_loading(iterations: int) -> dict:
+        Measures the time to get every app template with and without the cached template loader.
+
+    measure_search(lessons: int, iterations: int, words: int) -> dict:
+        Measures the full-text search against `icontains` scans on generated lessons.
+
+    measure_catalogue(courses: int, iterations: int, depths: List[int]) -> dict:
+        Measures the keyset pages of the course catalogue against OFFSET pages at increasing depths.
+
+    measure_leaderboard(learners: int, iterations: int) -> dict:
+        Measures the leaderboard of a lesson against aggregating its submissions per request.
+
+    measure_submission_storage() -> dict:
+        Measures the space the selected choices of the seeded submissions take, in the selection table and packed.
+"""
+
+import contextlib
+import importlib.util
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+import django
+from django.conf import settings
+from django.core import serializers
+from django.core.management import call_command
+from django.db import DatabaseError, connection, reset_queries
+from django.db.models import Max
+from django.template import Engine, engines
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from account import ratelimit
+from account.models import Learner, User
+
+from .management.commands.seed_benchmark_data import (
+    BENCHMARK_EMAIL_DOMAIN,
+    BENCHMARK_PASSWORD,
+    BENCHMARK_SLUG_PREFIX,
+    delete_benchmark_data,
+    seed_benchmark_data,
+)
+from . import leaderboard, search
+from .catalogue import DEFAULT_PER_PAGE, catalogue_page, catalogue_queryset, make_cursor
+from .content import content_querysets, export_content, import_content
+from .grading import calculate_grade
+from .models import Attempt, Choice, Course, Enrollment, Lesson, Question, Submission
+from .pool import draw_attempt
+from .selection import M2M, PACKED, pack_selections
+from .template_cache import app_template_names
+
+# Data scales passed to `seed_benchmark_data`
+SCALES = {
+    "small": {"users": 20, "courses": 2, "lessons": 2, "questions": 10, "choices": 4, "attempts": 2},
+    "medium": {"users": 200, "courses": 5, "lessons": 4, "questions": 20, "choices": 4, "attempts": 2},
+    "large": {"users": 2000, "courses": 10, "lessons": 5, "questions": 25, "choices": 4, "attempts": 3},
+}
+
+# Registered scenarios, mapping a name to the scenario function, its own number of iterations and whether its memory
+# is measured
+SCENARIOS = {}
+
+
+def scenario(name, iterations=None, memory=False):
+    """
+    Register a benchmark scenario.
+
+    Args:
+        name (str): The name the scenario is reported under.
+        iterations (int, optional): The number of measured calls, overriding the runner's default for slow scenarios.
+        memory (bool): Whether to also measure the peak memory allocated by a call, which slows the call down.
+    """
+
+    def decorator(func):
+        SCENARIOS[name] = (func, iterations, memory)
+        return func
+
+    return decorator
+
+
+class BenchmarkEnv:
+    """
+    Holds the objects shared by the scenarios of one data scale.
+
+    Attributes:
+        client (Client): A test client logged in as the benchmark runner, a superuser so attempts are not limited.
+        user (User): The benchmark runner.
+        course (Course): The first seeded course, the runner is enrolled in it.
+        lesson (Lesson): The first lesson of `course`.
+        submission (Submission): A seeded submission of `lesson`.
+    """
+
+    def __init__(self):
+        self.course = Course.objects.filter(slug_name__startswith=BENCHMARK_SLUG_PREFIX).order_by("id").first()
+        self.lesson = self.course.lessons.order_by("id").first()
+        self.submission = Submission.objects.filter(lesson=self.lesson).order_by("id").first()
+
+        self.user = User.objects.create_superuser(
+            email=f"runner@{BENCHMARK_EMAIL_DOMAIN}",
+            password=BENCHMARK_PASSWORD,
+            username="bench_runner",
+            full_name="Benchmark Runner",
+            nickname="Runner",
+            gender="Male",
+        )
+        Learner.objects.create(user=self.user, field_of_interest=Learner.IT, profession="Tester")
+        Enrollment.objects.create(learner=self.user, course=self.course, mode=Enrollment.HONOR)
+
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def quiz_url(self):
+        return reverse("onlinecourse:quiz_page", args=(self.course.slug_name,))
+
+    def answers(self):
+        """
+        Return a submit payload answering every question of `lesson` with its first choice.
+        """
+
+        choices = {}
+        for question in self.lesson.questions.prefetch_related("choices"):
+            first_choice = min(choice.id for choice in question.choices.all())
+            choices[str(question.id)] = [str(first_choice)]
+        return {"lessonTitle": self.lesson.title, "choices": choices}
+
+
+@scenario("calculate_grade")
+def calculate_grade_scenario(env):
+    questions = env.submission.lesson.questions.all()
+    choices = env.submission.selected_choices
+    return lambda: calculate_grade(questions=questions, choices=choices)
+
+
+@scenario("start_quiz")
+def start_quiz_scenario(env):
+    url = env.quiz_url()
+    return lambda: env.client.get(url, {"name": env.lesson.title})
+
+
+@scenario("submit")
+def submit_scenario(env):
+    url = reverse("onlinecourse:submit", args=(env.course.slug_name,))
+    payload = json.dumps(env.answers())
+    return lambda: env.client.post(url, payload, content_type="application/json")
+
+
+def submit_with_storage(storage):
+    def setup(env):
+        url = reverse("onlinecourse:submit", args=(env.course.slug_name,))
+        payload = json.dumps(env.answers())
+
+        def submit():
+            with override_settings(SUBMISSION_STORAGE=storage):
+                env.client.post(url, payload, content_type="application/json")
+
+        return submit
+
+    return setup
+
+
+# The submit latency with either storage of the selected choices, whichever one is configured
+for storage in (M2M, PACKED):
+    scenario(f"submit_{storage}")(submit_with_storage(storage))
+
+
+@scenario("show_exam_result")
+def show_exam_result_scenario(env):
+    # Take the quiz once to get the attempt the result page needs
+    env.client.get(env.quiz_url(), {"name": env.lesson.title})
+    env.client.post(
+        reverse("onlinecourse:submit", args=(env.course.slug_name,)),
+        json.dumps(env.answers()),
+        content_type="application/json",
+    )
+    url = reverse("onlinecourse:exam_result", args=(env.course.slug_name,))
+    return lambda: env.client.get(url, {"name": env.lesson.title, "attempt": 1})
+
+
+@scenario("quiz_api")
+def quiz_api_scenario(env):
+    url = reverse("onlinecourse:quiz_api", args=(env.lesson.id,))
+    return lambda: env.client.get(url)
+
+
+@scenario("quiz_api_not_modified")
+def quiz_api_not_modified_scenario(env):
+    # A browser revalidating the payload it holds gets an empty 304 response
+    url = reverse("onlinecourse:quiz_api", args=(env.lesson.id,))
+    etag = env.client.get(url)["ETag"]
+    return lambda: env.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+
+# Pool sizes the sampling of an attempt's questions is measured on, against shuffling the whole pool
+POOL_SIZES = (200, 2000)
+POOL_SAMPLE = 20
+POOL_TAGS = 5
+
+
+def pool_draw(size, questions_per_attempt=None, pool_strata=""):
+    def setup(env):
+        lesson = Lesson.objects.create(
+            course=env.course,
+            title=f"Pool of {size}",
+            content="",
+            questions_per_attempt=questions_per_attempt,
+            pool_strata=pool_strata,
+        )
+        questions = Question.objects.bulk_create(
+            Question(lesson=lesson, question_text=f"Question {number}", tag=f"tag-{number % POOL_TAGS}")
+            for number in range(size)
+        )
+        Choice.objects.bulk_create(
+            Choice(question=question, choice_text=f"Choice {number}", is_correct=number == 0)
+            for question in questions
+            for number in range(4)
+        )
+
+        # Every call draws a new attempt from the cached pool
+        attempts = itertools.count(1)
+        return lambda: draw_attempt(lesson, env.user.id, next(attempts))
+
+    return setup
+
+
+for size in POOL_SIZES:
+    scenario(f"pool_draw_{size}_all")(pool_draw(size))
+    scenario(f"pool_draw_{size}")(pool_draw(size, POOL_SAMPLE))
+    scenario(f"pool_draw_{size}_stratified")(pool_draw(size, POOL_SAMPLE, Lesson.TAG))
+
+
+@scenario("ratelimit_hit")
+def ratelimit_hit_scenario(env):
+    # The overhead the limiter adds to every login and registration request
+    return lambda: ratelimit.hit("benchmark", "127.0.0.1", limit=10**9, window=60)
+
+
+@scenario("login")
+def login_scenario(env):
+    # A failed login runs the password hasher, measured without the limiter getting in the way
+    client = Client()
+    url = reverse("account:login")
+    payload = json.dumps({"loginEmail": env.user.email, "loginPassword": "wrong-password"})
+
+    def login():
+        with override_settings(RATELIMIT={"ENABLED": False}):
+            client.post(url, payload, content_type="application/json")
+
+    return login
+
+
+@scenario("login_rate_limited")
+def login_rate_limited_scenario(env):
+    # Once a client is over the limit, its attempts are rejected before the password hasher runs
+    client = Client()
+    url = reverse("account:login")
+    payload = json.dumps({"loginEmail": env.user.email, "loginPassword": "wrong-password"})
+    while client.post(url, payload, content_type="application/json").status_code != 429:
+        pass
+    return lambda: client.post(url, payload, content_type="application/json")
+
+
+def verify_password_scenario(hasher_path):
+    def setup(env):
+        hasher = import_string(hasher_path)()
+        encoded = hasher.encode(BENCHMARK_PASSWORD, hasher.salt())
+        return lambda: hasher.verify(BENCHMARK_PASSWORD, encoded)
+
+    return setup
+
+
+# The CPU cost of checking a password at login with every hashing profile, whichever one is configured
+for profile, hasher_path in settings.PASSWORD_HASHER_PROFILES.items():
+    if profile == "argon2" and importlib.util.find_spec("argon2") is None:
+        continue
+    scenario(f"verify_password_{profile}", iterations=10)(verify_password_scenario(hasher_path))
+
+
+@scenario("course_list")
+def course_list_scenario(env):
+    url = reverse("onlinecourse:index")
+    return lambda: env.client.get(url)
+
+
+def backfill_grades(debug):
+    def backfill():
+        with override_settings(DEBUG=debug):
+            call_command("backfill_grades", stdout=io.StringIO())
+
+    return backfill
+
+
+@scenario("backfill_grades", iterations=3, memory=True)
+def backfill_grades_scenario(env):
+    return backfill_grades(debug=False)
+
+
+@scenario("backfill_grades_debug", iterations=3, memory=True)
+def backfill_grades_debug_scenario(env):
+    # The same backfill under the dev profile, where every SQL statement is kept in `connection.queries`
+    return backfill_grades(debug=True)
+
+
+def benchmark_courses():
+    return Course.objects.filter(slug_name__startswith=BENCHMARK_SLUG_PREFIX)
+
+
+def content_dump(export_format):
+    """
+    Dump the seeded courses with their learners' work to a temporary file.
+
+    Returns:
+        Tuple[NamedTemporaryFile, int]: The dump, open at its start, and the number of objects in it.
+    """
+
+    querysets = content_querysets(benchmark_courses(), learners=True)
+    dump = tempfile.NamedTemporaryFile("w+", suffix=f".{export_format}", encoding="utf-8")
+
+    if export_format == "jsonl":
+        export_content(dump, benchmark_courses(), learners=True)
+    else:
+        serializers.serialize(export_format, itertools.chain.from_iterable(querysets), stream=dump)
+
+    dump.flush()
+    dump.seek(0)
+    return dump, sum(queryset.count() for queryset in querysets)
+
+
+@scenario("content_export", iterations=3, memory=True)
+def content_export_scenario(env):
+    def export():
+        with open(os.devnull, "w", encoding="utf-8") as sink:
+            export_content(sink, benchmark_courses(), learners=True)
+
+    export.objects = sum(queryset.count() for queryset in content_querysets(benchmark_courses(), learners=True))
+    return export
+
+
+@scenario("content_import", iterations=3, memory=True)
+def content_import_scenario(env):
+    # Every call overwrites the seeded rows with their own dump, then regrades their submissions
+    dump, objects = content_dump("jsonl")
+
+    def load():
+        dump.seek(0)
+        import_content(dump)
+
+    load.objects = objects
+    return load
+
+
+@scenario("content_loaddata", iterations=3, memory=True)
+def content_loaddata_scenario(env):
+    # The same objects through `loaddata`, which parses the whole dump, saves one object at a time and fires signals
+    dump, objects = content_dump("json")
+
+    def load():
+        call_command("loaddata", dump.name, verbosity=0)
+
+    load.objects = objects
+    return load
+
+
+def percentile(samples, pct):
+    """
+    Compute a linearly interpolated percentile.
+
+    Args:
+        samples (List[float]): The sorted samples.
+        pct (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile of the samples.
+    """
+
+    if not samples:
+        return 0.0
+
+    rank = (len(samples) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(samples) - 1)
+    return samples[lower] + (samples[upper] - samples[lower]) * (rank - lower)
+
+
+class QueryCounter:
+    """
+    Counts executed SQL statements. Unlike `connection.queries`, it is not capped at 9000 entries.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func: Callable, iterations: int, warmup: int, memory: bool = False) -> dict:
+    """
+    Call `func` repeatedly and summarize its latency and query count.
+
+    Args:
+        func (Callable): The zero-argument callable returned by a scenario.
+        iterations (int): The number of measured calls.
+        warmup (int): The number of calls made before measuring.
+        memory (bool): Whether to make one more call under tracemalloc to measure its peak memory.
+
+    Returns:
+        dict: Latency percentiles and mean CPU time in milliseconds, query count statistics, and the peak memory
+        allocated by a call in kilobytes when measured.
+    """
+
+    latencies = []
+    cpu_times = []
+    queries = []
+
+    # Views may print to stdout, keep it out of the JSON report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            func()
+
+        for _ in range(iterations):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                start, cpu_start = time.perf_counter(), time.process_time()
+                func()
+                latencies.append((time.perf_counter() - start) * 1000)
+                cpu_times.append((time.process_time() - cpu_start) * 1000)
+            queries.append(counter.count)
+
+        peak_memory = None
+        if memory:
+            # Start from an empty query log, so the statements the call keeps in debug mode are counted
+            reset_queries()
+            tracemalloc.start()
+            func()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    latencies.sort()
+    result = {
+        "iterations": iterations,
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p90_ms": round(percentile(latencies, 90), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3),
+        "cpu_mean_ms": round(sum(cpu_times) / len(cpu_times), 3),
+        "queries": {
+            "min": min(queries),
+            "max": max(queries),
+            "mean": round(sum(queries) / len(queries), 2),
+        },
+    }
+    if peak_memory is not None:
+        result["peak_memory_kb"] = round(peak_memory / 1024, 1)
+    return result
+
+
+# Modules only needed by rare code paths, a worker must not load them at startup
+HEAVY_MODULES = ["aiohttp", "bs4", "numpy", "requests"]
+
+# Loads the application like a worker does before serving its first request, the URLconf included
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+
+start = time.perf_counter()
+import myproject.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+print(json.dumps({"elapsed_ms": elapsed * 1000, "rss_mb": rss, "modules": sorted(sys.modules)}))
+"""
+
+
+def parse_importtime(output: str) -> Dict[str, float]:
+    """
+    Sum the self import time of every top-level package from the `-X importtime` output, in milliseconds.
+    """
+
+    per_package = defaultdict(float)
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        per_package[name.strip().split(".")[0]] += int(self_us) / 1000
+    return per_package
+
+
+def measure_startup(runs: int = 3, top: int = 10) -> dict:
+    """
+    Start fresh interpreters that load the application and report what a new worker pays before its first request.
+
+    Args:
+        runs (int): The number of interpreters started, the timings are the mean of the runs.
+        top (int): The number of top-level packages reported with their import time.
+
+    Returns:
+        dict: The cold start time and the total import time in milliseconds, the peak RSS in megabytes, the slowest
+        packages to import and the `HEAVY_MODULES` that were loaded.
+    """
+
+    elapsed, imports, rss = [], [], []
+    per_package = defaultdict(float)
+    loaded = set()
+
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+        )
+        result = json.loads(process.stdout.splitlines()[-1])
+        run_imports = parse_importtime(process.stderr)
+
+        elapsed.append(result["elapsed_ms"])
+        imports.append(sum(run_imports.values()))
+        rss.append(result["rss_mb"])
+        for package, duration in run_imports.items():
+            per_package[package] += duration / runs
+        loaded.update(module for module in HEAVY_MODULES if module in result["modules"])
+
+    slowest = sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "runs": runs,
+        "cold_start_ms": round(sum(elapsed) / runs, 3),
+        "import_ms": round(sum(imports) / runs, 3),
+        "rss_mb": round(max(rss), 1),
+        "slowest_imports_ms": {package: round(duration, 3) for package, duration in slowest},
+        "heavy_modules_loaded": sorted(loaded),
+    }
+
+
+def measure_template_loading(iterations: int = 20) -> dict:
+    """
+    Get every template of the project's apps repeatedly, from an engine reading and compiling it on every call and
+    from one with the cached template loader, as the production settings configure it.
+
+    Args:
+        iterations (int): The number of measured calls per template and engine.
+
+    Returns:
+        dict: The mean time to get each template, in milliseconds, per engine.
+    """
+
+    django_engine = engines["django"].engine
+    file_loaders = ["django.template.loaders.filesystem.Loader", "django.template.loaders.app_directories.Loader"]
+
+    def build_engine(loaders):
+        return Engine(
+            dirs=django_engine.dirs,
+            loaders=loaders,
+            libraries=django_engine.libraries,
+            builtins=django_engine.builtins[len(Engine.default_builtins) :],
+        )
+
+    uncached = build_engine(file_loaders)
+    cached = build_engine([("django.template.loaders.cached.Loader", file_loaders)])
+
+    results = {}
+    for name in app_template_names():
+        cached.get_template(name)
+        timings = {}
+        for label, engine in [("uncached_ms", uncached), ("cached_ms", cached)]:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                engine.get_template(name)
+            timings[label] = round((time.perf_counter() - start) * 1000 / iterations, 4)
+        results[name] = timings
+
+    return results
+
+
+def search_vocabulary(size: int) -> List[str]:
+    # Pronounceable made-up words, so that no stemming merges two of them
+    syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "de", "pu", "xa", "zo"]
+    return ["".join(parts) for parts in itertools.product(syllables, repeat=3)][:size]
+
+
+def measure_search(lessons: int = 100_000, iterations: int = 20, words: int = 60) -> dict:
+    """
+    Measure the full-text search against `icontains` scans on a course of generated lessons.
+
+    Lesson texts draw their words from a vocabulary with Zipf-distributed frequencies, like natural text, so queries
+    range from words most lessons hold, where the `icontains` scan stops at the first page of unranked rows while the
+    index ranks every match, to words few or no lessons hold, where the scan reads the whole table. The course is
+    deleted afterwards.
+
+    Args:
+        lessons (int): The number of lessons generated.
+        iterations (int): The number of measured searches per query and method.
+        words (int): The number of words of every lesson content.
+
+    Returns:
+        dict: The number of lessons, the time to build the index, and per query the mean time of either method in
+        milliseconds and the results of the first page.
+    """
+
+    rng = random.Random(0)
+    vocabulary = search_vocabulary(1500)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+    course = Course.objects.create(
+        name="Search benchmark",
+        slug_name=f"{BENCHMARK_SLUG_PREFIX}search",
+        image="course_images/django.png",
+        description="Synthetic course generated for the search benchmark.",
+        pub_date=date.today(),
+    )
+    # A word only a few lessons hold, the kind of query a learner looking for one topic types
+    rare = set(rng.sample(range(lessons), min(10, lessons)))
+    for start in range(0, lessons, 5000):
+        Lesson.objects.bulk_create(
+            Lesson(
+                course=course,
+                title=" ".join(rng.choices(vocabulary, weights, k=4)),
+                content=" ".join(rng.choices(vocabulary, weights, k=words) + (["quasar"] if number in rare else [])),
+            )
+            for number in range(start, min(start + 5000, lessons))
+        )
+
+    start = time.perf_counter()
+    search.reindex()
+    results = {"lessons": lessons, "index_seconds": round(time.perf_counter() - start, 3), "queries": {}}
+
+    queries = {
+        "common": vocabulary[0],
+        "frequent": vocabulary[20],
+        "two_words": f"{vocabulary[5]} {vocabulary[40]}",
+        "prefix": vocabulary[300][:4],
+        "rare": "quasar",
+        "missing": "nebula",
+    }
+    for label, query in queries.items():
+        timings = {"query": query}
+        for method, full_text in [("full_text", True), ("icontains", False)]:
+            page = search.search(query, full_text=full_text)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                search.search(query, full_text=full_text)
+            timings[f"{method}_ms"] = round((time.perf_counter() - start) * 1000 / iterations, 3)
+            timings[f"{method}_results"] = len(page.results)
+        results["queries"][label] = timings
+
+    course.delete()
+    return results
+
+
+def measure_catalogue(courses: int = 50_000, iterations: int = 20, depths: Optional[List[int]] = None) -> dict:
+    """
+    Measure a page of the course catalogue read by keyset, as the course list does, against the same page read with
+    an OFFSET, at increasing depths of generated courses with few distinct enrollments, so ties are common. The
+    courses are deleted afterwards.
+
+    Args:
+        courses (int): The number of courses generated.
+        iterations (int): The number of measured page reads per depth and method.
+        depths (List[int], optional): The positions of the first course of the measured pages, from the first page to
+            the last one by default.
+
+    Returns:
+        dict: The number of courses, and per depth the mean time of either method in milliseconds and whether they
+        read the same page.
+    """
+
+    rng = random.Random(0)
+    if depths is None:
+        depths = sorted({0, courses // 100, courses // 10, courses // 2, max(courses - DEFAULT_PER_PAGE, 0)})
+
+    slug_prefix = f"{BENCHMARK_SLUG_PREFIX}catalogue-"
+    for start in range(0, courses, 5000):
+        Course.objects.bulk_create(
+            Course(
+                name=f"Catalogue {number}",
+                slug_name=f"{slug_prefix}{number}",
+                image="course_images/django.png",
+                description="Synthetic course generated for the catalogue benchmark.",
+                pub_date=date.today(),
+                total_enrollment=int(rng.paretovariate(1.5)),
+            )
+            for number in range(start, min(start + 5000, courses))
+        )
+
+    results = {"courses": courses, "depths": {}}
+    ordered = catalogue_queryset()
+    for depth in depths:
+        cursor = make_cursor(ordered[depth - 1]) if depth else None
+
+        def keyset():
+            return catalogue_page(cursor=cursor).courses
+
+        def offset():
+            return list(ordered.prefetch_related("instructors__user")[depth : depth + DEFAULT_PER_PAGE])
+
+        timings = {}
+        for method, read_page in [("keyset", keyset), ("offset", offset)]:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                read_page()
+            timings[f"{method}_ms"] = round((time.perf_counter() - start) * 1000 / iterations, 3)
+        timings["same_page"] = keyset() == offset()
+        results["depths"][depth] = timings
+
+    Course.objects.filter(slug_name__startswith=slug_prefix).delete()
+    return results
+
+def measure_leaderboard(learners: int = 20_000, iterations: int = 100) -> dict:
+    """
+    Measure the top 10 and the rank of a learner read from the leaderboard of a lesson against the same read by
+    aggregating the best grade of every learner per request, on a lesson with two submissions per learner. The time to
+    rebuild the leaderboard on a cold start and to record a submission are reported too. The course and the learners
+    are deleted afterwards.
+
+    Args:
+        learners (int): The number of learners with submissions.
+        iterations (int): The number of measured reads per method.
+
+    Returns:
+        dict: The number of learners, the time of either read, a rebuild and a recorded submission in milliseconds, and
+        whether both reads agree.
+    """
+
+    rng = random.Random(0)
+    course = Course.objects.create(
+        name="Leaderboard benchmark",
+        slug_name=f"{BENCHMARK_SLUG_PREFIX}leaderboard",
+        image="course_images/django.png",
+        description="Synthetic course generated for the leaderboard benchmark.",
+        pub_date=date.today(),
+    )
+    lesson = Lesson.objects.create(course=course, title="Leaderboard", content="")
+
+    users = User.objects.bulk_create(
+        User(
+            email=f"leaderboard{number}@{BENCHMARK_EMAIL_DOMAIN}",
+            username=f"bench_leaderboard_{number}",
+            full_name=f"Leaderboard Learner {number}",
+            nickname=f"Learner {number}",
+            gender="Female",
+        )
+        for number in range(learners)
+    )
+    attempts = Attempt.objects.bulk_create(
+        Attempt(learner=user, lesson=lesson, attempt_no=attempt_no) for user in users for attempt_no in (1, 2)
+    )
+    submissions = Submission.objects.bulk_create(
+        Submission(attempt=attempt, lesson=lesson, grade=rng.randint(0, 100)) for attempt in attempts
+    )
+    learner_id = users[len(users) // 2].id
+
+    def aggregated():
+        best = Submission.objects.filter(lesson=lesson).values("attempt__learner_id").annotate(best=Max("grade"))
+        top = list(best.order_by("-best", "attempt__learner_id").values_list("attempt__learner_id", "best")[:10])
+        grade = best.get(attempt__learner_id=learner_id)["best"]
+        return top, grade, best.filter(best__gt=grade).count() + 1
+
+    def from_leaderboard():
+        return leaderboard.get_standings(lesson.id, learner_id)
+
+    results = {"learners": learners}
+    leaderboard.invalidate_leaderboard(lesson.id)
+    start = time.perf_counter()
+    from_leaderboard()
+    results["rebuild_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    for method, read in [("leaderboard", from_leaderboard), ("aggregate", aggregated)]:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            read()
+        results[f"{method}_ms"] = round((time.perf_counter() - start) * 1000 / iterations, 3)
+
+    # The aggregate ranks learners tied on their best grade alike, the leaderboard by their earliest submission
+    standings, (top, grade, rank) = from_leaderboard(), aggregated()
+    results["agree"] = (
+        [entry.grade for entry in standings.top] == [best for _, best in top]
+        and standings.entry.grade == grade
+        and standings.rank >= rank
+    )
+
+    submission = submissions[0]
+    submission.grade = 100
+    start = time.perf_counter()
+    leaderboard.record_submission(submission)
+    results["record_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    User.objects.filter(email__startswith="leaderboard", email__endswith=f"@{BENCHMARK_EMAIL_DOMAIN}").delete()
+    course.delete()
+    leaderboard.invalidate_leaderboard(lesson.id)
+    return results
+
+def table_sizes(tables: List[str]) -> Optional[Dict[str, int]]:
+    """
+    Return the bytes taken by tables, their indexes included, or None when the database cannot tell.
+    """
+
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                # Needs SQLite built with the dbstat virtual table, as the builds shipped with Python are
+                placeholders = ", ".join(["%s"] * len(tables))
+                cursor.execute(
+                    "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat AS s JOIN sqlite_master AS m ON m.name = s.name "
+                    f"WHERE m.tbl_name IN ({placeholders}) GROUP BY m.tbl_name",
+                    tables,
+                )
+                sizes = dict(cursor.fetchall())
+            elif connection.vendor == "postgresql":
+                sizes = {}
+                for table in tables:
+                    cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+                    sizes[table] = cursor.fetchone()[0]
+            else:
+                return None
+    except DatabaseError:
+        return None
+
+    return {table: sizes.get(table, 0) for table in tables}
+
+
+def measure_submission_storage() -> dict:
+    """
+    Measure the space the selected choices of the seeded submissions take in the selection table and once packed, by
+    packing them the way the migration does.
+
+    Returns:
+        dict: The bytes of the submission and selection tables, and their total, before and after packing, and the
+        time packing took in milliseconds.
+    """
+
+    tables = [Submission._meta.db_table, Submission.choices.through._meta.db_table]
+
+    def sizes():
+        per_table = table_sizes(tables)
+        if per_table is None:
+            return None
+        return {**per_table, "total": sum(per_table.values())}
+
+    before = sizes()
+    start = time.perf_counter()
+    packed = pack_selections(Submission)
+    elapsed = time.perf_counter() - start
+
+    return {"submissions": packed, M2M: before, PACKED: sizes(), "pack_ms": round(elapsed * 1000, 3)}
+
+
+def git_revision():
+    try:
+        output = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def run_benchmarks(scales: Dict[str, dict], names: List[str], iterations: int = 20, warmup: int = 2) -> dict:
+    """
+    Seed every data scale in turn and measure the selected scenarios on it.
+
+    Args:
+        scales (Dict[str, dict]): Data scales by name, each one holding the arguments of `seed_benchmark_data`.
+        names (List[str]): Names of the scenarios to run.
+        iterations (int): The default number of measured calls per scenario.
+        warmup (int): The number of unmeasured calls per scenario.
+
+    Returns:
+        dict: The report, with run metadata, the submission storage per scale and the measurements per scale and
+        scenario.
+    """
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": {},
+    }
+
+    for scale_name, scale in scales.items():
+        delete_benchmark_data()
+        # Seeded in the selection table, then packed, to compare the space both storages take
+        with override_settings(SUBMISSION_STORAGE=M2M):
+            seed_benchmark_data(**scale)
+        results = report["results"][scale_name] = {"scale": scale}
+        results["submission_storage"] = measure_submission_storage()
+
+        for name in names:
+            func, scenario_iterations, memory = SCENARIOS[name]
+            # Every scenario gets a fresh runner so attempts made by one do not leak into another
+            User.objects.filter(email=f"runner@{BENCHMARK_EMAIL_DOMAIN}").delete()
+            with contextlib.redirect_stdout(io.StringIO()):
+                timed = func(BenchmarkEnv())
+            results[name] = measure(timed, scenario_iterations or iterations, warmup, memory)
+            # Bulk scenarios tell how many objects a call handles
+            if hasattr(timed, "objects"):
+                results[name]["objects"] = timed.objects
+                results[name]["objects_per_second"] = round(timed.objects / results[name]["mean_ms"] * 1000)
+
+    delete_benchmark_data()
+    return report
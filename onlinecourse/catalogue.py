@@ -0,0 +1,175 @@
+"""
+This module contains the course catalogue, every course ordered by enrollment, paginated by keyset.
+
+An OFFSET page makes the database read and skip every row before it, so deep pages get slower the further a learner
+scrolls. A keyset page starts right after the last course of the previous page instead, in two steps:
+
+    WHERE total_enrollment = :enrollment AND id < :id ORDER BY id DESC
+    WHERE total_enrollment < :enrollment ORDER BY total_enrollment DESC, id DESC
+
+the second one only when the courses tied with the cursor run out before the page is full. The `course_catalogue_idx`
+index on `(-total_enrollment, -id)` serves both by seeking to their first row and reading at most one page of rows, at
+any depth. The single `(total_enrollment, id) < (:enrollment, :id)` condition would say the same, but SQLite only
+seeks on the first column of it and scans every course tied with the cursor, and most courses share a few small
+enrollments. The ID breaks ties between courses with the same enrollment, so no course is skipped or repeated. A cursor
+is the "<enrollment>.<id>" of the last course of a page. Enrollments recounted while a learner scrolls move their
+course in the order, like in any live listing.
+
+`Classes`:
+
+    CataloguePage:
+        A page of the catalogue with the cursor of the next one.
+
+`Functions`:
+
+    make_cursor(course: Course) -> str:
+        Returns the cursor of the page after a course.
+
+    parse_cursor(cursor: str) -> Tuple[int, int] | None:
+        Reads a cursor, None when it is missing or malformed.
+
+    catalogue_filters(params: QueryDict) -> dict:
+        Reads the filters of the catalogue from query parameters.
+
+    catalogue_queryset(instructor_id: int, published_from: date, published_to: date) -> QuerySet:
+        Returns the filtered courses in catalogue order.
+
+    catalogue_page(user: User, cursor: str, instructor_id: int, published_from: date, published_to: date,
+                   per_page: int) -> CataloguePage:
+        Returns a page of the catalogue, optionally filtered by instructor and publication date.
+"""
+
+from datetime import date
+from typing import List, NamedTuple, Optional, Tuple
+
+from django.db.models import Exists, OuterRef, QuerySet, prefetch_related_objects
+from django.utils.dateparse import parse_date
+
+from .models import Course, Enrollment
+
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 50
+
+
+class CataloguePage(NamedTuple):
+    """
+    A page of the catalogue.
+
+    Attributes:
+        courses (List[Course]): The courses of the page, with `is_enrolled` set for the learner and their instructors
+        prefetched.
+        next_cursor (str | None): The cursor of the next page, None on the last page.
+    """
+
+    courses: List[Course]
+    next_cursor: Optional[str]
+
+
+def make_cursor(course: Course) -> str:
+    """
+    Return the cursor of the page after a course.
+    """
+
+    return f"{course.total_enrollment}.{course.id}"
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Read a cursor written by `make_cursor`, None when it is missing or malformed, which starts from the first page.
+    """
+
+    try:
+        enrollment, course_id = cursor.split(".")
+        return int(enrollment), int(course_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def catalogue_filters(params) -> dict:
+    """
+    Read the `instructor`, `published_from` and `published_to` filters from query parameters, ignoring malformed ones.
+
+    Returns:
+        dict: The keyword arguments of `catalogue_page` for the filters given.
+    """
+
+    filters = {}
+    try:
+        filters["instructor_id"] = int(params["instructor"])
+    except (KeyError, ValueError):
+        pass
+
+    for name in ("published_from", "published_to"):
+        try:
+            filters[name] = parse_date(params.get(name, ""))
+        except ValueError:
+            pass
+
+    return {name: value for name, value in filters.items() if value is not None}
+
+
+def catalogue_queryset(
+    instructor_id: Optional[int] = None, published_from: Optional[date] = None, published_to: Optional[date] = None
+) -> QuerySet:
+    """
+    Return the filtered courses in catalogue order.
+    """
+
+    courses = Course.objects.order_by("-total_enrollment", "-id")
+    if instructor_id is not None:
+        courses = courses.filter(instructors=instructor_id)
+    if published_from is not None:
+        courses = courses.filter(pub_date__gte=published_from)
+    if published_to is not None:
+        courses = courses.filter(pub_date__lte=published_to)
+    return courses
+
+
+def catalogue_page(
+    user=None,
+    cursor: Optional[str] = None,
+    instructor_id: Optional[int] = None,
+    published_from: Optional[date] = None,
+    published_to: Optional[date] = None,
+    per_page: int = DEFAULT_PER_PAGE,
+) -> CataloguePage:
+    """
+    Return a page of the catalogue, with at most four queries whatever its depth: one or two for the courses, with
+    whether the learner is enrolled in them as a subquery, then their instructors and the instructors' users.
+
+    Args:
+        user (User, optional): The learner, whose enrollment is flagged on every course when signed in.
+        cursor (str, optional): The cursor of the page, the first page by default.
+        instructor_id (int, optional): Only the courses of this instructor.
+        published_from (date, optional): Only the courses published on this day or later.
+        published_to (date, optional): Only the courses published on this day or earlier.
+        per_page (int): The number of courses per page, at most `MAX_PER_PAGE`.
+
+    Returns:
+        CataloguePage: The page.
+    """
+
+    per_page = min(max(per_page, 1), MAX_PER_PAGE)
+    courses = catalogue_queryset(instructor_id, published_from, published_to)
+
+    if user is not None and user.is_authenticated:
+        courses = courses.annotate(
+            is_enrolled=Exists(Enrollment.objects.filter(course=OuterRef("pk"), learner_id=user.id))
+        )
+
+    # One more course than the page holds tells whether another page follows
+    limit = per_page + 1
+    position = parse_cursor(cursor)
+    if position is None:
+        page = list(courses[:limit])
+    else:
+        enrollment, course_id = position
+        page = list(courses.filter(total_enrollment=enrollment, id__lt=course_id)[:limit])
+        if len(page) < limit:
+            page += courses.filter(total_enrollment__lt=enrollment)[: limit - len(page)]
+
+    next_cursor = make_cursor(page[per_page - 1]) if len(page) > per_page else None
+    page = page[:per_page]
+    prefetch_related_objects(page, "instructors__user")
+
+    return CataloguePage(page, next_cursor)
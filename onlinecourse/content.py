@@ -0,0 +1,214 @@
+"""
+This module contains the streaming export and import of course content, for moving courses between sites and for
+backups.
+
+`dumpdata` and `loaddata` hold a whole dump in memory and `loaddata` saves it one object at a time, firing the grading
+signals of every submission. Here, a dump is a JSONL file in the format of Django's `jsonl` serializer, one object per
+line, models in dependency order:
+
+    users → instructors → courses → lessons → questions → choices [→ enrollments → attempts → submissions]
+
+Learners, enrollments, attempts and submissions are only included when asked for. The export streams every table with
+`iterator()`, and the import reads the dump line by line and inserts consecutive objects of a model with one
+`bulk_create` per batch, which sends no model signals. Objects whose primary key exists are overwritten, like
+`loaddata` does. Grades are not trusted: the imported submissions are regraded in bulk once everything is in, and the
+lessons that already existed get their version bumped once, so cached quizzes are rebuilt. Imported courses and lessons
+are added to the search index. Like `dumpdata`, dumps keep times to the millisecond.
+
+`Functions`:
+
+    content_querysets(courses: QuerySet, learners: bool) -> List[QuerySet]:
+        Returns the querysets of the content of courses, in dependency order.
+
+    export_content(stream: TextIO, courses: QuerySet, learners: bool, chunk_size: int) -> Dict[str, int]:
+        Writes the content of courses to a stream as JSONL.
+
+    import_content(stream: Iterable[str], batch_size: int, regrade: bool) -> Dict[str, int]:
+        Imports a JSONL dump written by `export_content`.
+"""
+
+import itertools
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, TextIO
+
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import F, Q, QuerySet
+
+from account.models import Instructor, User
+
+from . import search
+from .models import Attempt, Choice, Course, Enrollment, Lesson, Question, Submission
+from .regrade import regrade_submissions
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_BATCH_SIZE = 1000
+
+# Groups and permissions are site configuration rather than content, a user is exported without them
+USER_FIELDS = [field.name for field in User._meta.concrete_fields if not field.primary_key]
+
+
+def content_querysets(courses: Optional[QuerySet] = None, learners: bool = False) -> List[QuerySet]:
+    """
+    Return the querysets of the content of courses, in dependency order.
+
+    Args:
+        courses (QuerySet, optional): The courses, every course by default.
+        learners (bool): Whether to include the learners, their enrollments, attempts and submissions.
+
+    Returns:
+        List[QuerySet]: The querysets, each ordered by primary key.
+    """
+
+    if courses is None:
+        courses = Course.objects.all()
+    course_ids = courses.values("id")
+
+    instructors = Instructor.objects.filter(course__in=course_ids).distinct()
+    users = Q(instructors__in=instructors.values("id"))
+    if learners:
+        users |= Q(enrollments__course__in=course_ids)
+
+    querysets = [
+        User.objects.filter(users).distinct(),
+        instructors,
+        courses.prefetch_related("instructors"),
+        Lesson.objects.filter(course__in=course_ids),
+        Question.objects.filter(lesson__course__in=course_ids),
+        Choice.objects.filter(question__lesson__course__in=course_ids),
+    ]
+    if learners:
+        querysets += [
+            Enrollment.objects.filter(course__in=course_ids),
+            Attempt.objects.filter(lesson__course__in=course_ids),
+            Submission.objects.filter(lesson__course__in=course_ids).prefetch_related("choices"),
+        ]
+
+    return [queryset.order_by("pk") for queryset in querysets]
+
+
+def export_content(
+    stream: TextIO, courses: Optional[QuerySet] = None, learners: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict[str, int]:
+    """
+    Write the content of courses to a stream as JSONL, one object per line.
+
+    Args:
+        stream (TextIO): The text stream written to.
+        courses (QuerySet, optional): The courses, every course by default.
+        learners (bool): Whether to include the learners, their enrollments, attempts and submissions.
+        chunk_size (int): The number of rows fetched per query.
+
+    Returns:
+        Dict[str, int]: The number of exported objects per model label.
+    """
+
+    counts = Counter()
+    serializer = serializers.get_serializer("jsonl")()
+
+    def counted(objects, label):
+        for obj in objects:
+            counts[label] += 1
+            yield obj
+
+    for queryset in content_querysets(courses, learners):
+        fields = USER_FIELDS if queryset.model is User else None
+        objects = counted(queryset.iterator(chunk_size=chunk_size), queryset.model._meta.label_lower)
+        serializer.serialize(objects, stream=stream, fields=fields)
+
+    return dict(counts)
+
+
+def save_batch(model, deserialized) -> List:
+    """
+    Insert or overwrite a batch of deserialized objects of a model with one `bulk_create`, then their many-to-many
+    relations.
+
+    Returns:
+        List: The primary keys of the objects that already existed.
+    """
+
+    objects = [item.object for item in deserialized]
+    pks = [obj.pk for obj in objects]
+    existing = list(model.objects.filter(pk__in=pks).values_list("pk", flat=True))
+
+    # `bulk_create` stamps `auto_now` and `auto_now_add` fields with the current time, the dumped values are put back
+    stamped = [field for field in model._meta.concrete_fields if getattr(field, "auto_now", False)]
+    stamped += [field for field in model._meta.concrete_fields if getattr(field, "auto_now_add", False)]
+    dumped = [[getattr(obj, field.attname) for field in stamped] for obj in objects]
+
+    model.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=[model._meta.pk.name],
+        update_fields=[field.name for field in model._meta.concrete_fields if not field.primary_key],
+    )
+
+    if stamped:
+        for obj, values in zip(objects, dumped):
+            for field, value in zip(stamped, values):
+                setattr(obj, field.attname, value)
+        model.objects.bulk_update(objects, [field.name for field in stamped])
+
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        # Relations through a model of their own, like enrollments, are imported as that model
+        if not through._meta.auto_created or not any(field.name in item.m2m_data for item in deserialized):
+            continue
+
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        through.objects.filter(**{f"{source}__in": pks}).delete()
+        through.objects.bulk_create(
+            [
+                through(**{f"{source}_id": item.object.pk, f"{target}_id": related_pk})
+                for item in deserialized
+                for related_pk in item.m2m_data.get(field.name, [])
+            ]
+        )
+
+    return existing
+
+
+def import_content(stream: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE, regrade: bool = True) -> Dict[str, int]:
+    """
+    Import a JSONL dump written by `export_content`, in one transaction.
+
+    Args:
+        stream (Iterable[str]): The lines of the dump, such as an open text file.
+        batch_size (int): The number of objects inserted per `bulk_create`.
+        regrade (bool): Whether to regrade the submissions of the imported lessons afterwards.
+
+    Returns:
+        Dict[str, int]: The number of imported objects per model label, and the number of `regraded` submissions.
+    """
+
+    counts = Counter()
+    lesson_ids, existing_lesson_ids, models = set(), set(), set()
+    objects = serializers.deserialize("jsonl", stream, ignorenonexistent=True)
+
+    with transaction.atomic():
+        # Consecutive objects of the same model form a batch, the dump is ordered by model
+        for model, group in itertools.groupby(objects, key=lambda item: type(item.object)):
+            models.add(model)
+            while batch := list(itertools.islice(group, batch_size)):
+                existing = save_batch(model, batch)
+                counts[model._meta.label_lower] += len(batch)
+
+                if model is Lesson:
+                    lesson_ids.update(item.object.pk for item in batch)
+                    existing_lesson_ids.update(existing)
+                if model in search.DOCUMENT_FIELDS:
+                    search.update_index(item.object for item in batch)
+
+        # Primary keys were inserted explicitly, the sequences of PostgreSQL must move past them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+        Lesson.objects.filter(pk__in=existing_lesson_ids).update(version=F("version") + 1)
+
+        if regrade and lesson_ids:
+            counts["regraded"] = regrade_submissions(Submission.objects.filter(lesson_id__in=lesson_ids))
+
+    return dict(counts)
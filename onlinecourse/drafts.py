@@ -0,0 +1,286 @@
+"""
+This module contains the autosave of quizzes in progress.
+
+While a learner takes a quiz, the page sends small deltas holding the answers of the questions that changed. The
+deltas are merged into a draft kept in the cache, and the draft is only written to its `QuizDraft` row once enough
+deltas have accumulated or enough time has passed since the last write. Thousands of learners answering at the same
+time therefore cost a handful of row writes per learner instead of one per click. The submit view promotes the draft
+to the submission, so the final request does not need to carry the answers again.
+
+The batching needs a cache shared by every process, see `leaderboard.cache_is_shared`. With a cache private to each
+process, the deltas of a quiz may reach different processes, so every delta is merged straight into the draft row
+instead, and the submit view promotes the row.
+
+The draft row is created when the quiz page is opened and keeps the questions and order drawn for the attempt, so the
+attempt is graded on the quiz the learner saw even if the question pool changes before they submit.
+
+`Functions`:
+
+    apply_delta(user_id: int, lesson_id: int, attempt_no: int, delta: dict) -> dict:
+        Merges an answer delta into a draft, writing the draft row when a batch is complete.
+
+    load_draft(user_id: int, lesson_id: int, attempt_no: int) -> dict:
+        Returns the answers of a draft.
+
+    flush_draft(user_id: int, lesson_id: int, attempt_no: int):
+        Writes a draft to its row.
+
+    discard_draft(user_id: int, lesson_id: int, attempt_no: int):
+        Deletes a draft once its quiz is submitted.
+
+    clean_delta(payload: dict, delta: dict) -> dict:
+        Keeps the answers of a delta that belong to a lesson.
+
+    start_draw(user_id: int, lesson: Lesson, attempt_no: int) -> Tuple[QuizOrder, List[int] | None]:
+        Draws the questions and order of an attempt once and keeps them with its draft.
+
+    load_draw(user_id: int, lesson: Lesson, attempt_no: int) -> Tuple[QuizOrder, List[int] | None]:
+        Returns the questions and order kept for an attempt.
+"""
+
+import contextlib
+import time
+from typing import List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .leaderboard import cache_is_shared
+from .models import Lesson, QuizDraft
+from .pool import draw_attempt
+from .selection import pack_choice_ids, unpack_choice_ids
+from .shuffle import QuizOrder, pack_order, unpack_order
+
+# A cached draft is written to its row after this many deltas or this many seconds, whichever comes first
+FLUSH_EVERY_DELTAS = 20
+FLUSH_EVERY_SECONDS = 30
+
+# Drafts outlive the 15 minutes session, so a learner logging back in finds their answers
+DRAFT_CACHE_TIMEOUT = 24 * 60 * 60  # 1 day
+
+# Overlapping deltas of a draft are merged one at a time, the lock is released after `LOCK_TIMEOUT` seconds even if
+# its holder died, and waited for `LOCK_WAIT` seconds
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 1
+
+
+def _cache_key(user_id, lesson_id, attempt_no):
+    return f"quiz_draft:{user_id}:{lesson_id}:{attempt_no}"
+
+
+@contextlib.contextmanager
+def _locked(user_id, lesson_id, attempt_no):
+    key = _cache_key(user_id, lesson_id, attempt_no) + ":lock"
+    deadline = time.monotonic() + LOCK_WAIT
+
+    while not (acquired := cache.add(key, 1, timeout=LOCK_TIMEOUT)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def _load_state(user_id, lesson_id, attempt_no):
+    state = cache.get(_cache_key(user_id, lesson_id, attempt_no))
+    if state is not None:
+        return state
+
+    # Cache miss after an eviction or a restart, resume from the last written batch
+    draft = QuizDraft.objects.filter(learner_id=user_id, lesson_id=lesson_id, attempt_no=attempt_no).first()
+    return {"answers": draft.answers if draft else {}, "pending": 0, "flushed_at": time.time()}
+
+
+def _write(user_id, lesson_id, attempt_no, answers):
+    QuizDraft.objects.update_or_create(
+        learner_id=user_id, lesson_id=lesson_id, attempt_no=attempt_no, defaults={"answers": answers}
+    )
+
+
+def clean_delta(payload: dict, delta: dict) -> dict:
+    """
+    Keep the answers of a delta that belong to a lesson.
+
+    Args:
+        payload (dict): The quiz payload of the lesson, as returned by `api.get_quiz_payload`.
+        delta (dict): Selected choice IDs per question ID, as sent by the quiz page.
+
+    Returns:
+        dict: The selected choice IDs, as integers, per question ID, as a string, of the questions of the lesson.
+        Choices of other questions are dropped.
+    """
+
+    questions = payload["questions"]
+    choice_ids = payload["choices"]["ids"]
+    cleaned = {}
+
+    for index, question_id in enumerate(questions["ids"]):
+        if str(question_id) not in delta:
+            continue
+
+        allowed = set(choice_ids[questions["offsets"][index] : questions["offsets"][index + 1]])
+        selected = delta[str(question_id)] or []
+        cleaned[str(question_id)] = sorted(
+            {int(choice_id) for choice_id in selected if str(choice_id).isdigit() and int(choice_id) in allowed}
+        )
+
+    return cleaned
+
+
+def _apply_to_row(user_id, lesson_id, attempt_no, delta):
+    # The row lock orders the deltas of every process
+    with transaction.atomic():
+        draft, _ = QuizDraft.objects.select_for_update().get_or_create(
+            learner_id=user_id, lesson_id=lesson_id, attempt_no=attempt_no
+        )
+        draft.answers.update(delta)
+        draft.save(update_fields=["answers", "updated_at"])
+
+    return {"answers": draft.answers, "flushed": True}
+
+
+def apply_delta(user_id: int, lesson_id: int, attempt_no: int, delta: dict) -> dict:
+    """
+    Merge an answer delta into a draft.
+
+    Every question of the delta replaces the answers of that question, an empty list clears them. The draft row is
+    written once `FLUSH_EVERY_DELTAS` deltas are pending or `FLUSH_EVERY_SECONDS` passed since the last write, or
+    with every delta when the cache is private to each process.
+
+    Args:
+        user_id (int): The ID of the learner.
+        lesson_id (int): The ID of the lesson.
+        attempt_no (int): The number of the attempt in progress.
+        delta (dict): The cleaned delta, as returned by `clean_delta`.
+
+    Returns:
+        dict | None: The `answers` of the draft and whether it was `flushed` to its row, None when the draft stayed
+            locked by another delta and this one was not merged.
+    """
+
+    if not cache_is_shared():
+        return _apply_to_row(user_id, lesson_id, attempt_no, delta)
+
+    # Without the lock, two deltas reading the same state would each write it back without the other one
+    with _locked(user_id, lesson_id, attempt_no) as acquired:
+        if not acquired:
+            return None
+
+        state = _load_state(user_id, lesson_id, attempt_no)
+        state["answers"].update(delta)
+        state["pending"] += 1
+
+        flushed = state["pending"] >= FLUSH_EVERY_DELTAS or time.time() - state["flushed_at"] >= FLUSH_EVERY_SECONDS
+        if flushed:
+            _write(user_id, lesson_id, attempt_no, state["answers"])
+            state["pending"] = 0
+            state["flushed_at"] = time.time()
+
+        cache.set(_cache_key(user_id, lesson_id, attempt_no), state, timeout=DRAFT_CACHE_TIMEOUT)
+
+    return {"answers": state["answers"], "flushed": flushed}
+
+
+def load_draft(user_id: int, lesson_id: int, attempt_no: int) -> dict:
+    """
+    Return the answers of a draft, including the deltas not written to its row yet.
+
+    Returns:
+        dict: The selected choice IDs per question ID, as a string.
+    """
+
+    if not cache_is_shared():
+        draft = QuizDraft.objects.filter(learner_id=user_id, lesson_id=lesson_id, attempt_no=attempt_no).first()
+        return draft.answers if draft else {}
+
+    return _load_state(user_id, lesson_id, attempt_no)["answers"]
+
+
+def flush_draft(user_id: int, lesson_id: int, attempt_no: int):
+    """
+    Write a draft to its row, whatever the number of pending deltas. A no-op when the cache is private to each
+    process, every delta is in the row already.
+    """
+
+    if not cache_is_shared():
+        return
+
+    # When the lock stays busy, the delta holding it leaves its answers pending for the next batch
+    with _locked(user_id, lesson_id, attempt_no) as acquired:
+        state = cache.get(_cache_key(user_id, lesson_id, attempt_no))
+        if acquired and state is not None and state["pending"]:
+            _write(user_id, lesson_id, attempt_no, state["answers"])
+            state["pending"] = 0
+            state["flushed_at"] = time.time()
+            cache.set(_cache_key(user_id, lesson_id, attempt_no), state, timeout=DRAFT_CACHE_TIMEOUT)
+
+
+def discard_draft(user_id: int, lesson_id: int, attempt_no: int):
+    """
+    Delete a draft once its quiz is submitted.
+    """
+
+    cache.delete_many([_cache_key(user_id, lesson_id, attempt_no), _draw_cache_key(user_id, lesson_id, attempt_no)])
+    QuizDraft.objects.filter(learner_id=user_id, lesson_id=lesson_id, attempt_no=attempt_no).delete()
+
+
+def _draw_cache_key(user_id, lesson_id, attempt_no):
+    return f"quiz_draw:{user_id}:{lesson_id}:{attempt_no}"
+
+
+def _unpack_draw(draft):
+    question_ids = None if draft.question_ids is None else unpack_choice_ids(draft.question_ids)
+    return unpack_order(draft.shuffle_order), question_ids
+
+
+def start_draw(user_id: int, lesson: Lesson, attempt_no: int) -> Tuple[QuizOrder, Optional[List[int]]]:
+    """
+    Draw the questions and order of an attempt and keep them with its draft row, unless a draw is kept already.
+
+    Args:
+        user_id (int): The ID of the learner.
+        lesson (Lesson): The lesson.
+        attempt_no (int): The number of the attempt being started.
+
+    Returns:
+        Tuple[QuizOrder, List[int] | None]: The draw, as returned by `draw_attempt`.
+    """
+
+    draft, _ = QuizDraft.objects.get_or_create(learner_id=user_id, lesson_id=lesson.id, attempt_no=attempt_no)
+
+    if draft.shuffle_order is None:
+        draw = draw_attempt(lesson, user_id, attempt_no)
+        draft.shuffle_order = pack_order(draw[0])
+        draft.question_ids = None if draw[1] is None else pack_choice_ids(draw[1])
+        draft.save(update_fields=["shuffle_order", "question_ids"])
+    else:
+        draw = _unpack_draw(draft)
+
+    cache.set(_draw_cache_key(user_id, lesson.id, attempt_no), draw, timeout=DRAFT_CACHE_TIMEOUT)
+    return draw
+
+
+def load_draw(user_id: int, lesson: Lesson, attempt_no: int) -> Tuple[QuizOrder, Optional[List[int]]]:
+    """
+    Return the questions and order kept for an attempt by `start_draw`.
+
+    Attempts started before draws were kept get theirs drawn again, which gives the same quiz while the pool does not
+    change.
+
+    Returns:
+        Tuple[QuizOrder, List[int] | None]: The draw, as returned by `draw_attempt`.
+    """
+
+    draw = cache.get(_draw_cache_key(user_id, lesson.id, attempt_no))
+    if draw is not None:
+        return draw
+
+    draft = QuizDraft.objects.filter(learner_id=user_id, lesson_id=lesson.id, attempt_no=attempt_no).first()
+    if draft is None or draft.shuffle_order is None:
+        return draw_attempt(lesson, user_id, attempt_no)
+
+    draw = _unpack_draw(draft)
+    cache.set(_draw_cache_key(user_id, lesson.id, attempt_no), draw, timeout=DRAFT_CACHE_TIMEOUT)
+    return draw
@@ -0,0 +1,203 @@
+"""
+This module contains the streaming export of submissions and grades.
+
+Submissions are read with `iterator()` in chunks, each chunk prefetching its selected choices, and turned into records
+and then into CSV or JSONL lines by generators, optionally gzip-compressed on the fly. Only one chunk is held in memory
+at a time, so exporting a course costs the same memory whatever the size of the submission table.
+
+`Functions`:
+
+    iter_submission_records(submissions: QuerySet, chunk_size: int) -> Iterator[dict]:
+        Yields one record per submission, with its per-question grades and selected choice ids.
+
+    stream_submissions(submissions: QuerySet, export_format: str, compress: bool) -> Iterator[bytes]:
+        Yields the encoded export of the submissions.
+
+    streaming_export_response(submissions: QuerySet, export_format: str, compress: bool) -> StreamingHttpResponse:
+        Returns a response streaming the export as an attachment.
+"""
+
+import csv
+import json
+import zlib
+from typing import Iterable, Iterator
+
+from django.db.models import Prefetch, QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .grading import answer_key_for_lesson, grade_selection, sampled_answer_key
+from .models import Choice
+
+CSV = "csv"
+JSONL = "jsonl"
+EXPORT_FORMATS = [CSV, JSONL]
+
+EXPORT_FIELDS = [
+    "submission_id",
+    "learner_id",
+    "learner_email",
+    "lesson_id",
+    "lesson_title",
+    "attempt_no",
+    "grade",
+    "submission_date",
+    "question_grades",
+    "selected_choice_ids",
+]
+
+CONTENT_TYPES = {CSV: "text/csv", JSONL: "application/x-ndjson"}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_submission_records(submissions: QuerySet, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Yield one record per submission.
+
+    Args:
+        submissions (QuerySet): The submissions to export.
+        chunk_size (int): The number of submissions fetched, and whose choices are prefetched, per query.
+
+    Yields:
+        dict: A record with the `EXPORT_FIELDS` keys. `question_grades` maps question IDs to the point earned, as
+        computed by `calculate_grade`.
+    """
+
+    submissions = (
+        submissions.select_related("attempt__learner", "lesson")
+        .only(
+            "id",
+            "grade",
+            "packed_choices",
+            "submission_date",
+            "lesson__id",
+            "lesson__title",
+            "attempt__attempt_no",
+            "attempt__question_ids",
+            "attempt__learner__id",
+            "attempt__learner__email",
+        )
+        # Submissions stored before their choices were packed read them from the prefetched selection table
+        .prefetch_related(Prefetch("choices", queryset=Choice.objects.only("id")))
+        .order_by("id")
+    )
+
+    # Answer keys are loaded once per lesson, lessons are few compared to submissions
+    answer_keys = {}
+
+    for submission in submissions.iterator(chunk_size=chunk_size):
+        lesson = submission.lesson
+        if lesson.id not in answer_keys:
+            answer_keys[lesson.id] = answer_key_for_lesson(lesson.id)
+
+        selected_ids = submission.selected_choice_ids()
+        answer_key = sampled_answer_key(answer_keys[lesson.id], submission.attempt.sampled_question_ids())
+        _, grade_per_question = grade_selection(answer_key, selected_ids)
+        learner = submission.attempt.learner
+
+        yield {
+            "submission_id": submission.id,
+            "learner_id": learner.id,
+            "learner_email": learner.email,
+            "lesson_id": lesson.id,
+            "lesson_title": lesson.title,
+            "attempt_no": submission.attempt.attempt_no,
+            "grade": submission.grade,
+            "submission_date": submission.submission_date.isoformat(),
+            "question_grades": grade_per_question,
+            "selected_choice_ids": selected_ids,
+        }
+
+
+class EchoBuffer:
+    """
+    A file-like object returning what is written to it, so that `csv.writer` can be used in a generator.
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_csv(records: Iterable[dict]) -> Iterator[str]:
+    """
+    Render records as CSV lines. Per-question grades are written as `question_id:point` pairs and selected choice
+    IDs as a list, both separated by semicolons.
+    """
+
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(EXPORT_FIELDS)
+
+    for record in records:
+        record = {
+            **record,
+            "question_grades": ";".join(f"{key}:{value}" for key, value in record["question_grades"].items()),
+            "selected_choice_ids": ";".join(str(choice_id) for choice_id in record["selected_choice_ids"]),
+        }
+        yield writer.writerow([record[field] for field in EXPORT_FIELDS])
+
+
+def render_jsonl(records: Iterable[dict]) -> Iterator[str]:
+    """
+    Render records as JSON lines.
+    """
+
+    for record in records:
+        yield json.dumps(record) + "\n"
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Gzip-compress a stream of bytes on the fly.
+    """
+
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def stream_submissions(
+    submissions: QuerySet, export_format: str = CSV, compress: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Yield the encoded export of the submissions.
+
+    Args:
+        submissions (QuerySet): The submissions to export.
+        export_format (str): "csv" or "jsonl".
+        compress (bool): Whether to gzip the output.
+        chunk_size (int): The number of submissions read per query.
+
+    Yields:
+        bytes: Consecutive pieces of the export.
+    """
+
+    render = render_csv if export_format == CSV else render_jsonl
+    lines = render(iter_submission_records(submissions, chunk_size=chunk_size))
+    encoded = (line.encode() for line in lines)
+
+    return gzip_stream(encoded) if compress else encoded
+
+
+def streaming_export_response(
+    submissions: QuerySet, export_format: str = CSV, compress: bool = False
+) -> StreamingHttpResponse:
+    """
+    Return a response streaming the export of the submissions as an attachment.
+    """
+
+    filename = f"submissions-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"
+    if compress:
+        filename += ".gz"
+
+    response = StreamingHttpResponse(
+        stream_submissions(submissions, export_format=export_format, compress=compress),
+        content_type="application/gzip" if compress else CONTENT_TYPES[export_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,239 @@
+"""
+This module contains bulk grading helpers for the online course application.
+
+`calculate_grade` grades one submission at a time by filtering querysets per question, which costs several queries
+for every question of every submission. The helpers below apply exactly the same partial-credit rules to an in-memory
+answer key and a set of selected choice ids, so that many submissions of a lesson can be graded after loading the
+answer key once.
+
+The module only depends on the models, so signals and management commands can grade without importing the views.
+
+`Functions`:
+
+    calculate_grade(questions: QuerySet, choices: QuerySet) -> Tuple[float, Dict[int, float]]:
+        Grades one submission from its querysets.
+
+    answer_key_for_lesson(lesson_id: int) -> Dict[int, dict]:
+        Loads the answer key of a lesson with two queries.
+
+    sampled_answer_key(answer_key: Dict[int, dict], question_ids: List[int] | None) -> Dict[int, dict]:
+        Restricts an answer key to the questions sampled for an attempt.
+
+    grade_selection(answer_key: Dict[int, dict], selected_ids: Iterable[int]) -> Tuple[float, Dict[int, float]]:
+        Grades a set of selected choice ids against an answer key, mirroring `calculate_grade`.
+
+    selected_choice_pairs(submissions: QuerySet) -> Iterator[Tuple[int, int]]:
+        Yields the (submission ID, choice ID) pairs of the selected choices of many submissions with one query.
+"""
+
+import heapq
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db.models import QuerySet
+
+from .models import Choice, Question, Submission
+from .selection import unpack_choice_ids
+
+# Score given to a multiple-answer question when nothing is selected, as in `calculate_grade`
+SCORE_IF_EMPTY = 50
+
+
+def answer_key_for_lesson(lesson_id: int) -> Dict[int, dict]:
+    """
+    Load the answer key of a lesson.
+
+    Args:
+        lesson_id (int): The ID of the lesson.
+
+    Returns:
+        Dict[int, dict]: A mapping of question ID to a dictionary holding the question `grade`, whether it expects
+        `multiple` answers, the set of all its `choices` and the set of its `correct` choice IDs. Questions are kept
+        in ID order, which is the order `calculate_grade` iterates them in.
+    """
+
+    answer_key = {}
+    questions = Question.objects.filter(lesson_id=lesson_id).order_by("id")
+
+    for question_id, grade, multiple in questions.values_list("id", "grade", "expect_multiple_answer"):
+        answer_key[question_id] = {"grade": grade, "multiple": multiple, "choices": set(), "correct": set()}
+
+    choices = Choice.objects.filter(question__lesson_id=lesson_id)
+
+    for choice_id, question_id, is_correct in choices.values_list("id", "question_id", "is_correct"):
+        answer_key[question_id]["choices"].add(choice_id)
+        if is_correct:
+            answer_key[question_id]["correct"].add(choice_id)
+
+    return answer_key
+
+
+def sampled_answer_key(answer_key: Dict[int, dict], question_ids: Optional[List[int]]) -> Dict[int, dict]:
+    """
+    Restrict an answer key to the questions sampled for an attempt, see `Attempt.question_ids`. None stands for every
+    question of the lesson.
+    """
+
+    if question_ids is None:
+        return answer_key
+
+    question_ids = set(question_ids)
+    return {question_id: key for question_id, key in answer_key.items() if question_id in question_ids}
+
+
+def _question_point(grade):
+    return int(grade / 100) if grade in [0, 100] else grade / 100
+
+
+def grade_selection(answer_key: Dict[int, dict], selected_ids: Iterable[int]) -> Tuple[float, Dict[int, float]]:
+    """
+    Grade the selected choices of a submission against an answer key.
+
+    Args:
+        answer_key (Dict[int, dict]): The answer key as returned by `answer_key_for_lesson`.
+        selected_ids (Iterable[int]): IDs of the selected choices. IDs that do not belong to the answer key are ignored.
+
+    Returns:
+        Tuple[float, Dict[int, float]]: The quiz grade and the point earned per question ID, identical to the values
+        returned by `calculate_grade` for the same questions and choices.
+    """
+
+    selected_ids = set(selected_ids)
+    total_grade = 0
+    grade_per_question = {}
+
+    selected_per_question = {
+        question_id: key["choices"] & selected_ids for question_id, key in answer_key.items()
+    }
+
+    if not any(selected_per_question.values()):
+        for question_id, key in answer_key.items():
+            grade = SCORE_IF_EMPTY if key["multiple"] else 0
+            grade_per_question[question_id] = _question_point(grade)
+            total_grade += grade
+        return total_grade / max(len(answer_key), 1), grade_per_question
+
+    for question_id, key in answer_key.items():
+        grade = key["grade"]
+
+        selected_choices = selected_per_question[question_id]
+        correct_choices = key["correct"]
+        user_correct_choices = selected_choices & correct_choices
+
+        if key["multiple"]:
+            point_per_choice = grade / max(len(key["choices"]), 1)
+            incorrect_choices = len(selected_choices) - len(user_correct_choices)
+
+            if not selected_choices:
+                grade = SCORE_IF_EMPTY
+            elif len(selected_choices) == len(correct_choices):
+                grade = (
+                    grade
+                    if selected_choices == correct_choices
+                    else grade - incorrect_choices * point_per_choice
+                )
+            elif len(selected_choices) < len(correct_choices):
+                grade = SCORE_IF_EMPTY + len(user_correct_choices) * point_per_choice
+            else:
+                grade = (
+                    SCORE_IF_EMPTY
+                    + len(user_correct_choices) * point_per_choice
+                    - incorrect_choices * point_per_choice
+                )
+        else:
+            grade = grade if correct_choices == selected_choices else 0
+
+        grade_per_question[question_id] = _question_point(grade)
+        total_grade += grade
+
+    return total_grade / max(len(answer_key), 1), grade_per_question
+
+
+def selected_choice_pairs(submissions: QuerySet) -> Iterator[Tuple[int, int]]:
+    """
+    Yield the selected choices of many submissions, reading the packed choices and the selection table once each
+    instead of once per submission.
+
+    Args:
+        submissions (QuerySet): The submissions whose selections are loaded.
+
+    Yields:
+        Tuple[int, int]: (submission ID, choice ID) pairs, ordered by submission ID.
+    """
+
+    packed = Submission.objects.filter(id__in=submissions.values("id"), packed_choices__isnull=False).order_by("id")
+    packed_pairs = (
+        (submission_id, choice_id)
+        for submission_id, data in packed.values_list("id", "packed_choices").iterator(chunk_size=5000)
+        for choice_id in unpack_choice_ids(data)
+    )
+
+    # Submissions stored before their choices were packed, or with `SUBMISSION_STORAGE` set to "m2m"
+    through = Submission.choices.through
+    pairs = through.objects.filter(submission__in=submissions.values("id")).order_by("submission_id", "choice_id")
+    table_pairs = pairs.values_list("submission_id", "choice_id").iterator(chunk_size=5000)
+
+    yield from heapq.merge(packed_pairs, table_pairs)
+
+
+def calculate_grade(questions, choices):
+    """
+    Grade one submission from its querysets.
+
+    Args:
+        questions (QuerySet): The questions of the lesson.
+        choices (QuerySet): The choices selected in the submission.
+
+    Returns:
+        Tuple[float, Dict[int, float]]: The grade of the submission, out of 100, and the points per question ID.
+    """
+
+    total_grade = 0
+    grade_per_question = {}
+
+    all_empty = all(not choices.filter(question=question).exists() for question in questions)
+
+    if all_empty:
+        for question in questions:
+            if question.expect_multiple_answer:
+                grade = 50
+            else:
+                grade = 0
+            grade_per_question[question.id] = int(grade / 100) if grade in [0, 100] else grade / 100
+            total_grade += grade
+        quiz_grade = total_grade / max(questions.count(), 1)
+        return quiz_grade, grade_per_question
+
+    for question in questions:
+        grade = question.grade
+
+        selected_choices = choices.filter(question=question)
+        correct_choices = question.choices.filter(is_correct=True)
+        user_correct_choices = selected_choices.filter(is_correct=True)
+
+        if question.expect_multiple_answer:
+            score_if_empty = 50
+            point_per_choice = grade / max(question.choices.count(), 1)
+            incorrect_choices = abs(len(selected_choices) - len(user_correct_choices))
+
+            if not selected_choices:
+                grade = score_if_empty
+            elif len(selected_choices) == len(correct_choices):
+                grade = (
+                    grade
+                    if set(selected_choices) == set(correct_choices)
+                    else grade - incorrect_choices * point_per_choice
+                )
+            elif len(selected_choices) < len(correct_choices):
+                grade = score_if_empty + len(user_correct_choices) * point_per_choice
+            else:
+                grade = (
+                    score_if_empty + len(user_correct_choices) * point_per_choice - incorrect_choices * point_per_choice
+                )
+        else:
+            grade = grade if set(correct_choices) == set(selected_choices) else 0
+
+        grade_per_question[question.id] = int(grade / 100) if grade in [0, 100] else grade / 100
+        total_grade += grade
+
+    quiz_grade = total_grade / max(questions.count(), 1)
+    return quiz_grade, grade_per_question
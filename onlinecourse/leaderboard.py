@@ -0,0 +1,440 @@
+"""
+This module contains the live leaderboards of the lessons, the best grade of every learner on a lesson ranked.
+
+The entry of a learner is their best grade, from the earliest submission that reached it, and entries with the same
+grade rank by that submission, earliest first. Every process keeps the leaderboards it serves in a `SortedKeyList`, so
+the rank of a learner and the top entries are read in O(log n), and a submission improving a best grade moves one entry
+in O(log n), instead of aggregating every submission of the lesson per request.
+
+The shared cache mirrors every leaderboard for the other processes, as:
+
+    leaderboard:<lesson ID>:state      (incarnation, number of the last change)
+    leaderboard:<lesson ID>:snapshot   (incarnation, number of the last change, entries), every `SNAPSHOT_EVERY` changes
+    leaderboard:<lesson ID>:log        (incarnation, the last `LOG_SIZE` changes as (number, entry) pairs)
+
+A process whose copy is behind replays the changes it missed from the log, and only loads the snapshot when it is
+further behind, so a busy lesson does not cost every process a full load and sort per submission. A leaderboard
+missing from the cache, after a restart, an eviction or an invalidation, is rebuilt from the submissions on the primary
+with a new incarnation, which tells every process to drop its copy. Changes and rebuilds are written under a lock held
+in the cache, so a rebuild never writes over a change recorded meanwhile. A process keeps the copies of the
+`MAX_LEADERBOARDS` lessons it read last, and its threads only wait for each other on the same lesson.
+Regrades, archives and restores change grades in bulk and invalidate the leaderboards of their lessons. With a cache
+private to every process, such as the default local memory cache, the invalidations of the task worker never reach the
+web processes, whose copies may then miss a regrade until they expire, see `cache_is_shared`.
+
+`Classes`:
+
+    LeaderboardEntry:
+        The best grade of a learner on a lesson.
+
+    Leaderboard:
+        The entries of a lesson, best first.
+
+    Standings:
+        The top of a leaderboard and the entry and rank of a learner.
+
+`Functions`:
+
+    build_leaderboard(lesson_id: int) -> Leaderboard:
+        Builds the leaderboard of a lesson from its submissions.
+
+    record_submission(submission: Submission):
+        Updates the leaderboard of a lesson with a graded submission.
+
+    invalidate_leaderboard(*lesson_ids: int):
+        Drops the leaderboards of lessons whose grades changed in bulk.
+
+    get_standings(lesson_id: int, learner_id: int | None, k: int) -> Standings:
+        Returns the top `k` entries of a lesson and the entry and rank of a learner.
+
+    cache_is_shared() -> bool:
+        Tells whether the processes share the cache the leaderboards are mirrored and invalidated in.
+"""
+
+import contextlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from sortedcontainers import SortedKeyList
+
+from .models import Submission
+
+LEADERBOARD_CACHE_TIMEOUT = 24 * 60 * 60  # 1 day
+
+# A snapshot is written every `SNAPSHOT_EVERY` changes and the log keeps more, so a snapshot and the log always hold
+# every change
+SNAPSHOT_EVERY = 50
+LOG_SIZE = 100
+
+# The lock is released after `LOCK_TIMEOUT` seconds even if its holder died, and waited for `LOCK_WAIT` seconds
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 1
+
+# The copies a process keeps, the least recently read are dropped first
+MAX_LEADERBOARDS = 500
+
+# The threads of a process sync a lesson under the lock of its stripe, a rebuild does not hold up the other stripes
+LOCK_STRIPES = 64
+
+DEFAULT_TOP = 10
+
+# The cache backends every process has its own copy of
+PRIVATE_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+class LeaderboardEntry(NamedTuple):
+    """
+    The best grade of a learner on a lesson.
+
+    Attributes:
+        learner_id (int): The learner.
+        grade (int): Their best grade.
+        submitted_at (float): The POSIX timestamp of the earliest submission with that grade.
+        submission_id (int): That submission.
+    """
+
+    learner_id: int
+    grade: int
+    submitted_at: float
+    submission_id: int
+
+
+def entry_order(entry: LeaderboardEntry) -> tuple:
+    return -entry.grade, entry.submitted_at, entry.submission_id
+
+
+class Leaderboard:
+    """
+    The entries of a lesson, best first, at most one per learner.
+
+    Attributes:
+        entries (SortedKeyList): The entries in rank order.
+        incarnation (str): The build the leaderboard comes from, a new one after every rebuild.
+        change (int): The number of the last change applied since the build.
+        snapshot_change (int): The number of the last change in the latest snapshot written to the cache.
+    """
+
+    def __init__(self, entries: Iterable[LeaderboardEntry] = (), incarnation: str = "", change=0, snapshot_change=0):
+        self.entries = SortedKeyList(entries, key=entry_order)
+        self.by_learner: Dict[int, LeaderboardEntry] = {entry.learner_id: entry for entry in self.entries}
+        self.incarnation = incarnation
+        self.change = change
+        self.snapshot_change = snapshot_change
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, learner_id: int) -> Optional[LeaderboardEntry]:
+        return self.by_learner.get(learner_id)
+
+    def replace(self, entry: LeaderboardEntry):
+        """
+        Make an entry the one of its learner, whether it ranks better or not.
+        """
+
+        current = self.by_learner.get(entry.learner_id)
+        if current is not None:
+            self.entries.remove(current)
+        self.entries.add(entry)
+        self.by_learner[entry.learner_id] = entry
+
+    def offer(self, entry: LeaderboardEntry) -> bool:
+        """
+        Make an entry the one of its learner if it ranks better than their current one.
+
+        Returns:
+            bool: Whether the entry replaced the current one.
+        """
+
+        current = self.by_learner.get(entry.learner_id)
+        if current is not None and entry_order(current) <= entry_order(entry):
+            return False
+
+        self.replace(entry)
+        return True
+
+    def rank(self, learner_id: int) -> Optional[int]:
+        """
+        Return the rank of a learner from 1, None when they have no graded submission.
+        """
+
+        entry = self.by_learner.get(learner_id)
+        return None if entry is None else self.entries.index(entry) + 1
+
+    def top(self, k: int) -> List[LeaderboardEntry]:
+        return list(self.entries.islice(0, k))
+
+
+class Standings(NamedTuple):
+    """
+    The top of a leaderboard and the entry and rank of a learner.
+
+    Attributes:
+        top (List[LeaderboardEntry]): The best entries, best first.
+        entry (LeaderboardEntry | None): The entry of the learner, None when they have no graded submission.
+        rank (int | None): The rank of the learner from 1.
+        size (int): The number of entries.
+    """
+
+    top: List[LeaderboardEntry]
+    entry: Optional[LeaderboardEntry]
+    rank: Optional[int]
+    size: int
+
+
+# The copies of this process, the last read last, guarded by a lock for the threads of the task worker
+_leaderboards: OrderedDict[int, Leaderboard] = OrderedDict()
+_leaderboards_lock = threading.Lock()
+
+_lesson_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+def _lesson_lock(lesson_id):
+    return _lesson_locks[lesson_id % LOCK_STRIPES]
+
+
+def _get_copy(lesson_id):
+    with _leaderboards_lock:
+        leaderboard = _leaderboards.get(lesson_id)
+        if leaderboard is not None:
+            _leaderboards.move_to_end(lesson_id)
+        return leaderboard
+
+
+def _keep_copy(lesson_id, leaderboard):
+    with _leaderboards_lock:
+        _leaderboards[lesson_id] = leaderboard
+        _leaderboards.move_to_end(lesson_id)
+        while len(_leaderboards) > MAX_LEADERBOARDS:
+            _leaderboards.popitem(last=False)
+
+
+def _cache_key(lesson_id, part):
+    return f"leaderboard:{lesson_id}:{part}"
+
+
+def build_leaderboard(lesson_id: int) -> Leaderboard:
+    """
+    Build the leaderboard of a lesson from its graded submissions, with a new incarnation.
+
+    The submissions are read from the primary, a lagging replica would leave the latest ones out of the copy every
+    process shares.
+    """
+
+    submissions = Submission.objects.using(router.db_for_write(Submission))
+    rows = (
+        submissions.filter(lesson_id=lesson_id, grade__isnull=False)
+        .order_by("attempt__learner_id", "-grade", "submission_date", "id")
+        .values_list("attempt__learner_id", "grade", "submission_date", "id")
+    )
+
+    # The first row of every learner is their entry
+    entries = {}
+    for learner_id, grade, submission_date, submission_id in rows.iterator(chunk_size=5000):
+        if learner_id not in entries:
+            entries[learner_id] = LeaderboardEntry(learner_id, grade, submission_date.timestamp(), submission_id)
+
+    return Leaderboard(entries.values(), incarnation=secrets.token_hex(8))
+
+
+def _publish(lesson_id, leaderboard):
+    # The state goes last, a process reading it finds the snapshot and the log it refers to
+    timeout = LEADERBOARD_CACHE_TIMEOUT
+    rows = [tuple(entry) for entry in leaderboard.entries]
+    cache.set(_cache_key(lesson_id, "snapshot"), (leaderboard.incarnation, leaderboard.change, rows), timeout)
+    cache.set(_cache_key(lesson_id, "log"), (leaderboard.incarnation, []), timeout)
+    cache.set(_cache_key(lesson_id, "state"), (leaderboard.incarnation, leaderboard.change), timeout)
+    leaderboard.snapshot_change = leaderboard.change
+
+
+def _rebuild(lesson_id, locked):
+    """
+    Rebuild the leaderboard of a lesson and publish it under the lock. Submissions are recorded once committed, under
+    the lock, so a rebuild holding it reads every submission recorded before and none recorded after is written over.
+    """
+
+    if locked:
+        leaderboard = build_leaderboard(lesson_id)
+        _publish(lesson_id, leaderboard)
+        return leaderboard
+
+    with _locked(lesson_id) as acquired:
+        leaderboard = build_leaderboard(lesson_id)
+        # Without the lock the copy only serves this process, until the holder of the lock publishes
+        if acquired:
+            _publish(lesson_id, leaderboard)
+        return leaderboard
+
+
+def _load_changes(lesson_id, incarnation):
+    log = cache.get(_cache_key(lesson_id, "log"))
+    return log[1] if log is not None and log[0] == incarnation else None
+
+
+def _catch_up(lesson_id, leaderboard, incarnation, change, locked):
+    changes = _load_changes(lesson_id, incarnation)
+    if changes is None:
+        return _rebuild(lesson_id, locked)
+
+    replayable = (
+        leaderboard is not None
+        and leaderboard.incarnation == incarnation
+        and leaderboard.change <= change
+        and bool(changes)
+        and changes[0][0] <= leaderboard.change + 1
+    )
+    if not replayable:
+        snapshot = cache.get(_cache_key(lesson_id, "snapshot"))
+        if snapshot is None or snapshot[0] != incarnation:
+            return _rebuild(lesson_id, locked)
+        _, snapshot_change, rows = snapshot
+        leaderboard = Leaderboard(
+            [LeaderboardEntry(*row) for row in rows], incarnation, snapshot_change, snapshot_change=snapshot_change
+        )
+
+    for number, row in changes:
+        if number > leaderboard.change + 1:
+            break
+        if number == leaderboard.change + 1:
+            leaderboard.replace(LeaderboardEntry(*row))
+            leaderboard.change = number
+
+    # A log evicted or written over in between misses changes, the submissions hold them all
+    if leaderboard.change != change:
+        return _rebuild(lesson_id, locked)
+
+    return leaderboard
+
+
+def _sync(lesson_id, locked=False):
+    """
+    Bring the copy of a lesson of this process up to date with the cache, building it when the cache has none.
+    The caller holds the thread lock of the lesson, `locked` tells whether it holds its cache lock as well.
+    """
+
+    leaderboard = _get_copy(lesson_id)
+    state = cache.get(_cache_key(lesson_id, "state"))
+
+    if state is None:
+        leaderboard = _rebuild(lesson_id, locked)
+    elif leaderboard is None or (leaderboard.incarnation, leaderboard.change) != state:
+        leaderboard = _catch_up(lesson_id, leaderboard, *state, locked)
+
+    _keep_copy(lesson_id, leaderboard)
+    return leaderboard
+
+
+@contextlib.contextmanager
+def _locked(lesson_id):
+    key = _cache_key(lesson_id, "lock")
+    deadline = time.monotonic() + LOCK_WAIT
+
+    while not (acquired := cache.add(key, 1, timeout=LOCK_TIMEOUT)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def record_submission(submission: Submission):
+    """
+    Update the leaderboard of a lesson with a graded submission, and write the change to the cache when it improves
+    the best grade of its learner.
+
+    When the lock cannot be taken in time, or the grade of the submission holding an entry went down, the leaderboard
+    is invalidated instead, and rebuilt from the submissions when it is next read.
+
+    Args:
+        submission (Submission): The graded submission, with its attempt.
+    """
+
+    if submission.grade is None:
+        return
+
+    # The grade is a float until the submission is read back, the column stores it truncated
+    grade = int(submission.grade)
+    submitted_at = submission.submission_date.timestamp()
+    lesson_id = submission.lesson_id
+    entry = LeaderboardEntry(submission.attempt.learner_id, grade, submitted_at, submission.id)
+
+    # The threads of this process take the thread lock first, as readers do
+    with _lesson_lock(lesson_id), _locked(lesson_id) as acquired:
+        if not acquired:
+            invalidate_leaderboard(lesson_id)
+            return
+
+        leaderboard = _sync(lesson_id, locked=True)
+        current = leaderboard.get(entry.learner_id)
+        if current is not None and current.submission_id == entry.submission_id and current.grade > entry.grade:
+            # Another submission of the learner may now be their best
+            invalidate_leaderboard(lesson_id)
+            return
+
+        if not leaderboard.offer(entry):
+            return
+
+        leaderboard.change += 1
+        changes = _load_changes(lesson_id, leaderboard.incarnation) or []
+        changes = (changes + [(leaderboard.change, tuple(entry))])[-LOG_SIZE:]
+        cache.set(_cache_key(lesson_id, "log"), (leaderboard.incarnation, changes), LEADERBOARD_CACHE_TIMEOUT)
+
+        if leaderboard.change - leaderboard.snapshot_change >= SNAPSHOT_EVERY:
+            rows = [tuple(entry) for entry in leaderboard.entries]
+            snapshot = (leaderboard.incarnation, leaderboard.change, rows)
+            cache.set(_cache_key(lesson_id, "snapshot"), snapshot, LEADERBOARD_CACHE_TIMEOUT)
+            leaderboard.snapshot_change = leaderboard.change
+
+        state = (leaderboard.incarnation, leaderboard.change)
+        cache.set(_cache_key(lesson_id, "state"), state, LEADERBOARD_CACHE_TIMEOUT)
+
+
+def invalidate_leaderboard(*lesson_ids: int):
+    """
+    Drop the leaderboards of lessons whose grades changed other than by a new submission. Every process rebuilds them
+    from the submissions when they are next read.
+    """
+
+    cache.delete_many(
+        [_cache_key(lesson_id, part) for lesson_id in set(lesson_ids) for part in ("state", "snapshot", "log")]
+    )
+
+
+def get_standings(lesson_id: int, learner_id: Optional[int] = None, k: int = DEFAULT_TOP) -> Standings:
+    """
+    Return the top entries of the leaderboard of a lesson, and the entry and rank of a learner, in O(log n + k) once
+    the copy of this process is up to date.
+
+    Args:
+        lesson_id (int): The lesson.
+        learner_id (int, optional): The learner whose entry and rank are returned.
+        k (int): The number of top entries.
+
+    Returns:
+        Standings: The standings.
+    """
+
+    with _lesson_lock(lesson_id):
+        leaderboard = _sync(lesson_id)
+        entry = leaderboard.get(learner_id) if learner_id is not None else None
+        return Standings(leaderboard.top(k), entry, leaderboard.rank(learner_id), len(leaderboard))
+
+
+def cache_is_shared() -> bool:
+    """
+    Tell whether the processes share the default cache, so the changes and invalidations written by one of them, the
+    task worker included, reach the others.
+    """
+
+    return settings.CACHES["default"]["BACKEND"] not in PRIVATE_CACHE_BACKENDS
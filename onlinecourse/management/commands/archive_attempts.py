@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from onlinecourse.archive import DEFAULT_CHUNK_SIZE, archive_attempts, default_archive_path, plan_archive
+
+
+class Command(BaseCommand):
+    help = "Move old attempts and their submissions into a gzip-compressed JSONL archive file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, help="Only archive attempts submitted over this many days ago")
+        parser.add_argument("--keep-last", type=int, default=1, help="Attempts kept per learner and lesson")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Attempts per transaction")
+        parser.add_argument("--output", help="Archive file (default: a new file in ARCHIVE_DIRECTORY)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the attempts that would be archived")
+
+    def handle(self, *args, **options):
+        if options["keep_last"] < 1:
+            raise CommandError("--keep-last must be at least 1.")
+
+        older_than = None
+        if options["older_than"] is not None:
+            older_than = timezone.now() - timedelta(days=options["older_than"])
+
+        if options["dry_run"]:
+            plan = plan_archive(older_than=older_than, keep_last=options["keep_last"])
+            self.stdout.write(
+                f"{len(plan.attempt_ids)} attempt(s) of {len(plan.totals)} learner and lesson pair(s) to archive."
+            )
+            return
+
+        stats = archive_attempts(
+            options["output"] or default_archive_path(),
+            older_than=older_than,
+            keep_last=options["keep_last"],
+            chunk_size=options["chunk_size"],
+        )
+        if not stats["attempts"]:
+            self.stdout.write("No attempts to archive.")
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {stats['attempts']} attempt(s) and {stats['submissions']} submission(s) to {stats['path']}."
+            )
+        )
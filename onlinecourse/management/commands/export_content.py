@@ -0,0 +1,44 @@
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myproject.db_routers import replica_reads
+from onlinecourse.content import DEFAULT_CHUNK_SIZE, export_content
+from onlinecourse.models import Course
+
+
+class Command(BaseCommand):
+    help = "Stream courses with their lessons, questions and choices, optionally their learners' work, as JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", action="append", help="Only export the course with this slug, repeatable")
+        parser.add_argument("--learners", action="store_true", help="Include enrollments, attempts and submissions")
+        parser.add_argument("--output", help="Write to this file instead of stdout, gzip-compressed if it ends in .gz")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read per query")
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options["course"]:
+            courses = courses.filter(slug_name__in=options["course"])
+            missing = set(options["course"]) - set(courses.values_list("slug_name", flat=True))
+            if missing:
+                raise CommandError(f"Unknown course(s): {', '.join(sorted(missing))}.")
+
+        start = time.perf_counter()
+        # The export reads whole tables, which the replica serves when there is one
+        with replica_reads():
+            if options["output"]:
+                opener = gzip.open if options["output"].endswith(".gz") else open
+                with opener(options["output"], "wt", encoding="utf-8") as file:
+                    counts = export_content(file, courses, options["learners"], options["chunk_size"])
+            else:
+                counts = export_content(sys.stdout, courses, options["learners"], options["chunk_size"])
+                sys.stdout.flush()
+
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        self.stderr.write(
+            self.style.SUCCESS(f"Exported {total} objects in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f}/s).")
+        )
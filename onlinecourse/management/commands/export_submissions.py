@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from myproject.db_routers import replica_reads
+from onlinecourse.exports import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, stream_submissions
+from onlinecourse.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Stream submissions with their grades, per-question grades and selected choices as CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv", help="Output format (default: csv)")
+        parser.add_argument("--gzip", action="store_true", help="Gzip-compress the output")
+        parser.add_argument("--output", help="Write to this file instead of stdout")
+        parser.add_argument("--course", help="Only export submissions of the course with this slug")
+        parser.add_argument("--lesson", type=int, help="Only export submissions of the lesson with this ID")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Submissions read per query")
+
+    def handle(self, *args, **options):
+        # The export reads every submission, which the replica serves when there is one
+        with replica_reads():
+            self.export(options)
+
+    def export(self, options):
+        submissions = Submission.objects.all()
+
+        if options["course"]:
+            submissions = submissions.filter(lesson__course__slug_name=options["course"])
+        if options["lesson"]:
+            submissions = submissions.filter(lesson_id=options["lesson"])
+
+        chunks = stream_submissions(
+            submissions, export_format=options["format"], compress=options["gzip"], chunk_size=options["chunk_size"]
+        )
+
+        if options["output"]:
+            with open(options["output"], "wb") as file:
+                file.writelines(chunks)
+            self.stderr.write(self.style.SUCCESS(f"Submissions exported to {options['output']}."))
+        else:
+            sys.stdout.buffer.writelines(chunks)
+            sys.stdout.buffer.flush()
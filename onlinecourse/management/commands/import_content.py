@@ -0,0 +1,39 @@
+import gzip
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from onlinecourse.content import DEFAULT_BATCH_SIZE, import_content
+
+
+class Command(BaseCommand):
+    help = "Import a JSONL dump written by export_content in bulk, then regrade the imported submissions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The dump, gzip-compressed if it ends in .gz")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Objects per insert")
+        parser.add_argument("--no-regrade", action="store_true", help="Keep the grades stored in the dump")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError(f"Dump {path} does not exist.")
+
+        start = time.perf_counter()
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as file:
+            counts = import_content(file, batch_size=options["batch_size"], regrade=not options["no_regrade"])
+        elapsed = time.perf_counter() - start
+
+        regraded = counts.pop("regraded", 0)
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count}")
+
+        total = sum(counts.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {total} objects in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f}/s), "
+                f"{regraded} grades changed."
+            )
+        )
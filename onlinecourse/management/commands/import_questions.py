@@ -0,0 +1,33 @@
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from onlinecourse.authoring import FORMATS, import_questions_file
+from onlinecourse.models import Lesson
+
+
+class Command(BaseCommand):
+    help = "Add the questions and choices of a CSV or JSON authoring file to a lesson"
+
+    def add_arguments(self, parser):
+        parser.add_argument("lesson", type=int, help="The ID of the lesson")
+        parser.add_argument("path", help="The authoring file")
+        parser.add_argument("--format", choices=FORMATS, help="File format (default: told by the file extension)")
+
+    def handle(self, *args, **options):
+        lesson = Lesson.objects.filter(pk=options["lesson"]).first()
+        if lesson is None:
+            raise CommandError(f"Lesson {options['lesson']} does not exist.")
+        if not os.path.isfile(options["path"]):
+            raise CommandError(f"File {options['path']} does not exist.")
+
+        try:
+            with open(options["path"], "rb") as file:
+                questions, choices = import_questions_file(lesson, file, options["format"])
+        except ValidationError as error:
+            raise CommandError("The file is not valid:\n" + "\n".join(error.messages))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Added {questions} question(s) and {choices} choice(s) to lesson {lesson.pk}.")
+        )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from onlinecourse.models import Submission
+from onlinecourse.selection import DEFAULT_BATCH_SIZE, pack_selections, unpack_selections
+
+
+class Command(BaseCommand):
+    help = "Move the selected choices of existing submissions into the packed storage, or back with --reverse"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reverse", action="store_true", help="Move packed selections back to the selection table")
+        parser.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Submissions converted per transaction"
+        )
+
+    def handle(self, *args, **options):
+        convert = unpack_selections if options["reverse"] else pack_selections
+
+        start = time.perf_counter()
+        count = convert(Submission, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - start
+
+        action = "Unpacked" if options["reverse"] else "Packed"
+        self.stdout.write(self.style.SUCCESS(f"{action} the selections of {count} submission(s) in {elapsed:.2f}s."))
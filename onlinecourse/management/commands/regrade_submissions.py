@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from onlinecourse.models import Lesson
+from onlinecourse.regrade import DEFAULT_CHUNK_SIZE, queue_regrade, run_regrade_jobs
+
+
+class Command(BaseCommand):
+    help = "Run the queued regrade jobs, resuming interrupted ones, or queue the regrade of given lessons first"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lesson", type=int, action="append", help="Queue a regrade of the lesson with this ID")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Submissions regraded per chunk")
+        parser.add_argument("--watch", action="store_true", help="Keep polling for new jobs")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --watch")
+
+    def handle(self, *args, **options):
+        for lesson_id in options["lesson"] or []:
+            if not Lesson.objects.filter(pk=lesson_id).exists():
+                raise CommandError(f"Lesson {lesson_id} does not exist.")
+            queue_regrade(lesson_id)
+
+        while True:
+            count = run_regrade_jobs(chunk_size=options["chunk_size"])
+            if count:
+                self.stdout.write(self.style.SUCCESS(f"Ran {count} regrade job(s)."))
+
+            if not options["watch"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from onlinecourse.search import DEFAULT_CHUNK_SIZE, reindex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of courses and lessons"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read and written per statement"
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = reindex(chunk_size=options["chunk_size"])
+        elapsed = time.perf_counter() - start
+
+        if not counts:
+            self.stdout.write(self.style.WARNING("The database has no full-text index, searches scan the tables."))
+            return
+
+        summary = ", ".join(f"{count} {kind}(s)" for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Indexed {summary} in {elapsed:.2f}s."))
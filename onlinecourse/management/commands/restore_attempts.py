@@ -0,0 +1,26 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from onlinecourse.archive import DEFAULT_CHUNK_SIZE, restore_archive
+
+
+class Command(BaseCommand):
+    help = "Move the attempts of archive files written by archive_attempts back into the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Archive files")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Attempts per transaction")
+
+    def handle(self, *args, **options):
+        for path in options["paths"]:
+            if not os.path.isfile(path):
+                raise CommandError(f"Archive {path} does not exist.")
+
+        for path in options["paths"]:
+            stats = restore_archive(path, chunk_size=options["chunk_size"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Restored {stats['attempts']} attempt(s) and {stats['submissions']} submission(s) from {path}."
+                )
+            )
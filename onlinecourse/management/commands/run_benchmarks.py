@@ -0,0 +1,101 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from onlinecourse.benchmarks import (
+    SCALES,
+    SCENARIOS,
+    measure_catalogue,
+    measure_leaderboard,
+    measure_search,
+    measure_startup,
+    measure_template_loading,
+    run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = "Run the benchmark scenarios against a throwaway database and report the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            action="append",
+            choices=list(SCALES),
+            help="Data scale to benchmark, can be repeated (default: small and medium)",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            help="Scenario to run, can be repeated (default: all). Available: " + ", ".join(SCENARIOS),
+        )
+        parser.add_argument("--iterations", type=int, default=20, help="Measured calls per scenario")
+        parser.add_argument("--warmup", type=int, default=2, help="Unmeasured calls per scenario")
+        parser.add_argument(
+            "--startup-runs", type=int, default=3, help="Fresh interpreters started to measure the startup (0 to skip)"
+        )
+        parser.add_argument(
+            "--template-iterations",
+            type=int,
+            default=20,
+            help="Loads of every template with and without the cached loader (0 to skip)",
+        )
+        parser.add_argument(
+            "--search-lessons",
+            type=int,
+            default=100_000,
+            help="Lessons generated to compare the full-text search with icontains scans (0 to skip)",
+        )
+        parser.add_argument(
+            "--catalogue-courses",
+            type=int,
+            default=50_000,
+            help="Courses generated to compare keyset pages of the catalogue with OFFSET pages (0 to skip)",
+        )
+        parser.add_argument(
+            "--leaderboard-learners",
+            type=int,
+            default=20_000,
+            help="Learners generated to compare the leaderboard with aggregating the submissions (0 to skip)",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        names = options["scenario"] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenario: {', '.join(unknown)}")
+
+        scales = {name: SCALES[name] for name in options["scale"] or ["small", "medium"]}
+
+        # Never touch the real database, the scenarios create and delete rows
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = run_benchmarks(scales, names, iterations=options["iterations"], warmup=options["warmup"])
+            if options["search_lessons"]:
+                report["search"] = measure_search(lessons=options["search_lessons"])
+            if options["catalogue_courses"]:
+                report["catalogue"] = measure_catalogue(courses=options["catalogue_courses"])
+            if options["leaderboard_learners"]:
+                report["leaderboard"] = measure_leaderboard(learners=options["leaderboard_learners"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["startup_runs"]:
+            report["startup"] = measure_startup(runs=options["startup_runs"])
+
+        if options["template_iterations"]:
+            report["templates"] = measure_template_loading(iterations=options["template_iterations"])
+
+        output = json.dumps(report, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}."))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from onlinecourse.tasks import Worker, task_metrics
+
+
+class Command(BaseCommand):
+    help = "Run the background tasks queued with onlinecourse.tasks.enqueue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pool", choices=["thread", "process"], help="Pool running the tasks (default: setting)")
+        parser.add_argument("--concurrency", type=int, help="Number of tasks run at once (default: setting)")
+        parser.add_argument("--burst", action="store_true", help="Exit once no task is due")
+        parser.add_argument("--metrics", action="store_true", help="Print the task metrics and exit")
+
+    def handle(self, *args, **options):
+        if options["metrics"]:
+            for row in task_metrics():
+                self.stdout.write(
+                    f"{row['name']}: {row['pending']} pending, {row['done']} done, {row['failed']} failed, "
+                    f"avg {row['avg_ms'] or 0:.1f} ms, max {row['max_ms'] or 0:.1f} ms"
+                )
+            return
+
+        worker = Worker(pool=options["pool"], concurrency=options["concurrency"])
+        self.stderr.write(f"Worker {worker.name} running {worker.concurrency} {worker.pool}(s).")
+
+        try:
+            count = worker.run(burst=options["burst"])
+        except KeyboardInterrupt:
+            return
+
+        self.stderr.write(self.style.SUCCESS(f"Ran {count} task(s)."))
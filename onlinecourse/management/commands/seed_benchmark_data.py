@@ -0,0 +1,251 @@
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from account.models import Instructor, Learner, User
+from onlinecourse.grading import grade_selection
+from onlinecourse.models import Attempt, Choice, Course, Enrollment, Lesson, Question, Submission
+from onlinecourse.search import update_index
+from onlinecourse.selection import PACKED, pack_choice_ids, storage_mode
+
+BENCHMARK_EMAIL_DOMAIN = "benchmark.quizzku.local"
+BENCHMARK_SLUG_PREFIX = "benchmark-"
+BENCHMARK_PASSWORD = "Benchmark#2024"
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, courses, quizzes and submissions for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50, help="Number of learners to create")
+        parser.add_argument("--courses", type=int, default=2, help="Number of courses to create")
+        parser.add_argument("--lessons", type=int, default=2, help="Number of lessons per course")
+        parser.add_argument("--questions", type=int, default=10, help="Number of questions per lesson")
+        parser.add_argument("--choices", type=int, default=4, help="Number of choices per question")
+        parser.add_argument("--attempts", type=int, default=2, help="Number of submitted attempts per learner and lesson")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random answers, for reproducible data")
+        parser.add_argument("--reset", action="store_true", help="Delete previously generated benchmark data first")
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            delete_benchmark_data()
+
+        counts = seed_benchmark_data(
+            users=options["users"],
+            courses=options["courses"],
+            lessons=options["lessons"],
+            questions=options["questions"],
+            choices=options["choices"],
+            attempts=options["attempts"],
+            seed=options["seed"],
+        )
+
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Benchmark data created: {summary}."))
+
+
+def delete_benchmark_data():
+    """
+    Delete every row created by `seed_benchmark_data`. Related rows are removed through cascading deletes.
+    """
+
+    with transaction.atomic():
+        User.objects.filter(email__endswith=f"@{BENCHMARK_EMAIL_DOMAIN}").delete()
+        Course.objects.filter(slug_name__startswith=BENCHMARK_SLUG_PREFIX).delete()
+
+
+def seed_benchmark_data(users=50, courses=2, lessons=2, questions=10, choices=4, attempts=2, seed=0):
+    """
+    Create a synthetic data set with `bulk_create`.
+
+    Every learner is enrolled in every course and submits `attempts` attempts for every lesson. Every third question
+    expects multiple answers. Answers are drawn from a seeded random generator, so the same arguments always produce
+    the same selections and grades. Selections follow `selection.storage_mode()`: they are written to the selection
+    table by default and to `Submission.packed_choices` when `SUBMISSION_STORAGE` is "packed".
+
+    Args:
+        users (int): Number of learners.
+        courses (int): Number of courses.
+        lessons (int): Number of lessons per course.
+        questions (int): Number of questions per lesson.
+        choices (int): Number of choices per question, at least 2.
+        attempts (int): Number of submitted attempts per learner and lesson, at most 3.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict: The number of rows created per model.
+    """
+
+    rng = random.Random(seed)
+    packed = storage_mode() == PACKED
+    attempts = min(attempts, 3)
+    choices = max(choices, 2)
+    password = make_password(BENCHMARK_PASSWORD)  # Hash once, every benchmark user shares the same password
+    # Offset the generated emails and slugs so that seeding twice does not collide with existing rows
+    offset = (User.objects.aggregate(last_id=Max("id"))["last_id"] or 0) + 1
+
+    with transaction.atomic():
+        learners = User.objects.bulk_create(
+            [
+                User(
+                    email=f"learner{offset + i}@{BENCHMARK_EMAIL_DOMAIN}",
+                    username=f"bench_{offset + i}",
+                    password=password,
+                    full_name=f"Benchmark Learner {i}",
+                    nickname=f"Learner {i}",
+                    gender="Male" if i % 2 else "Female",
+                )
+                for i in range(users)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        Learner.objects.bulk_create(
+            [Learner(user=learner, field_of_interest=Learner.IT, profession="Tester") for learner in learners],
+            batch_size=BATCH_SIZE,
+        )
+
+        instructor_user = User.objects.create(
+            email=f"instructor{offset}@{BENCHMARK_EMAIL_DOMAIN}",
+            username=f"bench_instructor_{offset}",
+            password=password,
+            full_name="Benchmark Instructor",
+            gender="Female",
+        )
+        instructor = Instructor.objects.create(user=instructor_user, work_experience=5, total_learners=users)
+
+        course_offset = (Course.objects.aggregate(last_id=Max("id"))["last_id"] or 0) + 1
+        course_list = Course.objects.bulk_create(
+            [
+                Course(
+                    name=f"Benchmark Course {i}",
+                    slug_name=f"{BENCHMARK_SLUG_PREFIX}{course_offset + i}",
+                    image="course_images/django.png",
+                    description="Synthetic course generated for benchmarking.",
+                    pub_date=date.today() - timedelta(days=i),
+                    total_enrollment=users,
+                )
+                for i in range(courses)
+            ]
+        )
+        Course.instructors.through.objects.bulk_create(
+            [Course.instructors.through(course=course, instructor=instructor) for course in course_list]
+        )
+
+        lesson_list = Lesson.objects.bulk_create(
+            [
+                Lesson(course=course, title=f"Lesson {j + 1}", content="Synthetic lesson content.")
+                for course in course_list
+                for j in range(lessons)
+            ]
+        )
+        # `bulk_create` sends no signal, the search index is updated here
+        update_index([*course_list, *lesson_list])
+
+        question_list = Question.objects.bulk_create(
+            [
+                Question(lesson=lesson, question_text=f"Question {k + 1}", expect_multiple_answer=k % 3 == 2)
+                for lesson in lesson_list
+                for k in range(questions)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        choice_list = Choice.objects.bulk_create(
+            [
+                Choice(
+                    question=question,
+                    choice_text=f"Choice {m + 1}",
+                    is_correct=m == 0 or (question.expect_multiple_answer and m == 1),
+                )
+                for question in question_list
+                for m in range(choices)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        # Build the answer keys in memory, the rows have just been created so there is nothing to query
+        answer_keys = {lesson.id: {} for lesson in lesson_list}
+        for question in question_list:
+            answer_keys[question.lesson_id][question.id] = {
+                "grade": question.grade,
+                "multiple": question.expect_multiple_answer,
+                "choices": set(),
+                "correct": set(),
+            }
+        choices_per_question = {}
+        for choice in choice_list:
+            key = answer_keys[choice.question.lesson_id][choice.question_id]
+            key["choices"].add(choice.id)
+            if choice.is_correct:
+                key["correct"].add(choice.id)
+            choices_per_question.setdefault(choice.question_id, []).append(choice.id)
+
+        Enrollment.objects.bulk_create(
+            [
+                Enrollment(learner=learner, course=course, mode=Enrollment.HONOR)
+                for learner in learners
+                for course in course_list
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        attempt_list = Attempt.objects.bulk_create(
+            [
+                Attempt(learner=learner, lesson=lesson, attempt_no=n, remaining_attempts=3 - n)
+                for learner in learners
+                for lesson in lesson_list
+                for n in range(1, attempts + 1)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        submission_list = []
+        selections = []
+        for attempt in attempt_list:
+            answer_key = answer_keys[attempt.lesson_id]
+            selected = []
+            for question_id, key in answer_key.items():
+                roll = rng.random()
+                if roll < 0.6:
+                    selected.extend(key["correct"])
+                elif roll < 0.9:
+                    picks = 2 if key["multiple"] else 1
+                    selected.extend(rng.sample(choices_per_question[question_id], picks))
+                # Otherwise the question is left unanswered
+
+            grade, _ = grade_selection(answer_key, selected)
+            submission = Submission(attempt=attempt, lesson_id=attempt.lesson_id, grade=int(grade))
+            if packed:
+                submission.packed_choices = pack_choice_ids(selected)
+            submission_list.append(submission)
+            selections.append(selected)
+
+        submission_list = Submission.objects.bulk_create(submission_list, batch_size=BATCH_SIZE)
+
+        if not packed:
+            through = Submission.choices.through
+            through.objects.bulk_create(
+                [
+                    through(submission_id=submission.id, choice_id=choice_id)
+                    for submission, selected in zip(submission_list, selections)
+                    for choice_id in selected
+                ],
+                batch_size=BATCH_SIZE,
+            )
+
+    return {
+        "users": len(learners) + 1,
+        "courses": len(course_list),
+        "lessons": len(lesson_list),
+        "questions": len(question_list),
+        "choices": len(choice_list),
+        "attempts": len(attempt_list),
+        "submissions": len(submission_list),
+        "selected choices": sum(map(len, selections)),
+    }
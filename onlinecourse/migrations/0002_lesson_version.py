@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onlinecourse', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='version',
+            field=models.IntegerField(default=1, editable=False),
+        ),
+    ]
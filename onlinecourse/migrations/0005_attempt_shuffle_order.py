@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-19 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onlinecourse', '0004_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='shuffle_order',
+            field=models.BinaryField(null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.3 on 2026-10-19 01:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('onlinecourse', '0005_attempt_shuffle_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_no', models.IntegerField()),
+                ('answers', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('learner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_drafts', to=settings.AUTH_USER_MODEL)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_drafts', to='onlinecourse.lesson')),
+            ],
+            options={
+                'unique_together': {('learner', 'lesson', 'attempt_no')},
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 2000
+
+
+def unpack_choice_ids(data):
+    # The stored form of onlinecourse/selection.py at this migration: the item width, then little-endian IDs
+    data = bytes(data)
+    width = data[0] if data else 4
+    return [int.from_bytes(data[start : start + width], "little") for start in range(1, len(data), width)]
+
+
+def unpack_existing_selections(apps, schema_editor):
+    # The selections packed since are moved back into the selection table before the column is dropped
+    Submission = apps.get_model("onlinecourse", "Submission")
+    Selection = Submission.choices.through
+
+    while True:
+        with transaction.atomic():
+            packed = Submission.objects.filter(packed_choices__isnull=False).order_by("id")
+            submissions = list(packed.values_list("id", "packed_choices")[:BATCH_SIZE])
+            if not submissions:
+                return
+
+            Selection.objects.bulk_create(
+                [
+                    Selection(submission_id=submission_id, choice_id=choice_id)
+                    for submission_id, data in submissions
+                    for choice_id in unpack_choice_ids(data)
+                ],
+                batch_size=BATCH_SIZE,
+            )
+            Submission.objects.filter(id__in=[submission_id for submission_id, _ in submissions]).update(
+                packed_choices=None
+            )
+
+
+class Migration(migrations.Migration):
+
+    # Selections are unpacked in batches of their own transaction, a large table is not locked in one go. Packing the
+    # existing selections is opt-in, see the pack_selections command
+    atomic = False
+
+    dependencies = [
+        ('onlinecourse', '0006_quizdraft'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='packed_choices',
+            field=models.BinaryField(editable=False, null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, unpack_existing_selections),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.3 on 2026-10-19 02:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('onlinecourse', '0007_submission_packed_choices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_count', models.IntegerField(default=0)),
+                ('archived_count', models.IntegerField(default=0)),
+                ('best_grade', models.IntegerField(null=True)),
+                ('last_submission_date', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('learner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_summaries', to=settings.AUTH_USER_MODEL)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_summaries', to='onlinecourse.lesson')),
+            ],
+            options={
+                'verbose_name_plural': 'attempt summaries',
+                'unique_together': {('learner', 'lesson')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.3 on 2026-10-19 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onlinecourse', '0008_attemptsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='question_ids',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='pool_strata',
+            field=models.CharField(blank=True, choices=[('tag', 'Tag'), ('difficulty', 'Difficulty')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='questions_per_attempt',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='difficulty',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Easy'), (2, 'Medium'), (3, 'Hard')], null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='tag',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
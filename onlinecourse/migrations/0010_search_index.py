@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from onlinecourse.search import drop_index, reindex
+
+
+def create_search_index(apps, schema_editor):
+    # Creates the table where the database supports it and indexes the existing courses and lessons, read with the
+    # models of this migration
+    reindex(using=schema_editor.connection.alias, apps=apps)
+
+
+def drop_search_index(apps, schema_editor):
+    drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onlinecourse', '0009_question_pools'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
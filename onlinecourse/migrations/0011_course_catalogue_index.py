@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onlinecourse', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-total_enrollment', '-id'], name='course_catalogue_idx'),
+        ),
+    ]
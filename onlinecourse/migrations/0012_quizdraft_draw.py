@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onlinecourse', '0011_course_catalogue_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizdraft',
+            name='question_ids',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='quizdraft',
+            name='shuffle_order',
+            field=models.BinaryField(null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.3 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+def drop_duplicate_pending_jobs(apps, schema_editor):
+    # A pending job regrades against the answer key current when it runs, the oldest one per lesson is enough
+    RegradeJob = apps.get_model("onlinecourse", "RegradeJob")
+    pending = RegradeJob.objects.filter(status="pending").order_by("lesson_id", "id")
+
+    kept = set()
+    duplicates = []
+    for job_id, lesson_id in pending.values_list("id", "lesson_id"):
+        if lesson_id in kept:
+            duplicates.append(job_id)
+        kept.add(lesson_id)
+
+    RegradeJob.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('onlinecourse', '0012_quizdraft_draw'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_pending_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='regradejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('lesson',), name='unique_pending_regrade_lesson'),
+        ),
+    ]
@@ -11,6 +11,10 @@ Models:
     `Question`: Represents a question with a course, question text, and grade.
     `Choice`: Represents a choice with a question, choice text, and correctness.
     `Submission`: Represents a submission with an enrollment and selected choices.
+    `RegradeJob`: Represents the regrade of the submissions of a lesson after its answer key changed.
+    `Task`: Represents a call deferred to the background task queue.
+    `QuizDraft`: Represents the autosaved answers of a quiz in progress.
+    `AttemptSummary`: Represents the totals of the attempts of a learner on a lesson, archived attempts included.
 """
 
 import sys
@@ -20,6 +24,8 @@ from django.utils.timezone import now
 
 from account.models import Instructor, User
 
+from .selection import PACKED, pack_choice_ids, storage_mode, unpack_choice_ids
+
 # User = get_user_model()
 
 # Errror handling if Django module is missing or not installed
@@ -125,6 +131,10 @@ class Course(models.Model):
     # In other words, it's not a direct relationship
     users = models.ManyToManyField(User, through="Enrollment", through_fields=("course", "learner"))
 
+    class Meta:
+        # The catalogue is ordered by enrollment and paginated by keyset over this index, see `catalogue.py`
+        indexes = [models.Index(fields=["-total_enrollment", "-id"], name="course_catalogue_idx")]
+
     def __str__(self):
         return f"Name: {self.name}, Description: {self.description}"
 
@@ -140,12 +150,26 @@ class Lesson(models.Model):
         title (CharField): The title of the lesson.
         content (TextField): The content of the lesson.
         total_attempt (IntegerField): The total number of attempts allowed for this lesson, not editable by users.
+        version (IntegerField): Incremented whenever a question or choice of the lesson changes, used to key caches
+        derived from the quiz content.
+        questions_per_attempt (PositiveIntegerField): With a pool of more questions, the number of questions sampled
+        for every attempt, see `pool.py`. Every question is asked when empty.
+        pool_strata (CharField): The question attribute the sample is stratified by, so that every tag or difficulty
+        is asked in proportion to its share of the pool.
     """
 
+    TAG = "tag"
+    DIFFICULTY = "difficulty"
+
+    POOL_STRATA = [(TAG, "Tag"), (DIFFICULTY, "Difficulty")]
+
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="lessons")  # Act as a foreign key
     title = models.CharField(null=False, max_length=200, default="title")
     content = models.TextField()
     total_attempt = models.IntegerField(default=3, editable=False)
+    version = models.IntegerField(default=1, editable=False)
+    questions_per_attempt = models.PositiveIntegerField(null=True, blank=True)
+    pool_strata = models.CharField(max_length=10, choices=POOL_STRATA, blank=True, default="")
 
     def __str__(self):
         return f"{self.title}"
@@ -189,9 +213,13 @@ class Attempt(models.Model):
     Attributes:
         learner (ForeignKey): A reference to the User who made the attempt.
         lesson (ForeignKey): A reference to the Lesson being attempted.
+        shuffle_order (BinaryField): The packed order of the questions and choices of the attempt, see `shuffle.py`.
+        question_ids (BinaryField): The packed IDs of the questions sampled from the lesson's pool for the attempt,
+        see `pool.py`. Empty when every question of the lesson was asked.
     Methods:
         `decrease_attempt()`: Decreases the remaining attempts by 1 if there are attempts left and saves the instance.
-        `has_attempts_left()`: Checks if there are any remaining attempts.
+        `sampled_question_ids()`: Returns the IDs of the sampled questions, or None when every question was asked.
+        `questions()`: Returns the questions the attempt is graded on.
         `__str__()`: Returns a string representation of the attempt, including the username and lesson title.
     """
 
@@ -200,6 +228,8 @@ class Attempt(models.Model):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="attempts")
     attempt_no = models.IntegerField(default=0, editable=False)
     remaining_attempts = models.IntegerField(null=True, editable=False)
+    shuffle_order = models.BinaryField(null=True, editable=False)
+    question_ids = models.BinaryField(null=True, editable=False)
 
     class Meta:
         unique_together = ["learner", "lesson", "attempt_no"]
@@ -209,10 +239,25 @@ class Attempt(models.Model):
             self.remaining_attempts -= 1
             self.save()
 
+    def sampled_question_ids(self):
+        if self.question_ids is None:
+            return None
+        return unpack_choice_ids(self.question_ids)
+
+    def questions(self):
+        questions = self.lesson.questions.all()
+        question_ids = self.sampled_question_ids()
+        return questions if question_ids is None else questions.filter(id__in=question_ids)
+
     @classmethod
-    def create_attempt(cls, learner, lesson, attempt_no, remaining_attempts=3):
+    def create_attempt(cls, learner, lesson, attempt_no, remaining_attempts=3, shuffle_order=None, question_ids=None):
         return cls.objects.create(
-            learner=learner, lesson=lesson, attempt_no=attempt_no, remaining_attempts=remaining_attempts
+            learner=learner,
+            lesson=lesson,
+            attempt_no=attempt_no,
+            remaining_attempts=remaining_attempts,
+            shuffle_order=shuffle_order,
+            question_ids=None if question_ids is None else pack_choice_ids(question_ids),
         )
 
     def __str__(self):
@@ -228,14 +273,24 @@ class Question(models.Model):
         question_text (CharField): The text of the question, limited to 200 characters.
         grade (IntegerField): The grade assigned to the question, default is 100.
         expect_multiple_answer (BooleanField): Indicates if the question expects multiple answers.
+        tag (CharField): An optional topic, question pools can be sampled per tag.
+        difficulty (PositiveSmallIntegerField): An optional difficulty, question pools can be sampled per difficulty.
     Methods:
         `is_get_score(selected_ids)`: Determines if the selected choices are correct.
     """
 
+    EASY = 1
+    MEDIUM = 2
+    HARD = 3
+
+    DIFFICULTIES = [(EASY, "Easy"), (MEDIUM, "Medium"), (HARD, "Hard")]
+
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="questions")
     question_text = models.CharField(max_length=200)  # Content of the question
     grade = models.IntegerField(default=100, editable=False)
     expect_multiple_answer = models.BooleanField(default=False)
+    tag = models.CharField(max_length=50, blank=True, default="")
+    difficulty = models.PositiveSmallIntegerField(choices=DIFFICULTIES, null=True, blank=True)
 
     def is_get_score(self, selected_ids) -> bool:
         """
@@ -284,11 +339,207 @@ class Submission(models.Model):
         attempt (ForeignKey): A reference to the Attempt model, indicating which attempt this submission belongs to.
         lesson (ForeignKey): A reference to the Lesson model, indicating which lesson this submission is for.
         choices (ManyToManyField): A many-to-many relationship with the Choice model, representing the choices made in this submission.
+        packed_choices (BinaryField): The IDs of the selected choices packed by `selection.pack_choice_ids`, or None
+        when they are stored in `choices`. See `SUBMISSION_STORAGE` in the settings.
         submission_date (DateTimeField): The date and time when the submission was created, automatically set to the current date and time.
+    Methods:
+        `create_submission(attempt, lesson, choice_ids)`: Creates a submission, storing its choices as configured.
+        `selected_choice_ids()`: Returns the sorted IDs of the selected choices, however they are stored.
+        `selected_choices`: The selected choices as a queryset, however they are stored.
     """
 
     attempt = models.ForeignKey(Attempt, on_delete=models.CASCADE, related_name="submissions")
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="submissions")
     choices = models.ManyToManyField(Choice)
+    packed_choices = models.BinaryField(null=True, editable=False)
     submission_date = models.DateTimeField(auto_now_add=True)
     grade = models.IntegerField(null=True, editable=False)
+
+    @classmethod
+    def create_submission(cls, attempt, lesson, choice_ids):
+        if storage_mode() == PACKED:
+            return cls.objects.create(attempt=attempt, lesson=lesson, packed_choices=pack_choice_ids(choice_ids))
+
+        submission = cls.objects.create(attempt=attempt, lesson=lesson)
+        submission.choices.set(choice_ids)
+        return submission
+
+    def selected_choice_ids(self):
+        if self.packed_choices is not None:
+            return unpack_choice_ids(self.packed_choices)
+        # Iterating `all()` uses the choices prefetched with the submission, if any
+        return sorted(choice.id for choice in self.choices.all())
+
+    @property
+    def selected_choices(self):
+        if self.packed_choices is not None:
+            return Choice.objects.filter(id__in=unpack_choice_ids(self.packed_choices))
+        return self.choices.all()
+
+
+class RegradeJob(models.Model):
+    """
+    Represents the regrade of the submissions of a lesson after its answer key changed.
+
+    Submissions are regraded in ID order and in chunks. The job records the last regraded submission after every
+    chunk, so a job interrupted by a restart resumes where it stopped instead of starting over. A lesson has at most one
+    pending job.
+
+    Attributes:
+        lesson (ForeignKey): The lesson whose submissions are regraded.
+        status (CharField): One of PENDING, RUNNING, DONE or FAILED.
+        total (IntegerField): The number of submissions of the lesson when the job started.
+        processed (IntegerField): The number of submissions regraded so far.
+        changed (IntegerField): The number of regraded submissions whose grade changed.
+        last_submission_id (BigIntegerField): The ID of the last regraded submission.
+        error (TextField): The error that failed the job, if any.
+        created_at (DateTimeField): When the job was queued.
+        updated_at (DateTimeField): When the job last made progress.
+        finished_at (DateTimeField): When the job finished.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    STATUSES = [(PENDING, "Pending"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="regrade_jobs")
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING, db_index=True)
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    changed = models.IntegerField(default=0)
+    last_submission_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["lesson"], condition=models.Q(status="pending"), name="unique_pending_regrade_lesson"
+            )
+        ]
+
+    def __str__(self):
+        return f"Regrade of lesson {self.lesson_id} ({self.status})"
+
+
+class Task(models.Model):
+    """
+    Represents a call deferred to the background task queue, run by the `run_worker` command.
+
+    Attributes:
+        name (CharField): The dotted path of the function to call.
+        args (JSONField): The positional arguments of the call.
+        kwargs (JSONField): The keyword arguments of the call.
+        key (CharField): An optional idempotency key. Enqueuing a task whose key matches a pending task returns the
+            pending task instead of adding a second one.
+        status (CharField): One of PENDING, RUNNING, DONE or FAILED.
+        attempts (IntegerField): The number of times the task was run.
+        max_attempts (IntegerField): The number of runs after which a failing task is given up.
+        run_at (DateTimeField): The task is not run before this time, later for every retry.
+        error (TextField): The error of the last failed run, if any.
+        duration_ms (FloatField): The duration of the last run, in milliseconds.
+        created_at (DateTimeField): When the task was enqueued.
+        started_at (DateTimeField): When the last run started.
+        finished_at (DateTimeField): When the task finished or was given up.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    STATUSES = [(PENDING, "Pending"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_at = models.DateTimeField(default=now)
+    error = models.TextField(blank=True, default="")
+    duration_ms = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key"], condition=models.Q(status="pending"), name="unique_pending_task_key"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class QuizDraft(models.Model):
+    """
+    Represents the autosaved answers of a quiz in progress, promoted to a submission when the quiz is submitted.
+
+    Answer changes are coalesced in the cache and written here in batches, see `drafts.py`.
+
+    Attributes:
+        learner (ForeignKey): The learner taking the quiz.
+        lesson (ForeignKey): The lesson of the quiz.
+        attempt_no (IntegerField): The number of the attempt the answers belong to.
+        answers (JSONField): The selected choice IDs per question ID.
+        shuffle_order (BinaryField): The packed order the quiz page drew for the attempt, see `shuffle.py`.
+        question_ids (BinaryField): The packed IDs of the questions the quiz page sampled for the attempt, see
+        `pool.py`. Empty when every question of the lesson is asked.
+        updated_at (DateTimeField): When the answers were last written.
+    """
+
+    learner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="quiz_drafts")
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="quiz_drafts")
+    attempt_no = models.IntegerField()
+    answers = models.JSONField(default=dict)
+    shuffle_order = models.BinaryField(null=True, editable=False)
+    question_ids = models.BinaryField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["learner", "lesson", "attempt_no"]
+
+    def __str__(self):
+        return f"Draft of attempt {self.attempt_no} of lesson {self.lesson_id} by learner {self.learner_id}"
+
+
+class AttemptSummary(models.Model):
+    """
+    Represents the totals of the attempts of a learner on a lesson, archived attempts included, see `archive.py`.
+
+    Written when attempts of the pair are archived or restored, so the totals outlive the archived rows.
+
+    Attributes:
+        learner (ForeignKey): The learner.
+        lesson (ForeignKey): The lesson.
+        attempt_count (IntegerField): The number of attempts, archived ones included.
+        archived_count (IntegerField): The number of attempts currently archived.
+        best_grade (IntegerField): The best grade of the submitted attempts, archived ones included.
+        last_submission_date (DateTimeField): When the last attempt was submitted.
+        updated_at (DateTimeField): When the totals were last written.
+    """
+
+    learner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="attempt_summaries")
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="attempt_summaries")
+    attempt_count = models.IntegerField(default=0)
+    archived_count = models.IntegerField(default=0)
+    best_grade = models.IntegerField(null=True)
+    last_submission_date = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["learner", "lesson"]
+        verbose_name_plural = "attempt summaries"
+
+    def __str__(self):
+        return f"Attempts of learner {self.learner_id} on lesson {self.lesson_id}"
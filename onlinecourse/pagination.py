@@ -0,0 +1,80 @@
+"""
+This module contains paginators for large tables of the online course application.
+
+`Classes`:
+
+    EstimatedCountPaginator(Paginator):
+        Uses a cheap row estimate instead of `COUNT(*)` for unfiltered querysets of large tables.
+
+`Functions`:
+
+    estimate_row_count(model: Model) -> int | None:
+        Estimates the number of rows of a model's table without scanning it.
+"""
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using="default"):
+    """
+    Estimate the number of rows of a model's table without scanning it.
+
+    PostgreSQL and MySQL keep row estimates in their catalogs. SQLite has none, so the highest primary key is used,
+    which is read from the index and overestimates only by the number of deleted rows.
+
+    Args:
+        model (Model): The model whose table is estimated.
+        using (str): The database alias.
+
+    Returns:
+        int | None: The estimate, or None if the database offers no cheap estimate.
+    """
+
+    connection = connections[using]
+    table = model._meta.db_table
+
+    if connection.vendor == "postgresql":
+        sql, params = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]
+    elif connection.vendor == "mysql":
+        sql = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+        params = [table]
+    elif connection.vendor == "sqlite":
+        column = connection.ops.quote_name(model._meta.pk.column)
+        sql, params = f"SELECT MAX({column}) FROM {connection.ops.quote_name(table)}", []
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    # PostgreSQL reports -1 for tables that were never analysed
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that counts unfiltered querysets from a row estimate instead of `COUNT(*)`.
+
+    Counting a table with millions of rows scans it on every changelist page. When the queryset has no filter and the
+    estimate is above `exact_count_threshold`, the estimate is used as the count, which only makes the number of pages
+    approximate. Filtered querysets and small tables are counted exactly.
+
+    Attributes:
+        exact_count_threshold (int): Tables estimated below this number of rows are counted exactly.
+    """
+
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+
+        if hasattr(queryset, "query") and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate >= self.exact_count_threshold:
+                return estimate
+
+        return super().count
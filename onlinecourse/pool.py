@@ -0,0 +1,229 @@
+"""
+This module contains the question pools of lessons and the sampling of the questions of an attempt.
+
+A lesson with `questions_per_attempt` set asks every attempt only that many questions, sampled from all the questions
+of the lesson, its pool. The pool is kept as arrays, with questions sorted by ID:
+
+    question_ids     the question IDs
+    choice_counts    the number of choices of every question, as `shuffle.py` expects
+    strata           per stratum attribute, "tag" or "difficulty", the indexes of the questions of every value
+
+built with one query and cached per lesson version, so drawing an attempt costs no query and, as `random.sample` picks
+k indexes without copying the population, about the same time whatever the size of the pool. With `pool_strata` set,
+every tag or difficulty gets a share of the sample proportional to its share of the pool.
+
+The sampled question IDs are stored with the attempt, see `Attempt.question_ids`, and the attempt is graded on those
+questions only. The question order of the attempt holds indexes into the whole pool, the pages get the quiz payload
+of the sampled questions only, see `api.py`, and the order mapped onto it by `sample_order`. Lessons without
+`questions_per_attempt`, or with a pool no larger than it, ask every question as before.
+
+`Classes`:
+
+    QuestionPool:
+        The arrays of the questions of a lesson.
+
+`Functions`:
+
+    get_pool(lesson: Lesson) -> QuestionPool:
+        Returns the pool of a lesson, cached per lesson version.
+
+    allocate(sizes: List[int], k: int) -> List[int]:
+        Splits a sample between strata in proportion to their sizes.
+
+    draw_attempt(lesson: Lesson, user_id: int, attempt_no: int) -> Tuple[QuizOrder, List[int] | None]:
+        Samples the questions of an attempt and draws their order.
+
+    attempt_order(attempt: Attempt) -> QuizOrder:
+        Returns the order an attempt was taken in, fitted to the current pool.
+
+    sample_order(order: QuizOrder) -> QuizOrder:
+        Maps an order over the pool onto the payload of its sampled questions.
+"""
+
+import random
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Lesson, Question
+from .shuffle import QuizOrder, draw_order, matches, unpack_order
+
+POOL_CACHE_TIMEOUT = 24 * 60 * 60  # 1 day
+
+# Questions without a tag or difficulty form a stratum of their own
+UNSET = ""
+
+
+class QuestionPool(NamedTuple):
+    """
+    The arrays of the questions of a lesson, sorted by ID.
+
+    Attributes:
+        question_ids (array): The question IDs.
+        choice_counts (array): The number of choices of every question.
+        strata (Dict[str, Dict[str, array]]): Per stratum attribute, the indexes of the questions of every value.
+    """
+
+    question_ids: array
+    choice_counts: array
+    strata: Dict[str, Dict[str, array]]
+
+    def index_of(self, question_id: int) -> Optional[int]:
+        index = bisect_left(self.question_ids, question_id)
+        if index < len(self.question_ids) and self.question_ids[index] == question_id:
+            return index
+        return None
+
+
+def build_pool(lesson_id: int) -> QuestionPool:
+    """
+    Build the pool of a lesson with one query.
+    """
+
+    questions = Question.objects.filter(lesson_id=lesson_id).order_by("id").annotate(choice_count=Count("choices"))
+    rows = questions.values_list("id", "choice_count", "tag", "difficulty")
+
+    question_ids, choice_counts = array("q"), array("H")
+    strata = {Lesson.TAG: {}, Lesson.DIFFICULTY: {}}
+
+    for index, (question_id, choice_count, tag, difficulty) in enumerate(rows):
+        question_ids.append(question_id)
+        choice_counts.append(choice_count)
+        strata[Lesson.TAG].setdefault(tag or UNSET, array("I")).append(index)
+        strata[Lesson.DIFFICULTY].setdefault(str(difficulty or UNSET), array("I")).append(index)
+
+    return QuestionPool(question_ids, choice_counts, strata)
+
+
+def get_pool(lesson: Lesson) -> QuestionPool:
+    """
+    Return the pool of a lesson, built at most once per lesson version.
+    """
+
+    cache_key = f"question_pool:{lesson.id}:{lesson.version}"
+
+    pool = cache.get(cache_key)
+    if pool is None:
+        pool = build_pool(lesson.id)
+        cache.set(cache_key, pool, timeout=POOL_CACHE_TIMEOUT)
+
+    return pool
+
+
+def allocate(sizes: List[int], k: int) -> List[int]:
+    """
+    Split a sample of `k` between strata in proportion to their sizes, by largest remainder.
+
+    Args:
+        sizes (List[int]): The size of every stratum.
+        k (int): The size of the sample, at most the sum of the sizes.
+
+    Returns:
+        List[int]: The number of questions sampled from every stratum.
+    """
+
+    total = sum(sizes)
+    quotas = [k * size / total for size in sizes]
+    counts = [int(quota) for quota in quotas]
+
+    # The remaining questions go to the strata the rounding shorted most, larger strata first on ties
+    by_remainder = sorted(range(len(sizes)), key=lambda index: (counts[index] - quotas[index], -sizes[index], index))
+    for index in by_remainder[: k - sum(counts)]:
+        counts[index] += 1
+
+    return counts
+
+
+def sample_indexes(pool: QuestionPool, lesson: Lesson, rng: random.Random) -> Optional[List[int]]:
+    """
+    Sample the indexes of the questions of an attempt, sorted, or return None when every question is asked.
+    """
+
+    k = lesson.questions_per_attempt
+    if not k or k >= len(pool.question_ids):
+        return None
+
+    if lesson.pool_strata not in pool.strata:
+        return sorted(rng.sample(range(len(pool.question_ids)), k))
+
+    strata = [pool.strata[lesson.pool_strata][value] for value in sorted(pool.strata[lesson.pool_strata])]
+    indexes = []
+    for stratum, count in zip(strata, allocate([len(stratum) for stratum in strata], k)):
+        indexes.extend(rng.sample(stratum, count))
+
+    return sorted(indexes)
+
+
+def draw_attempt(lesson: Lesson, user_id: int, attempt_no: int) -> Tuple[QuizOrder, Optional[List[int]]]:
+    """
+    Sample the questions of an attempt and draw their order. The same attempt always gets the same questions, as long
+    as the pool does not change, so the quiz page and the submit view draw the same quiz.
+
+    Args:
+        lesson (Lesson): The lesson.
+        user_id (int): The ID of the learner.
+        attempt_no (int): The number of the attempt.
+
+    Returns:
+        Tuple[QuizOrder, List[int] | None]: The order, with question indexes into the whole pool, and the sorted IDs
+        of the sampled questions, None when every question is asked.
+    """
+
+    pool = get_pool(lesson)
+    indexes = sample_indexes(pool, lesson, random.Random(f"{user_id}-{lesson.id}-{attempt_no}-pool"))
+
+    if indexes is None:
+        return draw_order(user_id, lesson.id, attempt_no, list(pool.choice_counts)), None
+
+    order = draw_order(user_id, lesson.id, attempt_no, [pool.choice_counts[index] for index in indexes])
+    pool_order = QuizOrder([indexes[position] for position in order.questions], order.choices)
+
+    return pool_order, [pool.question_ids[index] for index in indexes]
+
+
+def attempt_order(attempt) -> QuizOrder:
+    """
+    Return the order an attempt was taken in, for its result page.
+
+    The stored order is kept while it fits the lesson. Attempts stored before the order was, or whose lesson changed
+    since, get an order drawn again, over the sampled questions that still exist for pooled attempts.
+
+    Args:
+        attempt (Attempt): The attempt.
+
+    Returns:
+        QuizOrder: The order, with question indexes into the current pool.
+    """
+
+    lesson = attempt.lesson
+    pool = get_pool(lesson)
+    order = unpack_order(attempt.shuffle_order) if attempt.shuffle_order else None
+    question_ids = attempt.sampled_question_ids()
+
+    if question_ids is None:
+        if order is None or not matches(order, list(pool.choice_counts)):
+            order = draw_order(attempt.learner_id, lesson.id, attempt.attempt_no, list(pool.choice_counts))
+        return order
+
+    indexes = [index for index in map(pool.index_of, question_ids) if index is not None]
+    if order is not None and sorted(order.questions) == indexes:
+        if all(len(choices) == pool.choice_counts[index] for index, choices in zip(order.questions, order.choices)):
+            return order
+
+    order = draw_order(
+        attempt.learner_id, lesson.id, attempt.attempt_no, [pool.choice_counts[index] for index in indexes]
+    )
+    return QuizOrder([indexes[position] for position in order.questions], order.choices)
+
+
+def sample_order(order: QuizOrder) -> QuizOrder:
+    """
+    Map an order with question indexes into the whole pool onto the quiz payload of its sampled questions, which holds
+    them in ID order as the pool does.
+    """
+
+    ranks = {index: rank for rank, index in enumerate(sorted(order.questions))}
+    return QuizOrder([ranks[index] for index in order.questions], order.choices)
@@ -0,0 +1,293 @@
+"""
+This module contains the opt-in request profiler of the online course application.
+
+`ProfilingMiddleware` profiles the requests selected by the `PROFILING` setting, either with `cProfile` or with a
+statistical sampler that periodically records the stack of the request thread, and writes the profiles to a rotating
+on-disk `ProfileStore`. When `PROFILING["ENABLED"]` is false the middleware raises `MiddlewareNotUsed`, so Django drops
+it from the middleware chain and disabled profiling costs nothing per request.
+
+`Classes`:
+
+    ProfileStore:
+        Writes, lists and prunes the profile files of a directory.
+
+    SamplingProfiler:
+        Collects collapsed stacks of one thread from a background sampling thread.
+
+    ProfilingMiddleware:
+        Profiles the selected requests and saves the slow ones.
+
+`Functions`:
+
+    pstats_to_collapsed(path: str) -> str:
+        Converts a cProfile dump into flamegraph-compatible collapsed stacks.
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    # "cprofile" for deterministic profiles, "sampling" for a low-overhead statistical profiler
+    "MODE": "cprofile",
+    # Namespaced view names to profile, e.g. "onlinecourse:submit". An empty list profiles every view.
+    "VIEWS": [],
+    # Fraction of the matching requests that get profiled
+    "SAMPLE_RATE": 1.0,
+    # Profiles of requests faster than this are discarded
+    "SLOW_THRESHOLD_MS": 0,
+    "DIRECTORY": "profiles",
+    # Oldest profiles are deleted beyond this count
+    "MAX_PROFILES": 100,
+    "SAMPLING_INTERVAL_MS": 5,
+}
+
+PSTATS_EXTENSION = ".prof"
+COLLAPSED_EXTENSION = ".collapsed"
+
+
+def get_profiling_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, "PROFILING", {})}
+
+
+class ProfileStore:
+    """
+    Writes, lists and prunes the profile files of a directory.
+
+    Attributes:
+        directory (str): The directory holding the profiles.
+        max_profiles (int): The number of profiles kept, the oldest ones are deleted first.
+    """
+
+    def __init__(self, directory, max_profiles=100):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def filename(self, view_name, elapsed_ms, extension):
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        view_slug = view_name.replace(":", "-") or "unknown"
+        return f"{timestamp}-{os.getpid()}-{threading.get_ident() % 10000}-{view_slug}-{elapsed_ms}ms{extension}"
+
+    def path(self, name):
+        """
+        Return the path of a stored profile, or None if `name` is not a profile of this store.
+        """
+
+        if name != os.path.basename(name) or not name.endswith((PSTATS_EXTENSION, COLLAPSED_EXTENSION)):
+            return None
+
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def save_pstats(self, profile, view_name, elapsed_ms):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, self.filename(view_name, elapsed_ms, PSTATS_EXTENSION))
+        profile.dump_stats(path)
+        self.prune()
+        return path
+
+    def save_collapsed(self, stacks, view_name, elapsed_ms):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, self.filename(view_name, elapsed_ms, COLLAPSED_EXTENSION))
+        with open(path, "w") as file:
+            file.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        self.prune()
+        return path
+
+    def list(self):
+        """
+        Return the stored profiles, newest first, as dictionaries with the `name`, `size` and `modified` time.
+        """
+
+        if not os.path.isdir(self.directory):
+            return []
+
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith((PSTATS_EXTENSION, COLLAPSED_EXTENSION)):
+                stat = entry.stat()
+                profiles.append({"name": entry.name, "size": stat.st_size, "modified": stat.st_mtime})
+
+        return sorted(profiles, key=lambda profile: profile["modified"], reverse=True)
+
+    def prune(self):
+        for profile in self.list()[self.max_profiles :]:
+            try:
+                os.remove(os.path.join(self.directory, profile["name"]))
+            except FileNotFoundError:
+                # Another worker pruned it first
+                pass
+
+
+def get_profile_store():
+    options = get_profiling_settings()
+    return ProfileStore(options["DIRECTORY"], options["MAX_PROFILES"])
+
+
+class SamplingProfiler:
+    """
+    Collects collapsed stacks of one thread by sampling it from a background thread.
+
+    Attributes:
+        thread_id (int): The identifier of the sampled thread.
+        interval (float): The time between two samples, in seconds.
+        stacks (Counter): The number of samples per collapsed stack, root frame first.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            labels = []
+            while frame is not None:
+                code = frame.f_code
+                labels.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+def pstats_to_collapsed(path):
+    """
+    Convert a cProfile dump into flamegraph-compatible collapsed stacks.
+
+    cProfile only records caller/callee pairs, not full stacks, so each function is placed under the chain of its
+    costliest callers. The weight of every stack is the function's own time in microseconds.
+
+    Args:
+        path (str): The path of the cProfile dump.
+
+    Returns:
+        str: One `frame;frame;frame weight` line per function.
+    """
+
+    stats = pstats.Stats(path).stats
+
+    def label(func):
+        filename, line, name = func
+        return f"{os.path.basename(filename)}:{name}:{line}"
+
+    main_caller = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        if callers:
+            main_caller[func] = max(callers, key=lambda caller: callers[caller][3])
+
+    lines = []
+    for func, (_, _, own_time, _, _) in stats.items():
+        weight = int(own_time * 1_000_000)
+        if weight == 0:
+            continue
+
+        stack = [func]
+        while stack[-1] in main_caller and main_caller[stack[-1]] not in stack:
+            stack.append(main_caller[stack[-1]])
+        lines.append(f"{';'.join(label(frame) for frame in reversed(stack))} {weight}")
+
+    return "\n".join(lines) + "\n"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests selected by the `PROFILING` setting and saves the ones slower than its threshold.
+
+    A request is profiled when its view is listed in `PROFILING["VIEWS"]` (or the list is empty) and it is picked by
+    `PROFILING["SAMPLE_RATE"]`. The profile is saved only if the request took at least
+    `PROFILING["SLOW_THRESHOLD_MS"]`, which allows profiling every request while keeping only the slow ones.
+    """
+
+    def __init__(self, get_response):
+        options = get_profiling_settings()
+
+        if not options["ENABLED"]:
+            raise MiddlewareNotUsed("Request profiling is disabled.")
+
+        self.get_response = get_response
+        self.mode = options["MODE"]
+        self.views = set(options["VIEWS"])
+        self.sample_rate = options["SAMPLE_RATE"]
+        self.threshold_ms = options["SLOW_THRESHOLD_MS"]
+        self.interval = options["SAMPLING_INTERVAL_MS"] / 1000
+        self.store = ProfileStore(options["DIRECTORY"], options["MAX_PROFILES"])
+
+    def get_view_name(self, request):
+        try:
+            return resolve(request.path_info).view_name
+        except Resolver404:
+            return ""
+
+    def __call__(self, request):
+        view_name = self.get_view_name(request)
+
+        if (self.views and view_name not in self.views) or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        if self.mode == "sampling":
+            return self.sample(request, view_name)
+        return self.profile(request, view_name)
+
+    def profile(self, request, view_name):
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active in this thread
+            return self.get_response(request)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        if elapsed_ms >= self.threshold_ms:
+            path = self.store.save_pstats(profile, view_name, elapsed_ms)
+            logger.info("Saved profile of %s (%s ms) to %s", view_name, elapsed_ms, path)
+
+        return response
+
+    def sample(self, request, view_name):
+        sampler = SamplingProfiler(threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        sampler.start()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        if elapsed_ms >= self.threshold_ms and sampler.stacks:
+            path = self.store.save_collapsed(sampler.stacks, view_name, elapsed_ms)
+            logger.info("Saved sampled profile of %s (%s ms) to %s", view_name, elapsed_ms, path)
+
+        return response
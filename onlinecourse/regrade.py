@@ -0,0 +1,261 @@
+"""
+This module contains the incremental regrade of submissions after an answer key change.
+
+When a choice's correctness or a question's answer mode changes, only the submissions of that lesson are stale. A
+`RegradeJob` is queued for the lesson and processed in chunks: every chunk of submissions is graded in memory against
+the current answer key, the changed grades are written with one `bulk_update`, and the job's cursor is advanced in the
+same transaction so an interrupted job resumes from the last committed chunk. Where the database supports it, the
+submissions of a chunk stored in the selection table are regraded by one SQL statement instead, see `sql_grading`.
+
+`Functions`:
+
+    queue_regrade(lesson_id: int) -> RegradeJob | None:
+        Queues a regrade of a lesson, unless one is already pending, and a background task running it.
+
+    run_regrade_job(job: RegradeJob, chunk_size: int) -> RegradeJob:
+        Regrades the remaining submissions of a job.
+
+    run_regrade_jobs(chunk_size: int) -> int:
+        Runs every pending job and resumes the stale running ones.
+
+    regrade_submissions(submissions: QuerySet, chunk_size: int) -> int:
+        Regrades submissions at once, outside of any job.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
+from . import sql_grading
+from .grading import answer_key_for_lesson, grade_selection, sampled_answer_key, selected_choice_pairs
+from .leaderboard import invalidate_leaderboard
+from .models import Lesson, RegradeJob, Submission
+from .selection import unpack_choice_ids
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+# A running job that made no progress for this long belongs to a worker that stopped and is resumed
+STALE_AFTER = timedelta(minutes=10)
+
+# The submissions `sql_grading` leaves out: packed ones, and those of attempts on a question pool
+IN_PYTHON = Q(packed_choices__isnull=False) | Q(attempt__question_ids__isnull=False)
+
+
+def queue_regrade(lesson_id):
+    """
+    Queue a regrade of the submissions of a lesson.
+
+    A pending job already regrades against the answer key current when it runs, so no second job is queued for the
+    same lesson. The `unique_pending_regrade_lesson` constraint keeps concurrent calls from queuing two. Lessons without
+    submissions need no regrade.
+
+    Args:
+        lesson_id (int): The ID of the lesson.
+
+    Returns:
+        RegradeJob | None: The queued job, or None if none was needed.
+    """
+
+    if not Lesson.objects.filter(pk=lesson_id).exists():
+        return None
+
+    if RegradeJob.objects.filter(lesson_id=lesson_id, status=RegradeJob.PENDING).exists():
+        return None
+
+    if not Submission.objects.filter(lesson_id=lesson_id).exists():
+        return None
+
+    try:
+        with transaction.atomic():
+            job = RegradeJob.objects.create(lesson_id=lesson_id)
+    except IntegrityError:
+        # A concurrent call queued a job for the lesson since the check above
+        return None
+
+    logger.info("Queued regrade of lesson %s", lesson_id)
+    enqueue(run_regrade_jobs, key="run-regrade-jobs")
+
+    return job
+
+
+def regrade_chunk(answer_key, submission_grades):
+    """
+    Grade a chunk of submissions against an answer key.
+
+    Args:
+        answer_key (dict): The answer key returned by `answer_key_for_lesson`.
+        submission_grades (List[Tuple[int, int]]): (submission ID, stored grade) pairs.
+
+    Returns:
+        List[Submission]: Unsaved submissions holding the ID and the new grade of every submission whose grade changed.
+    """
+
+    submission_ids = [submission_id for submission_id, _ in submission_grades]
+    selections = defaultdict(list)
+
+    for submission_id, choice_id in selected_choice_pairs(Submission.objects.filter(id__in=submission_ids)):
+        selections[submission_id].append(choice_id)
+
+    # Attempts on a question pool are graded on their sampled questions only
+    pooled = Submission.objects.filter(id__in=submission_ids, attempt__question_ids__isnull=False)
+    sampled = {submission_id: data for submission_id, data in pooled.values_list("id", "attempt__question_ids")}
+
+    changed = []
+    for submission_id, stored_grade in submission_grades:
+        question_ids = unpack_choice_ids(sampled[submission_id]) if submission_id in sampled else None
+        grade, _ = grade_selection(sampled_answer_key(answer_key, question_ids), selections[submission_id])
+        if stored_grade != int(grade):
+            changed.append(Submission(id=submission_id, grade=int(grade)))
+
+    return changed
+
+
+def run_regrade_job(job, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Regrade the submissions of a job that come after its cursor.
+
+    Args:
+        job (RegradeJob): The job, already claimed by the caller.
+        chunk_size (int): The number of submissions regraded per transaction.
+
+    Returns:
+        RegradeJob: The finished job.
+    """
+
+    if not job.total:
+        job.total = Submission.objects.filter(lesson_id=job.lesson_id).count()
+        job.save(update_fields=["total", "updated_at"])
+
+    try:
+        answer_key = answer_key_for_lesson(job.lesson_id)
+
+        sql = sql_grading.supported()
+
+        while True:
+            submissions = Submission.objects.filter(lesson_id=job.lesson_id, id__gt=job.last_submission_id)
+            submissions = submissions.annotate(in_python=ExpressionWrapper(IN_PYTHON, BooleanField()))
+            rows = list(submissions.order_by("id").values_list("id", "grade", "in_python")[:chunk_size])
+
+            if not rows:
+                break
+
+            # The database regrades the submissions stored in the selection table itself, the others are graded here
+            submission_grades = [
+                (submission_id, grade) for submission_id, grade, in_python in rows if in_python or not sql
+            ]
+            changed = regrade_chunk(answer_key, submission_grades)
+
+            with transaction.atomic():
+                Submission.objects.bulk_update(changed, ["grade"])
+                job.changed += len(changed)
+                if sql:
+                    chunk = Submission.objects.filter(lesson_id=job.lesson_id, id__range=(rows[0][0], rows[-1][0]))
+                    job.changed += sql_grading.update_grades_in_sql(chunk)
+
+                job.last_submission_id = rows[-1][0]
+                job.processed += len(rows)
+                job.save(update_fields=["last_submission_id", "processed", "changed", "updated_at"])
+    except Exception as error:
+        logger.exception("Regrade of lesson %s failed", job.lesson_id)
+        job.status = RegradeJob.FAILED
+        job.error = str(error)
+        job.save(update_fields=["status", "error", "updated_at"])
+        # The chunks regraded before the failure are committed
+        invalidate_leaderboard(job.lesson_id)
+        raise
+
+    job.status = RegradeJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
+    if job.changed:
+        invalidate_leaderboard(job.lesson_id)
+    logger.info("Regraded %s submissions of lesson %s, %s changed", job.processed, job.lesson_id, job.changed)
+
+    return job
+
+
+def claim_job(job):
+    """
+    Mark a job as running, unless another worker claimed it first. Stale running jobs can be claimed again.
+    """
+
+    claimable = RegradeJob.objects.filter(pk=job.pk, status=job.status, updated_at=job.updated_at)
+    if not claimable.update(status=RegradeJob.RUNNING, updated_at=timezone.now()):
+        return False
+
+    job.refresh_from_db()
+    return True
+
+
+def run_regrade_jobs(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Run every pending regrade job, and resume the running jobs whose worker stopped.
+
+    Args:
+        chunk_size (int): The number of submissions regraded per transaction.
+
+    Returns:
+        int: The number of jobs run.
+    """
+
+    stale = RegradeJob.objects.filter(status=RegradeJob.RUNNING, updated_at__lt=timezone.now() - STALE_AFTER)
+    pending = RegradeJob.objects.filter(status=RegradeJob.PENDING)
+    count = 0
+
+    for job in list(stale.order_by("id")) + list(pending.order_by("id")):
+        if claim_job(job):
+            run_regrade_job(job, chunk_size=chunk_size)
+            count += 1
+
+    return count
+
+
+def regrade_submissions(submissions, chunk_size=2000):
+    """
+    Regrade submissions against the current answer keys, in bulk and outside of any job, as a backfill or an import
+    does. Submissions stored in the selection table are graded by the database in one statement where it supports it,
+    the others in chunks per lesson.
+
+    Args:
+        submissions (QuerySet): The submissions to regrade.
+        chunk_size (int): The number of submissions graded per chunk in Python.
+
+    Returns:
+        int: The number of submissions whose grade changed.
+    """
+
+    changed = 0
+    # Read before the grades change, the submissions may be selected by their grade
+    lesson_ids = set(submissions.order_by().values_list("lesson_id", flat=True).distinct())
+
+    if sql_grading.supported():
+        with transaction.atomic():
+            changed += sql_grading.update_grades_in_sql(submissions)
+        submissions = submissions.filter(IN_PYTHON)
+
+    for lesson_id in submissions.order_by().values_list("lesson_id", flat=True).distinct():
+        answer_key = answer_key_for_lesson(lesson_id)
+        last_id = 0
+
+        while True:
+            chunk = submissions.filter(lesson_id=lesson_id, id__gt=last_id).order_by("id")
+            submission_grades = list(chunk.values_list("id", "grade")[:chunk_size])
+            if not submission_grades:
+                break
+
+            updated = regrade_chunk(answer_key, submission_grades)
+            Submission.objects.bulk_update(updated, ["grade"])
+            changed += len(updated)
+            last_id = submission_grades[-1][0]
+
+    if changed:
+        invalidate_leaderboard(*lesson_ids)
+
+    return changed
@@ -0,0 +1,431 @@
+"""
+This module contains the full-text search of courses and lessons.
+
+Course names and descriptions and lesson titles and contents are indexed in one table, `onlinecourse_search`, keyed by
+a row ID derived from the model and the primary key, see `document_rowid`:
+
+    SQLite       an FTS5 virtual table, ranked with bm25
+    PostgreSQL   a table with a weighted `tsvector` column generated from the text and a GIN index, ranked with
+                 ts_rank_cd
+
+Titles weigh more than bodies. The index is kept current by the signals of `Course` and `Lesson`, and by the bulk
+paths that bypass them, such as the content import, through `update_index`. `reindex` rebuilds it from scratch, see
+the `reindex_search` command. Other databases, or SQLite built without FTS5, fall back to `icontains` scans.
+
+A query is split into words that must all match, the last one as a prefix, so results follow the learner typing. Words
+are not stemmed, a stemmed prefix such as "decorat" would not match the stem "decor" of "decorators".
+
+`Classes`:
+
+    SearchResult:
+        A course or lesson matching a query.
+
+    SearchPage:
+        A page of results.
+
+`Functions`:
+
+    supported(connection: BaseDatabaseWrapper) -> bool:
+        Tells whether the database can hold the full-text index.
+
+    create_index(connection: BaseDatabaseWrapper) -> None:
+        Creates the index table if it does not exist.
+
+    drop_index(connection: BaseDatabaseWrapper) -> None:
+        Drops the index table.
+
+    update_index(objects: Iterable[Model]) -> int:
+        Indexes or reindexes courses and lessons.
+
+    remove_from_index(objects: Iterable[Model]) -> None:
+        Removes courses and lessons from the index.
+
+    reindex(chunk_size: int, using: str | None, apps: Apps | None) -> Dict[str, int]:
+        Rebuilds the whole index.
+
+    search(query: str, page: int, per_page: int) -> SearchPage:
+        Returns a page of the courses and lessons matching a query, best first.
+"""
+
+import itertools
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.db import connections, router, transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.models import Q
+
+from .models import Course, Lesson
+
+TABLE = "onlinecourse_search"
+
+# The indexed title and body of every model, the order of the models gives the last digits of the row IDs
+DOCUMENT_FIELDS = {Course: ("name", "description"), Lesson: ("title", "content")}
+MODELS = list(DOCUMENT_FIELDS)
+
+KINDS = {Course: "course", Lesson: "lesson"}
+
+# Titles weigh more than bodies: 10 times in the bm25 of SQLite, through the A and B weights in PostgreSQL
+TITLE_WEIGHT = 10.0
+
+MAX_TERMS = 10
+SNIPPET_WORDS = 16
+DEFAULT_PER_PAGE = 20
+DEFAULT_CHUNK_SIZE = 2000
+
+# The (alias, name) of the databases known to hold the index
+_ready_databases = set()
+
+CREATE_SQL = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    ],
+    "postgresql": [
+        f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+        "rowid bigint PRIMARY KEY, title text NOT NULL, body text NOT NULL, "
+        "document tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')) STORED)",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING GIN (document)",
+    ],
+}
+
+SEARCH_SQL = {
+    "sqlite": (
+        f"SELECT rowid, snippet({TABLE}, 1, '', '', '…', {SNIPPET_WORDS}) FROM {TABLE} "
+        f"WHERE {TABLE} MATCH %s ORDER BY bm25({TABLE}, {TITLE_WEIGHT}, 1.0), rowid LIMIT %s OFFSET %s"
+    ),
+    "postgresql": (
+        "SELECT rowid, ts_headline('simple', body, query, "
+        f"'MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}, StartSel=\"\", StopSel=\"\"') "
+        f"FROM {TABLE}, to_tsquery('simple', %s) AS query "
+        "WHERE document @@ query ORDER BY ts_rank_cd(document, query) DESC, rowid LIMIT %s OFFSET %s"
+    ),
+}
+
+# The primary keys of the matching documents of one model, `%%` being the modulo escaped for the parameters
+MATCH_SQL = {
+    "sqlite": f"SELECT rowid / {{models}} FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid %% {{models}} = {{index}}",
+    "postgresql": (
+        f"SELECT rowid / {{models}} FROM {TABLE} "
+        "WHERE document @@ to_tsquery('simple', %s) AND rowid %% {models} = {index}"
+    ),
+}
+
+
+class SearchResult(NamedTuple):
+    """
+    A course or lesson matching a query.
+
+    Attributes:
+        kind (str): "course" or "lesson".
+        course (Course): The course, or the course of the lesson.
+        lesson (Lesson | None): The lesson, None for a course.
+        snippet (str): The part of the description or content that matches best.
+    """
+
+    kind: str
+    course: Course
+    lesson: Optional[Lesson]
+    snippet: str
+
+
+class SearchPage(NamedTuple):
+    """
+    A page of results, without a total count, which would cost a scan of every match.
+
+    Attributes:
+        results (List[SearchResult]): The results of the page, best first.
+        number (int): The page number, from 1.
+        has_next (bool): Whether another page follows.
+    """
+
+    results: List[SearchResult]
+    number: int
+    has_next: bool
+
+
+def supported(connection: BaseDatabaseWrapper) -> bool:
+    """
+    Tell whether the database can hold the full-text index: PostgreSQL, or SQLite built with FTS5, as the builds
+    shipped with Python are.
+    """
+
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor != "sqlite":
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return ("ENABLE_FTS5",) in cursor.fetchall()
+
+
+def create_index(connection: BaseDatabaseWrapper):
+    """
+    Create the index table if the database supports it and it does not exist.
+    """
+
+    if not supported(connection):
+        return
+
+    with connection.cursor() as cursor:
+        for sql in CREATE_SQL[connection.vendor]:
+            cursor.execute(sql)
+
+
+def drop_index(connection: BaseDatabaseWrapper):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def index_ready(connection: BaseDatabaseWrapper) -> bool:
+    """
+    Tell whether the database holds the index, remembered once it does so searches do not look it up again.
+    """
+
+    key = (connection.alias, connection.settings_dict["NAME"])
+    if key not in _ready_databases:
+        if not supported(connection) or TABLE not in connection.introspection.table_names():
+            return False
+        _ready_databases.add(key)
+    return True
+
+
+def document_rowid(model, pk: int) -> int:
+    return pk * len(MODELS) + MODELS.index(model)
+
+
+def document_key(rowid: int) -> Tuple[type, int]:
+    return MODELS[rowid % len(MODELS)], rowid // len(MODELS)
+
+
+def write_connection() -> Optional[BaseDatabaseWrapper]:
+    connection = connections[router.db_for_write(Course)]
+    return connection if index_ready(connection) else None
+
+
+def chunked(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def write_rows(cursor, rows: List[Tuple[int, str, str]]):
+    """
+    Replace the index rows of documents, given as (row ID, title, body) tuples.
+    """
+
+    placeholders = ", ".join(["%s"] * len(rows))
+    cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", [row[0] for row in rows])
+    cursor.executemany(f"INSERT INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)", rows)
+
+
+def update_index(objects: Iterable, chunk_size: int = 500) -> int:
+    """
+    Index or reindex courses and lessons, for instance after they were written with `bulk_create`.
+
+    Args:
+        objects (Iterable[Course | Lesson]): The courses and lessons, or a queryset of either.
+        chunk_size (int): The number of documents written per statement.
+
+    Returns:
+        int: The number of indexed documents, 0 when the database has no index.
+    """
+
+    connection = write_connection()
+    if connection is None:
+        return 0
+
+    count = 0
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for chunk in chunked(objects, chunk_size):
+            rows = []
+            for obj in chunk:
+                title_field, body_field = DOCUMENT_FIELDS[type(obj)]
+                title, body = getattr(obj, title_field) or "", getattr(obj, body_field) or ""
+                rows.append((document_rowid(type(obj), obj.pk), title, body))
+            write_rows(cursor, rows)
+            count += len(rows)
+
+    return count
+
+
+def remove_from_index(objects: Iterable):
+    """
+    Remove courses and lessons from the index.
+    """
+
+    connection = write_connection()
+    if connection is None:
+        return
+
+    rowids = [document_rowid(type(obj), obj.pk) for obj in objects]
+    with connection.cursor() as cursor:
+        for chunk in chunked(rowids, 500):
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def reindex(chunk_size: int = DEFAULT_CHUNK_SIZE, using: Optional[str] = None, apps=None) -> Dict[str, int]:
+    """
+    Rebuild the whole index, in one transaction, creating its table when missing.
+
+    Args:
+        chunk_size (int): The number of rows read per query and written per statement.
+        using (str, optional): The database alias, the one courses are written to by default.
+        apps (Apps, optional): The registry the courses and lessons are read with, the historical one of a migration.
+            The current models by default.
+
+    Returns:
+        Dict[str, int]: The number of indexed documents per kind, empty when the database has no index.
+    """
+
+    connection = connections[using or router.db_for_write(Course)]
+    counts = {}
+
+    with transaction.atomic(using=connection.alias):
+        create_index(connection)
+        if not supported(connection):
+            return counts
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+
+            for model, (title_field, body_field) in DOCUMENT_FIELDS.items():
+                source = model if apps is None else apps.get_model(model._meta.app_label, model._meta.model_name)
+                rows = source.objects.using(connection.alias).order_by("pk").values_list("pk", title_field, body_field)
+                counts[KINDS[model]] = 0
+                for chunk in chunked(rows.iterator(chunk_size=chunk_size), chunk_size):
+                    cursor.executemany(
+                        f"INSERT INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                        [(document_rowid(model, pk), title or "", body or "") for pk, title, body in chunk],
+                    )
+                    counts[KINDS[model]] += len(chunk)
+
+            if connection.vendor == "sqlite":
+                # Merges the b-trees written by the inserts, which makes the queries that follow faster
+                cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+    return counts
+
+
+def query_terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def match_expression(vendor: str, terms: List[str]) -> str:
+    """
+    Build the full-text query matching every term, the last one as a prefix. Terms are quoted, so operators typed by
+    the learner are matched as words.
+    """
+
+    if vendor == "sqlite":
+        return " ".join(f'"{term}"' for term in terms) + "*"
+    return " & ".join(f"'{term}'" for term in terms) + ":*"
+
+
+def load_results(ranked: List[Tuple[int, str]]) -> List[SearchResult]:
+    """
+    Load the courses and lessons of ranked (row ID, snippet) pairs with two queries, keeping their order.
+    """
+
+    keys = [document_key(rowid) for rowid, _ in ranked]
+    courses = Course.objects.in_bulk([pk for model, pk in keys if model is Course])
+    lessons = Lesson.objects.select_related("course").in_bulk([pk for model, pk in keys if model is Lesson])
+
+    results = []
+    for (model, pk), (_, snippet) in zip(keys, ranked):
+        if model is Course and pk in courses:
+            results.append(SearchResult(KINDS[Course], courses[pk], None, snippet))
+        elif model is Lesson and pk in lessons:
+            results.append(SearchResult(KINDS[Lesson], lessons[pk].course, lessons[pk], snippet))
+
+    return results
+
+
+def full_text_search(connection, terms: List[str], limit: int, offset: int) -> List[SearchResult]:
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL[connection.vendor], [match_expression(connection.vendor, terms), limit, offset])
+        return load_results(cursor.fetchall())
+
+
+def icontains_filter(fields: Tuple[str, str], terms: List[str]) -> Q:
+    title_field, body_field = fields
+    condition = Q()
+    for term in terms:
+        condition &= Q(**{f"{title_field}__icontains": term}) | Q(**{f"{body_field}__icontains": term})
+    return condition
+
+
+def snippet_of(text: str, terms: List[str]) -> str:
+    words = text.split()
+    start = next((index for index, word in enumerate(words) if any(term in word.lower() for term in terms)), 0)
+    start = max(0, start - SNIPPET_WORDS // 2)
+    snippet = " ".join(words[start : start + SNIPPET_WORDS])
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_WORDS < len(words) else "")
+
+
+def icontains_search(terms: List[str], limit: int, offset: int) -> List[SearchResult]:
+    """
+    Search with `icontains` scans, courses first, for databases without a full-text index.
+    """
+
+    courses = Course.objects.filter(icontains_filter(DOCUMENT_FIELDS[Course], terms)).order_by("pk")
+    lessons = Lesson.objects.filter(icontains_filter(DOCUMENT_FIELDS[Lesson], terms)).select_related("course")
+
+    results = [
+        SearchResult(KINDS[Course], course, None, snippet_of(course.description, terms))
+        for course in courses[: offset + limit]
+    ]
+    if len(results) < offset + limit:
+        results += [
+            SearchResult(KINDS[Lesson], lesson.course, lesson, snippet_of(lesson.content, terms))
+            for lesson in lessons.order_by("pk")[: offset + limit - len(results)]
+        ]
+
+    return results[offset:]
+
+
+def search(query: str, page: int = 1, per_page: int = DEFAULT_PER_PAGE, full_text: bool = True) -> SearchPage:
+    """
+    Return a page of the courses and lessons matching a query, best first.
+
+    Args:
+        query (str): The text typed by the learner.
+        page (int): The page number, from 1.
+        per_page (int): The number of results per page.
+        full_text (bool): Whether to use the full-text index when the database has one, `icontains` scans otherwise.
+
+    Returns:
+        SearchPage: The page. A query without words matches nothing.
+    """
+
+    terms = query_terms(query)
+    if not terms:
+        return SearchPage([], page, False)
+
+    # One more result than the page holds tells whether another page follows
+    offset, limit = (page - 1) * per_page, per_page + 1
+    connection = connections[router.db_for_read(Lesson)]
+
+    if full_text and index_ready(connection):
+        results = full_text_search(connection, terms, limit, offset)
+    else:
+        results = icontains_search(terms, limit, offset)
+
+    return SearchPage(results[:per_page], page, len(results) > per_page)
+
+
+def matching_pks(model, query: str) -> Optional[Tuple[str, List]]:
+    """
+    Return the SQL selecting the primary keys of the objects of a model matching a query, with its parameters, for a
+    subquery, or None when the database has no index.
+    """
+
+    connection = connections[router.db_for_read(model)]
+    terms = query_terms(query)
+    if not terms or not index_ready(connection):
+        return None
+
+    sql = MATCH_SQL[connection.vendor].format(models=len(MODELS), index=MODELS.index(model))
+    return sql, [match_expression(connection.vendor, terms)]
@@ -0,0 +1,172 @@
+"""
+This module contains the packed storage of the choices selected in a submission.
+
+A submission used to keep its selected choices in the many-to-many table, one row of two foreign keys, plus the row's
+own ID and two index entries, per selected choice. A quiz of 20 questions thus wrote some 20 rows and 40 index entries,
+and reading a submission back joined the table. Packed, the selected choice IDs are sorted and stored with the
+submission itself as one small binary value:
+
+    [item width in bytes, 4 or 8][choice IDs as little-endian unsigned integers of that width...]
+
+IDs are stored on 4 bytes while they fit, which is the case for the first four billion choices, so a selection of 20
+choices takes 81 bytes in the submission row. Which storage new submissions use is set by `SUBMISSION_STORAGE` in the
+settings, the many-to-many table unless packed storage is opted into, and submissions stored either way are read the
+same way, see `Submission.selected_choice_ids`. The `pack_selections` command moves the existing selections.
+
+`Functions`:
+
+    storage_mode() -> str:
+        Returns the storage new submissions use.
+
+    pack_choice_ids(choice_ids: Iterable[int]) -> bytes:
+        Packs selected choice IDs into the stored form.
+
+    unpack_choice_ids(data: bytes) -> List[int]:
+        Unpacks stored choice IDs.
+
+    pack_selections(submission_model: Type[Model], batch_size: int) -> int:
+        Moves the selections stored in the many-to-many table into the packed form, batch by batch.
+
+    unpack_selections(submission_model: Type[Model], batch_size: int) -> int:
+        Moves packed selections back into the many-to-many table, batch by batch.
+"""
+
+import sys
+from array import array
+from typing import Iterable, List, Type
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Model
+
+M2M = "m2m"
+PACKED = "packed"
+
+# Typecodes of the unsigned integer arrays per item width, the width of the C types varies across platforms
+TYPECODES = {array(code).itemsize: code for code in ("L", "I", "Q")}
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def storage_mode() -> str:
+    """
+    Return the storage new submissions use, "m2m" or "packed".
+    """
+
+    return getattr(settings, "SUBMISSION_STORAGE", M2M)
+
+
+def pack_choice_ids(choice_ids: Iterable[int]) -> bytes:
+    """
+    Pack selected choice IDs, sorted and without duplicates.
+    """
+
+    choice_ids = sorted(set(map(int, choice_ids)))
+    width = 4 if not choice_ids or choice_ids[-1] < 2**32 else 8
+
+    packed = array(TYPECODES[width], choice_ids)
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    return bytes([width]) + packed.tobytes()
+
+
+def unpack_choice_ids(data: bytes) -> List[int]:
+    """
+    Unpack choice IDs packed by `pack_choice_ids`.
+    """
+
+    data = bytes(data)
+    if not data:
+        return []
+
+    packed = array(TYPECODES[data[0]])
+    packed.frombytes(data[1:])
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    return packed.tolist()
+
+
+def pack_selections(submission_model: Type[Model], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Pack the selections of the submissions stored in the many-to-many table and delete their rows.
+
+    Every batch is committed on its own, so the table is never locked for long and an interrupted run resumes where it
+    stopped.
+
+    Args:
+        submission_model (Type[Model]): The Submission model.
+        batch_size (int): The number of submissions packed per transaction.
+
+    Returns:
+        int: The number of submissions packed.
+    """
+
+    through = submission_model.choices.through
+    packed = 0
+    last_id = 0
+
+    while True:
+        with transaction.atomic():
+            submission_ids = list(
+                submission_model.objects.filter(id__gt=last_id, packed_choices__isnull=True)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not submission_ids:
+                return packed
+
+            selections = {submission_id: [] for submission_id in submission_ids}
+            rows = through.objects.filter(submission_id__in=submission_ids)
+            for submission_id, choice_id in rows.values_list("submission_id", "choice_id"):
+                selections[submission_id].append(choice_id)
+
+            submissions = [
+                submission_model(id=submission_id, packed_choices=pack_choice_ids(choice_ids))
+                for submission_id, choice_ids in selections.items()
+            ]
+            submission_model.objects.bulk_update(submissions, ["packed_choices"])
+            rows.delete()
+
+        packed += len(submission_ids)
+        last_id = submission_ids[-1]
+
+
+def unpack_selections(submission_model: Type[Model], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Move packed selections back into the many-to-many table, the reverse of `pack_selections`.
+
+    Args:
+        submission_model (Type[Model]): The Submission model.
+        batch_size (int): The number of submissions unpacked per transaction.
+
+    Returns:
+        int: The number of submissions unpacked.
+    """
+
+    through = submission_model.choices.through
+    unpacked = 0
+
+    while True:
+        with transaction.atomic():
+            submissions = list(
+                submission_model.objects.filter(packed_choices__isnull=False)
+                .order_by("id")
+                .values_list("id", "packed_choices")[:batch_size]
+            )
+            if not submissions:
+                return unpacked
+
+            through.objects.bulk_create(
+                [
+                    through(submission_id=submission_id, choice_id=choice_id)
+                    for submission_id, data in submissions
+                    for choice_id in unpack_choice_ids(data)
+                ],
+                batch_size=batch_size,
+            )
+            submission_ids = [submission_id for submission_id, _ in submissions]
+            submission_model.objects.filter(id__in=submission_ids).update(packed_choices=None)
+
+        unpacked += len(submissions)
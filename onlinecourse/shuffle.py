@@ -0,0 +1,130 @@
+"""
+This module contains the shuffle-order engine of the quiz pages.
+
+The order in which a learner sees the questions of a lesson, and the choices of every question, is drawn from a
+`random.Random` instance private to the call and seeded with the learner, the lesson and the attempt number. Nothing
+touches the global `random` state, so concurrent requests cannot disturb each other's order, and the same attempt always
+gets the same order whatever the day.
+
+The order is stored with the attempt as an array of 16-bit indexes into the questions and choices sorted by ID:
+
+    [question count, question indexes..., then per question in quiz order: choice count, choice indexes...]
+
+so the result page shows the quiz exactly as it was taken without drawing it again. The quiz API payload lists
+questions and choices in the same ID order, so the pages apply an order to it directly.
+
+`Functions`:
+
+    draw_order(user_id: int, lesson_id: int, attempt_no: int, choice_counts: List[int]) -> QuizOrder:
+        Draws the question and choice order of an attempt.
+
+    pack_order(order: QuizOrder) -> bytes:
+        Packs an order into the compact form stored with the attempt.
+
+    unpack_order(data: bytes) -> QuizOrder:
+        Unpacks a stored order.
+
+    matches(order: QuizOrder, choice_counts: List[int]) -> bool:
+        Checks that an order still fits the questions and choices of a lesson.
+"""
+
+import random
+import sys
+from array import array
+from typing import List, NamedTuple
+
+
+class QuizOrder(NamedTuple):
+    """
+    The order of a quiz.
+
+    Attributes:
+        questions (List[int]): The indexes of the questions, sorted by ID, in quiz order.
+        choices (List[List[int]]): Per question in quiz order, the indexes of its choices, sorted by ID, in quiz order.
+    """
+
+    questions: List[int]
+    choices: List[List[int]]
+
+
+def draw_order(user_id: int, lesson_id: int, attempt_no: int, choice_counts: List[int]) -> QuizOrder:
+    """
+    Draw the question and choice order of an attempt.
+
+    Questions are always shuffled. The choices of a question are only shuffled when it has more than two, so true or
+    false questions keep their order.
+
+    Args:
+        user_id (int): The ID of the learner.
+        lesson_id (int): The ID of the lesson.
+        attempt_no (int): The number of the attempt.
+        choice_counts (List[int]): The number of choices of every question, with questions sorted by ID.
+
+    Returns:
+        QuizOrder: The order of the quiz.
+    """
+
+    rng = random.Random(f"{user_id}-{lesson_id}-{attempt_no}")
+
+    question_order = list(range(len(choice_counts)))
+    rng.shuffle(question_order)
+
+    choice_orders = []
+    for index in question_order:
+        choices = list(range(choice_counts[index]))
+        if len(choices) > 2:
+            rng.shuffle(choices)
+        choice_orders.append(choices)
+
+    return QuizOrder(question_order, choice_orders)
+
+
+def pack_order(order: QuizOrder) -> bytes:
+    """
+    Pack an order into an array of little-endian 16-bit indexes.
+    """
+
+    packed = array("H", [len(order.questions), *order.questions])
+    for choices in order.choices:
+        packed.append(len(choices))
+        packed.extend(choices)
+
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    return packed.tobytes()
+
+
+def unpack_order(data: bytes) -> QuizOrder:
+    """
+    Unpack an order packed by `pack_order`.
+    """
+
+    packed = array("H")
+    packed.frombytes(bytes(data))
+
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    question_count = packed[0]
+    questions = packed[1 : question_count + 1].tolist()
+    choices = []
+
+    position = question_count + 1
+    for _ in range(question_count):
+        choice_count = packed[position]
+        choices.append(packed[position + 1 : position + 1 + choice_count].tolist())
+        position += choice_count + 1
+
+    return QuizOrder(questions, choices)
+
+
+def matches(order: QuizOrder, choice_counts: List[int]) -> bool:
+    """
+    Check that an order still fits the questions and choices of a lesson, which may have been edited since.
+    """
+
+    return len(order.questions) == len(choice_counts) and all(
+        len(choices) == choice_counts[index] for index, choices in zip(order.questions, order.choices)
+    )
+
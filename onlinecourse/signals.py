@@ -1,10 +1,14 @@
 import logging
 
-from django.db.models.signals import m2m_changed, post_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import Submission
-from .views import calculate_grade
+from .grading import calculate_grade
+from . import leaderboard, search
+from .models import Choice, Course, Lesson, Question, Submission
+from .regrade import queue_regrade
 
 logger = logging.getLogger(__name__)
 
@@ -14,20 +18,104 @@ def update_submission_grade(sender, instance, created, **kwargs):
     if created and instance.lesson:
         logger.info("Submission created with ID: %s. Calculating initial grade.", instance.id)
 
-        questions = instance.lesson.questions.all()
-        choices = instance.choices.all()
+        # An attempt on a question pool is graded on its sampled questions only
+        questions = instance.attempt.questions()
+        choices = instance.selected_choices
 
         instance.grade, _ = calculate_grade(questions=questions, choices=choices)
         instance.save(update_fields=["grade"])
+        transaction.on_commit(lambda: leaderboard.record_submission(instance))
 
 
 @receiver(m2m_changed, sender=Submission.choices.through)
 def calculate_grade_on_choices_change(sender, instance, action, **kwargs):
-    lesson = instance.lesson
-    questions = lesson.questions.all()
-    choices = instance.choices.all()
+    # The grade only changes once the choices have been changed
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    questions = instance.attempt.questions()
+    choices = instance.selected_choices
 
     logger.info("Calculating grade for Submission ID: %s on action: %s", instance.id, action)
 
     instance.grade, _ = calculate_grade(questions=questions, choices=choices)
     instance.save(update_fields=["grade"])
+    transaction.on_commit(lambda: leaderboard.record_submission(instance))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_version_on_question_change(sender, instance, **kwargs):
+    Lesson.objects.filter(pk=instance.lesson_id).update(version=F("version") + 1)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def bump_version_on_choice_change(sender, instance, **kwargs):
+    # The question may already be deleted, in which case its own signal has bumped the version
+    lesson_id = Question.objects.filter(pk=instance.question_id).values_list("lesson_id", flat=True).first()
+
+    if lesson_id is not None:
+        Lesson.objects.filter(pk=lesson_id).update(version=F("version") + 1)
+
+
+@receiver(pre_save, sender=Question)
+def detect_question_answer_key_change(sender, instance, **kwargs):
+    previous = Question.objects.filter(pk=instance.pk)
+    previous = previous.values_list("lesson_id", "grade", "expect_multiple_answer").first()
+
+    if previous is None:
+        # A new question lowers every quiz grade of its lesson, through the number of questions
+        instance._regrade_lesson_ids = {instance.lesson_id}
+    elif previous != (instance.lesson_id, instance.grade, instance.expect_multiple_answer):
+        # Moving a question changes the answer key of both lessons
+        instance._regrade_lesson_ids = {previous[0], instance.lesson_id}
+    else:
+        instance._regrade_lesson_ids = set()
+
+
+@receiver(pre_save, sender=Choice)
+def detect_choice_answer_key_change(sender, instance, **kwargs):
+    previous = Choice.objects.filter(pk=instance.pk).values("question__lesson_id", "question_id", "is_correct").first()
+    lesson_id = Question.objects.filter(pk=instance.question_id).values_list("lesson_id", flat=True).first()
+
+    if previous is None:
+        # A new choice only changes the grades of multiple-answer questions, through the point per choice
+        instance._regrade_lesson_ids = {lesson_id}
+    elif (previous["question_id"], previous["is_correct"]) != (instance.question_id, instance.is_correct):
+        instance._regrade_lesson_ids = {previous["question__lesson_id"], lesson_id}
+    else:
+        instance._regrade_lesson_ids = set()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Choice)
+def regrade_on_answer_key_change(sender, instance, **kwargs):
+    for lesson_id in getattr(instance, "_regrade_lesson_ids", set()) - {None}:
+        transaction.on_commit(lambda lesson_id=lesson_id: queue_regrade(lesson_id))
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Choice)
+def regrade_on_answer_key_deletion(sender, instance, **kwargs):
+    if sender is Question:
+        lesson_id = instance.lesson_id
+    else:
+        lesson_id = Question.objects.filter(pk=instance.question_id).values_list("lesson_id", flat=True).first()
+
+    if lesson_id is not None:
+        transaction.on_commit(lambda: queue_regrade(lesson_id))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    # Saves of other fields, such as a recounted enrollment, leave the indexed text as it is
+    if update_fields is None or set(update_fields) & set(search.DOCUMENT_FIELDS[sender]):
+        search.update_index([instance])
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_from_index([instance])
@@ -0,0 +1,205 @@
+"""
+This module contains the set-based grading of submissions in SQL.
+
+`calculate_grade` grades one submission with several queries per question, and `grade_selection` still needs the
+selections loaded into Python. For submissions whose choices are stored in the selection table, the database can apply
+the same partial-credit rules itself in one statement:
+
+    question_stats   the grade, answer mode, number of choices and number of correct choices of every question
+    selected         per submission and question, the number of selected choices and of selected correct choices
+    answers          every question of a submission's lesson with its counts, and, as a window over the submission,
+                     the number of choices selected in the whole quiz, which tells an empty quiz apart
+    points           the points of every answer, computed with the operations of `calculate_grade` in the same order
+    grades           the truncated mean of the points per submission, the integer `Submission.grade` stores
+
+A report streams the result of the SELECT, a backfill or regrade writes it with one `UPDATE ... FROM`, which only
+touches the submissions whose grade changed. The selection table is the default storage, see `selection.py`, so every
+submission is graded here unless packed storage was opted into. Packed selections cannot be read in portable SQL, so
+packed submissions are left out and graded with `grade_selection` instead, which only costs one query per chunk. So
+are the submissions of attempts on a question pool, graded on their sampled questions only, see `pool.py`.
+
+Runs on SQLite 3.33 and later and on PostgreSQL. `supported()` tells whether the current database can run it.
+
+`Functions`:
+
+    supported() -> bool:
+        Tells whether the database can grade in SQL.
+
+    iter_sql_grades(submissions: QuerySet, chunk_size: int) -> Iterator[Tuple[int, int]]:
+        Streams the grade of every submission stored in the selection table.
+
+    update_grades_in_sql(submissions: QuerySet) -> int:
+        Writes the grade of every submission stored in the selection table whose grade changed.
+"""
+
+from typing import Iterator, List, Tuple
+
+from django.db import connection
+from django.db.models import QuerySet
+
+from .grading import SCORE_IF_EMPTY
+from .models import Attempt, Choice, Question, Submission
+
+GRADES_SQL = """
+WITH targets AS (
+    SELECT s.id, s.lesson_id
+    FROM {submission} s
+    LEFT JOIN {attempt} a ON a.id = s.attempt_id
+    WHERE s.id IN ({submission_ids}) AND s.packed_choices IS NULL AND a.question_ids IS NULL
+),
+question_stats AS (
+    SELECT
+        q.id AS question_id,
+        q.lesson_id,
+        q.grade,
+        q.expect_multiple_answer AS multiple,
+        COUNT(c.id) AS choice_count,
+        COALESCE(SUM(CASE WHEN c.is_correct THEN 1 ELSE 0 END), 0) AS correct_count
+    FROM {question} q
+    LEFT JOIN {choice} c ON c.question_id = q.id
+    WHERE q.lesson_id IN (SELECT lesson_id FROM targets)
+    GROUP BY q.id, q.lesson_id, q.grade, q.expect_multiple_answer
+),
+selected AS (
+    SELECT
+        sc.submission_id,
+        c.question_id,
+        COUNT(*) AS selected_count,
+        SUM(CASE WHEN c.is_correct THEN 1 ELSE 0 END) AS selected_correct
+    FROM {selection} sc
+    JOIN {choice} c ON c.id = sc.choice_id
+    WHERE sc.submission_id IN (SELECT id FROM targets)
+    GROUP BY sc.submission_id, c.question_id
+),
+answers AS (
+    SELECT
+        t.id AS submission_id,
+        qs.question_id,
+        qs.grade,
+        qs.multiple,
+        qs.correct_count,
+        CAST(qs.grade AS DOUBLE PRECISION) / CASE WHEN qs.choice_count > 0 THEN qs.choice_count ELSE 1 END AS point,
+        COALESCE(sel.selected_count, 0) AS selected_count,
+        COALESCE(sel.selected_correct, 0) AS selected_correct,
+        SUM(COALESCE(sel.selected_count, 0)) OVER (PARTITION BY t.id) AS answered
+    FROM targets t
+    LEFT JOIN question_stats qs ON qs.lesson_id = t.lesson_id
+    LEFT JOIN selected sel ON sel.submission_id = t.id AND sel.question_id = qs.question_id
+),
+points AS (
+    SELECT
+        submission_id,
+        question_id,
+        CASE
+            WHEN question_id IS NULL THEN NULL
+            WHEN answered = 0 THEN CASE WHEN multiple THEN {score_if_empty} ELSE 0 END
+            WHEN multiple THEN CASE
+                WHEN selected_count = 0 THEN {score_if_empty}
+                WHEN selected_count = correct_count THEN CASE
+                    WHEN selected_correct = correct_count THEN grade
+                    ELSE grade - (selected_count - selected_correct) * point
+                END
+                WHEN selected_count < correct_count THEN {score_if_empty} + selected_correct * point
+                ELSE {score_if_empty} + selected_correct * point - (selected_count - selected_correct) * point
+            END
+            WHEN selected_correct = correct_count AND selected_count = correct_count THEN grade
+            ELSE 0
+        END AS points
+    FROM answers
+),
+grades AS (
+    SELECT
+        submission_id,
+        {truncate} AS grade
+    FROM points
+    GROUP BY submission_id
+)
+SELECT submission_id, grade FROM grades
+"""
+
+# The mean of the points, as a float like in Python, then truncated toward zero like `int()`
+MEAN_POINTS = (
+    "COALESCE(CAST(SUM(points) AS DOUBLE PRECISION), 0) / "
+    "CASE WHEN COUNT(question_id) > 0 THEN COUNT(question_id) ELSE 1 END"
+)
+
+# PostgreSQL rounds when casting to an integer, SQLite truncates
+TRUNCATE = {
+    "postgresql": "CAST(TRUNC({}) AS INTEGER)",
+    "sqlite": "CAST({} AS INTEGER)",
+}
+
+
+def supported() -> bool:
+    """
+    Tell whether the database can grade in SQL. SQLite needs window functions and `UPDATE ... FROM`, from 3.33 on.
+    """
+
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 33)
+    return connection.vendor in TRUNCATE
+
+
+def grades_query(submissions: QuerySet) -> Tuple[str, List]:
+    """
+    Build the query selecting the (submission_id, grade) rows of the submissions.
+    """
+
+    submission_ids, params = submissions.order_by().values("id").query.sql_with_params()
+    quote = connection.ops.quote_name
+
+    sql = GRADES_SQL.format(
+        submission=quote(Submission._meta.db_table),
+        attempt=quote(Attempt._meta.db_table),
+        question=quote(Question._meta.db_table),
+        choice=quote(Choice._meta.db_table),
+        selection=quote(Submission.choices.through._meta.db_table),
+        submission_ids=submission_ids,
+        score_if_empty=SCORE_IF_EMPTY,
+        truncate=TRUNCATE[connection.vendor].format(MEAN_POINTS),
+    )
+    return sql, list(params)
+
+
+def iter_sql_grades(submissions: QuerySet, chunk_size: int = 2000) -> Iterator[Tuple[int, int]]:
+    """
+    Stream the grades of submissions computed in SQL.
+
+    Args:
+        submissions (QuerySet): The submissions to grade. Packed ones are left out.
+        chunk_size (int): The number of rows fetched at a time.
+
+    Yields:
+        Tuple[int, int]: (submission ID, grade) pairs, ordered by submission ID.
+    """
+
+    sql, params = grades_query(submissions)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql + "ORDER BY submission_id", params)
+        while rows := cursor.fetchmany(chunk_size):
+            yield from rows
+
+
+def update_grades_in_sql(submissions: QuerySet) -> int:
+    """
+    Write the grades of submissions computed in SQL with one statement.
+
+    Args:
+        submissions (QuerySet): The submissions to grade. Packed ones are left out.
+
+    Returns:
+        int: The number of submissions whose grade changed.
+    """
+
+    sql, params = grades_query(submissions)
+    table = connection.ops.quote_name(Submission._meta.db_table)
+
+    # The query is a subquery rather than a prefix of the UPDATE, so the driver reports the number of changed rows
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET grade = grades.grade FROM ({sql}) AS grades "
+            f"WHERE {table}.id = grades.submission_id AND ({table}.grade IS NULL OR {table}.grade <> grades.grade)",
+            params,
+        )
+        return cursor.rowcount
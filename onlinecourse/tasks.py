@@ -0,0 +1,314 @@
+"""
+This module contains the background task queue of the online course application.
+
+Tasks are rows of the `Task` table, so the queue needs no broker: a view or a signal enqueues a call with `enqueue`, the
+row is committed with the rest of the request's transaction, and a `run_worker` process claims and runs it in a thread
+or process pool. Failed runs are retried with an exponential backoff, tasks may carry an idempotency key that
+collapses duplicates while they wait, and every run records its duration.
+
+With `TASK_QUEUE["EAGER"]` enabled, tasks run in the process that enqueues them once its transaction commits, which
+keeps development setups without a worker working.
+
+`Classes`:
+
+    Worker:
+        Claims due tasks and runs them in a thread or process pool.
+
+`Functions`:
+
+    enqueue(func: Callable | str, *args, key: str, max_attempts: int, delay: float, **kwargs) -> Task | None:
+        Defers a call to the task queue.
+
+    run_task(task_id: int) -> str:
+        Runs a claimed task and records its outcome.
+
+    task_metrics() -> List[dict]:
+        Summarizes the runs of every task name.
+
+    refresh_enrollment_count(course_id: int):
+        Recounts the enrollments of a course.
+"""
+
+import logging
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Course, Enrollment, Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "EAGER": False,
+    "POOL": "thread",  # "thread" or "process"
+    "CONCURRENCY": 4,
+    "MAX_ATTEMPTS": 3,
+    "RETRY_BACKOFF_SECONDS": 10,
+    "POLL_INTERVAL_SECONDS": 1,
+    "STALE_AFTER_SECONDS": 15 * 60,
+}
+
+
+def get_task_queue_settings():
+    """
+    Return the `TASK_QUEUE` setting completed with the defaults.
+    """
+
+    return {**DEFAULT_SETTINGS, **getattr(settings, "TASK_QUEUE", {})}
+
+
+def task_name(func):
+    """
+    Return the dotted path of a module-level function, the form in which tasks are stored.
+    """
+
+    if isinstance(func, str):
+        return func
+
+    if "<" in func.__qualname__:
+        raise ValueError(f"{func.__qualname__} cannot be enqueued, only module-level functions can.")
+
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *args, key=None, max_attempts=None, delay=0, **kwargs):
+    """
+    Defer a call to the task queue.
+
+    The arguments are stored as JSON, so they should be IDs and plain values rather than model instances. The task is
+    only visible to workers once the current transaction commits.
+
+    Args:
+        func (Callable | str): A module-level function, or its dotted path.
+        *args: The positional arguments of the call.
+        key (str): An optional idempotency key. While a task with the same key is pending, it is returned instead of
+            enqueuing a duplicate.
+        max_attempts (int): The number of runs after which a failing task is given up.
+        delay (float): The number of seconds before the task may run.
+        **kwargs: The keyword arguments of the call.
+
+    Returns:
+        Task | None: The enqueued or the pending task with the same key, or None when the call is run eagerly.
+    """
+
+    name = task_name(func)
+    queue_settings = get_task_queue_settings()
+
+    if queue_settings["EAGER"]:
+        transaction.on_commit(lambda: import_string(name)(*args, **kwargs))
+        return None
+
+    task = Task(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        key=key,
+        max_attempts=max_attempts or queue_settings["MAX_ATTEMPTS"],
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+    if key is None:
+        task.save()
+        return task
+
+    try:
+        with transaction.atomic():
+            task.save()
+    except IntegrityError:
+        # A pending task already carries the key
+        return Task.objects.filter(key=key, status=Task.PENDING).first()
+
+    return task
+
+
+def claim_tasks(limit):
+    """
+    Claim up to `limit` due tasks for this worker.
+
+    A task is claimed with a conditional update from PENDING to RUNNING, so two workers polling the same rows never
+    both run a task.
+
+    Returns:
+        List[int]: The IDs of the claimed tasks.
+    """
+
+    due = Task.objects.filter(status=Task.PENDING, run_at__lte=timezone.now()).order_by("run_at", "id")
+    claimed = []
+
+    for task_id in due.values_list("id", flat=True)[: limit * 2]:
+        if Task.objects.filter(pk=task_id, status=Task.PENDING).update(
+            status=Task.RUNNING, started_at=timezone.now()
+        ):
+            claimed.append(task_id)
+            if len(claimed) == limit:
+                break
+
+    return claimed
+
+
+def requeue_stale_tasks(stale_after):
+    """
+    Return running tasks whose worker stopped to the queue.
+
+    Returns:
+        int: The number of requeued tasks.
+    """
+
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+
+    # The key is dropped as a pending task may have taken it since, the requeued task still runs once
+    return Task.objects.filter(status=Task.RUNNING, started_at__lt=cutoff).update(status=Task.PENDING, key=None)
+
+
+def run_task(task_id):
+    """
+    Run a claimed task and record its outcome, its duration, and the retry of a failed run.
+
+    Args:
+        task_id (int): The ID of a task in the RUNNING state.
+
+    Returns:
+        str: The status of the task after the run.
+    """
+
+    close_old_connections()
+
+    try:
+        task = Task.objects.get(pk=task_id)
+        task.attempts += 1
+        started = time.perf_counter()
+
+        try:
+            import_string(task.name)(*task.args, **task.kwargs)
+        except Exception:
+            task.error = traceback.format_exc()
+            task.duration_ms = (time.perf_counter() - started) * 1000
+
+            if task.attempts < task.max_attempts:
+                backoff = get_task_queue_settings()["RETRY_BACKOFF_SECONDS"] * 2 ** (task.attempts - 1)
+                task.status = Task.PENDING
+                task.run_at = timezone.now() + timedelta(seconds=backoff)
+                logger.warning("Task %s (%s) failed, retrying in %ss", task.id, task.name, backoff)
+            else:
+                task.status = Task.FAILED
+                task.finished_at = timezone.now()
+                logger.error("Task %s (%s) failed after %s attempts", task.id, task.name, task.attempts)
+        else:
+            task.duration_ms = (time.perf_counter() - started) * 1000
+            task.status = Task.DONE
+            task.finished_at = timezone.now()
+
+        try:
+            with transaction.atomic():
+                task.save()
+        except IntegrityError:
+            # A task with the same key was enqueued meanwhile and will do the work
+            task.key = None
+            task.save()
+
+        return task.status
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    """
+    Claims due tasks and runs them in a thread or process pool.
+
+    Attributes:
+        pool (str): "thread" for I/O-bound tasks, "process" for CPU-bound ones.
+        concurrency (int): The number of tasks run at once.
+        poll_interval (float): The number of seconds between polls of an empty queue.
+        stale_after (float): Running tasks not finished after this many seconds are requeued at startup.
+    """
+
+    def __init__(self, pool=None, concurrency=None, poll_interval=None, stale_after=None):
+        queue_settings = get_task_queue_settings()
+        self.pool = pool or queue_settings["POOL"]
+        self.concurrency = concurrency or queue_settings["CONCURRENCY"]
+        self.poll_interval = poll_interval if poll_interval is not None else queue_settings["POLL_INTERVAL_SECONDS"]
+        self.stale_after = stale_after if stale_after is not None else queue_settings["STALE_AFTER_SECONDS"]
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def executor(self):
+        if self.pool == "process":
+            # Forked children must open their own database connections
+            connections.close_all()
+            return ProcessPoolExecutor(max_workers=self.concurrency)
+
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="task-worker")
+
+    def run(self, burst=False):
+        """
+        Run tasks until interrupted, or until the queue is empty with `burst`.
+
+        Returns:
+            int: The number of tasks run.
+        """
+
+        requeued = requeue_stale_tasks(self.stale_after)
+        if requeued:
+            logger.info("Worker %s requeued %s stale tasks", self.name, requeued)
+
+        count = 0
+        running = set()
+
+        with self.executor() as executor:
+            while True:
+                free = self.concurrency - len(running)
+                if free:
+                    running.update(executor.submit(run_task, task_id) for task_id in claim_tasks(free))
+
+                if not running:
+                    if burst:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception():
+                        logger.error("Worker %s could not run a task", self.name, exc_info=future.exception())
+                    count += 1
+
+        return count
+
+
+def task_metrics():
+    """
+    Summarize the runs of every task name.
+
+    Returns:
+        List[dict]: Per task name, the `name`, the number of `pending`, `done` and `failed` tasks, and the `avg_ms` and
+        `max_ms` durations of the last run of the tasks.
+    """
+
+    return list(
+        Task.objects.values("name")
+        .annotate(
+            pending=Count("id", filter=Q(status=Task.PENDING)),
+            done=Count("id", filter=Q(status=Task.DONE)),
+            failed=Count("id", filter=Q(status=Task.FAILED)),
+            avg_ms=Avg("duration_ms"),
+            max_ms=Max("duration_ms"),
+        )
+        .order_by("name")
+    )
+
+
+def refresh_enrollment_count(course_id):
+    """
+    Recount the enrollments of a course. Recounting instead of incrementing keeps the count right when the task is
+    retried or runs after other enrollments.
+    """
+
+    Course.objects.filter(pk=course_id).update(total_enrollment=Enrollment.objects.filter(course_id=course_id).count())
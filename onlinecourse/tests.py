@@ -1,5 +1,1775 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import io
+import json
+import logging
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-course = get_object_or_404(Course, pk=course_id)
-submission = get_object_or_404(Submission, pk=submission_id)
-lesson = Lesson.objects.filter(course=course)
\ No newline at end of file
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, router
+from django.db.migrations.loader import MigrationLoader
+from django.template.loader import get_template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import Instructor, User
+from myproject import db_routers
+from myproject.log_formatters import JsonFormatter
+
+from . import drafts, leaderboard, sql_grading, tasks
+from .analytics import analyze_lesson, load_lesson_arrays, score_matrix
+from .api import build_quiz_payload, quiz_payload_etag
+from .archive import archive_attempts, read_archive, restore_archive
+from .authoring import import_questions, parse_questions
+from .benchmarks import (
+    BenchmarkEnv,
+    measure_catalogue,
+    measure_leaderboard,
+    measure_search,
+    measure_startup,
+    run_benchmarks,
+)
+from .catalogue import catalogue_page
+from .content import export_content, import_content
+from .exports import iter_submission_records, stream_submissions
+from .grading import answer_key_for_lesson, calculate_grade, grade_selection, selected_choice_pairs
+from .management.commands.seed_benchmark_data import seed_benchmark_data
+from .models import (
+    Attempt,
+    AttemptSummary,
+    Choice,
+    Course,
+    Lesson,
+    Question,
+    QuizDraft,
+    RegradeJob,
+    Submission,
+    Task,
+)
+from .pagination import EstimatedCountPaginator
+from .profiling import ProfilingMiddleware
+from .pool import allocate, draw_attempt, get_pool
+from .regrade import queue_regrade, regrade_submissions, run_regrade_jobs
+from .search import reindex, search
+from .selection import pack_choice_ids, pack_selections, unpack_choice_ids, unpack_selections
+from .shuffle import draw_order, pack_order, unpack_order
+from .template_cache import app_template_names, warm_template_cache
+from .tasks import Worker, claim_tasks, enqueue, run_task, task_metrics
+
+TINY_SCALE = {"users": 3, "courses": 1, "lessons": 2, "questions": 6, "choices": 4, "attempts": 2}
+
+
+def failing_task():
+    raise ValueError("Task failed")
+
+
+def rename_course(course_id, name):
+    Course.objects.filter(pk=course_id).update(name=name)
+
+
+class GradeSelectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def test_matches_calculate_grade(self):
+        for lesson in Lesson.objects.all():
+            answer_key = answer_key_for_lesson(lesson.id)
+            questions = lesson.questions.all()
+
+            for submission in Submission.objects.filter(lesson=lesson):
+                choices = submission.selected_choices
+                selected_ids = choices.values_list("id", flat=True)
+
+                self.assertEqual(
+                    grade_selection(answer_key, selected_ids), calculate_grade(questions=questions, choices=choices)
+                )
+
+    def test_seeded_grades_are_stored(self):
+        for submission in Submission.objects.all():
+            grade, _ = calculate_grade(submission.lesson.questions.all(), submission.selected_choices)
+            self.assertEqual(submission.grade, int(grade))
+
+    def test_all_empty_selection(self):
+        lesson = Lesson.objects.first()
+        answer_key = answer_key_for_lesson(lesson.id)
+        questions = lesson.questions.all()
+
+        expected = calculate_grade(questions=questions, choices=Choice.objects.none())
+        self.assertEqual(grade_selection(answer_key, []), expected)
+
+
+class BenchmarkRunnerTests(TestCase):
+    def test_reports_latency_and_queries(self):
+        report = run_benchmarks({"tiny": TINY_SCALE}, ["course_list", "submit"], iterations=2, warmup=0)
+
+        self.assertIn("revision", report["meta"])
+        for name in ["course_list", "submit"]:
+            result = report["results"]["tiny"][name]
+            self.assertEqual(result["iterations"], 2)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["queries"]["max"], 0)
+            self.assertNotIn("peak_memory_kb", result)
+
+    def test_reports_peak_memory_of_debug_backfill(self):
+        names = ["backfill_grades", "backfill_grades_debug"]
+        report = run_benchmarks({"tiny": TINY_SCALE}, names, iterations=1, warmup=0)
+
+        results = report["results"]["tiny"]
+        self.assertGreater(results["backfill_grades"]["peak_memory_kb"], 0)
+        # Debug mode keeps every statement of the backfill in memory
+        self.assertGreater(
+            results["backfill_grades_debug"]["peak_memory_kb"], results["backfill_grades"]["peak_memory_kb"]
+        )
+
+
+class SettingsProfileTests(TestCase):
+    def test_prod_profile_disables_debug_overhead(self):
+        from myproject.settings import prod
+
+        self.assertFalse(prod.DEBUG)
+        self.assertEqual(prod.LOGGING["handlers"]["console"]["formatter"], "json")
+        loader, _ = prod.TEMPLATES[0]["OPTIONS"]["loaders"][0]
+        self.assertEqual(loader, "django.template.loaders.cached.Loader")
+
+    def test_json_log_lines(self):
+        record = logging.makeLogRecord(
+            {"name": "onlinecourse", "levelname": "INFO", "msg": "Regraded %s", "args": (3,), "lesson_id": 7}
+        )
+
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry["message"], "Regraded 3")
+        self.assertEqual(entry["lesson_id"], 7)
+        self.assertEqual(entry["level"], "INFO")
+
+
+@override_settings(REPLICA={"ALIAS": "replica", "STICKY_SECONDS": 15, "RETRY_AFTER_SECONDS": 30})
+class ReplicaRoutingTests(TestCase):
+    # The replica is a second SQLite file that replicates nothing, so the rows a page shows tell which database it read
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        db_routers._replica_down_until.clear()
+        self.addCleanup(db_routers._replica_down_until.clear)
+
+        fields = {"image": "course_images/course.png", "description": "", "pub_date": date.today()}
+        Course.objects.create(name="Primary course", slug_name="primary-course", **fields)
+        Course.objects.using("replica").create(name="Replica course", slug_name="replica-course", **fields)
+
+    def test_read_mostly_views_read_from_the_replica(self):
+        response = self.client.get(reverse("onlinecourse:index"))
+        self.assertContains(response, 'data-course-name="replica course"')
+        self.assertNotContains(response, 'data-course-name="primary course"')
+
+        # Writes go to the primary, even for an instance read from the replica
+        with db_routers.replica_reads():
+            course = Course.objects.get(slug_name="replica-course")
+        self.assertEqual(router.db_for_write(Course, instance=course), "default")
+
+    def test_learner_reads_own_writes_after_submit(self):
+        seed_benchmark_data(**TINY_SCALE)
+        env = BenchmarkEnv()
+        details_url = reverse("onlinecourse:course_details", args=(env.course.slug_name,))
+
+        # The course only exists on the primary
+        self.assertEqual(env.client.get(details_url).status_code, 404)
+
+        env.client.get(env.quiz_url(), {"name": env.lesson.title})
+        response = env.client.post(
+            reverse("onlinecourse:submit", args=(env.course.slug_name,)),
+            json.dumps(env.answers()),
+            content_type="application/json",
+        )
+        self.assertEqual(env.client.get(response.json()["quiz_result_url"]).status_code, 200)
+        self.assertEqual(env.client.get(details_url).status_code, 200)
+
+        later = time.time() + 16
+        with mock.patch.object(db_routers.time, "time", return_value=later):
+            self.assertEqual(env.client.get(details_url).status_code, 404)
+
+    @mock.patch.object(drafts, "cache_is_shared", return_value=True)
+    def test_requests_without_writes_do_not_stick_to_the_primary(self, _):
+        cache.clear()
+        seed_benchmark_data(**TINY_SCALE)
+        env = BenchmarkEnv()
+        question_id, choice_ids = next(iter(env.answers()["choices"].items()))
+
+        # The delta stays in the cache until a batch is written
+        env.client.post(
+            reverse("onlinecourse:autosave", args=(env.course.slug_name,)),
+            json.dumps({"lessonTitle": env.lesson.title, "answers": {question_id: choice_ids}}),
+            content_type="application/json",
+        )
+        self.assertNotIn(db_routers.STICKY_SESSION_KEY, env.client.session)
+
+    def test_unavailable_replica_falls_back_to_the_primary(self):
+        replica = connections["replica"]
+        with mock.patch.object(replica, "ensure_connection", side_effect=OperationalError) as ensure_connection:
+            for _ in range(2):
+                response = self.client.get(reverse("onlinecourse:index"))
+                self.assertContains(response, 'data-course-name="primary course"')
+
+        # The replica is not tried again until RETRY_AFTER_SECONDS have passed
+        self.assertEqual(ensure_connection.call_count, 1)
+
+
+class TemplateCacheTests(TestCase):
+    def test_warm_up_compiles_every_app_template(self):
+        names = app_template_names()
+        self.assertIn("onlinecourse/quiz_page.html", names)
+        self.assertIn("getting_started.html", names)
+        self.assertFalse([name for name in names if name.startswith("admin/")])
+
+        self.assertEqual(warm_template_cache(), len(names))
+
+        # Warm templates are not read from disk again
+        with mock.patch("django.template.loaders.filesystem.Loader.get_contents", side_effect=AssertionError):
+            get_template("onlinecourse/quiz_page.html")
+
+
+class StartupTests(TestCase):
+    def test_heavy_modules_are_not_loaded_at_startup(self):
+        report = measure_startup(runs=1)
+
+        self.assertEqual(report["heavy_modules_loaded"], [])
+        self.assertGreater(report["cold_start_ms"], 0)
+        self.assertGreater(report["rss_mb"], 0)
+        self.assertIn("django", report["slowest_imports_ms"])
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.staff = User.objects.create_superuser(email="staff@example.com", password="secret", username="staff")
+        self.client.force_login(self.staff)
+
+    def test_disabled_middleware_is_removed(self):
+        with override_settings(PROFILING={"ENABLED": False}):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: None)
+
+    def test_profiles_are_listed_and_downloaded(self):
+        options = {"ENABLED": True, "SLOW_THRESHOLD_MS": 0, "DIRECTORY": self.directory, "VIEWS": ["profile_list"]}
+
+        with override_settings(PROFILING=options):
+            self.client.get(reverse("profile_list"))
+            response = self.client.get(reverse("profile_list"))
+
+            name = response.context["profiles"][0]["name"]
+            download = self.client.get(reverse("profile_download", args=(name,)), {"format": "collapsed"})
+
+        self.assertEqual(len(response.context["profiles"]), 1)
+        self.assertIn("profile_list", download.content.decode())
+
+
+class LessonAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def test_score_matrix_matches_calculate_grade(self):
+        lesson = Lesson.objects.first()
+        arrays = load_lesson_arrays(lesson.id)
+        scores = score_matrix(arrays)
+
+        for row, submission_id in enumerate(arrays["submission_ids"].tolist()):
+            submission = Submission.objects.get(pk=submission_id)
+            grade, grade_per_question = calculate_grade(lesson.questions.all(), submission.selected_choices)
+
+            self.assertAlmostEqual(scores[row].mean(), grade)
+            for column, question_id in enumerate(arrays["question_ids"].tolist()):
+                self.assertAlmostEqual(scores[row, column] / 100, grade_per_question[question_id])
+
+    def test_analysis_covers_every_question_and_choice(self):
+        lesson = Lesson.objects.first()
+        analysis = analyze_lesson(lesson.id)
+
+        self.assertEqual(analysis["submissions"], lesson.submissions.count())
+        self.assertEqual(sum(analysis["scores"]["histogram"]), lesson.submissions.count())
+        for question in lesson.questions.all():
+            stats = analysis["questions"][question.id]
+            self.assertTrue(0 <= stats["difficulty"] <= 1)
+            self.assertEqual(set(stats["selection_rates"]), set(question.choices.values_list("id", flat=True)))
+
+    def test_choice_change_bumps_lesson_version(self):
+        lesson = Lesson.objects.first()
+        choice = Choice.objects.filter(question__lesson=lesson).first()
+
+        choice.is_correct = not choice.is_correct
+        choice.save()
+
+        lesson.refresh_from_db()
+        self.assertEqual(lesson.version, 2)
+
+    def test_admin_change_forms_show_statistics(self):
+        staff = User.objects.create_superuser(email="staff@example.com", password="secret", username="staff")
+        self.client.force_login(staff)
+        lesson = Lesson.objects.first()
+        question = lesson.questions.first()
+
+        response = self.client.get(reverse("admin:onlinecourse_lesson_change", args=(lesson.id,)))
+        self.assertContains(response, "Discrimination")
+
+        response = self.client.get(reverse("admin:onlinecourse_question_change", args=(question.id,)))
+        self.assertContains(response, "distractor")
+
+
+class SubmissionStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with override_settings(SUBMISSION_STORAGE="m2m"):
+            seed_benchmark_data(**TINY_SCALE)
+
+    def test_pack_round_trip(self):
+        for choice_ids in [[], [3, 1, 2, 3], [1, 2**32 + 5]]:
+            self.assertEqual(unpack_choice_ids(pack_choice_ids(choice_ids)), sorted(set(choice_ids)))
+        self.assertEqual(len(pack_choice_ids(range(20))), 81)
+
+    def test_packing_keeps_selections_and_grades(self):
+        submissions = Submission.objects.order_by("id")
+        selections = {submission.id: submission.selected_choice_ids() for submission in submissions}
+        pairs = list(selected_choice_pairs(submissions))
+
+        self.assertEqual(pack_selections(Submission, batch_size=4), len(selections))
+        self.assertFalse(Submission.choices.through.objects.exists())
+
+        for submission in submissions.all():
+            self.assertEqual(submission.selected_choice_ids(), selections[submission.id])
+            grade, _ = calculate_grade(submission.lesson.questions.all(), submission.selected_choices)
+            self.assertEqual(submission.grade, int(grade))
+
+        # Half packed, half in the selection table, the pairs are still read in submission order
+        unpack_selections(Submission, batch_size=4)
+        half = list(selections)[::2]
+        for submission_id in half:
+            packed_choices = pack_choice_ids(selections[submission_id])
+            Submission.objects.filter(pk=submission_id).update(packed_choices=packed_choices)
+            Submission.choices.through.objects.filter(submission_id=submission_id).delete()
+        self.assertEqual(list(selected_choice_pairs(submissions)), pairs)
+
+        self.assertEqual(unpack_selections(Submission), len(half))
+        self.assertEqual(list(selected_choice_pairs(submissions)), pairs)
+
+    def test_command_packs_and_migration_unpacks(self):
+        selections = {submission.id: submission.selected_choice_ids() for submission in Submission.objects.all()}
+
+        call_command("pack_selections", batch_size=4, stdout=io.StringIO())
+        self.assertFalse(Submission.choices.through.objects.exists())
+
+        # Migrating back before the packed column moves the selections into the table again, with historical models
+        migration = importlib.import_module("onlinecourse.migrations.0007_submission_packed_choices")
+        state = MigrationLoader(connection).project_state(("onlinecourse", "0007_submission_packed_choices"))
+        migration.unpack_existing_selections(state.apps, None)
+
+        self.assertFalse(Submission.objects.filter(packed_choices__isnull=False).exists())
+        for submission in Submission.objects.all():
+            self.assertEqual(submission.selected_choice_ids(), selections[submission.id])
+
+    def test_seeder_stores_choices_as_configured(self):
+        seeded = list(Submission.objects.order_by("id"))
+        with override_settings(SUBMISSION_STORAGE="packed"):
+            seed_benchmark_data(**TINY_SCALE)
+        packed = list(Submission.objects.filter(id__gt=seeded[-1].id).order_by("id"))
+
+        self.assertFalse(any(submission.packed_choices is not None for submission in seeded))
+        self.assertFalse(any(submission.packed_choices is None for submission in packed))
+        self.assertFalse(Submission.choices.through.objects.filter(submission__in=packed).exists())
+        # The same seed draws the same answers, so the grades and selection sizes match whatever the storage
+        self.assertEqual(
+            [(submission.grade, len(submission.selected_choice_ids())) for submission in seeded],
+            [(submission.grade, len(submission.selected_choice_ids())) for submission in packed],
+        )
+
+    def test_submit_stores_choices_as_configured(self):
+        env = BenchmarkEnv()
+        url = reverse("onlinecourse:submit", args=(env.course.slug_name,))
+        payload = env.answers()
+        expected = sorted(int(choice_ids[0]) for choice_ids in payload["choices"].values())
+
+        grades = []
+        for storage in ["m2m", "packed"]:
+            with override_settings(SUBMISSION_STORAGE=storage):
+                env.client.post(url, json.dumps(payload), content_type="application/json")
+
+            submission = Submission.objects.filter(attempt__learner=env.user).latest("id")
+            self.assertEqual(submission.packed_choices is None, storage == "m2m")
+            self.assertEqual(submission.choices.exists(), storage == "m2m")
+            self.assertEqual(submission.selected_choice_ids(), expected)
+            grades.append(submission.grade)
+
+        self.assertEqual(grades[0], grades[1])
+
+
+class SqlGradingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Stored as the default settings store them
+        seed_benchmark_data(**TINY_SCALE)
+
+        lesson = Lesson.objects.first()
+        learner = User.objects.filter(is_superuser=False).first()
+        questions = list(lesson.questions.prefetch_related("choices"))
+        every_choice = [choice.id for question in questions for choice in question.choices.all()]
+        other_lesson_choice = Choice.objects.exclude(question__lesson=lesson).first().id
+
+        # Edge cases the random answers may miss: nothing selected, everything selected, only foreign choices, and a
+        # lesson without questions
+        empty_lesson = Lesson.objects.create(course=lesson.course, title="Empty", content="")
+        cases = [(lesson, []), (lesson, every_choice), (lesson, [other_lesson_choice]), (empty_lesson, [])]
+        for attempt_no, (case_lesson, choice_ids) in enumerate(cases, start=4):
+            attempt = Attempt.create_attempt(learner, case_lesson, attempt_no)
+            Submission.create_submission(attempt, case_lesson, choice_ids)
+
+    def test_default_storage_is_regraded_in_sql(self):
+        env = BenchmarkEnv()
+        env.client.post(
+            reverse("onlinecourse:submit", args=(env.course.slug_name,)),
+            json.dumps(env.answers()),
+            content_type="application/json",
+        )
+        self.assertFalse(Submission.objects.filter(packed_choices__isnull=False).exists())
+
+        Submission.objects.filter(lesson=env.lesson).update(grade=0)
+        with mock.patch("onlinecourse.regrade.regrade_chunk", return_value=[]) as regrade_chunk:
+            queue_regrade(env.lesson.id)
+            run_regrade_jobs()
+
+        # Nothing is left to the Python grader
+        self.assertEqual([call.args[1] for call in regrade_chunk.call_args_list], [[]])
+        for submission in Submission.objects.filter(lesson=env.lesson):
+            expected, _ = calculate_grade(env.lesson.questions.all(), submission.selected_choices)
+            self.assertEqual(submission.grade, int(expected))
+
+    def test_matches_calculate_grade(self):
+        for submission_id, grade in sql_grading.iter_sql_grades(Submission.objects.all(), chunk_size=5):
+            submission = Submission.objects.get(pk=submission_id)
+            expected, _ = calculate_grade(submission.lesson.questions.all(), submission.selected_choices)
+            self.assertEqual(grade, int(expected), submission_id)
+            self.assertEqual(grade, submission.grade)
+
+        self.assertEqual(len(list(sql_grading.iter_sql_grades(Submission.objects.all()))), Submission.objects.count())
+
+    def test_backfill_grades_both_storages(self):
+        expected = dict(Submission.objects.values_list("id", "grade"))
+
+        submission_ids = sorted(expected)[::2]
+        for submission in Submission.objects.filter(id__in=submission_ids):
+            packed_choices = pack_choice_ids(submission.selected_choice_ids())
+            Submission.objects.filter(pk=submission.pk).update(packed_choices=packed_choices)
+            submission.choices.clear()
+        Submission.objects.update(grade=None)
+
+        # Packed submissions are left to the Python grader
+        sql_grades = list(sql_grading.iter_sql_grades(Submission.objects.all()))
+        self.assertEqual(len(sql_grades), len(expected) - len(submission_ids))
+
+        call_command("backfill_grades", stdout=io.StringIO())
+        self.assertEqual(dict(Submission.objects.values_list("id", "grade")), expected)
+
+        # A second run has nothing left to change
+        output = io.StringIO()
+        call_command("backfill_grades", stdout=output)
+        self.assertIn("0 grades changed", output.getvalue())
+
+
+def attempt_snapshot():
+    return {
+        submission.id: (
+            submission.attempt_id,
+            submission.attempt.attempt_no,
+            submission.grade,
+            submission.submission_date,
+            submission.selected_choice_ids(),
+        )
+        for submission in Submission.objects.select_related("attempt")
+    }
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**{**TINY_SCALE, "attempts": 3})
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f"{directory.name}/attempts.jsonl.gz"
+
+    def test_archive_keeps_last_and_best_attempts(self):
+        before = attempt_snapshot()
+        pairs = {}
+        for attempt in Attempt.objects.prefetch_related("submissions"):
+            grade = max(submission.grade for submission in attempt.submissions.all())
+            pairs.setdefault((attempt.learner_id, attempt.lesson_id), []).append((attempt.attempt_no, grade))
+
+        stats = archive_attempts(self.path, keep_last=1, chunk_size=2)
+
+        records = list(read_archive(self.path))
+        self.assertEqual(stats["attempts"], len(records))
+        self.assertEqual(stats["submissions"], sum(len(record["submissions"]) for record in records))
+        self.assertEqual(Attempt.objects.count() + len(records), sum(map(len, pairs.values())))
+
+        for (learner_id, lesson_id), attempts in pairs.items():
+            kept = set(
+                Attempt.objects.filter(learner_id=learner_id, lesson_id=lesson_id).values_list("attempt_no", flat=True)
+            )
+            best_grade = max(grade for _, grade in attempts)
+            # The next attempt number and the best grade shown to the learner are unchanged
+            self.assertIn(max(attempt_no for attempt_no, _ in attempts), kept)
+            self.assertIn(best_grade, [grade for attempt_no, grade in attempts if attempt_no in kept])
+
+            if len(kept) < len(attempts):
+                summary = AttemptSummary.objects.get(learner_id=learner_id, lesson_id=lesson_id)
+                self.assertEqual(summary.attempt_count, len(attempts))
+                self.assertEqual(summary.archived_count, len(attempts) - len(kept))
+                self.assertEqual(summary.best_grade, best_grade)
+
+        for record in records:
+            for submission in record["submissions"]:
+                _, attempt_no, grade, _, choice_ids = before[submission["id"]]
+                self.assertEqual((record["attempt_no"], submission["grade"]), (attempt_no, grade))
+                self.assertEqual(submission["choice_ids"], choice_ids)
+
+        # Nothing is left to archive
+        self.assertEqual(archive_attempts(self.path + ".2", keep_last=1)["attempts"], 0)
+
+    def test_archive_older_than(self):
+        first_attempts = Attempt.objects.filter(attempt_no=1).count()
+        Submission.objects.filter(attempt__attempt_no=1).update(submission_date=timezone.now() - timedelta(days=400))
+
+        archive_attempts(self.path, older_than=timezone.now() - timedelta(days=365))
+
+        # Only first attempts are old enough, those with the best grade stay
+        records = list(read_archive(self.path))
+        self.assertTrue(records)
+        self.assertEqual({record["attempt_no"] for record in records}, {1})
+        self.assertEqual(Attempt.objects.filter(attempt_no=1).count() + len(records), first_attempts)
+
+    @override_settings(SUBMISSION_STORAGE="m2m")
+    def test_restore_round_trip(self):
+        before = attempt_snapshot()
+        archive_attempts(self.path, keep_last=1)
+        archived_ids = [submission["id"] for record in read_archive(self.path) for submission in record["submissions"]]
+        self.assertTrue(archived_ids)
+
+        output = io.StringIO()
+        call_command("restore_attempts", self.path, stdout=output)
+        self.assertIn("Restored", output.getvalue())
+
+        self.assertEqual(attempt_snapshot(), before)
+        # Restored selections are stored as SUBMISSION_STORAGE sets
+        self.assertFalse(Submission.objects.filter(id__in=archived_ids, packed_choices__isnull=False).exists())
+        self.assertFalse(AttemptSummary.objects.exclude(archived_count=0).exists())
+        self.assertFalse(AttemptSummary.objects.exclude(attempt_count=3).exists())
+
+        # Restoring again skips the attempts already in the database
+        self.assertEqual(restore_archive(self.path)["attempts"], 0)
+        self.assertEqual(attempt_snapshot(), before)
+
+    def test_command_dry_run(self):
+        output = io.StringIO()
+        call_command("archive_attempts", "--dry-run", stdout=output)
+        self.assertIn("to archive", output.getvalue())
+        self.assertEqual(AttemptSummary.objects.count(), 0)
+
+
+class SubmissionExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def test_jsonl_export_matches_calculate_grade(self):
+        output = b"".join(stream_submissions(Submission.objects.all(), export_format="jsonl", chunk_size=5))
+        records = [json.loads(line) for line in output.decode().splitlines()]
+
+        self.assertEqual(len(records), Submission.objects.count())
+        for record in records:
+            submission = Submission.objects.get(pk=record["submission_id"])
+            questions = submission.lesson.questions.all()
+            grade, grade_per_question = calculate_grade(questions, submission.selected_choices)
+
+            self.assertEqual(record["grade"], int(grade))
+            self.assertEqual(record["question_grades"], {str(key): value for key, value in grade_per_question.items()})
+            self.assertEqual(record["selected_choice_ids"], submission.selected_choice_ids())
+
+    def test_gzip_csv_export(self):
+        output = b"".join(stream_submissions(Submission.objects.all(), export_format="csv", compress=True))
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(output).decode())))
+
+        self.assertEqual(len(rows), Submission.objects.count())
+
+    def test_admin_action_streams_export(self):
+        staff = User.objects.create_superuser(email="staff@example.com", password="secret", username="staff")
+        self.client.force_login(staff)
+
+        response = self.client.post(
+            reverse("admin:onlinecourse_submission_changelist"),
+            {"action": "export_jsonl", "_selected_action": list(Submission.objects.values_list("id", flat=True)[:3])},
+        )
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 3)
+
+
+class ContentTransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def content_snapshot(self):
+        # Dumps keep times to the millisecond, like `dumpdata`, the snapshot is compared as dumped
+        return json.loads(json.dumps(self.content_rows(), cls=DjangoJSONEncoder))
+
+    def content_rows(self):
+        return {
+            "courses": list(Course.objects.values_list("id", "slug_name", "total_enrollment").order_by("id")),
+            "instructors": sorted(Course.instructors.through.objects.values_list("course_id", "instructor_id")),
+            "lessons": list(Lesson.objects.values_list("id", "course_id", "title").order_by("id")),
+            "choices": list(Choice.objects.values_list("id", "question__lesson_id", "is_correct").order_by("id")),
+            "learners": list(User.objects.values_list("id", "email", "password", "date_joined").order_by("id")),
+            "submissions": attempt_snapshot(),
+        }
+
+    def test_round_trip_with_learners(self):
+        before = self.content_snapshot()
+        expected_grades = dict(Submission.objects.values_list("id", "grade"))
+
+        dump = io.StringIO()
+        counts = export_content(dump, learners=True)
+        self.assertEqual(counts["onlinecourse.submission"], len(expected_grades))
+        self.assertEqual(len(dump.getvalue().splitlines()), sum(counts.values()))
+
+        Course.objects.all().delete()
+        User.objects.all().delete()
+
+        dump.seek(0)
+        with mock.patch("onlinecourse.signals.calculate_grade") as per_submission_grading:
+            imported = import_content(dump, batch_size=7)
+        per_submission_grading.assert_not_called()
+
+        self.assertEqual(imported["onlinecourse.submission"], len(expected_grades))
+        self.assertEqual(self.content_snapshot(), before)
+        self.assertEqual(dict(Submission.objects.values_list("id", "grade")), expected_grades)
+        self.assertFalse(RegradeJob.objects.exists())
+
+    def test_import_regrades_and_overwrites(self):
+        lesson_versions = dict(Lesson.objects.values_list("id", "version"))
+        expected_grades = dict(Submission.objects.values_list("id", "grade"))
+        Submission.objects.update(grade=None)
+
+        dump = io.StringIO()
+        export_content(dump, courses=Course.objects.all(), learners=True)
+        Course.objects.update(name="Renamed")
+
+        dump.seek(0)
+        imported = import_content(dump)
+
+        self.assertEqual(imported["regraded"], len(expected_grades))
+        self.assertEqual(dict(Submission.objects.values_list("id", "grade")), expected_grades)
+        self.assertFalse(Course.objects.filter(name="Renamed").exists())
+        # Lessons that were overwritten get a new version once
+        self.assertEqual(
+            dict(Lesson.objects.values_list("id", "version")),
+            {lesson_id: version + 1 for lesson_id, version in lesson_versions.items()},
+        )
+
+    def test_commands(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/content.jsonl.gz"
+            call_command("export_content", "--output", path, stderr=io.StringIO())
+
+            with gzip.open(path, "rt") as file:
+                models = {json.loads(line)["model"] for line in file}
+            self.assertNotIn("onlinecourse.submission", models)
+            self.assertIn("onlinecourse.choice", models)
+
+            output = io.StringIO()
+            call_command("import_content", path, stdout=output)
+            self.assertIn("onlinecourse.choice: ", output.getvalue())
+            self.assertIn("0 grades changed", output.getvalue())
+
+
+AUTHORING_CSV = """question,choice,correct,multiple,tag,difficulty
+What is Django?,A web framework,yes,,django,easy
+,A database,no,,,
+Which are Python web frameworks?,Django,true,true,,3
+,Flask,true,,,
+,React,false,,,
+"""
+
+
+class QuestionAuthoringTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+        cls.lesson = Lesson.objects.order_by("id").first()
+
+    def test_csv_and_json_parse_alike(self):
+        from_csv = parse_questions(AUTHORING_CSV, "csv")
+        authoring_json = [
+            {
+                "question": "What is Django?",
+                "tag": "django",
+                "difficulty": "Easy",
+                "choices": [{"choice": "A web framework", "correct": True}, {"choice": "A database"}],
+            },
+            {
+                "question": "Which are Python web frameworks?",
+                "multiple": True,
+                "difficulty": "hard",
+                "choices": [
+                    {"choice": "Django", "correct": True},
+                    {"choice": "Flask", "correct": True},
+                    {"choice": "React", "correct": False},
+                ],
+            },
+        ]
+        from_json = parse_questions(json.dumps({"questions": authoring_json}), "json")
+
+        def strip_locations(questions):
+            return [{key: value for key, value in question.items() if key != "location"} for question in questions]
+
+        self.assertEqual(strip_locations(from_csv), strip_locations(from_json))
+        # Left out, whether a question expects multiple answers follows its correct choices
+        self.assertEqual([question["multiple"] for question in from_csv], [False, True])
+        self.assertEqual([(question["tag"], question["difficulty"]) for question in from_csv], [("django", 1), ("", 3)])
+
+    def test_validation_reports_every_problem(self):
+        content = """question,choice,correct,multiple,difficulty
+No correct choice,A,false,,
+,B,false,,
+Too many correct,A,true,false,
+,B,true,,
+One choice,A,true,,
+Bad flag,A,maybe,,extreme
+,B,true,,
+"""
+        with self.assertRaises(ValidationError) as raised:
+            parse_questions(content, "csv")
+
+        messages = raised.exception.messages
+        self.assertEqual(len(messages), 5, messages)
+        self.assertIn("Line 2: a question needs at least one correct choice.", messages)
+        self.assertIn("Line 4: a single-answer question has 2 correct choices.", messages)
+        self.assertIn("Line 6: a question needs at least two choices.", messages)
+        self.assertIn("Line 7: correct must be true or false, not 'maybe'.", messages)
+        self.assertIn("Line 7: difficulty must be easy, medium or hard, not 'extreme'.", messages)
+
+    def test_import_writes_in_bulk_and_bumps_version_once(self):
+        version = self.lesson.version
+        questions = parse_questions(AUTHORING_CSV, "csv")
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(import_questions(self.lesson, questions), (2, 5))
+
+        inserts = [query for query in queries.captured_queries if query["sql"].startswith("INSERT")]
+        self.assertEqual(len([query for query in inserts if "onlinecourse_question" in query["sql"]]), 1)
+        self.assertEqual(len([query for query in inserts if "onlinecourse_choice" in query["sql"]]), 1)
+
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.version, version + 1)
+        question = self.lesson.questions.get(question_text="Which are Python web frameworks?")
+        self.assertTrue(question.expect_multiple_answer)
+        self.assertEqual(question.choices.filter(is_correct=True).count(), 2)
+        self.assertTrue(RegradeJob.objects.filter(lesson=self.lesson).exists())
+
+    def test_admin_upload(self):
+        staff = User.objects.create_superuser(email="staff@example.com", password="secret", username="staff")
+        self.client.force_login(staff)
+        url = reverse("admin:onlinecourse_lesson_import_questions", args=(self.lesson.pk,))
+        question_count = self.lesson.questions.count()
+
+        invalid = SimpleUploadedFile("questions.csv", b"question,choice,correct\nAlone,A,true\n")
+        response = self.client.post(url, {"file": invalid})
+        self.assertContains(response, "a question needs at least two choices")
+        self.assertEqual(self.lesson.questions.count(), question_count)
+
+        upload = SimpleUploadedFile("questions.csv", AUTHORING_CSV.encode("utf-8-sig"))
+        response = self.client.post(url, {"file": upload})
+        self.assertRedirects(response, reverse("admin:onlinecourse_lesson_change", args=(self.lesson.pk,)))
+        self.assertEqual(self.lesson.questions.count(), question_count + 2)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as file:
+            file.write(AUTHORING_CSV)
+            file.flush()
+            output = io.StringIO()
+            call_command("import_questions", str(self.lesson.pk), file.name, stdout=output)
+
+        self.assertIn("Added 2 question(s) and 5 choice(s)", output.getvalue())
+
+
+class LargeTableAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def setUp(self):
+        staff = User.objects.create_superuser(email="staff@example.com", password="secret", username="staff")
+        self.client.force_login(staff)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for model_name in ["submission", "attempt", "enrollment"]:
+            url = reverse(f"admin:onlinecourse_{model_name}_changelist")
+            with CaptureQueriesContext(connection) as small:
+                self.client.get(url)
+
+            seed_benchmark_data(users=5, courses=1, lessons=1, questions=3)
+            with CaptureQueriesContext(connection) as large:
+                response = self.client.get(url)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(small.captured_queries), len(large.captured_queries), model_name)
+
+    def test_submission_change_form_does_not_list_choices(self):
+        submission = Submission.objects.first()
+        response = self.client.get(reverse("admin:onlinecourse_submission_change", args=(submission.id,)))
+
+        self.assertContains(response, ", ".join(map(str, submission.selected_choice_ids())))
+        self.assertNotContains(response, "<option value=\"%s\"" % Choice.objects.last().id)
+
+    def test_unfiltered_count_is_estimated(self):
+        paginator = EstimatedCountPaginator(Attempt.objects.order_by("id"), 10)
+        paginator.exact_count_threshold = 1
+        last_id = Attempt.objects.order_by("id").last().id
+
+        self.assertEqual(paginator.count, last_id)
+
+        paginator = EstimatedCountPaginator(Attempt.objects.filter(attempt_no=1).order_by("id"), 10)
+        paginator.exact_count_threshold = 1
+        self.assertEqual(paginator.count, Attempt.objects.filter(attempt_no=1).count())
+
+
+class RegradeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def assertGradesCurrent(self, lesson):
+        for submission in lesson.submissions.all():
+            grade, _ = calculate_grade(lesson.questions.all(), submission.selected_choices)
+            self.assertEqual(submission.grade, int(grade))
+
+    def test_answer_key_change_regrades_only_its_lesson(self):
+        lesson, other_lesson = Lesson.objects.order_by("id")[:2]
+        other_grades = list(other_lesson.submissions.order_by("id").values_list("grade", flat=True))
+        choice = Choice.objects.filter(question__lesson=lesson).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            choice.is_correct = not choice.is_correct
+            choice.save()
+
+        job = RegradeJob.objects.get()
+        self.assertEqual((job.lesson, job.status), (lesson, RegradeJob.PENDING))
+
+        self.assertEqual(run_regrade_jobs(chunk_size=2), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, RegradeJob.DONE)
+        self.assertEqual(job.processed, lesson.submissions.count())
+        self.assertGradesCurrent(lesson)
+        self.assertEqual(list(other_lesson.submissions.order_by("id").values_list("grade", flat=True)), other_grades)
+
+    def test_regrade_covers_both_storages(self):
+        lesson = Lesson.objects.order_by("id").first()
+
+        # Every other submission is stored in the selection table, which the database regrades
+        for submission in lesson.submissions.order_by("id")[::2]:
+            choice_ids = submission.selected_choice_ids()
+            Submission.objects.filter(pk=submission.pk).update(packed_choices=None)
+            submission.choices.set(choice_ids)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Choice.objects.filter(question__lesson=lesson, is_correct=True).first().delete()
+
+        run_regrade_jobs(chunk_size=3)
+        self.assertGradesCurrent(lesson)
+        self.assertEqual(RegradeJob.objects.get().processed, lesson.submissions.count())
+
+    def test_unchanged_answer_key_queues_nothing(self):
+        choice = Choice.objects.first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            choice.choice_text = "Reworded"
+            choice.save()
+
+        self.assertFalse(RegradeJob.objects.exists())
+
+    def test_concurrent_queue_keeps_one_pending_job(self):
+        lesson = Lesson.objects.first()
+        job = queue_regrade(lesson.id)
+
+        # A concurrent call passed the pending check before the first job was created
+        pending = mock.Mock(**{"exists.return_value": False})
+        with mock.patch.object(RegradeJob.objects, "filter", return_value=pending):
+            self.assertIsNone(queue_regrade(lesson.id))
+
+        self.assertEqual(list(RegradeJob.objects.all()), [job])
+        job.status = RegradeJob.DONE
+        job.save()
+        self.assertIsNotNone(queue_regrade(lesson.id))
+
+    def test_interrupted_job_resumes_from_cursor(self):
+        lesson = Lesson.objects.first()
+        Choice.objects.filter(question__lesson=lesson).update(is_correct=True)
+        submission_ids = list(lesson.submissions.order_by("id").values_list("id", flat=True))
+
+        job = RegradeJob.objects.create(
+            lesson=lesson, status=RegradeJob.RUNNING, total=len(submission_ids), last_submission_id=submission_ids[0]
+        )
+        RegradeJob.objects.filter(pk=job.pk).update(updated_at=job.updated_at - timedelta(hours=1))
+
+        self.assertEqual(run_regrade_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (RegradeJob.DONE, len(submission_ids) - 1))
+
+    def test_admin_action_queues_jobs(self):
+        staff = User.objects.create_superuser(email="staff@example.com", password="secret", username="staff")
+        self.client.force_login(staff)
+        lesson_ids = list(Lesson.objects.values_list("id", flat=True))
+
+        self.client.post(
+            reverse("admin:onlinecourse_lesson_changelist"),
+            {"action": "regrade_lessons", "_selected_action": lesson_ids},
+        )
+
+        self.assertEqual(set(RegradeJob.objects.values_list("lesson_id", flat=True)), set(lesson_ids))
+
+
+class TaskQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def test_key_collapses_pending_duplicates(self):
+        course = Course.objects.first()
+        first = enqueue(rename_course, course.id, "First", key="rename")
+        second = enqueue(rename_course, course.id, "Second", key="rename")
+
+        self.assertEqual(first, second)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_run_records_duration(self):
+        course = Course.objects.first()
+        task = enqueue(rename_course, course.id, "Renamed")
+
+        self.assertEqual(claim_tasks(10), [task.id])
+        self.assertEqual(claim_tasks(10), [])
+        self.assertEqual(run_task(task.id), Task.DONE)
+
+        task.refresh_from_db()
+        self.assertIsNotNone(task.duration_ms)
+        self.assertEqual(Course.objects.get(pk=course.id).name, "Renamed")
+        self.assertEqual(task_metrics()[0]["done"], 1)
+
+    def test_failing_task_is_retried_with_backoff(self):
+        task = enqueue(failing_task, max_attempts=2)
+        claim_tasks(1)
+
+        self.assertEqual(run_task(task.id), Task.PENDING)
+        task.refresh_from_db()
+        self.assertGreater(task.run_at, task.created_at)
+        self.assertIn("Task failed", task.error)
+        self.assertEqual(claim_tasks(1), [])
+
+        Task.objects.filter(pk=task.id).update(status=Task.RUNNING)
+        self.assertEqual(run_task(task.id), Task.FAILED)
+
+    def test_enroll_queues_enrollment_count(self):
+        user = User.objects.create_user(email="learner@example.com", password="secret", full_name="Learner")
+        course = Course.objects.first()
+        self.client.force_login(user)
+
+        self.client.get(reverse("onlinecourse:enroll", args=(course.slug_name,)))
+
+        task = Task.objects.get(name="onlinecourse.tasks.refresh_enrollment_count")
+        claim_tasks(1)
+        run_task(task.id)
+        course.refresh_from_db()
+        self.assertEqual(course.total_enrollment, course.enrollments.count())
+
+    @override_settings(TASK_QUEUE={"EAGER": True})
+    def test_eager_mode_runs_on_commit(self):
+        course = Course.objects.first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(enqueue(rename_course, course.id, "Eager"))
+
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(Course.objects.get(pk=course.id).name, "Eager")
+
+
+class TaskWorkerTests(TransactionTestCase):
+    def setUp(self):
+        # The in-memory test database raises "table is locked" instead of waiting, as a database file would, when a
+        # thread reads a table another one is writing in a transaction. Claims and runs take turns here.
+        lock = threading.Lock()
+
+        def serialized(func):
+            def wrapper(*args, **kwargs):
+                with lock:
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        for name in ["claim_tasks", "run_task"]:
+            self.enterContext(mock.patch.object(tasks, name, serialized(getattr(tasks, name))))
+
+    def test_thread_pool_runs_due_tasks(self):
+        seed_benchmark_data(**TINY_SCALE)
+        course = Course.objects.first()
+        for index in range(5):
+            enqueue(rename_course, course.id, f"Name {index}")
+
+        self.assertEqual(Worker(pool="thread", concurrency=2, poll_interval=0.01).run(burst=True), 5)
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 5)
+
+
+class ShuffleOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def test_order_is_deterministic_and_leaves_global_rng_alone(self):
+        random.seed(7)
+        expected = random.random()
+
+        random.seed(7)
+        order = draw_order(1, 2, 3, [4, 2, 5, 3])
+        self.assertEqual(random.random(), expected)
+
+        self.assertEqual(order, draw_order(1, 2, 3, [4, 2, 5, 3]))
+        self.assertEqual(unpack_order(pack_order(order)), order)
+        self.assertEqual(sorted(order.questions), [0, 1, 2, 3])
+
+    def test_result_page_shows_quiz_order(self):
+        env = BenchmarkEnv()
+        quiz_page = env.client.get(env.quiz_url(), {"name": env.lesson.title})
+        env.client.post(
+            reverse("onlinecourse:submit", args=(env.course.slug_name,)),
+            data=json.dumps(env.answers()),
+            content_type="application/json",
+        )
+
+        attempt = Attempt.objects.get(learner=env.user, lesson=env.lesson)
+        self.assertIsNotNone(attempt.shuffle_order)
+
+        result_page = env.client.get(
+            reverse("onlinecourse:exam_result", args=(env.course.slug_name,)),
+            {"name": env.lesson.title, "attempt": attempt.attempt_no},
+        )
+
+        self.assertEqual(quiz_page.context["quiz_order"], result_page.context["quiz_order"])
+        self.assertContains(result_page, 'id="quiz-result"')
+
+
+class QuestionPoolTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def setUp(self):
+        cache.clear()
+        self.env = BenchmarkEnv()
+        # A pool of 30 questions in 3 tags of 10, every attempt asking 6 of them
+        self.lesson = Lesson.objects.create(
+            course=self.env.course, title="Pool", content="", questions_per_attempt=6, pool_strata=Lesson.TAG
+        )
+        questions = Question.objects.bulk_create(
+            Question(lesson=self.lesson, question_text=f"Question {number}", tag=f"tag-{number % 3}")
+            for number in range(30)
+        )
+        Choice.objects.bulk_create(
+            Choice(question=question, choice_text=f"Choice {number}", is_correct=number == 0)
+            for question in questions
+            for number in range(3)
+        )
+        self.env.lesson = self.lesson
+
+    def test_allocate_is_proportional(self):
+        self.assertEqual(allocate([10, 5, 5], 4), [2, 1, 1])
+        self.assertEqual(allocate([6, 3, 1], 5), [3, 2, 0])
+        self.assertEqual(sum(allocate([1, 1, 1], 2)), 2)
+
+    def test_sample_is_deterministic_and_stratified(self):
+        order, question_ids = draw_attempt(self.lesson, self.env.user.id, 1)
+
+        self.assertEqual(draw_attempt(self.lesson, self.env.user.id, 1), (order, question_ids))
+        self.assertNotEqual(draw_attempt(self.lesson, self.env.user.id, 2)[1], question_ids)
+        self.assertEqual(len(question_ids), 6)
+        self.assertEqual(sorted(get_pool(self.lesson).question_ids[index] for index in order.questions), question_ids)
+
+        tags = Question.objects.filter(id__in=question_ids).values_list("tag", flat=True)
+        self.assertEqual(sorted(tags), ["tag-0", "tag-0", "tag-1", "tag-1", "tag-2", "tag-2"])
+
+    def test_draw_needs_no_query_once_cached(self):
+        draw_attempt(self.lesson, self.env.user.id, 1)
+        with self.assertNumQueries(0):
+            draw_attempt(self.lesson, self.env.user.id, 2)
+
+    def test_lesson_without_sample_asks_every_question(self):
+        self.lesson.questions_per_attempt = None
+        self.lesson.save()
+
+        order, question_ids = draw_attempt(self.lesson, self.env.user.id, 1)
+        self.assertIsNone(question_ids)
+        self.assertEqual(sorted(order.questions), list(range(30)))
+
+    def test_quiz_page_gets_the_payload_of_its_sampled_questions(self):
+        page = self.env.client.get(self.env.quiz_url(), {"name": self.lesson.title})
+        order, question_ids = draw_attempt(self.lesson, self.env.user.id, 1)
+        url = reverse("onlinecourse:quiz_api", args=(self.lesson.id,))
+
+        response = self.env.client.get(url, {"attempt": 1})
+        payload = response.json()
+        self.assertEqual(payload["questions"]["ids"], question_ids)
+        self.assertEqual(len(payload["choices"]["ids"]), 18)
+        self.assertEqual(response["ETag"], f'"{quiz_payload_etag(self.lesson.id, self.lesson.version, question_ids)}"')
+        self.assertEqual(self.env.client.get(url, {"attempt": 1}, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        # The page order addresses the sampled payload and shows the questions drawn over the pool
+        pool = get_pool(self.lesson)
+        shown = [payload["questions"]["ids"][index] for index in page.context["quiz_order"]["questions"]]
+        self.assertEqual(shown, [pool.question_ids[index] for index in order.questions])
+
+        # Answers to questions outside the sample are not autosaved
+        unasked = Question.objects.filter(lesson=self.lesson).exclude(id__in=question_ids).first()
+        choice_id = str(unasked.choices.first().id)
+        self.env.client.post(
+            reverse("onlinecourse:autosave", args=(self.env.course.slug_name,)),
+            json.dumps({"lessonTitle": self.lesson.title, "answers": {str(unasked.id): [choice_id]}}),
+            content_type="application/json",
+        )
+        self.assertEqual(drafts.load_draft(self.env.user.id, self.lesson.id, 1), {})
+
+    def test_analysis_only_counts_the_asked_questions(self):
+        _, question_ids = draw_attempt(self.lesson, self.env.user.id, 1)
+        answers = self.env.answers()
+        answers["choices"] = {question_id: answers["choices"][str(question_id)] for question_id in question_ids}
+        self.env.client.post(
+            reverse("onlinecourse:submit", args=(self.env.course.slug_name,)),
+            data=json.dumps(answers),
+            content_type="application/json",
+        )
+
+        analysis = analyze_lesson(self.lesson.id)
+        self.assertEqual(analysis["scores"]["mean"], 100)
+        for question_id, stats in analysis["questions"].items():
+            if question_id in question_ids:
+                self.assertEqual((stats["difficulty"], stats["omitted"]), (1, 0))
+            else:
+                self.assertEqual((stats["difficulty"], stats["omitted"]), (None, None))
+                self.assertEqual(set(stats["selection_rates"].values()), {None})
+
+    def test_attempt_keeps_the_draw_of_its_quiz_page(self):
+        self.env.client.get(self.env.quiz_url(), {"name": self.lesson.title})
+        order, question_ids = draw_attempt(self.lesson, self.env.user.id, 1)
+
+        # The pool changes while the quiz is taken, the submission is still graded on the questions the page showed
+        self.lesson.questions_per_attempt = 4
+        self.lesson.save()
+        cache.clear()
+        self.env.client.post(
+            reverse("onlinecourse:submit", args=(self.env.course.slug_name,)),
+            data=json.dumps({"lessonTitle": self.lesson.title}),
+            content_type="application/json",
+        )
+
+        attempt = Attempt.objects.get(learner=self.env.user, lesson=self.lesson)
+        self.assertEqual(attempt.sampled_question_ids(), question_ids)
+        self.assertEqual(unpack_order(attempt.shuffle_order), order)
+        self.assertFalse(QuizDraft.objects.exists())
+
+    @override_settings(SUBMISSION_STORAGE="m2m")
+    def test_attempt_is_graded_on_its_sampled_questions(self):
+        _, question_ids = draw_attempt(self.lesson, self.env.user.id, 1)
+        # Answered right on the sampled questions only, the grade would be 20 over the whole pool
+        answers = self.env.answers()
+        answers["choices"] = {question_id: answers["choices"][str(question_id)] for question_id in question_ids}
+
+        self.env.client.post(
+            reverse("onlinecourse:submit", args=(self.env.course.slug_name,)),
+            data=json.dumps(answers),
+            content_type="application/json",
+        )
+
+        attempt = Attempt.objects.get(learner=self.env.user, lesson=self.lesson)
+        self.assertEqual(attempt.sampled_question_ids(), question_ids)
+        self.assertEqual(list(attempt.questions().values_list("id", flat=True).order_by("id")), question_ids)
+        submission = attempt.submissions.get()
+        self.assertEqual(submission.grade, 100)
+
+        result_page = self.env.client.get(
+            reverse("onlinecourse:exam_result", args=(self.env.course.slug_name,)),
+            {"name": self.lesson.title, "attempt": 1},
+        )
+        self.assertEqual(result_page.status_code, 200)
+        # The order addresses the payload of the sampled questions
+        self.assertEqual(sorted(result_page.context["quiz_order"]["questions"]), list(range(6)))
+        payload = self.env.client.get(
+            reverse("onlinecourse:quiz_api", args=(self.lesson.id,)), {"attempt": attempt.attempt_no}
+        ).json()
+        self.assertEqual(payload["questions"]["ids"], question_ids)
+
+        # The database leaves pooled submissions to the Python regrade, which grades the sample only
+        self.assertNotIn(submission.id, dict(sql_grading.iter_sql_grades(Submission.objects.all())))
+        Submission.objects.filter(pk=submission.pk).update(grade=0)
+        queue_regrade(self.lesson.id)
+        run_regrade_jobs()
+        submission.refresh_from_db()
+        self.assertEqual(submission.grade, 100)
+
+        Submission.objects.filter(pk=submission.pk).update(grade=0)
+        call_command("backfill_grades", stdout=io.StringIO())
+        submission.refresh_from_db()
+        self.assertEqual(submission.grade, 100)
+
+        record = next(iter_submission_records(Submission.objects.filter(pk=submission.pk)))
+        self.assertEqual(sorted(record["question_grades"]), question_ids)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+        cls.course = Course.objects.create(
+            name="Python programming",
+            slug_name="python-programming",
+            image="course_images/django.png",
+            description="Lists, dictionaries and classes.",
+            pub_date=date.today(),
+        )
+        cls.lesson = Lesson.objects.create(
+            course=cls.course, title="Decorators explained", content="Functions wrapping other functions in Python."
+        )
+
+    def found(self, query, **kwargs):
+        return [(result.kind, (result.lesson or result.course).pk) for result in search(query, **kwargs).results]
+
+    def test_titles_rank_first_and_last_word_is_a_prefix(self):
+        self.assertEqual(self.found("python"), [("course", self.course.pk), ("lesson", self.lesson.pk)])
+        self.assertEqual(self.found("python decor"), [("lesson", self.lesson.pk)])
+        self.assertEqual(self.found("wrapping"), [("lesson", self.lesson.pk)])
+        self.assertEqual(self.found('"AND python OR*'), self.found("and python or"))
+        self.assertEqual(self.found("  "), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.lesson.title = "Generators explained"
+        self.lesson.save()
+        self.assertEqual(self.found("decorators"), [])
+        self.assertEqual(self.found("generators"), [("lesson", self.lesson.pk)])
+
+        # A save of other fields leaves the index alone
+        with CaptureQueriesContext(connection) as queries:
+            self.course.save(update_fields=["total_enrollment"])
+        self.assertFalse([query for query in queries.captured_queries if "onlinecourse_search" in query["sql"]])
+
+        self.course.delete()
+        self.assertEqual(self.found("python"), [])
+
+    def test_pages(self):
+        Lesson.objects.bulk_create(
+            Lesson(course=self.course, title=f"Graph theory {number}", content="") for number in range(25)
+        )
+        self.assertEqual(self.found("graph"), [])
+        call_command("reindex_search", stdout=io.StringIO())
+
+        pages = [search("graph", page=page, per_page=10) for page in (1, 2, 3)]
+        self.assertEqual([len(page.results) for page in pages], [10, 10, 5])
+        self.assertEqual([page.has_next for page in pages], [True, True, False])
+        keys = {(result.kind, result.lesson.pk) for page in pages for result in page.results}
+        self.assertEqual(len(keys), 25)
+
+    def test_migration_reindexes_with_historical_models(self):
+        state = MigrationLoader(connection).project_state(("onlinecourse", "0010_search_index"))
+        counts = reindex(apps=state.apps)
+
+        self.assertEqual(counts, {"course": Course.objects.count(), "lesson": Lesson.objects.count()})
+        self.assertEqual(self.found("decorators"), [("lesson", self.lesson.pk)])
+
+    def test_icontains_fallback_finds_the_same(self):
+        for query in ["python", "lesson", "synthetic course"]:
+            self.assertEqual(sorted(self.found(query)), sorted(self.found(query, full_text=False)), query)
+
+    def test_api(self):
+        url = reverse("onlinecourse:search_api")
+        payload = self.client.get(url, {"q": "decorators", "page": "x"}).json()
+
+        self.assertEqual((payload["page"], payload["has_next"]), (1, False))
+        self.assertEqual(
+            payload["results"],
+            [
+                {
+                    "kind": "lesson",
+                    "title": "Decorators explained",
+                    "snippet": "Functions wrapping other functions in Python.",
+                    "course": "Python programming",
+                    "url": reverse("onlinecourse:course_details", args=(self.course.slug_name,)),
+                }
+            ],
+        )
+
+    def test_admin_search_uses_index(self):
+        staff = User.objects.create_superuser(email="staff@example.com", password="secret", username="staff")
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse("admin:onlinecourse_lesson_changelist"), {"q": "decorat"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.lesson])
+
+    def test_benchmark(self):
+        results = measure_search(lessons=200, iterations=1)
+
+        self.assertEqual(results["lessons"], 200)
+        for timings in results["queries"].values():
+            self.assertEqual(timings["full_text_results"], timings["icontains_results"])
+        self.assertFalse(Course.objects.filter(name="Search benchmark").exists())
+
+
+class CatalogueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+        cls.instructor = Instructor.objects.get()
+        # Ties on the enrollment make the ID decide the order
+        courses = Course.objects.bulk_create(
+            Course(
+                name=f"Catalogue {number}",
+                slug_name=f"catalogue-{number}",
+                image="course_images/django.png",
+                description="",
+                pub_date=date.today() - timedelta(days=number),
+                total_enrollment=number % 4,
+            )
+            for number in range(33)
+        )
+        guest = User.objects.create_user(email="guest@example.com", password="secret", full_name="Guest")
+        guest_instructor = Instructor.objects.create(user=guest, work_experience=1, total_learners=0)
+        Course.instructors.through.objects.bulk_create(
+            Course.instructors.through(course=course, instructor=cls.instructor if index < 5 else guest_instructor)
+            for index, course in enumerate(courses)
+        )
+        cls.ordered = list(Course.objects.order_by("-total_enrollment", "-id").values_list("id", flat=True))
+
+    def walk(self, **filters):
+        ids, cursor = [], None
+        while True:
+            page = catalogue_page(cursor=cursor, **filters)
+            ids.extend(course.id for course in page.courses)
+            if page.next_cursor is None:
+                return ids
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_course_once_in_order(self):
+        self.assertEqual(self.walk(), self.ordered)
+        self.assertEqual(self.walk(per_page=7), self.ordered)
+
+    def test_deep_pages_cost_the_same_queries(self):
+        env = BenchmarkEnv()
+        # The page after the 12th course starts among the courses tied with it and ends past them
+        cursor = catalogue_page(per_page=12).next_cursor
+
+        with self.assertNumQueries(4):
+            page = catalogue_page(env.user, cursor=cursor)
+        self.assertEqual([course.id for course in page.courses], self.ordered[12:22])
+
+        cursor = catalogue_page(per_page=30).next_cursor
+        with self.assertNumQueries(4):
+            page = catalogue_page(env.user, cursor=cursor)
+        self.assertEqual([course.id for course in page.courses], self.ordered[30:])
+
+        # A page within the courses tied with its cursor needs one query for them
+        cursor = catalogue_page(per_page=18).next_cursor
+        with self.assertNumQueries(3):
+            page = catalogue_page(env.user, cursor=cursor, per_page=5)
+        self.assertEqual([course.id for course in page.courses], self.ordered[18:23])
+
+        enrolled = [course.is_enrolled for course in catalogue_page(env.user, per_page=50).courses]
+        self.assertEqual(enrolled, [course_id == env.course.id for course_id in self.ordered])
+
+    def test_filters(self):
+        taught = self.instructor.course_set.order_by("-total_enrollment", "-id").values_list("id", flat=True)
+        self.assertEqual(self.walk(instructor_id=self.instructor.id, per_page=2), list(taught))
+
+        published = self.walk(
+            published_from=date.today() - timedelta(days=2), published_to=date.today() - timedelta(days=1)
+        )
+        names = Course.objects.filter(id__in=published).values_list("slug_name", flat=True)
+        self.assertEqual(sorted(names), ["catalogue-1", "catalogue-2"])
+
+    def test_malformed_cursor_starts_over(self):
+        for cursor in ["", "x", "1.2.3", "a.b"]:
+            self.assertEqual([course.id for course in catalogue_page(cursor=cursor).courses], self.ordered[:10])
+
+    def test_course_list_and_api_follow_the_cursor(self):
+        env = BenchmarkEnv()
+        response = env.client.get(reverse("onlinecourse:index"), {"instructor": self.instructor.id})
+        self.assertEqual(len(response.context["course_list"]), 6)
+        self.assertIsNone(response.context["next_page_url"])
+
+        response = env.client.get(reverse("onlinecourse:index"))
+        ids = [course.id for course in response.context["course_list"]]
+        next_url = response.context["next_page_url"]
+        self.assertContains(response, 'id="catalogueSentinel"')
+
+        while next_url:
+            payload = env.client.get(next_url).json()
+            ids.extend(course["id"] for course in payload["courses"])
+            next_url = payload["next"]
+        self.assertEqual(ids, self.ordered)
+
+        url = reverse("onlinecourse:catalogue_api")
+        published_to = (date.today() - timedelta(days=1)).isoformat()
+        payload = env.client.get(url, {"published_to": published_to, "instructor": "x"}).json()
+        self.assertEqual(payload["v"], 1)
+        self.assertEqual(len(payload["courses"]), 10)
+        self.assertTrue(payload["next"].startswith(f"{url}?published_to={published_to}&after="))
+
+        payload = env.client.get(url, {"instructor": self.instructor.id}).json()
+        enrolled = {course["id"]: course["is_enrolled"] for course in payload["courses"]}
+        self.assertEqual(enrolled, {course.id: course == env.course for course in self.instructor.course_set.all()})
+        self.assertEqual(payload["courses"][0]["instructors"], [self.instructor.user.nickname])
+
+    def test_benchmark(self):
+        results = measure_catalogue(courses=120, iterations=1)
+
+        self.assertEqual(list(results["depths"]), [0, 1, 12, 60, 110])
+        self.assertTrue(all(timings["same_page"] for timings in results["depths"].values()))
+        self.assertEqual(Course.objects.count(), len(self.ordered))
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def setUp(self):
+        cache.clear()
+        self.env = BenchmarkEnv()
+        self.lesson = self.env.lesson
+
+    def expected(self):
+        best = {}
+        submissions = Submission.objects.filter(lesson=self.lesson)
+        for learner_id, grade, submitted, submission_id in submissions.values_list(
+            "attempt__learner_id", "grade", "submission_date", "id"
+        ):
+            best[learner_id] = min(best.get(learner_id, (101,)), (-grade, submitted, submission_id))
+        return [(learner_id, -key[0]) for learner_id, key in sorted(best.items(), key=lambda item: item[1])]
+
+    def ranking(self):
+        return [(entry.learner_id, entry.grade) for entry in leaderboard.get_standings(self.lesson.id, k=100).top]
+
+    def submit(self):
+        # Every correct choice, for a grade of 100
+        choices = {}
+        for question_id, choice_id in Choice.objects.filter(question__lesson=self.lesson, is_correct=True).values_list(
+            "question_id", "id"
+        ):
+            choices.setdefault(str(question_id), []).append(str(choice_id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.env.client.post(
+                reverse("onlinecourse:submit", args=(self.env.course.slug_name,)),
+                data=json.dumps({"lessonTitle": self.lesson.title, "choices": choices}),
+                content_type="application/json",
+            )
+
+    def test_best_grades_rank_with_earliest_first(self):
+        self.assertEqual(self.ranking(), self.expected())
+
+        # Tied on the grade, the learner who reached it first ranks first
+        submissions = list(Submission.objects.filter(lesson=self.lesson).order_by("-id"))
+        for days, submission in enumerate(submissions):
+            submission.grade, submission.submission_date = 70, timezone.now() - timedelta(days=days)
+        Submission.objects.bulk_update(submissions, ["grade", "submission_date"])
+        leaderboard.invalidate_leaderboard(self.lesson.id)
+
+        self.assertEqual(self.ranking(), self.expected())
+        self.assertEqual(self.ranking()[0][0], submissions[-1].attempt.learner_id)
+
+    def test_submission_moves_one_entry(self):
+        standings = leaderboard.get_standings(self.lesson.id, self.env.user.id)
+        self.assertEqual((standings.entry, standings.rank, standings.size), (None, None, 3))
+
+        self.submit()
+
+        with self.assertNumQueries(0):
+            standings = leaderboard.get_standings(self.lesson.id, self.env.user.id)
+        self.assertEqual((standings.entry.grade, standings.rank, standings.size), (100, 1, 4))
+        self.assertEqual(self.ranking(), self.expected())
+
+    def test_other_processes_replay_the_changes(self):
+        leaderboard.get_standings(self.lesson.id)
+        copy = leaderboard._leaderboards[self.lesson.id]
+        stale = leaderboard.Leaderboard(copy.entries, copy.incarnation, copy.change, copy.snapshot_change)
+
+        self.submit()
+        leaderboard._leaderboards[self.lesson.id] = stale
+        with self.assertNumQueries(0):
+            ranking = self.ranking()
+        self.assertEqual(ranking, self.expected())
+
+        # Further behind than the log holds, the snapshot is loaded
+        stale = leaderboard.Leaderboard(stale.entries, stale.incarnation, stale.change, stale.snapshot_change)
+        with mock.patch.object(leaderboard, "LOG_SIZE", 1), mock.patch.object(leaderboard, "SNAPSHOT_EVERY", 1):
+            submission = Submission.objects.filter(lesson=self.lesson).exclude(attempt__learner=self.env.user).first()
+            Submission.objects.filter(pk=submission.pk).update(grade=100)
+            submission.refresh_from_db()
+            leaderboard.record_submission(submission)
+
+            leaderboard._leaderboards[self.lesson.id] = stale
+            with self.assertNumQueries(0):
+                ranking = self.ranking()
+            self.assertEqual(ranking, self.expected())
+
+    def test_cold_start_and_bulk_changes_rebuild(self):
+        leaderboard.get_standings(self.lesson.id)
+        incarnation = leaderboard._leaderboards[self.lesson.id].incarnation
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            ranking = self.ranking()
+        self.assertEqual(ranking, self.expected())
+        self.assertNotEqual(leaderboard._leaderboards[self.lesson.id].incarnation, incarnation)
+
+        Submission.objects.filter(lesson=self.lesson).update(grade=0)
+        self.assertNotEqual(self.ranking(), self.expected())
+        self.assertTrue(regrade_submissions(Submission.objects.filter(lesson=self.lesson)))
+        self.assertEqual(self.ranking(), self.expected())
+
+    def test_copies_are_bounded_and_locked_per_lesson(self):
+        other = Lesson.objects.exclude(pk=self.lesson.pk).first()
+        held, release = threading.Event(), threading.Event()
+
+        def rebuild_slowly():
+            with leaderboard._lesson_lock(self.lesson.id):
+                held.set()
+                release.wait(5)
+
+        # A lesson being rebuilt by another thread does not hold up the other lessons
+        thread = threading.Thread(target=rebuild_slowly)
+        thread.start()
+        held.wait(5)
+        try:
+            with mock.patch.object(leaderboard, "MAX_LEADERBOARDS", 1):
+                leaderboard.get_standings(other.id)
+            self.assertTrue(thread.is_alive())
+        finally:
+            release.set()
+            thread.join()
+
+        with mock.patch.object(leaderboard, "MAX_LEADERBOARDS", 1):
+            leaderboard.get_standings(self.lesson.id)
+        self.assertEqual(list(leaderboard._leaderboards), [self.lesson.id])
+
+    def test_lowered_grade_or_busy_lock_invalidates(self):
+        entry = leaderboard.get_standings(self.lesson.id, k=1).top[0]
+        submission = Submission.objects.get(pk=entry.submission_id)
+        Submission.objects.filter(pk=submission.pk).update(grade=0)
+        submission.refresh_from_db()
+
+        leaderboard.record_submission(submission)
+        self.assertEqual(self.ranking(), self.expected())
+
+        lock = f"leaderboard:{self.lesson.id}:lock"
+        cache.add(lock, 1)
+        with mock.patch.object(leaderboard, "LOCK_WAIT", 0):
+            self.submit()
+        self.assertIsNone(cache.get(f"leaderboard:{self.lesson.id}:state"))
+
+        cache.delete(lock)
+        self.assertEqual(self.ranking(), self.expected())
+        self.assertIsNotNone(cache.get(f"leaderboard:{self.lesson.id}:state"))
+
+    def test_api_and_result_page(self):
+        self.submit()
+        url = reverse("onlinecourse:leaderboard_api", args=(self.lesson.id,))
+
+        payload = self.env.client.get(url, {"k": 2}).json()
+        self.assertEqual((payload["v"], payload["lesson"], payload["size"]), (1, self.lesson.id, 4))
+        self.assertEqual([entry["rank"] for entry in payload["top"]], [1, 2])
+        self.assertEqual(payload["top"][0]["learner"], "Runner")
+        self.assertEqual((payload["me"]["rank"], payload["me"]["grade"]), (1, 100))
+        self.assertEqual(len(self.env.client.get(url, {"k": "x"}).json()["top"]), 4)
+
+        result_page = self.env.client.get(
+            reverse("onlinecourse:exam_result", args=(self.env.course.slug_name,)),
+            {"name": self.lesson.title, "attempt": 1},
+        )
+        self.assertEqual(result_page.context["highest_grade"], 100)
+        self.assertContains(result_page, "#1 of 4")
+
+    def test_result_page_reads_regrades_of_other_processes(self):
+        self.submit()
+        result_url = reverse("onlinecourse:exam_result", args=(self.env.course.slug_name,))
+        params = {"name": self.lesson.title, "attempt": 1}
+
+        # A regrade by the task worker, whose invalidation stays in its private cache
+        Submission.objects.filter(attempt__learner=self.env.user).update(grade=50)
+        self.assertFalse(leaderboard.cache_is_shared())
+        self.assertEqual(self.env.client.get(result_url, params).context["highest_grade"], 50)
+
+        # A shared cache would have carried the invalidation, the leaderboard is trusted
+        with mock.patch("onlinecourse.views.cache_is_shared", return_value=True):
+            self.assertEqual(self.env.client.get(result_url, params).context["highest_grade"], 100)
+
+    def test_benchmark(self):
+        results = measure_leaderboard(learners=50, iterations=1)
+
+        self.assertEqual(results["learners"], 50)
+        self.assertTrue(results["agree"])
+        self.assertFalse(Course.objects.filter(name="Leaderboard benchmark").exists())
+        self.assertFalse(User.objects.filter(username__startswith="bench_leaderboard_").exists())
+
+class QuizApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def setUp(self):
+        self.env = BenchmarkEnv()
+        self.url = reverse("onlinecourse:quiz_api", args=(self.env.lesson.id,))
+
+    def test_payload_is_compact_and_hides_answers(self):
+        lesson = self.env.lesson
+        payload = self.env.client.get(self.url).json()
+
+        self.assertEqual(payload, build_quiz_payload(lesson))
+        self.assertNotIn("is_correct", json.dumps(payload))
+
+        questions = payload["questions"]
+        self.assertEqual(questions["ids"], sorted(lesson.questions.values_list("id", flat=True)))
+        for index, question in enumerate(lesson.questions.order_by("id")):
+            choice_ids = payload["choices"]["ids"][questions["offsets"][index] : questions["offsets"][index + 1]]
+            self.assertEqual(choice_ids, sorted(question.choices.values_list("id", flat=True)))
+
+    def test_etag_follows_lesson_version(self):
+        etag = self.env.client.get(self.url)["ETag"]
+        self.assertEqual(self.env.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        question = self.env.lesson.questions.first()
+        question.question_text = "Edited"
+        question.save()
+
+        response = self.env.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Edited", response.json()["questions"]["texts"])
+
+    def test_quiz_page_is_a_shell(self):
+        response = self.env.client.get(self.env.quiz_url(), {"name": self.env.lesson.title})
+
+        self.assertContains(response, self.url)
+        self.assertContains(response, 'id="quiz-order"')
+        self.assertNotContains(response, self.env.lesson.questions.first().question_text)
+
+
+class QuizAutosaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_benchmark_data(**TINY_SCALE)
+
+    def setUp(self):
+        cache.clear()
+        self.env = BenchmarkEnv()
+        self.url = reverse("onlinecourse:autosave", args=(self.env.course.slug_name,))
+        self.answers = self.env.answers()["choices"]
+
+        # The deltas are batched in a cache shared by the processes, as with Redis
+        self.shared_cache = mock.patch.object(drafts, "cache_is_shared", return_value=True)
+        self.shared_cache.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def autosave(self, answers, **extra):
+        body = {"lessonTitle": self.env.lesson.title, "answers": answers, **extra}
+        return self.env.client.post(self.url, json.dumps(body), content_type="application/json")
+
+    def test_deltas_are_coalesced_in_the_cache(self):
+        for question_id, choice_ids in self.answers.items():
+            self.assertEqual(self.autosave({question_id: choice_ids}).json(), {"success": True, "flushed": False})
+
+        self.assertFalse(QuizDraft.objects.exists())
+        draft = drafts.load_draft(self.env.user.id, self.env.lesson.id, 1)
+        self.assertEqual(draft, {key: [int(value) for value in values] for key, values in self.answers.items()})
+
+        self.autosave({}, flush=True)
+        self.assertEqual(QuizDraft.objects.get().answers, draft)
+
+    def test_draft_is_written_in_batches(self):
+        with mock.patch.object(drafts, "FLUSH_EVERY_DELTAS", 3):
+            for index, (question_id, choice_ids) in enumerate(list(self.answers.items())[:4]):
+                self.assertEqual(self.autosave({question_id: choice_ids}).json()["flushed"], index == 2)
+
+        self.assertEqual(len(QuizDraft.objects.get().answers), 3)
+
+        # After a cache eviction the draft resumes from the row
+        cache.clear()
+        self.assertEqual(len(drafts.load_draft(self.env.user.id, self.env.lesson.id, 1)), 3)
+
+    def test_overlapping_deltas_are_both_merged(self):
+        (first_id, first_choices), (second_id, second_choices) = list(self.answers.items())[:2]
+        load_state = drafts._load_state
+
+        def load_state_during_other_delta(*args):
+            # A second delta arrives while the first one is being merged
+            state = load_state(*args)
+            if not state["answers"]:
+                self.assertEqual(self.autosave({second_id: second_choices}).status_code, 409)
+            return state
+
+        with mock.patch.object(drafts, "_load_state", load_state_during_other_delta), mock.patch.object(
+            drafts, "LOCK_WAIT", 0
+        ):
+            self.autosave({first_id: first_choices})
+        self.autosave({second_id: second_choices})
+
+        draft = drafts.load_draft(self.env.user.id, self.env.lesson.id, 1)
+        self.assertEqual(set(draft), {first_id, second_id})
+
+    def test_private_cache_writes_every_delta_to_the_row(self):
+        self.shared_cache.stop()
+        first, second = list(self.answers.items())[:2]
+
+        self.assertEqual(self.autosave(dict([first])).json(), {"success": True, "flushed": True})
+        # Another process, with a cache of its own, merges the next delta into the row
+        cache.clear()
+        self.autosave(dict([second]))
+
+        expected = {key: [int(value) for value in values] for key, values in (first, second)}
+        self.assertEqual(QuizDraft.objects.get().answers, expected)
+        self.assertEqual(drafts.load_draft(self.env.user.id, self.env.lesson.id, 1), expected)
+
+    def test_foreign_choices_are_dropped(self):
+        question_id, choice_ids = next(iter(self.answers.items()))
+        foreign_choice = Choice.objects.exclude(question__lesson=self.env.lesson).first()
+
+        self.autosave({question_id: choice_ids + [str(foreign_choice.id), "x"], "0": ["1"]})
+
+        draft = drafts.load_draft(self.env.user.id, self.env.lesson.id, 1)
+        self.assertEqual(draft, {question_id: [int(choice_ids[0])]})
+
+    def test_submit_promotes_draft(self):
+        self.autosave(self.answers)
+        self.env.client.post(
+            reverse("onlinecourse:submit", args=(self.env.course.slug_name,)),
+            json.dumps({"lessonTitle": self.env.lesson.title}),
+            content_type="application/json",
+        )
+
+        submission = Submission.objects.get(attempt__learner=self.env.user)
+        expected = sorted(int(choice_id) for choice_ids in self.answers.values() for choice_id in choice_ids)
+        self.assertEqual(submission.selected_choice_ids(), expected)
+        self.assertEqual(drafts.load_draft(self.env.user.id, self.env.lesson.id, 1), {})
+        self.assertFalse(QuizDraft.objects.exists())
@@ -14,7 +14,12 @@ Routes:
 - "logout/" : logout_request for user logout.
 - "enroll/<int:course_id>/" : enroll for enrolling in a course.
 - "<int:course_id>/submit/" : submit for submitting course work.
+- "<slug:course_slug>/lesson/autosave/" : autosave for saving the answers of a quiz in progress.
 - "course/<int:course_id>/submission/<int:submission_id>/result/" : show_exam_result for displaying exam results.
+- "api/v1/lessons/<int:lesson_id>/quiz/" : quiz_api for the compact quiz payload the quiz and result pages render.
+- "api/v1/search/" : search_api for the full-text search of courses and lessons.
+- "api/v1/courses/" : catalogue_api for the pages of the course catalogue the course list scrolls through.
+- "api/v1/lessons/<int:lesson_id>/leaderboard/" : leaderboard_api for the best grades of the learners on a lesson.
 
 Static files are served using settings.MEDIA_URL and settings.MEDIA_ROOT.
 """
@@ -23,17 +28,22 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path
 
-from . import views
+from . import api, views
 
 # Application namespace
 app_name = "onlinecourse"
 
 urlpatterns = [
     path(route="", view=views.CourseListView.as_view(), name="index"),
+    path(route="api/v1/lessons/<int:lesson_id>/quiz/", view=api.quiz_api, name="quiz_api"),
+    path(route="api/v1/search/", view=api.search_api, name="search_api"),
+    path(route="api/v1/courses/", view=api.catalogue_api, name="catalogue_api"),
+    path(route="api/v1/lessons/<int:lesson_id>/leaderboard/", view=api.leaderboard_api, name="leaderboard_api"),
     path(route="<slug:course_slug>/enroll/", view=views.enroll, name="enroll"),
     path(route="<slug:course_slug>/", view=views.CourseDetailView.as_view(), name="course_details"),
     path(route="<slug:course_slug>/lesson/", view=views.start_quiz, name="quiz_page"),
     path(route="<slug:course_slug>/lesson/submit/", view=views.submit, name="submit"),
+    path(route="<slug:course_slug>/lesson/autosave/", view=views.autosave, name="autosave"),
     path(
         route="<slug:course_slug>/lesson/result/",
         view=views.show_exam_result,
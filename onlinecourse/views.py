@@ -18,19 +18,29 @@ The module also includes utility functions to check user enrollment status and e
         Checks if a user is enrolled in a given course.
 
     enroll(request: HttpRequest, course_id: int) -> HttpResponseRedirect:
-        Handles course enrollment requests, creates an enrollment record if the user is not already enrolled.
+        Handles course enrollment requests, creates an enrollment record if the user is not already enrolled and queues
+        the recount of the course's enrollments.
 
     submit(request: HttpRequest, course_id: int) -> HttpResponseRedirect:
 
+    autosave(request: HttpRequest, course_slug: str) -> JsonResponse:
+        Merges the answers changed in a quiz in progress into its autosaved draft.
+
     extract_answers(request: HttpRequest) -> List[int]:
 
     show_exam_result(request: HttpRequest, course_id: int, submission_id: int) -> HttpResponse:
         Displays the exam result for a specific course and submission.
 
+    profile_list(request: HttpRequest) -> HttpResponse:
+        Lists the request profiles saved by the profiling middleware, for staff members only.
+
+    profile_download(request: HttpRequest, name: str) -> FileResponse | HttpResponse:
+        Downloads a saved request profile as a pstats dump or as collapsed stacks, for staff members only.
+
 `Classes`:
 
     CourseListView(generic.ListView):
-        Displays a list of courses, ordered by total enrollment.
+        Displays the first page of the course catalogue, ordered by total enrollment, the next ones being scrolled in.
 
     CourseDetailView(generic.DetailView):
         Displays the details of a specific course.
@@ -39,7 +49,6 @@ The module also includes utility functions to check user enrollment status and e
 
 import json
 import logging
-import random
 
 # import re
 from datetime import date
@@ -47,16 +56,28 @@ from typing import List
 
 # from django.contrib.auth import authenticate, login, logout
 # from django.contrib.auth import get_user_model
+from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Count, Max, Q
-from django.http import HttpRequest, HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
 
 from account.models import User
+from myproject.db_routers import read_from_replica
 
 # Import models
+from .api import catalogue_page_url, get_quiz_payload, leaderboard_payload, result_payload
+from .catalogue import catalogue_filters, catalogue_page
+from .drafts import apply_delta, clean_delta, discard_draft, flush_draft, load_draft, load_draw, start_draw
+from .grading import calculate_grade
+from .leaderboard import cache_is_shared
 from .models import Attempt, Course, Enrollment, Lesson, Submission
+from .profiling import COLLAPSED_EXTENSION, PSTATS_EXTENSION, get_profile_store, pstats_to_collapsed
+from .pool import attempt_order, sample_order
+from .shuffle import pack_order
+from .tasks import enqueue, refresh_enrollment_count
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -86,6 +107,7 @@ def check_if_enrolled(user: User, course: Course) -> bool:
 
 
 # Generic class-based views
+@method_decorator(read_from_replica, name="dispatch")
 class CourseListView(generic.ListView):
     model = Course
     template_name = "onlinecourse/course_list_bootstrap.html"
@@ -114,20 +136,19 @@ class CourseListView(generic.ListView):
 
         context["completion_percentage"] = user.completion_percentage() if user.is_authenticated else 0
         context["course_age"] = course_age
+        context["next_page_url"] = catalogue_page_url(self.request.GET, self.page.next_cursor)
         context["attempt_limit"] = self.request.session.get("attempt_limit", False)
         context["from_registration"] = self.request.session.get("from_registration", False)
 
         return context
 
     def get_queryset(self):
-        user = self.request.user
-        courses = Course.objects.order_by("-total_enrollment")[:10]  # Get the top 10 courses based on total enrollment
-        for course in courses:
-            if user.is_authenticated:
-                course.is_enrolled = check_if_enrolled(user, course)
-        return courses
+        # The first page of the catalogue, the next ones are loaded from the catalogue API while scrolling
+        self.page = catalogue_page(self.request.user, **catalogue_filters(self.request.GET))
+        return self.page.courses
 
 
+@method_decorator(read_from_replica, name="dispatch")
 class CourseDetailView(generic.DetailView):
     model = Course
     template_name = "onlinecourse/course_detail_bootstrap.html"
@@ -170,8 +191,7 @@ def enroll(request: HttpRequest, course_slug: str) -> HttpResponse | HttpRespons
         # Create an enrollment if the user is authenticated and not enrolled
         if not is_enrolled and user.is_authenticated:
             Enrollment.objects.create(learner=user, course=course, mode="honor")
-            course.total_enrollment += 1
-            course.save()
+            enqueue(refresh_enrollment_count, course.id, key=f"enrollment-count:{course.id}")
             return HttpResponseRedirect(reverse(viewname="onlinecourse:course_details", args=(course_slug,)))
 
         # Redirect to the course details page if the user is authenticated and enrolled
@@ -230,34 +250,25 @@ def start_quiz(request: HttpRequest, course_slug) -> HttpResponse:
     # Ensure that Question model has a ForeignKey to Lesson
     # Assuming Question has a ForeignKey to Lesson with related_name='questions'
 
-    attempt = Attempt.objects.filter(learner=user, lesson=lesson)
-    attempt_no = 1 if not attempt.exists() else attempt.last().attempt_no + 1
-    random.seed(f"{date.today()}-{user.id}-{lesson.id}-{attempt_no}")
-
-    questions = list(lesson.questions.prefetch_related("choices"))
-    random.shuffle(questions)
+    attempt_no = next_attempt_no(user, lesson)
 
-    quiz_data = [{"question": question, "choices": list(question.choices.all())} for question in questions]
-
-    for item in quiz_data:
-        if len(item["choices"]) > 2:
-            random.shuffle(item["choices"])
-
-    is_binary_question = {question.id: question.choices.count() == 2 for question in questions}
+    # The page is a shell, the questions are rendered in the browser from the quiz API payload in this order, which
+    # only holds the questions sampled for the attempt when the lesson has a question pool. The draw is kept with the
+    # draft of the attempt, the submission is graded on it
+    quiz_order, question_ids = start_draw(user.id, lesson, attempt_no)
+    if question_ids is not None:
+        quiz_order = sample_order(quiz_order)
 
     context = {
         "course": course,
         "lesson": lesson,
-        "quiz_data": quiz_data,
-        "is_binary_question": is_binary_question,
+        "attempt_no": attempt_no,
+        "quiz_order": quiz_order._asdict(),
+        # Answers autosaved before the session expired or the tab closed are restored
+        "quiz_draft": load_draft(user.id, lesson.id, attempt_no),
     }
 
-    response = render(request, template_name="onlinecourse/quiz_page.html", context=context)
-    response.set_cookie("is_binary_question", json.dumps(is_binary_question))
-    print(response.cookies["is_binary_question"])
-    print(response.cookies["is_binary_question"].value)
-
-    return response
+    return render(request, template_name="onlinecourse/quiz_page.html", context=context)
 
 
 # Create a submit view to create an exam submission record for a course enrollment
@@ -286,14 +297,23 @@ def submit(request: HttpRequest, course_slug) -> HttpResponseRedirect:
 
         attempts = Attempt.objects.filter(learner=user, lesson=lesson)
 
-        if not attempts.exists():
-            attempt_idx = 1
-            attempt = Attempt.create_attempt(learner=user, lesson=lesson, attempt_no=attempt_idx)
+        # The attempt keeps the questions and the order the quiz page drew for it, it is graded on those questions and
+        # the result page shows the same order
+        last_attempt = attempts.last()
+        attempt_idx = 1 if last_attempt is None else last_attempt.attempt_no + 1
+        quiz_order, question_ids = load_draw(user.id, lesson, attempt_idx)
+        shuffle_order = pack_order(quiz_order)
+
+        if last_attempt is None:
+            attempt = Attempt.create_attempt(
+                learner=user,
+                lesson=lesson,
+                attempt_no=attempt_idx,
+                shuffle_order=shuffle_order,
+                question_ids=question_ids,
+            )
             attempt.decrease_attempt()
         else:
-            last_attempt = attempts.last()
-            attempt_idx = last_attempt.attempt_no + 1
-
             if user.is_superuser:
                 remaining_attempts = 3
             else:
@@ -302,14 +322,23 @@ def submit(request: HttpRequest, course_slug) -> HttpResponseRedirect:
                     return redirect("onlinecourse:index")
 
             attempt = Attempt.create_attempt(
-                learner=user, lesson=lesson, attempt_no=attempt_idx, remaining_attempts=remaining_attempts
+                learner=user,
+                lesson=lesson,
+                attempt_no=attempt_idx,
+                remaining_attempts=remaining_attempts,
+                shuffle_order=shuffle_order,
+                question_ids=question_ids,
             )
 
-        selected_choices = extract_answers(data)
+        # Without answers in the body, the autosaved draft of the attempt is promoted
+        if "choices" in data:
+            selected_choices = extract_answers(data)
+        else:
+            draft = load_draft(user.id, lesson.id, attempt_idx)
+            selected_choices = [choice_id for choice_ids in draft.values() for choice_id in choice_ids]
 
-        submission = Submission.objects.create(attempt=attempt, lesson=lesson)
-        submission.choices.set(selected_choices)
-        submission.save()
+        Submission.create_submission(attempt=attempt, lesson=lesson, choice_ids=selected_choices)
+        discard_draft(user.id, lesson.id, attempt_idx)
 
         quiz_result_url = (
             reverse("onlinecourse:exam_result", args=(course_slug,)) + f"?name={lesson_title}&attempt={attempt_idx}"
@@ -319,6 +348,56 @@ def submit(request: HttpRequest, course_slug) -> HttpResponseRedirect:
     return JsonResponse({"success": False, "message": "Invalid request"}, status=400)
 
 
+def autosave(request: HttpRequest, course_slug) -> JsonResponse:
+    """
+    Autosave the answers of a quiz in progress.
+
+    The body holds the `lessonTitle` and the `answers` of the questions changed since the last autosave, as selected
+    choice IDs per question ID. They are merged into the draft of the attempt, see `drafts.py`. With `flush`, sent
+    when the page is left, the draft is written to its row at once.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        course_slug (str): The slug of the course.
+
+    Returns:
+        JsonResponse: Whether the delta was saved and whether the draft was written to its row.
+    """
+
+    if request.method != "POST":
+        return JsonResponse({"success": False, "message": "Invalid request"}, status=400)
+
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Oops! You're not logged in."}, status=401)
+
+    data = json.loads(request.body)
+    lesson = get_object_or_404(Lesson, title=data.get("lessonTitle", "").strip(), course__slug_name=course_slug)
+    attempt_no = next_attempt_no(user, lesson)
+
+    # Only the questions sampled for the attempt can be answered
+    _, question_ids = load_draw(user.id, lesson, attempt_no)
+    delta = clean_delta(get_quiz_payload(lesson, question_ids), data.get("answers", {}))
+    draft = apply_delta(user.id, lesson.id, attempt_no, delta)
+    if draft is None:
+        # The page keeps the delta and sends it again with the next one
+        return JsonResponse({"success": False, "message": "The draft is busy, try again."}, status=409)
+
+    if data.get("flush"):
+        flush_draft(user.id, lesson.id, attempt_no)
+
+    return JsonResponse({"success": True, "flushed": draft["flushed"]})
+
+
+def next_attempt_no(user: User, lesson: Lesson) -> int:
+    """
+    Return the number of the next attempt of a learner on a lesson.
+    """
+
+    last_attempt_no = Attempt.objects.filter(learner=user, lesson=lesson).aggregate(last=Max("attempt_no"))["last"]
+    return (last_attempt_no or 0) + 1
+
+
 # A method to collect the selected choices from the exam form from the request object
 def extract_answers(data: dict) -> List[int]:
     """
@@ -342,67 +421,8 @@ def extract_answers(data: dict) -> List[int]:
     return submitted_answers
 
 
-def calculate_grade(questions, choices):
-    total_grade = 0
-    grade_per_question = {}
-
-    all_empty = all(not choices.filter(question=question).exists() for question in questions)
-
-    if all_empty:
-        for question in questions:
-            if question.expect_multiple_answer:
-                grade = 50
-            else:
-                grade = 0
-            grade_per_question[question.id] = int(grade / 100) if grade in [0, 100] else grade / 100
-            total_grade += grade
-        quiz_grade = total_grade / max(questions.count(), 1)
-        return quiz_grade, grade_per_question
-
-    for question in questions:
-        grade = question.grade
-
-        selected_choices = choices.filter(question=question)
-        correct_choices = question.choices.filter(is_correct=True)
-        user_correct_choices = selected_choices.filter(is_correct=True)
-
-        if question.expect_multiple_answer:
-            score_if_empty = 50
-            point_per_choice = grade / max(question.choices.count(), 1)
-            incorrect_choices = abs(len(selected_choices) - len(user_correct_choices))
-
-            if not selected_choices:
-                grade = score_if_empty
-            elif len(selected_choices) == len(correct_choices):
-                grade = (
-                    grade
-                    if set(selected_choices) == set(correct_choices)
-                    else grade - incorrect_choices * point_per_choice
-                )
-            elif len(selected_choices) < len(correct_choices):
-                grade = score_if_empty + len(user_correct_choices) * point_per_choice
-            else:
-                grade = (
-                    score_if_empty + len(user_correct_choices) * point_per_choice - incorrect_choices * point_per_choice
-                )
-        else:
-            grade = grade if set(correct_choices) == set(selected_choices) else 0
-
-        grade_per_question[question.id] = int(grade / 100) if grade in [0, 100] else grade / 100
-        total_grade += grade
-
-    quiz_grade = total_grade / max(questions.count(), 1)
-    return quiz_grade, grade_per_question
-
-
-def get_highest_grade(request: HttpRequest, lesson):
-    user = request.user
-    submission = Submission.objects.filter(lesson=lesson, attempt__learner=user)
-    highest_grade = submission.aggregate(highest_grade=Max("grade"))["highest_grade"]
-    return highest_grade
-
-
 # Create an exam result view to check if learner passed exam and show their question results and result for each question
+@read_from_replica
 def show_exam_result(request: HttpRequest, course_slug) -> HttpResponse:
     """
     Display the exam result for a specific course and submission.
@@ -439,39 +459,83 @@ def show_exam_result(request: HttpRequest, course_slug) -> HttpResponse:
     submission = get_object_or_404(Submission, attempt=attempt, lesson=lesson)
     submission_date = submission.submission_date.strftime("%Y-%m-%d")
 
-    random.seed(f"{date.today()}-{user.id}-{lesson.id}-{attempt_index}")
-    questions = lesson.questions.prefetch_related("choices")
-    question_list = list(questions)
-    random.shuffle(question_list)
+    # Attempts stored before the order was, or whose lesson changed since, fall back to drawing the order again
+    order = attempt_order(attempt)
+    if attempt.question_ids is not None:
+        order = sample_order(order)
 
-    selected_choices = submission.choices.all()
-    quiz_data = [
-        {"selected_choices": selected_choices, "question": question, "choices": list(question.choices.all())}
-        for question in question_list
-    ]
+    # Only the questions sampled for the attempt are scored
+    _, grade_per_question = calculate_grade(attempt.questions(), submission.selected_choices)
 
-    for item in quiz_data:
-        if len(item["choices"]) > 2:
-            random.shuffle(item["choices"])
-
-    _, grade_per_question = calculate_grade(questions, selected_choices)
+    # The best grade of the learner is their entry on the leaderboard
+    leaderboard = leaderboard_payload(lesson.id, user)
+    if cache_is_shared():
+        highest_grade = leaderboard["me"]["grade"] if leaderboard["me"] else None
+    else:
+        # The copy of this process misses the regrades of the task worker, the submissions hold the current grades
+        submissions = Submission.objects.filter(lesson=lesson, attempt__learner=user)
+        highest_grade = submissions.aggregate(highest_grade=Max("grade"))["highest_grade"]
 
     # Add courses, total scores, and choices to the context dictionary for further use within the template
     context = {
         "course": course,
         "lesson": lesson,
-        "quiz_data": quiz_data,
+        "quiz_order": order._asdict(),
+        "result": result_payload(submission, grade_per_question),
         "submission": submission,
         "grade": int(submission.grade) if submission.grade % 2 == 0 else round(submission.grade, 3),
-        "question_grade": grade_per_question,
-        "highest_grade": get_highest_grade(request, lesson),
+        "highest_grade": highest_grade,
+        "leaderboard": leaderboard,
         "user": user,
+        "attempt_no": attempt.attempt_no,
         "attempt_left": attempt.remaining_attempts,
         "submission_date": submission_date,
     }
 
-    context["is_binary_question"] = {
-        int(key): value for key, value in json.loads(request.COOKIES["is_binary_question"]).items()
+    return render(request, template_name="onlinecourse/quiz_result.html", context=context)
+
+
+@staff_member_required
+def profile_list(request: HttpRequest) -> HttpResponse:
+    """
+    List the request profiles saved by the profiling middleware, newest first.
+    Args:
+        request (HttpRequest): The HTTP request object.
+    Returns:
+        HttpResponse: The HTTP response with the rendered profile list.
+    """
+
+    context = {
+        "title": "Request profiles",
+        "profiles": get_profile_store().list(),
+        "pstats_extension": PSTATS_EXTENSION,
     }
 
-    return render(request, template_name="onlinecourse/quiz_result.html", context=context)
+    return render(request, template_name="onlinecourse/profile_list.html", context=context)
+
+
+@staff_member_required
+def profile_download(request: HttpRequest, name: str) -> FileResponse | HttpResponse:
+    """
+    Download a saved request profile.
+    cProfile dumps are downloaded as they are, to be opened with `pstats` or snakeviz, unless the `format` query
+    parameter is "collapsed", in which case they are converted to collapsed stacks for flamegraph tools. Sampled
+    profiles are always stored as collapsed stacks.
+    Args:
+        request (HttpRequest): The HTTP request object.
+        name (str): The file name of the profile.
+    Returns:
+        FileResponse | HttpResponse: The profile as an attachment.
+    """
+
+    path = get_profile_store().path(name)
+
+    if path is None:
+        raise Http404("Profile not found.")
+
+    if name.endswith(PSTATS_EXTENSION) and request.GET.get("format") == "collapsed":
+        response = HttpResponse(pstats_to_collapsed(path), content_type="text/plain")
+        response["Content-Disposition"] = f'attachment; filename="{name[: -len(PSTATS_EXTENSION)]}{COLLAPSED_EXTENSION}"'
+        return response
+
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
@@ -1,6 +1,5 @@
 document.addEventListener("DOMContentLoaded", () => {
     const searchBar = document.getElementById("searchBar");
-    const courseItems = document.querySelectorAll(".course-item");
     const overlayPopupAuthenticated = document.querySelector(".overlay-popup-authenticated");
     const overlayPopupWarning = document.querySelector(".overlay-popup-warning");
     const popupAfterAuth = document.querySelector(".popup-after-auth");
@@ -18,7 +17,8 @@ document.addEventListener("DOMContentLoaded", () => {
         const filterCourses = () => {
             const searchTerm = searchBar.value.toLowerCase();
 
-            courseItems.forEach((item) => {
+            // Courses scrolled in after the page loaded are filtered too
+            document.querySelectorAll(".course-item").forEach((item) => {
                 const courseName = item.getAttribute("data-course-name");
                 if (courseName.includes(searchTerm)) {
                     item.style.display = "grid";
@@ -30,6 +30,124 @@ document.addEventListener("DOMContentLoaded", () => {
         searchBar.addEventListener("input", filterCourses);
     }
 
+    // The next pages of the catalogue are appended when the end of the list comes into view
+    const catalogueSentinel = document.getElementById("catalogueSentinel");
+    const courseCardTemplate = document.getElementById("courseCardTemplate");
+
+    if (catalogueSentinel && courseCardTemplate) {
+        const courseRow = document.querySelector(".grid-wrapper .row");
+        let nextUrl = catalogueSentinel.dataset.nextUrl;
+        let loading = false;
+
+        const createdText = (pubDate) => {
+            const days = pubDate ? Math.floor((Date.now() - Date.parse(pubDate)) / 86400000) : 30;
+            if (days <= 0) return "Created: Today";
+            if (days === 1) return "Created: A day ago";
+            if (days < 30) return `Created: ${days} days ago`;
+            return "Created: A month ago";
+        };
+
+        const renderCourse = (course) => {
+            const card = courseCardTemplate.content.firstElementChild.cloneNode(true);
+            card.dataset.courseName = course.name.toLowerCase();
+            card.querySelector(".course-name").textContent = course.name;
+            card.querySelector(".course-created").textContent = createdText(course.pub_date);
+            card.querySelector(".course-enrollment").textContent = `Student enrolled: ${course.total_enrollment}`;
+            card.querySelector(".course-instructors").textContent = `Created by: ${course.instructors.join(", ")}`;
+            card.querySelector(".course-description").textContent = course.description;
+            if (course.image) {
+                card.querySelector("img").src = course.image;
+            }
+
+            const enrollForm = card.querySelector(".course-enroll");
+            if (enrollForm) {
+                enrollForm.action = course.url;
+                enrollForm.querySelector("button").textContent = course.is_enrolled ? "Enter" : "Enroll";
+            }
+            return card;
+        };
+
+        const observer = new IntersectionObserver(async (entries) => {
+            if (!entries.some((entry) => entry.isIntersecting) || loading || !nextUrl) {
+                return;
+            }
+
+            loading = true;
+            try {
+                const response = await fetch(nextUrl);
+                if (response.ok) {
+                    const page = await response.json();
+                    courseRow.append(...page.courses.map(renderCourse));
+                    nextUrl = page.next;
+                }
+            } finally {
+                loading = false;
+            }
+
+            if (!nextUrl) {
+                observer.disconnect();
+                catalogueSentinel.remove();
+            }
+        });
+        observer.observe(catalogueSentinel);
+    }
+
+    // Beyond the top courses listed on the page, every course and lesson is searched on the server
+    const searchResults = document.getElementById("searchResults");
+
+    if (searchBar && searchResults) {
+        let searchTimer = null;
+        let searchController = null;
+
+        const renderResults = (results) => {
+            searchResults.replaceChildren(
+                ...results.map((result) => {
+                    const item = document.createElement("a");
+                    item.className = "list-group-item list-group-item-action";
+                    item.href = result.url;
+
+                    const title = document.createElement("strong");
+                    title.textContent = result.kind === "lesson" ? `${result.course} · ${result.title}` : result.title;
+                    const snippet = document.createElement("p");
+                    snippet.className = "mb-0 small";
+                    snippet.textContent = result.snippet;
+
+                    item.append(title, snippet);
+                    return item;
+                })
+            );
+        };
+
+        const searchServer = async () => {
+            const query = searchBar.value.trim();
+            if (searchController) {
+                searchController.abort();
+            }
+            if (query.length < 2) {
+                renderResults([]);
+                return;
+            }
+
+            searchController = new AbortController();
+            const url = `${searchResults.dataset.url}?q=${encodeURIComponent(query)}`;
+            try {
+                const response = await fetch(url, { signal: searchController.signal });
+                if (response.ok) {
+                    renderResults((await response.json()).results);
+                }
+            } catch (error) {
+                if (error.name !== "AbortError") {
+                    renderResults([]);
+                }
+            }
+        };
+
+        searchBar.addEventListener("input", () => {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(searchServer, 250);
+        });
+    }
+
     const showPopup = () => {
         overlayPopupAuthenticated.style.display = "block";
         document.body.style.overflow = "hidden";
@@ -193,6 +193,12 @@ const login = async (e) => {
             body: loginCredentials,
         });
 
+        if (response.status === 429) {
+            const data = await response.json();
+            showNotification("error", data.message);
+            return;
+        }
+
         if (!response.ok) {
             throw new Error("Network problem occurred");
         }
@@ -234,6 +240,12 @@ const register = async (e) => {
             body: registerCredentials,
         });
 
+        if (response.status === 429) {
+            const data = await response.json();
+            showNotification("error", data.message);
+            return;
+        }
+
         if (!response.ok) {
             throw new Error("Network problem occurred");
         }
@@ -131,7 +131,8 @@ const login = async (e) => {
             body: loginCredentials,
         });
 
-        if (!response.ok) {
+        // Too many attempts, the getting started page shows the login error
+        if (!response.ok && response.status !== 429) {
             throw new Error("Network problem occurred");
         }
 
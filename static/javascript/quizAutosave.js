@@ -0,0 +1,67 @@
+// Autosaves the answers of a quiz in progress. Changed questions are collected and sent as one small delta after a
+// short pause, the server coalesces the deltas and writes them to the draft in batches (see onlinecourse/drafts.py).
+
+const AUTOSAVE_DELAY_MS = 1500;
+
+const selectedChoices = (question) =>
+    Array.from(question.querySelectorAll("input:not([required-type]):not([type='hidden'])"))
+        .filter((input) => input.checked)
+        .map((input) => input.value);
+
+const createAutosave = (url, csrfToken, lessonTitle) => {
+    let pending = {};
+    let timer = null;
+
+    const send = (flush = false) => {
+        clearTimeout(timer);
+        timer = null;
+
+        if (Object.keys(pending).length === 0 && !flush) {
+            return Promise.resolve();
+        }
+
+        const delta = pending;
+        pending = {};
+
+        // keepalive lets the last delta reach the server when the page is being closed
+        return fetch(url, {
+            method: "POST",
+            headers: { "Content-Type": "application/json", "X-CSRFToken": csrfToken },
+            body: JSON.stringify({ lessonTitle: lessonTitle, answers: delta, flush: flush }),
+            keepalive: true,
+        })
+            .then((response) => {
+                if (!response.ok) throw new Error(`Autosave failed with status ${response.status}`);
+            })
+            .catch((error) => {
+                // The failed delta is sent again with the next one, the answers changed meanwhile take precedence
+                pending = { ...delta, ...pending };
+                throw error;
+            });
+    };
+
+    // The deltas sent on a timer are retried with the next change, their failure is only logged
+    const sendLater = () => send().catch((error) => console.error(error));
+
+    return {
+        record: (question) => {
+            pending[question.dataset.id] = selectedChoices(question);
+            clearTimeout(timer);
+            timer = setTimeout(sendLater, AUTOSAVE_DELAY_MS);
+        },
+        send: send,
+    };
+};
+
+// Checks the inputs of the answers autosaved before the page was reloaded
+const restoreDraft = (draft) => {
+    Object.entries(draft).forEach(([questionId, choiceIds]) => {
+        const question = document.querySelector(`.question[data-id="${questionId}"]`);
+        if (!question) return;
+
+        choiceIds.forEach((choiceId) => {
+            const input = question.querySelector(`input[value="${choiceId}"]`);
+            if (input) input.checked = true;
+        });
+    });
+};
@@ -0,0 +1,108 @@
+// Renders the quiz and result pages from the compact quiz payload served by the quiz API (see onlinecourse/api.py)
+// and the question and choice order of the attempt, embedded in the page.
+
+const escapeHtml = (text) => {
+    const element = document.createElement("span");
+    element.textContent = text;
+    return element.innerHTML;
+};
+
+const toAlphabet = (number) => (number >= 1 && number <= 26 ? `${String.fromCharCode(64 + number)}).` : number);
+
+// Result classes of a choice, the same rules the server-side result template used
+const choiceClass = (multiple, isCorrect, isSelected) => {
+    if (!multiple) {
+        if (isCorrect && isSelected) return "correct";
+        return isCorrect ? "" : "incorrect";
+    }
+    if (isCorrect && isSelected) return "correct";
+    return !isCorrect && isSelected ? "less-precise" : "not-selected";
+};
+
+const renderChoice = (payload, questionId, multiple, isBinary, choiceIndex, position, result) => {
+    const choiceId = payload.choices.ids[choiceIndex];
+    const choiceText = escapeHtml(payload.choices.texts[choiceIndex]);
+    const name = multiple ? `choice__${choiceId}` : `choice_${questionId}`;
+
+    let state = "";
+    if (result) {
+        const isSelected = result.selected.has(choiceId);
+        const isCorrect = result.correct.has(choiceId);
+        state = `class="${choiceClass(multiple, isCorrect, isSelected)}" ${isSelected ? "checked" : ""} disabled`;
+    }
+
+    const label = isBinary
+        ? `<span class="choice-text binary"> ${choiceText}</span>`
+        : `<span class="alphabet">${toAlphabet(position + 1)} </span><span class="choice-text"> ${choiceText}</span>`;
+
+    return `
+        <div class="choice-wrapper">
+            <div class="choice">
+                <label class="choice-option">
+                    <input type="${multiple ? "checkbox" : "radio"}" name="${name}" value="${choiceId}" ${state} />
+                    <span class="${multiple ? "checkbox-btn" : "radio-btn"}"></span>
+                    ${label}
+                </label>
+            </div>
+        </div>`;
+};
+
+const renderQuestion = (payload, questionIndex, choiceOrder, number, result) => {
+    const questionId = payload.questions.ids[questionIndex];
+    const multiple = payload.questions.multiple[questionIndex] === 1;
+    const firstChoice = payload.questions.offsets[questionIndex];
+    const isBinary = choiceOrder.length === 2;
+
+    const choices = choiceOrder
+        .map((offset, position) =>
+            renderChoice(payload, questionId, multiple, isBinary, firstChoice + offset, position, result)
+        )
+        .join("");
+
+    const point = result
+        ? `${result.points[questionId]} / 1 point`
+        : `<span class="material-symbols-outlined"> workspace_premium </span> + 1`;
+
+    return `
+        <div class="question" role="group" data-id="${questionId}">
+            <div class="header-wrapper">
+                <div class="question-header">
+                    <div class="question-number"><h3>${number}.</h3></div>
+                    <div class="question-text"><p>${escapeHtml(payload.questions.texts[questionIndex])}</p></div>
+                </div>
+            </div>
+            <div class="question-choice">
+                <div class="left-space"></div>
+                <div class="choices" role="group">${choices}</div>
+            </div>
+            <div class="question-point"><span class="point-value">${point}</span></div>
+        </div>`;
+};
+
+// Fetches the payload, revalidated by the browser with its ETag, and renders the questions into the container.
+// Resolves once the questions are in the page.
+const renderQuiz = async (container) => {
+    const order = JSON.parse(document.getElementById("quiz-order").textContent);
+    const resultElement = document.getElementById("quiz-result");
+
+    let result = null;
+    if (resultElement) {
+        const data = JSON.parse(resultElement.textContent);
+        result = { selected: new Set(data.selected), correct: new Set(data.correct), points: data.points };
+    }
+
+    const response = await fetch(container.dataset.payloadUrl, { credentials: "same-origin" });
+    if (!response.ok) {
+        throw new Error("The quiz could not be loaded");
+    }
+    const payload = await response.json();
+
+    container.insertAdjacentHTML(
+        "afterbegin",
+        order.questions
+            .map((questionIndex, position) =>
+                renderQuestion(payload, questionIndex, order.choices[position], position + 1, result)
+            )
+            .join("")
+    );
+};